@@ -5,6 +5,10 @@ import logging
 import numpy as np
 from typing import List, Dict, Any, Union, Tuple
 
+from app import indicators
+from app.levels import find_levels
+from app.ohlcv import as_ohlcv
+
 # إعداد التسجيل
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -15,7 +19,7 @@ def predict_trend(klines):
     تم تخفيض الحساسية لتحديد الاتجاهات الصاعدة بشكل أسهل.
     
     المدخلات:
-    :param klines: بيانات الشموع (قائمة من القواميس)
+    :param klines: بيانات الشموع (OHLCVSeries أو قائمة من القواميس)
     
     المخرجات:
     :return: ("up", confidence) إذا كان الاتجاه صاعدًا، ("down", confidence) إذا كان هابطًا، ("neutral", confidence) إذا كان محايدًا
@@ -25,11 +29,13 @@ def predict_trend(klines):
             logger.warning("عدد غير كافٍ من البيانات للتنبؤ بالاتجاه")
             return ("neutral", 0.6)  # إرجاع قيمة افتراضية محايدة
             
-        # استخراج البيانات
-        closes = np.array([float(candle.get('close', 0)) for candle in klines])
-        highs = np.array([float(candle.get('high', 0)) for candle in klines])
-        lows = np.array([float(candle.get('low', 0)) for candle in klines])
-        volumes = np.array([float(candle.get('volume', 0)) for candle in klines])
+        # استخراج البيانات (أعمدة السلسلة مباشرة دون إعادة التحويل)
+        series = as_ohlcv(klines)
+        opens = series.open
+        closes = series.close
+        highs = series.high
+        lows = series.low
+        volumes = series.volume
         
         # ===== تحليل 1: المتوسطات المتحركة (تخفيف الشروط) =====
         sma5 = np.mean(closes[-5:])
@@ -95,10 +101,9 @@ def predict_trend(klines):
         
         # فحص نمط "المطرقة" - Hammer (نمط ارتدادي صاعد)
         if len(closes) >= 3:
-            last_candle = klines[-1]
-            body_size = abs(last_candle.get('open', 0) - last_candle.get('close', 0))
-            lower_wick = min(last_candle.get('open', 0), last_candle.get('close', 0)) - last_candle.get('low', 0)
-            upper_wick = last_candle.get('high', 0) - max(last_candle.get('open', 0), last_candle.get('close', 0))
+            body_size = abs(opens[-1] - closes[-1])
+            lower_wick = min(opens[-1], closes[-1]) - lows[-1]
+            upper_wick = highs[-1] - max(opens[-1], closes[-1])
             
             # إذا كان الفتيل السفلي أطول من جسم الشمعة بمرتين على الأقل
             if lower_wick > body_size * 2 and upper_wick < body_size * 0.5:
@@ -107,10 +112,9 @@ def predict_trend(klines):
         
         # فحص نمط "الشهاب" - Shooting Star (نمط انعكاسي هابط)
         if len(closes) >= 3:
-            last_candle = klines[-1]
-            body_size = abs(last_candle.get('open', 0) - last_candle.get('close', 0))
-            lower_wick = min(last_candle.get('open', 0), last_candle.get('close', 0)) - last_candle.get('low', 0)
-            upper_wick = last_candle.get('high', 0) - max(last_candle.get('open', 0), last_candle.get('close', 0))
+            body_size = abs(opens[-1] - closes[-1])
+            lower_wick = min(opens[-1], closes[-1]) - lows[-1]
+            upper_wick = highs[-1] - max(opens[-1], closes[-1])
             
             # إذا كان الفتيل العلوي أطول من جسم الشمعة بمرتين على الأقل
             if upper_wick > body_size * 2 and lower_wick < body_size * 0.5:
@@ -177,7 +181,7 @@ def predict_trend(klines):
 
 def calculate_rsi(closes, period=14):
     """
-    حساب مؤشر القوة النسبية (RSI)
+    حساب مؤشر القوة النسبية (RSI) بطريقة وايلدر على كامل السلسلة
     
     :param closes: أسعار الإغلاق
     :param period: الفترة المستخدمة لحساب RSI
@@ -186,19 +190,7 @@ def calculate_rsi(closes, period=14):
     if len(closes) < period + 1:
         return 50  # قيمة افتراضية محايدة إذا لم تكن هناك بيانات كافية
     
-    deltas = np.diff(closes)
-    seed = deltas[:period]
-    
-    up = seed[seed >= 0].sum() / period
-    down = -seed[seed < 0].sum() / period
-    
-    if down == 0:
-        return 100
-    
-    rs = up / down
-    rsi = 100 - (100 / (1 + rs))
-    
-    return rsi
+    return indicators.last_value(indicators.rsi(closes, period), 50)
 
 def filter_symbols_by_stability(symbols, min_volume=100000, volatility_threshold=0.05):
     """
@@ -210,7 +202,7 @@ def filter_symbols_by_stability(symbols, min_volume=100000, volatility_threshold
     :return: قائمة بالرموز المصفاة
     """
     try:
-        from app.mexc_api import get_all_symbols_24h_data, get_klines
+        from app.mexc_api import get_all_symbols_24h_data, get_ohlcv
         
         # جلب بيانات 24 ساعة لجميع العملات
         market_data = get_all_symbols_24h_data()
@@ -235,7 +227,7 @@ def filter_symbols_by_stability(symbols, min_volume=100000, volatility_threshold
                 # تطبيق معايير التصفية
                 if volume >= min_volume and volatility <= volatility_threshold:
                     # جلب بيانات الشموع لفحص الاتجاه
-                    klines = get_klines(symbol, '15m', 30)
+                    klines = get_ohlcv(symbol, '15m', 30)
                     if klines and len(klines) >= 20:
                         trend = predict_trend(klines)
                         if trend == "up":
@@ -261,11 +253,12 @@ def identify_trend_reversal(klines):
             return False
         
         # استخراج أسعار الفتح والإغلاق والارتفاع والانخفاض
-        opens = np.array([candle.get('open', 0) for candle in klines])
-        closes = np.array([candle.get('close', 0) for candle in klines])
-        highs = np.array([candle.get('high', 0) for candle in klines])
-        lows = np.array([candle.get('low', 0) for candle in klines])
-        volumes = np.array([candle.get('volume', 0) for candle in klines])
+        series = as_ohlcv(klines)
+        opens = series.open
+        closes = series.close
+        highs = series.high
+        lows = series.low
+        volumes = series.volume
         
         # ===== تحليل 1: مؤشرات فنية متطورة =====
         # مؤشر RSI
@@ -391,14 +384,14 @@ def predict_potential_profit(klines):
         return 0.0
     
     # استخراج بيانات الأسعار والأحجام
-    closes = [float(k['close']) for k in klines]
-    highs = [float(k['high']) for k in klines]
-    lows = [float(k['low']) for k in klines]
-    volumes = [float(k.get('volume', 0)) for k in klines if k.get('volume') is not None]
+    series = as_ohlcv(klines)
+    closes = series.close
+    highs = series.high
+    lows = series.low
+    volumes = series.volume
     
     # حساب متوسط مدى التذبذب
-    ranges = [(h - l) / l for h, l in zip(highs, lows)]
-    avg_range = sum(ranges) / len(ranges)
+    avg_range = float(np.mean((highs - lows) / lows))
     
     # تقدير أولي للربح المحتمل استنادًا إلى متوسط المدى
     potential_profit = avg_range * 100 * 0.25  # 25% من متوسط مدى التذبذب
@@ -412,7 +405,7 @@ def predict_potential_profit(klines):
             volume_trend = 0.8  # انخفاض في الحجم يشير إلى تراجع الزخم
     
     # تحليل انعكاس الاتجاه
-    reversal_potential = identify_trend_reversal(klines)
+    reversal_potential = identify_trend_reversal(series)
     reversal_factor = 1.2 if reversal_potential else 1.0
     
     # حساب RSI
@@ -444,27 +437,13 @@ def trend_was_up(closes, period=10):
     return percent_change > 3  # اعتبار صعود بنسبة 3% مؤشراً على اتجاه صاعد
 
 def find_resistance_levels(highs, lows, closes, window=20, tolerance=0.01):
-    """تحديد مستويات المقاومة بناءً على التحليل السعري"""
-    levels = []
-    
+    """تحديد مستويات المقاومة: قمم محلية هي الأعلى ضمن window شمعة على كل جانب، مدموجة بنسبة tolerance"""
     if len(highs) < window:
-        return levels
-    
-    # البحث عن القمم المحلية
-    for i in range(window, len(highs) - 1):
-        # التحقق إذا كانت النقطة الحالية هي أعلى من النقاط المحيطة (قمة محلية)
-        if highs[i] == max(highs[i-window:i+window+1] if i+window+1 <= len(highs) else highs[i-window:]):
-            # تجاهل المستويات المتكررة (ضمن نطاق التسامح)
-            is_new_level = True
-            for level in levels:
-                if abs(highs[i] / level - 1) < tolerance:
-                    is_new_level = False
-                    break
-            
-            if is_new_level:
-                levels.append(highs[i])
+        return []
     
-    return levels
+    # آخر الشموع تُقارن مع الجيران المتاحين فقط على اليمين، وتُستبعد الشمعة الأخيرة
+    return find_levels(highs, lows, window, tolerance, partial_tail=True,
+                       start=window, stop=len(highs) - 1).resistances
 
 def analyze_market_sentiment(klines, symbol_info=None):
     """
@@ -479,10 +458,11 @@ def analyze_market_sentiment(klines, symbol_info=None):
             return {"sentiment": "neutral", "confidence": 0.5, "reason": "بيانات غير كافية"}
         
         # استخراج البيانات
-        closes = np.array([candle.get('close', 0) for candle in klines])
+        series = as_ohlcv(klines)
+        closes = series.close
         
         # ===== المؤشرات =====
-        trend = predict_trend(klines)
+        trend = predict_trend(series)
         rsi = calculate_rsi(closes)
         
         # المتوسط المتحرك الأسي EMA
@@ -599,16 +579,8 @@ def calculate_ema(values, period):
     """
     if len(values) < period:
         return values.copy()
-        
-    ema = np.zeros_like(values)
-    ema[0] = values[0]
-    
-    multiplier = 2 / (period + 1)
-    
-    for i in range(1, len(values)):
-        ema[i] = (values[i] - ema[i-1]) * multiplier + ema[i-1]
     
-    return ema
+    return indicators.ema(values, period)
 
 def is_profitable_entry(klines, min_profit_pct=0.008):  # تخفيض الحد الأدنى للربح المتوقع إلى 0.8%
     """
@@ -624,12 +596,13 @@ def is_profitable_entry(klines, min_profit_pct=0.008):  # تخفيض الحد ا
             return False, "بيانات غير كافية"
         
         # استخراج البيانات
-        closes = np.array([float(candle.get('close', 0)) for candle in klines])
-        highs = np.array([float(candle.get('high', 0)) for candle in klines])
-        lows = np.array([float(candle.get('low', 0)) for candle in klines])
+        series = as_ohlcv(klines)
+        closes = series.close
+        highs = series.high
+        lows = series.low
         
         # تحليل الاتجاه والمؤشرات
-        trend = predict_trend(klines)
+        trend = predict_trend(series)
         rsi = calculate_rsi(closes)
         
         # حساب متوسط حركة السعر
@@ -659,7 +632,7 @@ def is_profitable_entry(klines, min_profit_pct=0.008):  # تخفيض الحد ا
             return True, "تحرك صاعد مستمر خلال آخر 3 شموع"
             
         # ارتفاع في الحجم مع صعود في السعر
-        volumes = np.array([float(candle.get('volume', 0)) for candle in klines])
+        volumes = series.volume
         if len(volumes) >= 3 and volumes[-1] > np.mean(volumes) * 1.5 and closes[-1] > closes[-2]:
             return True, "ارتفاع في حجم التداول يدعم الصعود"
             
@@ -675,7 +648,7 @@ def is_profitable_entry(klines, min_profit_pct=0.008):  # تخفيض الحد ا
             return True, f"تقلب سعري كافي ({avg_price_movement:.1f}%) لتحقيق ربح محتمل"
         
         # التقاط انعكاس الاتجاه المحتمل
-        if identify_trend_reversal(klines):
+        if identify_trend_reversal(series):
             return True, "نمط انعكاس اتجاه مرصود"
             
         # مؤشر MACD
@@ -19,6 +19,9 @@ from typing import List, Dict, Any, Tuple, Set
 from app.mexc_api import get_current_price, place_order, get_all_symbols_24h_data, get_trades_history
 from app.config import TAKE_PROFIT, STOP_LOSS
 from app.telegram_notify import send_telegram_message, notify_trade_status
+from app.trade_store import trade_store
+from app.trade_journal import trade_journal
+from app.order_tracker import order_tracker, track_buy, track_sell
 
 # إعداد التسجيل
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -61,72 +64,41 @@ PRIORITY_COINS = [
 
 def create_backup() -> str:
     """
-    إنشاء نسخة احتياطية من ملف الصفقات
+    إنشاء نسخة احتياطية من مخزن الصفقات
     
-    :return: اسم ملف النسخة الاحتياطية
+    :return: اسم ملف النسخة الاحتياطية أو "" إذا تم تخطيها
     """
     try:
-        if not os.path.exists(TRADES_FILE):
-            return ""
-            
-        timestamp = int(time.time())
-        backup_file = f"{TRADES_FILE}.backup.{timestamp}"
-        
-        with FILE_LOCK:
-            os.system(f"cp {TRADES_FILE} {backup_file}")
-            
-        logger.info(f"تم إنشاء نسخة احتياطية: {backup_file}")
-        return backup_file
+        return trade_journal.checkpoint()
     except Exception as e:
         logger.error(f"خطأ في إنشاء نسخة احتياطية: {e}")
         return ""
 
 def load_trades() -> Dict[str, List[Dict[str, Any]]]:
     """
-    تحميل الصفقات من الملف
+    تحميل الصفقات من مخزن الصفقات
     
     :return: بيانات الصفقات
     """
     try:
         with FILE_LOCK:
-            if os.path.exists(TRADES_FILE):
-                with open(TRADES_FILE, 'r') as f:
-                    data = json.load(f)
-                
-                # تحويل البيانات إلى التنسيق الصحيح إذا لزم الأمر
-                if isinstance(data, dict) and 'open' in data and 'closed' in data:
-                    return data
-                elif isinstance(data, list):
-                    return {
-                        'open': [t for t in data if t.get('status') == 'OPEN'],
-                        'closed': [t for t in data if t.get('status') != 'OPEN']
-                    }
-                else:
-                    logger.warning(f"صيغة غير متوقعة لملف الصفقات: {type(data)}")
-                    return {'open': [], 'closed': []}
-            
-            return {'open': [], 'closed': []}
+            return trade_store.load_all()
     except Exception as e:
         logger.error(f"خطأ في تحميل الصفقات: {e}")
         return {'open': [], 'closed': []}
 
 def save_trades(data: Dict[str, List[Dict[str, Any]]]) -> bool:
     """
-    حفظ الصفقات في الملف
+    حفظ الصفقات في مخزن الصفقات (تُكتب الصفقات المتغيرة فقط)
     
     :param data: بيانات الصفقات
     :return: نجاح العملية
     """
     try:
-        # إنشاء نسخة احتياطية
-        create_backup()
-        
-        # حفظ البيانات
         with FILE_LOCK:
-            with open(TRADES_FILE, 'w') as f:
-                json.dump(data, f, indent=2)
+            changed = trade_store.save_all(data)
                 
-        logger.info(f"تم حفظ {len(data.get('open', []))} صفقة مفتوحة و {len(data.get('closed', []))} صفقة مغلقة")
+        logger.info(f"تم حفظ {len(data.get('open', []))} صفقة مفتوحة و {len(data.get('closed', []))} صفقة مغلقة ({changed} صف معدل)")
         return True
     except Exception as e:
         logger.error(f"خطأ في حفظ الصفقات: {e}")
@@ -227,7 +199,7 @@ def calculate_per_trade_amount() -> float:
 
 def execute_buy(symbol: str, amount: float) -> Tuple[bool, Dict]:
     """
-    تنفيذ عملية الشراء مع تأكيد قطعي للصفقات الحقيقية فقط
+    تنفيذ عملية الشراء - تُسجّل الصفقة كمعلّقة ويعود فوراً، ويُؤكَّد التنفيذ في الخلفية عبر track_buy
     
     :param symbol: رمز العملة
     :param amount: المبلغ بالدولار
@@ -315,73 +287,13 @@ def execute_buy(symbol: str, amount: float) -> Tuple[bool, Dict]:
             
         logger.info(f"✅ تم إرسال أمر الشراء بنجاح: {result}")
         
-        # التحقق من تنفيذ الصفقة فعلياً - إنتظار قصير للتأكد من تحديث تاريخ التداول
-        time.sleep(2)
-        
-        # نتحقق عبر تاريخ التداول أولاً
-        trade_history_verified = False
-        try:
-            logger.info(f"🔍 التحقق من تنفيذ صفقة {symbol} في تاريخ التداول...")
-            
-            # محاولات متعددة للتحقق من تنفيذ الصفقة خلال 10 ثوانٍ
-            for attempt in range(3):
-                recent_trades = get_trades_history(symbol, 20)
-                order_id = result.get('orderId')
-                
-                if recent_trades:
-                    for trade_record in recent_trades:
-                        if str(trade_record.get('orderId')) == str(order_id):
-                            trade_history_verified = True
-                            logger.info(f"✅✅ تأكيد وجود الصفقة في تاريخ التداول: {symbol} (معرف الأمر: {order_id})")
-                            break
-                
-                if trade_history_verified:
-                    break
-                    
-                # إنتظار قصير ثم محاولة مرة أخرى
-                logger.warning(f"⚠️ محاولة {attempt+1}/3: لم يتم العثور على الصفقة في تاريخ التداول بعد. إنتظار...")
-                time.sleep(2)
-            
-            if not trade_history_verified:
-                logger.error(f"❌❌ لم يتم تأكيد الصفقة في تاريخ التداول بعد 3 محاولات: {symbol}")
-                return False, {"error": "لم يتم تأكيد الصفقة في تاريخ التداول"}
-                
-        except Exception as e:
-            logger.error(f"❌ خطأ أثناء التحقق من تاريخ التداول: {e}")
-            return False, {"error": f"خطأ أثناء التحقق من تاريخ التداول: {e}"}
-        
-        # وصلنا إلى هنا فقط إذا تم تأكيد الصفقة فعلياً
-        logger.info(f"🎯 تم تأكيد تنفيذ صفقة حقيقية: {symbol}")
-        
-        # التحقق من تغير الرصيد بعد الشراء
-        try:
-            new_balance = get_account_balance()
-            if new_balance and 'USDT' in new_balance:
-                new_usdt_balance = float(new_balance['USDT'].get('free', 0))
-                balance_diff = initial_usdt_balance - new_usdt_balance
-                logger.info(f"💰 تغير رصيد USDT: {initial_usdt_balance} → {new_usdt_balance} (فرق: {balance_diff})")
-                
-                # التحقق إذا كان هناك تغير فعلي في الرصيد يقارب قيمة الصفقة
-                if balance_diff < amount * 0.8:  # يجب أن يكون التغير على الأقل 80% من قيمة الصفقة
-                    logger.warning(f"⚠️ تغير الرصيد أقل من المتوقع: {balance_diff} < {amount}")
-                    # لكننا نستمر لأن الصفقة تم تأكيدها بالفعل في تاريخ التداول
-            
-            # التحقق من وجود العملة في الرصيد بعد الشراء
-            purchased_coin_symbol = symbol.replace('USDT', '')
-            if new_balance and purchased_coin_symbol in new_balance:
-                purchased_coin_balance = float(new_balance[purchased_coin_symbol].get('free', 0))
-                logger.info(f"💰 رصيد {purchased_coin_symbol} الجديد: {purchased_coin_balance}")
-        except Exception as e:
-            logger.error(f"❌ خطأ في التحقق من تغير الرصيد: {e}")
-            # نستمر لأن الصفقة تم تأكيدها بالفعل في تاريخ التداول
-        
         # تحضير أهداف الربح
         take_profit_targets = [
             {'percent': percent, 'hit': False}
             for percent in [0.5, 1.0, 2.0]  # أهداف ربح متعددة
         ]
         
-        # إنشاء سجل للصفقة
+        # إنشاء سجل للصفقة كصفقة معلّقة حتى يتأكد تنفيذ الأمر
         order_info = {
             'symbol': symbol,
             'quantity': quantity,
@@ -391,27 +303,17 @@ def execute_buy(symbol: str, amount: float) -> Tuple[bool, Dict]:
             'timestamp': int(time.time() * 1000),
             'status': 'OPEN',
             'api_executed': True,
-            'api_confirmed': True,  # نؤكد أنها صفقة حقيقية تم التحقق منها
+            'api_confirmed': False,  # تصبح True عند تأكيد التنفيذ في الخلفية
+            'confirmation': 'PENDING',
             'orderId': result.get('orderId', ''),
             'order_type': 'MARKET'
         }
         
-        # تحديث ملف الصفقات
-        data = load_trades()
-        data['open'].append(order_info)
-        save_trades(data)
-        
-        logger.info(f"✅✅ تم تسجيل صفقة حقيقية مؤكدة: {symbol}")
-        
-        # إرسال إشعار تلجرام
-        notify_trade_status(
-            symbol=symbol, 
-            status="تم الشراء", 
-            price=price, 
-            order_id=result.get('orderId'),
-            api_verified=True
-        )
+        # إضافة الصفقة إلى المخزن ثم تأكيد التنفيذ في الخلفية
+        trade_store.add_trade(order_info)
+        track_buy(order_info, notify=notify_trade_status)
         
+        result['pending'] = True
         return True, result
     except Exception as e:
         logger.error(f"❌ خطأ في تنفيذ الشراء لـ {symbol}: {e}")
@@ -419,7 +321,7 @@ def execute_buy(symbol: str, amount: float) -> Tuple[bool, Dict]:
 
 def execute_sell(symbol: str, quantity: float) -> Tuple[bool, Dict]:
     """
-    تنفيذ عملية البيع مع تأكيد قطعي للصفقات الحقيقية فقط
+    تنفيذ عملية البيع - يعود فور قبول المنصة للأمر، ويُؤكَّد التنفيذ في الخلفية عبر track_sell
     
     :param symbol: رمز العملة
     :param quantity: الكمية
@@ -469,69 +371,8 @@ def execute_sell(symbol: str, quantity: float) -> Tuple[bool, Dict]:
         
         logger.info(f"✅ تم إرسال أمر البيع بنجاح: {result}")
         
-        # التحقق من تنفيذ الصفقة فعلياً - إنتظار قصير للتأكد من تحديث تاريخ التداول
-        time.sleep(2)
-        
-        # نتحقق عبر تاريخ التداول
-        sell_verified = False
-        try:
-            logger.info(f"🔍 التحقق من تنفيذ عملية بيع {symbol} في تاريخ التداول...")
-            
-            # محاولات متعددة للتحقق من تنفيذ الصفقة
-            for attempt in range(3):
-                trades_history = get_trades_history(symbol, 20)
-                if trades_history:
-                    for trade_record in trades_history:
-                        # نبحث عن صفقة بيع حديثة بنفس معرف الأمر
-                        if (str(trade_record.get('orderId')) == str(result.get('orderId')) and 
-                            trade_record.get('side') == 'SELL'):
-                            sell_verified = True
-                            logger.info(f"✅✅ تأكيد تنفيذ عملية البيع في تاريخ التداول: {symbol}")
-                            break
-                
-                if sell_verified:
-                    break
-                    
-                # إنتظار قصير ثم محاولة مرة أخرى
-                logger.warning(f"⚠️ محاولة {attempt+1}/3: لم يتم العثور على عملية البيع في تاريخ التداول بعد. إنتظار...")
-                time.sleep(2)
-            
-            if not sell_verified:
-                # إذا لم نتمكن من التحقق من البيع، نحاول التحقق من تغير الرصيد كوسيلة بديلة
-                logger.warning(f"⚠️ لم يتم تأكيد عملية البيع في تاريخ التداول. التحقق من تغير الرصيد...")
-                
-                try:
-                    # استخدام كمية الصفقة كقيمة افتراضية لرصيد العملة
-                    old_coin_balance = current_coin_balance
-                        
-                    # التحقق من انخفاض رصيد العملة
-                    new_balance = get_account_balance()
-                    if new_balance and coin_symbol in new_balance:
-                        new_coin_balance = float(new_balance[coin_symbol].get('free', 0))
-                        if new_coin_balance < old_coin_balance * 0.5:  # انخفاض الرصيد بشكل كبير يعني نجاح البيع
-                            sell_verified = True
-                            logger.info(f"✅ تم تأكيد البيع من خلال تغير الرصيد: {old_coin_balance} → {new_coin_balance}")
-                except Exception as e:
-                    logger.error(f"❌ خطأ في التحقق من تغير الرصيد: {e}")
-                
-                if not sell_verified:
-                    logger.error(f"❌❌ لم يتم تأكيد عملية البيع {symbol} بعد عدة محاولات")
-                    return False, {"error": "لم يتم تأكيد تنفيذ عملية البيع"}
-        except Exception as e:
-            logger.error(f"❌ خطأ أثناء التحقق من عملية البيع: {e}")
-            return False, {"error": f"خطأ أثناء التحقق من عملية البيع: {e}"}
-        
-        # وصلنا إلى هنا فقط إذا تم التأكد من تنفيذ البيع فعلياً
-        logger.info(f"🎯 تم تأكيد تنفيذ عملية بيع حقيقية: {symbol}")
-        
-        # إرسال إشعار تلجرام عن عملية البيع
-        notify_trade_status(
-            symbol=symbol,
-            status=f"تم البيع",
-            price=price,
-            order_id=result.get('orderId'),
-            api_verified=True
-        )
+        # تأكيد التنفيذ وسعر البيع الفعلي يتمان في الخلفية (track_sell) بعد إغلاق الصفقة
+        result['pending'] = True
         
         return True, result
     except Exception as e:
@@ -682,51 +523,43 @@ def close_trade(trade: Dict[str, Any], reason: str) -> bool:
         else:
             logger.warning(f"❌ تجاهل تنفيذ أمر البيع لصفقة غير مؤكدة: {symbol}")
         
-        # قراءة ملف الصفقات
-        trades_data = load_trades()
-        
-        # البحث عن الصفقة وتحديثها
-        for i, t in enumerate(trades_data.get('open', [])):
-            if t.get('symbol') == symbol and t.get('timestamp') == trade.get('timestamp'):
-                # إغلاق الصفقة
-                t['status'] = 'CLOSED'
-                t['close_reason'] = reason
-                t['close_timestamp'] = int(time.time() * 1000)
-                t['api_confirmed'] = api_verified  # إضافة علامة التحقق من API
-                
-                # إضافة بيانات البيع إذا نجح
-                if success and result:
-                    t['sell_price'] = result.get('price', 0)
-                    t['sell_time'] = result.get('transactTime', 0)
-                    
-                # نقل الصفقة إلى المغلقة
-                if 'closed' not in trades_data:
-                    trades_data['closed'] = []
-                    
-                trades_data['closed'].append(t)
-                trades_data['open'].pop(i)
-                
-                # حفظ التغييرات
-                save_trades(trades_data)
-                
-                # إرسال إشعار تلجرام للصفقات المؤكدة فقط
-                if api_verified:
-                    sell_price = result.get('price', 0) if success and result else 0
-                    profit_loss = ((sell_price - trade.get('entry_price', 0)) / trade.get('entry_price', 1)) * 100 if sell_price > 0 else 0
-                    
-                    # إرسال إشعار بنجاح البيع
-                    notify_trade_status(
-                        symbol=symbol,
-                        status=f"تم البيع ({reason})",
-                        price=sell_price,
-                        profit_loss=profit_loss,
-                        order_id=result.get('orderId') if success and result else None,
-                        api_verified=True
-                    )
-                else:
-                    logger.warning(f"⚠️ تم إغلاق صفقة غير مؤكدة: {symbol} - لم يتم إرسال إشعار")
+        # نقل الصفقة إلى المغلقة وتحديثها (كتابة صف واحد)
+        changes = {
+            'status': 'CLOSED',
+            'close_reason': reason,
+            'close_timestamp': int(time.time() * 1000),
+            'api_confirmed': api_verified  # إضافة علامة التحقق من API
+        }
+        # إضافة بيانات البيع إذا نجح
+        if success and result:
+            changes['sell_order_id'] = result.get('orderId', '')
+            changes['sell_time'] = result.get('transactTime', 0)
+            if not result.get('pending'):
+                changes['sell_price'] = result.get('price', 0)
+        
+        closed = trade_store.close_trade(symbol, trade.get('timestamp'), changes)
+        if closed is not None:
+            # تأكيد أمر البيع في الخلفية: سعر البيع الفعلي والإشعار عند التنفيذ
+            if success and result and result.get('pending'):
+                track_sell(closed, result.get('orderId'), reason, notify=notify_trade_status)
+            # إرسال إشعار تلجرام للصفقات المؤكدة فقط
+            elif api_verified:
+                sell_price = result.get('price', 0) if success and result else 0
+                profit_loss = ((sell_price - trade.get('entry_price', 0)) / trade.get('entry_price', 1)) * 100 if sell_price > 0 else 0
                 
-                return True
+                # إرسال إشعار بنجاح البيع
+                notify_trade_status(
+                    symbol=symbol,
+                    status=f"تم البيع ({reason})",
+                    price=sell_price,
+                    profit_loss=profit_loss,
+                    order_id=result.get('orderId') if success and result else None,
+                    api_verified=True
+                )
+            else:
+                logger.warning(f"⚠️ تم إغلاق صفقة غير مؤكدة: {symbol} - لم يتم إرسال إشعار")
+            
+            return True
         
         logger.warning(f"لم يتم العثور على الصفقة لإغلاقها: {symbol} - {trade.get('timestamp')}")
         return False
@@ -760,8 +593,9 @@ def check_and_sell_trades() -> int:
         for trade in list(open_trades):  # نسخة من القائمة لتجنب مشاكل التعديل أثناء التكرار
             symbol = trade.get('symbol')
             
-            # إذا كانت الصفقة غير مؤكدة، نغلقها ونعلمها كصفقة وهمية
-            if not trade.get('api_confirmed', False):
+            # إذا كانت الصفقة غير مؤكدة، نغلقها ونعلمها كصفقة وهمية (عدا أوامر الشراء بانتظار التأكيد)
+            pending = order_tracker.is_pending(trade.get('orderId', '')) or trade.get('confirmation') == 'PENDING'
+            if not trade.get('api_confirmed', False) and not pending:
                 logger.warning(f"⚠️ تنظيف صفقة غير مؤكدة: {symbol}")
                 
                 # إغلاق الصفقة وتعليمها كصفقة وهمية
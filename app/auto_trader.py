@@ -3,7 +3,6 @@
 تعتمد على تحليل متخصص من مراقب السوق وتنفذ الصفقات بناءً على معايير محددة
 """
 import logging
-import threading
 import time
 from typing import List, Dict, Any
 from datetime import datetime
@@ -16,6 +15,8 @@ from app.utils import load_json_data, save_json_data, get_timestamp_str
 from app.config import MAX_ACTIVE_TRADES, TAKE_PROFIT, STOP_LOSS
 from app.candlestick_patterns import detect_candlestick_patterns, get_entry_signal
 from app.telegram_notify import send_telegram_message
+from app.engine import trading_engine
+from app.position_index import position_index
 from app.trade_diversifier import get_trade_diversity_metrics
 from app.symbol_enforcer_hook import is_trade_allowed, enforce_diversity
 # استبدال دالة can_trade_coin القديمة بأكثر تطوراً
@@ -26,7 +27,17 @@ logger = logging.getLogger('auto_trader')
 
 # متغيرات عالمية
 auto_trader_running = False
-auto_trader_thread = None
+
+# أسماء مهام التداول الآلي في محرك التداول الموحد
+MANAGE_TASK = 'auto_trader.manage'
+SCAN_TASK = 'auto_trader.scan'
+
+# حالة المسح بين دورات scan_and_trade
+scan_state = {
+    'last_full_scan': 0,
+    'last_quick_scan': 0,
+    'recently_scanned': set()     # العملات التي تم فحصها في المسح الشامل مؤخراً
+}
 trade_settings = {
     'min_confidence': 0.65,           # خفض الحد الأدنى لدرجة الثقة لاقتناص المزيد من الفرص
     'min_profit': 0.5,                # خفض الحد الأدنى للربح المحتمل (0.5% بدلاً من 1%)
@@ -85,12 +96,12 @@ def can_open_new_trade(symbol: str) -> bool:
             logger.info(f"تجاهل الصفقة لـ {symbol} - موجودة في القائمة السوداء")
             return False
         
-        # الحصول على الصفقات المفتوحة
-        open_trades = get_open_trades()
+        # عدد الصفقات المفتوحة من فهرس المراكز
+        open_count = position_index.open_count()
         
         # التحقق من عدد الصفقات المفتوحة
-        if len(open_trades) >= trade_settings['max_active_trades']:
-            logger.info(f"تجاهل الصفقة لـ {symbol} - وصلنا للحد الأقصى من الصفقات المفتوحة ({len(open_trades)}/{trade_settings['max_active_trades']})")
+        if open_count >= trade_settings['max_active_trades']:
+            logger.info(f"تجاهل الصفقة لـ {symbol} - وصلنا للحد الأقصى من الصفقات المفتوحة ({open_count}/{trade_settings['max_active_trades']})")
             return False
         
         # ===== استخدام نظام التنويع الجديد المحسن =====
@@ -101,11 +112,7 @@ def can_open_new_trade(symbol: str) -> bool:
             return False
             
         # فحص إضافي للتأكيد
-        diversity_metrics = get_trade_diversity_metrics()
-        logger.info(f"حالة التنويع الحالية: {diversity_metrics}")
-        
-        # ستظهر الإحصائيات كل مرة للتأكد من التطبيق الصحيح
-        if symbol in diversity_metrics['coins_distribution']:
+        if position_index.is_open(symbol):
             logger.error(f"⛔ منع الصفقة بشكل إلزامي! - {symbol} متداولة بالفعل. التنويع مطلوب!")
             return False
         
@@ -183,15 +190,14 @@ def should_enter_trade(opportunity: Dict[str, Any]) -> bool:
         if trade_settings['confirm_patterns']:
             # تحليل إضافي للشموع
             try:
-                # الحصول على بيانات الشموع من مختلف الإطارات الزمنية
-                from app.mexc_api import get_klines
-                klines_5m = get_klines(symbol, interval='5m', limit=30)
-                klines_15m = get_klines(symbol, interval='15m', limit=30)
-                klines_1h = get_klines(symbol, interval='60m', limit=24)
+                # الحصول على بيانات الشموع من مختلف الإطارات الزمنية (مشتقة من جلبة واحدة)
+                from app.exchange_manager import get_timeframes
+                frames = get_timeframes(symbol, {'5m': 30, '15m': 30, '1h': 24})
+                klines_5m, klines_15m, klines_1h = frames['5m'], frames['15m'], frames['1h']
                 
                 if klines_5m and klines_15m and klines_1h:
                     # الحصول على إشارة الدخول من تحليل الشموع
-                    has_signal, trend, signal_strength, signal_info = get_entry_signal(klines_1h, klines_15m, klines_5m)
+                    has_signal, trend, signal_strength, signal_info = get_entry_signal(klines_1h, klines_15m, klines_5m, symbol)
                     
                     if not has_signal or trend != 'up' or signal_strength < 0.7:
                         logger.info(f"تجاهل الصفقة لـ {symbol} - لم يتم تأكيد إشارة الدخول (إشارة: {has_signal}, اتجاه: {trend}, قوة: {signal_strength:.2f})")
@@ -258,130 +264,131 @@ def execute_trade(opportunity: Dict[str, Any]) -> Dict[str, Any]:
         return {'error': str(e)}
 
 
+def next_scan_interval() -> float:
+    """الفاصل حتى دورة المسح التالية حسب إعدادات المسح الشامل والسريع"""
+    if trade_settings['rapid_scanning']:
+        return max(1, min(trade_settings['scan_interval'], trade_settings['quick_scan_interval']))
+    return max(1, trade_settings['scan_interval'])
+
+
 def scan_and_trade():
     """
     فحص الفرص وتنفيذ الصفقات تلقائياً مع تطبيق صارم لقواعد التنويع
+    (دورة واحدة - مهمة دورية في محرك التداول الموحد)
     """
     global auto_trader_running
     import json
     
-    # متغيرات لتتبع الوقت
-    last_full_scan = 0
-    last_quick_scan = 0
+    current_time = time.time()
+    last_full_scan = scan_state['last_full_scan']
+    last_quick_scan = scan_state['last_quick_scan']
     
     # قائمة العملات التي تم فحصها في المسح السريع
-    recently_scanned = set()
+    recently_scanned = scan_state['recently_scanned']
+    
+    # تحديد نوع المسح (شامل أو سريع)
+    if trade_settings['rapid_scanning']:
+        # مسح شامل كل 60 ثانية (أو حسب الإعدادات)
+        run_full_scan = (current_time - last_full_scan) >= trade_settings['scan_interval']
+        
+        # مسح سريع للعملات ذات الأولوية كل 10 ثواني (أو حسب الإعدادات)
+        run_quick_scan = (current_time - last_quick_scan) >= trade_settings['quick_scan_interval']
+    else:
+        # إذا كان المسح السريع معطلاً، استخدم المسح الشامل فقط
+        run_full_scan = True
+        run_quick_scan = False
     
-    while auto_trader_running:
-        try:
-            current_time = time.time()
+    # المسح الشامل - فحص جميع الفرص
+    if run_full_scan:
+        logger.info("بدء المسح الشامل للفرص...")
+        
+        # الحصول على أفضل الفرص (عدد أكبر لزيادة الاحتمالات)
+        opportunities = get_best_opportunities(limit=30)
+        
+        if opportunities:
+            # تحضير قائمة مجموعة متنوعة من العملات لزيادة التنوع
+            # تطبيق قواعد التنويع من خلال نظام trade_diversifier.py الجديد
+            from app.trade_diversifier import enforce_diversity
             
-            # تحديد نوع المسح (شامل أو سريع)
-            if trade_settings['rapid_scanning']:
-                # مسح شامل كل 60 ثانية (أو حسب الإعدادات)
-                run_full_scan = (current_time - last_full_scan) >= trade_settings['scan_interval']
-                
-                # مسح سريع للعملات ذات الأولوية كل 10 ثواني (أو حسب الإعدادات)
-                run_quick_scan = (current_time - last_quick_scan) >= trade_settings['quick_scan_interval']
-            else:
-                # إذا كان المسح السريع معطلاً، استخدم المسح الشامل فقط
-                run_full_scan = True
-                run_quick_scan = False
+            # استخراج رموز العملات من الفرص
+            candidate_symbols = [opp.get('symbol') for opp in opportunities if opp.get('symbol')]
+            
+            # تطبيق آلية التنويع على الفرص باستخدام النظام الجديد
+            diverse_symbols = enforce_diversity(candidate_symbols)
+            
+            # فلترة الفرص لتقتصر على العملات المتنوعة فقط
+            diverse_opportunities = [opp for opp in opportunities if opp.get('symbol') in diverse_symbols]
             
-            # المسح الشامل - فحص جميع الفرص
-            if run_full_scan:
-                logger.info("بدء المسح الشامل للفرص...")
+            logger.info(f"بعد تطبيق قواعد التنويع: {len(diverse_opportunities)} فرصة متاحة من أصل {len(opportunities)}")
+            
+            # فحص كل فرصة والدخول إذا كانت تستوفي المعايير
+            for opportunity in diverse_opportunities:
+                if not auto_trader_running:
+                    break
+                    
+                symbol = opportunity.get('symbol')
                 
-                # الحصول على أفضل الفرص (عدد أكبر لزيادة الاحتمالات)
-                opportunities = get_best_opportunities(limit=30)
+                logger.info(f"[مسح شامل] فحص فرصة لـ {symbol} - ثقة: {opportunity.get('confidence', 0):.2f}, ربح محتمل: {opportunity.get('potential_profit', 0):.2f}%")
                 
-                if opportunities:
-                    # تحضير قائمة مجموعة متنوعة من العملات لزيادة التنوع
-                    # تطبيق قواعد التنويع من خلال نظام trade_diversifier.py الجديد
-                    from app.trade_diversifier import enforce_diversity
-                    
-                    # استخراج رموز العملات من الفرص
-                    candidate_symbols = [opp.get('symbol') for opp in opportunities if opp.get('symbol')]
-                    
-                    # تطبيق آلية التنويع على الفرص باستخدام النظام الجديد
-                    diverse_symbols = enforce_diversity(candidate_symbols)
-                    
-                    # فلترة الفرص لتقتصر على العملات المتنوعة فقط
-                    diverse_opportunities = [opp for opp in opportunities if opp.get('symbol') in diverse_symbols]
-                    
-                    logger.info(f"بعد تطبيق قواعد التنويع: {len(diverse_opportunities)} فرصة متاحة من أصل {len(opportunities)}")
-                    
-                    # فحص كل فرصة والدخول إذا كانت تستوفي المعايير
-                    for opportunity in diverse_opportunities:
-                        if not auto_trader_running:
-                            break
-                            
-                        symbol = opportunity.get('symbol')
-                        
-                        logger.info(f"[مسح شامل] فحص فرصة لـ {symbol} - ثقة: {opportunity.get('confidence', 0):.2f}, ربح محتمل: {opportunity.get('potential_profit', 0):.2f}%")
-                        
-                        # إضافة العملة للقائمة المفحوصة مؤخراً
-                        recently_scanned.add(symbol)
-                        
-                        # محاولة فتح صفقة
-                        process_opportunity(opportunity)
-                else:
-                    logger.info("لم يتم العثور على فرص تداول في المسح الشامل")
+                # إضافة العملة للقائمة المفحوصة مؤخراً
+                recently_scanned.add(symbol)
                 
-                # تحديث وقت آخر مسح شامل
-                last_full_scan = current_time
+                # محاولة فتح صفقة
+                process_opportunity(opportunity)
+        else:
+            logger.info("لم يتم العثور على فرص تداول في المسح الشامل")
+        
+        # تحديث وقت آخر مسح شامل
+        scan_state['last_full_scan'] = current_time
+    
+    # المسح السريع - فحص العملات ذات الأولوية فقط
+    elif run_quick_scan and trade_settings['rapid_scanning']:
+        logger.info("بدء المسح السريع للعملات ذات الأولوية...")
+        
+        # فحص العملات ذات الأولوية فقط
+        from app.market_monitor import analyze_price_action
+        
+        # فحص كل عملة من العملات ذات الأولوية
+        for symbol in trade_settings['priority_symbols']:
+            if not auto_trader_running:
+                break
             
-            # المسح السريع - فحص العملات ذات الأولوية فقط
-            elif run_quick_scan and trade_settings['rapid_scanning']:
-                logger.info("بدء المسح السريع للعملات ذات الأولوية...")
+            # تجاهل العملات التي تم فحصها مؤخراً في المسح الشامل
+            if symbol in recently_scanned:
+                continue
                 
-                # فحص العملات ذات الأولوية فقط
-                from app.market_monitor import analyze_price_action
+            try:
+                # تحليل العملة
+                analysis = analyze_price_action(symbol)
                 
-                # فحص كل عملة من العملات ذات الأولوية
-                for symbol in trade_settings['priority_symbols']:
-                    if not auto_trader_running:
-                        break
+                # التحقق مما إذا كانت مناسبة للتداول
+                if analysis['summary'].get('suitable_for_trading', False):
+                    logger.info(f"[مسح سريع] عثر على فرصة لـ {symbol}")
                     
-                    # تجاهل العملات التي تم فحصها مؤخراً في المسح الشامل
-                    if symbol in recently_scanned:
-                        continue
-                        
-                    try:
-                        # تحليل العملة
-                        analysis = analyze_price_action(symbol)
-                        
-                        # التحقق مما إذا كانت مناسبة للتداول
-                        if analysis['summary'].get('suitable_for_trading', False):
-                            logger.info(f"[مسح سريع] عثر على فرصة لـ {symbol}")
-                            
-                            # إنشاء كائن الفرصة
-                            opportunity = {
-                                'symbol': symbol,
-                                'entry_price': analysis['price'],
-                                'potential_profit': analysis['summary']['weighted_profit'] * 100,
-                                'confidence': analysis['summary']['confidence'],
-                                'reason': analysis['summary'].get('trading_reason', 'تحليل فني إيجابي'),
-                                'timeframe': max(analysis['timeframes'].keys(), key=lambda k: analysis['timeframes'][k]['trend_strength'])
-                            }
-                            
-                            # محاولة فتح صفقة
-                            process_opportunity(opportunity)
-                    except Exception as e:
-                        logger.error(f"خطأ في تحليل العملة {symbol} في المسح السريع: {e}")
-                
-                # تحديث وقت آخر مسح سريع
-                last_quick_scan = current_time
-                
-                # مسح قائمة العملات المفحوصة مؤخراً بشكل دوري
-                if len(recently_scanned) > 50:
-                    recently_scanned.clear()
-            
-            # انتظار قصير بين دورات المسح
-            time.sleep(1)
-        except Exception as e:
-            logger.error(f"خطأ في حلقة المسح والتداول: {e}")
-            time.sleep(30)  # انتظار في حالة حدوث خطأ
+                    # إنشاء كائن الفرصة
+                    opportunity = {
+                        'symbol': symbol,
+                        'entry_price': analysis['price'],
+                        'potential_profit': analysis['summary']['weighted_profit'] * 100,
+                        'confidence': analysis['summary']['confidence'],
+                        'reason': analysis['summary'].get('trading_reason', 'تحليل فني إيجابي'),
+                        'timeframe': max(analysis['timeframes'].keys(), key=lambda k: analysis['timeframes'][k]['trend_strength'])
+                    }
+                    
+                    # محاولة فتح صفقة
+                    process_opportunity(opportunity)
+            except Exception as e:
+                logger.error(f"خطأ في تحليل العملة {symbol} في المسح السريع: {e}")
+        
+        # تحديث وقت آخر مسح سريع
+        scan_state['last_quick_scan'] = current_time
+        
+        # مسح قائمة العملات المفحوصة مؤخراً بشكل دوري
+        if len(recently_scanned) > 50:
+            recently_scanned.clear()
+    
+    # الدورة التالية: أقصر فاصل بين المسحين (المحرك يستدعي الدالة عند حلوله)
+    trading_engine.set_interval(SCAN_TASK, next_scan_interval())
 
 
 def process_opportunity(opportunity):
@@ -394,16 +401,22 @@ def process_opportunity(opportunity):
     try:
         symbol = opportunity.get('symbol')
         
-        # التحقق من إمكانية فتح صفقة جديدة
+        # فحص سريع قبل جلب بيانات السوق
         if not can_open_new_trade(symbol):
             return False
         
-        # التحقق مما إذا كان يجب الدخول في الصفقة
+        # التحقق مما إذا كان يجب الدخول في الصفقة (يجلب الشموع والمؤشرات: خارج قفل الصفقات)
         if not should_enter_trade(opportunity):
             return False
         
-        # تنفيذ الصفقة
-        result = execute_trade(opportunity)
+        # قسم الكتابة فقط لا يتزامن مع مهام الصفقات الأخرى
+        with trading_engine.exclusive():
+            # إعادة التحقق داخل القفل: مهمة أخرى قد تكون فتحت صفقة أثناء التحليل
+            if not can_open_new_trade(symbol):
+                return False
+            
+            # تنفيذ الصفقة
+            result = execute_trade(opportunity)
         
         if 'error' in result:
             logger.error(f"فشل تنفيذ الصفقة لـ {symbol}: {result['error']}")
@@ -412,8 +425,8 @@ def process_opportunity(opportunity):
             logger.info(f"تم تنفيذ الصفقة بنجاح لـ {symbol}")
             
             # إعادة حساب أسعار العملات بسرعة بعد فتح صفقة جديدة
-            # لتحديث معلومات وقف الخسارة وأخذ الربح
-            threading.Thread(target=lambda: manage_open_trades(), daemon=True).start()
+            # لتحديث معلومات وقف الخسارة وأخذ الربح (الدورة التالية لإدارة الصفقات فوراً)
+            trading_engine.run_now(MANAGE_TASK)
             
             return True
     except Exception as e:
@@ -608,34 +621,13 @@ def manage_open_trades():
         logger.error(f"خطأ في إدارة الصفقات المفتوحة: {e}")
 
 
-def auto_trading_loop():
-    """
-    حلقة التداول الآلي - تدمج البحث عن الفرص وإدارة الصفقات
-    """
-    global auto_trader_running
-    
-    while auto_trader_running:
-        try:
-            # إدارة الصفقات المفتوحة
-            manage_open_trades()
-            
-            # فحص وتنفيذ صفقات جديدة
-            scan_and_trade()
-            
-            # انتظار فترة قصيرة قبل الدورة التالية
-            time.sleep(10)
-        except Exception as e:
-            logger.error(f"خطأ في حلقة التداول الآلي: {e}")
-            time.sleep(30)
-
-
 def start_auto_trader():
     """
-    بدء التداول الآلي
+    بدء التداول الآلي (إدارة الصفقات والمسح كمهمتين في محرك التداول الموحد)
     
     :return: True إذا تم البدء بنجاح
     """
-    global auto_trader_running, auto_trader_thread
+    global auto_trader_running
     
     if auto_trader_running:
         logger.warning("التداول الآلي قيد التشغيل بالفعل")
@@ -643,8 +635,14 @@ def start_auto_trader():
     
     # بدء التداول الآلي
     auto_trader_running = True
-    auto_trader_thread = threading.Thread(target=auto_trading_loop, daemon=True)
-    auto_trader_thread.start()
+    scan_state['last_full_scan'] = 0
+    scan_state['last_quick_scan'] = 0
+    scan_state['recently_scanned'].clear()
+    trading_engine.register(MANAGE_TASK, manage_open_trades, 10, error_interval=30,
+                            exclusive=True, uses_prices=True)
+    # المسح غير exclusive: يقفل فتح الصفقات فقط في process_opportunity وليس جلب بيانات السوق
+    trading_engine.register(SCAN_TASK, scan_and_trade, next_scan_interval(), error_interval=30,
+                            uses_prices=True, long_running=True)
     
     logger.info("تم بدء التداول الآلي")
     
@@ -665,7 +663,7 @@ def stop_auto_trader():
     
     :return: True إذا تم الإيقاف بنجاح
     """
-    global auto_trader_running, auto_trader_thread
+    global auto_trader_running
     
     if not auto_trader_running:
         logger.warning("التداول الآلي متوقف بالفعل")
@@ -673,10 +671,8 @@ def stop_auto_trader():
     
     # إيقاف التداول الآلي
     auto_trader_running = False
-    
-    # انتظار إنهاء الخيط
-    if auto_trader_thread:
-        auto_trader_thread.join(timeout=1.0)
+    trading_engine.unregister(MANAGE_TASK)
+    trading_engine.unregister(SCAN_TASK)
     
     logger.info("تم إيقاف التداول الآلي")
     
@@ -719,6 +715,9 @@ def update_auto_trader_settings(new_settings: Dict[str, Any]):
             if key in trade_settings:
                 trade_settings[key] = value
         
+        # تطبيق فترات المسح الجديدة على المهمة المسجلة فوراً
+        trading_engine.set_interval(SCAN_TASK, next_scan_interval())
+        
         logger.info(f"تم تحديث إعدادات التداول الآلي: {trade_settings}")
         return trade_settings
     except Exception as e:
@@ -0,0 +1,585 @@
+"""
+محرك الاختبار التاريخي (Backtesting) المتجه
+يعيد تشغيل شموع تاريخية لعدة عملات عبر نفس منطق الدخول والخروج المستخدم في البوت:
+- إشارات الدخول: market_scanner.opportunity_arrays (نسخة analyze_symbol_opportunity)
+  و/أو candlestick_patterns.entry_signal_arrays (نسخة get_entry_signal على 1h/15m/5m)
+- قواعد الخروج: نفس شروط check_and_sell_trades (take_profit_targets، stop_loss، max_hold_hours)
+تُحسب المؤشرات والإشارات مرة واحدة كمصفوفات على كامل التاريخ، ثم تُحاكى المحفظة بالقفز
+بين الإشارات بدلاً من المرور على كل شمعة.
+"""
+import argparse
+import bisect
+import heapq
+import json
+import logging
+import math
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.candlestick_patterns import detect_candlestick_patterns_array, entry_signal_arrays
+from app.kline_store import INTERVAL_MS, kline_store
+from app.market_scanner import opportunity_arrays
+from app.ohlcv import OHLCVSeries, as_ohlcv
+from app.timeframes import resample
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import SYSTEM_SETTINGS
+except (ImportError, AttributeError):
+    SYSTEM_SETTINGS = {
+        'max_trades': 10,
+        'total_capital': 25.0,
+        'per_trade_amount': 5.0,
+        'max_hold_hours': 2
+    }
+
+try:
+    from app.config import BACKTEST_FEE_RATE, BACKTEST_DATA_DIR
+except (ImportError, AttributeError):
+    BACKTEST_FEE_RATE = 0.001
+    BACKTEST_DATA_DIR = 'backtest_data'
+
+# أسماء بديلة للفواصل الزمنية غير الموجودة في INTERVAL_MS
+INTERVAL_ALIASES = {'1h': '60m'}
+
+# أسباب الخروج (نفس أسماء أسباب check_and_sell_trades)
+EXIT_REASONS = ('all_targets_hit', 'stop_loss', 'max_hold_time', 'end_of_data')
+
+# الحد الأقصى لعدد الخلايا (صفقات × شموع) في كل دفعة من محاكاة الخروج المتجهة
+EXIT_CHUNK_CELLS = 2_000_000
+
+# المعاملات الافتراضية (نفس قيم الصفقة التي ينشئها execute_buy وإعدادات SYSTEM_SETTINGS)
+DEFAULT_PARAMS = {
+    'strategy': 'scanner',  # scanner / candlestick / both
+    'min_signals': 1,  # الحد الأدنى لإشارات analyze_symbol_opportunity
+    'min_strength': 0.0,  # الحد الأدنى لقوة إشارة get_entry_signal
+    'take_profit_targets': [0.01, 0.01, 0.01],  # أهداف الربح بالنسبة المئوية
+    'tp_quantity_ratios': None,  # None: بيع الكمية كاملة عند تحقق جميع الأهداف (كما في check_and_sell_trades)
+    'stop_loss': -3.0,  # وقف الخسارة بالنسبة المئوية
+    'smart_stop_threshold': None,  # عتبة وقف الخسارة الذكي بالنسبة المئوية (None: معطل)
+    'min_profit_to_sell': None,  # None: البيع عند max_hold_hours دائماً، وإلا البيع بعدها فقط إذا قل الربح عن هذه النسبة
+    'max_trade_hold_hours': None,  # الحد المطلق للاحتفاظ عند تفعيل min_profit_to_sell
+    'max_hold_hours': SYSTEM_SETTINGS.get('max_hold_hours', 2),
+    'max_trades': SYSTEM_SETTINGS.get('max_trades', 10),
+    'per_trade_amount': SYSTEM_SETTINGS.get('per_trade_amount', 5.0),
+    'initial_capital': SYSTEM_SETTINGS.get('total_capital', 25.0),
+    'fee_rate': BACKTEST_FEE_RATE  # عمولة كل عملية شراء/بيع
+}
+
+
+def interval_ms(interval: str) -> int:
+    """مدة الفاصل الزمني بالمللي ثانية"""
+    step = INTERVAL_MS.get(INTERVAL_ALIASES.get(interval, interval))
+    if not step:
+        raise ValueError(f"فاصل زمني غير مدعوم: {interval}")
+    return step
+
+
+def align(base_close_time: np.ndarray, frame: OHLCVSeries, *columns: np.ndarray) -> List[np.ndarray]:
+    """
+    محاذاة أعمدة إطار زمني آخر مع شموع الإطار الأساسي: لكل شمعة أساسية تُؤخذ قيمة آخر شمعة
+    أُغلقت عند إغلاقها أو قبله (بدون النظر إلى المستقبل). الشموع بلا قيمة سابقة تأخذ 0
+    """
+    index = np.searchsorted(frame.close_time, base_close_time, side='right') - 1
+    missing = index < 0
+    index = np.clip(index, 0, None)
+    aligned = []
+    for column in columns:
+        values = column[index] if len(column) else np.zeros(len(index), dtype=column.dtype)
+        aligned.append(np.where(missing, 0, values).astype(column.dtype))
+    return aligned
+
+
+class _SymbolData:
+    """بيانات عملة واحدة مع الإشارات المحسوبة مسبقاً"""
+
+    __slots__ = ('symbol', 'series', 'frames', 'signals')
+
+    def __init__(self, symbol: str, series: OHLCVSeries):
+        self.symbol = symbol
+        self.series = series
+        self.frames: Dict[str, OHLCVSeries] = {}
+        self.signals: Dict[str, Dict[str, np.ndarray]] = {}
+
+
+class Backtester:
+    """
+    محرك اختبار تاريخي متعدد العملات
+    الإشارات تُحسب مرة واحدة لكل عملة وتُعاد استخدامها في جميع تشغيلات run بمعاملات مختلفة
+    """
+
+    def __init__(self, interval: str = '15m'):
+        """
+        :param interval: الإطار الزمني الأساسي للمحاكاة
+        """
+        self.interval = interval
+        self.step = interval_ms(interval)
+        self.data: Dict[str, _SymbolData] = {}
+
+    # ---------- البيانات ----------
+
+    def add_series(self, symbol: str, klines: Any, interval: Optional[str] = None):
+        """
+        إضافة بيانات عملة (الإطار الأساسي، أو إطار إضافي لإشارات الشموع مثل 5m أو 1h)
+
+        :param symbol: رمز العملة
+        :param klines: الشموع (OHLCVSeries أو قائمة)
+        :param interval: الإطار الزمني (الافتراضي الإطار الأساسي)
+        """
+        series = as_ohlcv(klines)
+        interval = interval or self.interval
+        if len(series) and np.all(series.close_time == series.open_time):
+            series.close_time = series.open_time + interval_ms(interval) - 1
+        if interval == self.interval:
+            self.data[symbol] = _SymbolData(symbol, series)
+        elif symbol in self.data:
+            self.data[symbol].frames[INTERVAL_ALIASES.get(interval, interval)] = series
+            self.data[symbol].signals.pop('candlestick', None)
+        else:
+            raise ValueError(f"أضف الإطار الأساسي {self.interval} لـ {symbol} قبل الإطارات الإضافية")
+
+    def load_from_store(self, symbols: Iterable[str], limit: int = 100000):
+        """تحميل الشموع المحفوظة في kline_store (محدودة بـ KLINE_STORE_MAX_ROWS لكل سلسلة)"""
+        for symbol in symbols:
+            series = kline_store.get_recent_ohlcv(symbol, self.interval, limit)
+            if len(series):
+                self.add_series(symbol, series)
+
+    def load_files(self, directory: str = BACKTEST_DATA_DIR, symbols: Optional[Iterable[str]] = None):
+        """
+        تحميل ملفات SYMBOL_INTERVAL.npz المحفوظة بـ save_history (مصفوفة klines بأعمدة OHLCV)
+
+        :param directory: مجلد البيانات
+        :param symbols: العملات المطلوبة (الافتراضي جميع الملفات)
+        """
+        wanted = set(symbols) if symbols else None
+        files = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.npz'):
+                symbol, interval = name[:-4].rsplit('_', 1)
+                if wanted is None or symbol in wanted:
+                    files.append((interval != self.interval, symbol, interval, name))
+        # الإطار الأساسي أولاً ثم الإطارات الإضافية
+        for extra, symbol, interval, name in sorted(files):
+            if extra and symbol not in self.data:
+                continue
+            with np.load(os.path.join(directory, name)) as archive:
+                self.add_series(symbol, OHLCVSeries.from_matrix(archive['klines']), interval)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        تصدير السلاسل والإشارات المحسوبة كقاموس مصفوفات مسطح (لمشاركتها بين العمليات)
+        المفاتيح: "SYMBOL|column" للشموع و "SYMBOL|signal|kind|name" للإشارات
+        """
+        arrays = {}
+        for symbol, item in self.data.items():
+            for column in ('open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time'):
+                arrays[f"{symbol}|{column}"] = getattr(item.series, column)
+            for kind, signals in item.signals.items():
+                for name, values in signals.items():
+                    arrays[f"{symbol}|signal|{kind}|{name}"] = values
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, interval: str, arrays: Dict[str, np.ndarray]) -> 'Backtester':
+        """إعادة بناء محرك من ناتج to_arrays (المصفوفات تُستخدم كما هي بدون نسخ)"""
+        backtester = cls(interval)
+        symbols = sorted({key.split('|', 1)[0] for key in arrays})
+        for symbol in symbols:
+            columns = [arrays[f"{symbol}|{c}"] for c in ('open_time', 'open', 'high', 'low', 'close', 'volume')]
+            item = _SymbolData(symbol, OHLCVSeries(*columns, arrays[f"{symbol}|close_time"]))
+            prefix = f"{symbol}|signal|"
+            for key, values in arrays.items():
+                if key.startswith(prefix):
+                    kind, name = key[len(prefix):].split('|', 1)
+                    item.signals.setdefault(kind, {})[name] = values
+            backtester.data[symbol] = item
+        return backtester
+
+    # ---------- الإشارات ----------
+
+    def _scanner_signals(self, item: _SymbolData) -> Dict[str, np.ndarray]:
+        if 'scanner' not in item.signals:
+            item.signals['scanner'] = opportunity_arrays(item.series)
+        return item.signals['scanner']
+
+    def _candlestick_signals(self, item: _SymbolData) -> Dict[str, np.ndarray]:
+        """
+        إشارة get_entry_signal لكل شمعة: الإطارات 1h و15m و5m من البيانات الإضافية إن وجدت،
+        وإلا تُجمّع من الإطار الأساسي (الإطار الأصغر من الأساسي يُستبدل بالأساسي)
+        """
+        if 'candlestick' in item.signals:
+            return item.signals['candlestick']
+        base_close = item.series.close_time
+        columns = []
+        for interval in ('60m', '15m', '5m'):
+            frame = item.frames.get(interval)
+            if frame is None:
+                step = INTERVAL_MS[interval]
+                frame = resample(item.series, step) if step > self.step else item.series
+            result = detect_candlestick_patterns_array(frame)
+            columns.extend(align(base_close, frame, result['trend'], result['strength']))
+        signal, trend, strength = entry_signal_arrays(*columns)
+        up_1h, up_15m, up_5m = (columns[i] == 1 for i in (0, 2, 4))
+        item.signals['candlestick'] = {
+            'signal': signal & (trend == 1),
+            'strength': strength,
+            # معامل وقف الخسارة الذكي كما في trade_executor: 1.0 إذا كانت الإطارات الثلاثة صاعدة، 0.8 لـ 1h و15m
+            'smart_stop_factor': np.select([up_1h & up_15m & up_5m, up_1h & up_15m], [1.0, 0.8], 0.0)
+        }
+        return item.signals['candlestick']
+
+    def _entries(self, item: _SymbolData, params: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """مواضع شموع الدخول وأولويتها (score) لعملة واحدة"""
+        strategy = params['strategy']
+        n = len(item.series)
+        mask = np.zeros(n, dtype=bool) if strategy == 'both' else np.ones(n, dtype=bool)
+        score = np.zeros(n)
+        if strategy in ('scanner', 'both'):
+            scanner = self._scanner_signals(item)
+            hit = scanner['signals'] >= max(params['min_signals'], 1)
+            mask = mask | hit if strategy == 'both' else mask & hit
+            score = np.maximum(score, scanner['score'])
+        if strategy in ('candlestick', 'both'):
+            candles = self._candlestick_signals(item)
+            hit = candles['signal'] & (candles['strength'] >= params['min_strength'])
+            mask = mask | hit if strategy == 'both' else mask & hit
+            score = np.maximum(score, candles['strength'])
+        if strategy not in ('scanner', 'candlestick', 'both'):
+            raise ValueError(f"استراتيجية غير معروفة: {strategy}")
+        index = np.flatnonzero(mask)
+        return index, score[index]
+
+    def prepare(self, strategy: str = 'scanner'):
+        """حساب الإشارات مسبقاً لجميع العملات (يُستدعى تلقائياً من run)"""
+        for item in self.data.values():
+            if strategy in ('scanner', 'both'):
+                self._scanner_signals(item)
+            if strategy in ('candlestick', 'both'):
+                self._candlestick_signals(item)
+
+    # ---------- الخروج ----------
+
+    def _exits(self, item: _SymbolData, index: np.ndarray,
+               params: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        محاكاة خروج جميع الصفقات المحتملة لعملة (دخول عند إغلاق كل شمعة في index) دفعة واحدة
+        بنفس شروط check_and_sell_trades: تُفحص قمة/قاع الشموع التالية حتى max_hold_hours،
+        وعند تحقق هدف ووقف الخسارة في نفس الشمعة يُفترض الوقف أولاً
+
+        :return: (مواضع شموع الخروج، نسبة قيمة الخروج إلى سعر الدخول، رموز أسباب الخروج EXIT_REASONS)
+        """
+        series = item.series
+        n = len(series)
+        hold = params['_hold_bars']
+        horizon = params['_horizon_bars']
+        exit_at = np.empty(len(index), dtype=np.int64)
+        ratio = np.empty(len(index))
+        reason = np.empty(len(index), dtype=np.int8)
+        offsets = np.arange(1, horizon + 1)
+        stop_pct = abs(float(params['stop_loss']))
+        smart = params.get('smart_stop_threshold')
+        smart_factor = self._candlestick_signals(item)['smart_stop_factor'] if smart else None
+        floor = params.get('min_profit_to_sell')
+        chunk = max(1, EXIT_CHUNK_CELLS // horizon)
+        for start in range(0, len(index), chunk):
+            entries = index[start:start + chunk]
+            rows = np.arange(len(entries))
+            cells = entries[:, None] + offsets
+            valid = cells <= n - 1
+            cells = np.minimum(cells, n - 1)
+            highs = np.where(valid, series.high[cells], -np.inf)
+            lows = np.where(valid, series.low[cells], np.inf)
+            opens = series.open[cells]
+            entry_price = series.close[entries]
+
+            # وقف الخسارة (يتسع حتى عتبة الوقف الذكي عندما تكون الإطارات الزمنية صاعدة)
+            if smart:
+                stop_cells = entry_price[:, None] * (1 - np.maximum(stop_pct, smart * smart_factor[cells]) / 100)
+            else:
+                stop_cells = np.broadcast_to((entry_price * (1 - stop_pct / 100))[:, None], cells.shape)
+            stop_mask = lows <= stop_cells
+            has_stop = stop_mask.any(axis=1)
+            stop_at = np.where(has_stop, stop_mask.argmax(axis=1), horizon)
+
+            # الخروج الزمني: عند max_hold_hours (أو بعدها عند أول إغلاق بربح أقل من min_profit_to_sell)
+            time_mask = (offsets >= hold)[None, :] & valid
+            if floor is not None:
+                time_mask &= series.close[cells] < (entry_price * (1 + float(floor) / 100))[:, None]
+            has_time = time_mask.any(axis=1)
+            time_at = np.where(has_time, time_mask.argmax(axis=1), horizon)
+            before_exit = (offsets[None, :] - 1 < stop_at[:, None]) & (offsets[None, :] - 1 <= time_at[:, None])
+
+            # الأهداف مرتبة تصاعدياً: تحقق هدف يعني تحقق ما قبله
+            value = np.zeros(len(entries))
+            filled = np.zeros(len(entries))
+            target_at = np.zeros(len(entries), dtype=np.int64)
+            for target, share in zip(params['_targets'], params['_ratios']):
+                target_price = entry_price * (1 + target / 100)
+                hit_mask = (highs >= target_price[:, None]) & before_exit
+                hit = hit_mask.any(axis=1)
+                first = hit_mask.argmax(axis=1)
+                fill_price = np.maximum(target_price, opens[rows, first])
+                value += np.where(hit, share * fill_price / entry_price, 0.0)
+                filled += np.where(hit, share, 0.0)
+                target_at = np.where(hit, first, target_at)
+            remaining = np.clip(1.0 - filled, 0.0, None)
+            all_hit = remaining <= 1e-9
+
+            last = np.minimum(stop_at, horizon - 1)
+            stop_fill = np.minimum(stop_cells[rows, last], opens[rows, last])
+            stopped = ~all_hit & has_stop & (stop_at <= time_at)
+            timed = ~all_hit & ~stopped & has_time
+            end = np.minimum(entries + horizon, n - 1)
+            time_exit = np.where(timed, entries + 1 + np.minimum(time_at, horizon - 1), end)
+
+            exit_at[start:start + len(entries)] = np.select(
+                [all_hit, stopped], [entries + 1 + target_at, entries + 1 + stop_at], time_exit)
+            ratio[start:start + len(entries)] = value + np.select(
+                [all_hit, stopped], [0.0, remaining * stop_fill / entry_price],
+                remaining * series.close[time_exit] / entry_price)
+            reason[start:start + len(entries)] = np.select(
+                [all_hit, stopped, timed | (entries + horizon <= n - 1)], [0, 1, 2], 3)
+        return exit_at, ratio, reason
+
+    # ---------- المحاكاة ----------
+
+    def _bars(self, hours: float) -> int:
+        """عدد الشموع المقابل لعدد ساعات (على الأقل شمعة واحدة)"""
+        return max(1, math.ceil(float(hours) * 3600 * 1000 / self.step))
+
+    def _normalize(self, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        merged = dict(DEFAULT_PARAMS)
+        merged.update(params or {})
+        targets = sorted(float(t) for t in merged['take_profit_targets']) or [float('inf')]
+        ratios = merged['tp_quantity_ratios']
+        if ratios:
+            ratios = [float(r) for r in ratios][:len(targets)]
+            targets = targets[:len(ratios)]
+            ratios[-1] += 1.0 - sum(ratios)  # الهدف الأخير يبيع الكمية المتبقية
+        else:
+            # السلوك الحالي: لا بيع جزئي، الخروج الكامل عند تحقق أعلى هدف
+            targets, ratios = [targets[-1]], [1.0]
+        merged['_targets'] = targets
+        merged['_ratios'] = ratios
+        merged['_hold_bars'] = self._bars(merged['max_hold_hours'])
+        merged['_horizon_bars'] = merged['_hold_bars']
+        if merged.get('min_profit_to_sell') is not None:
+            limit = merged.get('max_trade_hold_hours') or merged['max_hold_hours']
+            merged['_horizon_bars'] = max(merged['_hold_bars'], self._bars(limit))
+        return merged
+
+    def run(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        تشغيل الاختبار التاريخي: الدخول عند إغلاق شمعة الإشارة إذا توفر مكان (max_trades)
+        ولم تكن هناك صفقة مفتوحة على نفس العملة (فرض التنويع)، والأولوية للإشارة الأعلى score
+
+        :param params: معاملات تتجاوز DEFAULT_PARAMS
+        :return: قاموس {'summary', 'per_symbol', 'trades', 'params'}
+        """
+        started = time.time()
+        params = self._normalize(params)
+        self.prepare(params['strategy'])
+
+        symbols = list(self.data)
+        plans = []
+        queue = []
+        for sid, symbol in enumerate(symbols):
+            item = self.data[symbol]
+            index, score = self._entries(item, params)
+            exit_at, ratio, reason = self._exits(item, index, params)
+            times = item.series.close_time[index]
+            exit_times = item.series.close_time[exit_at]
+            # العملة مشغولة حتى الإغلاق: الإشارة التالية الممكنة بعد كل صفقة
+            following = np.searchsorted(times, exit_times, side='right')
+            plans.append((index, ratio, reason, exit_at, times.tolist(), (-score).tolist(),
+                          exit_times.tolist(), following.tolist()))
+            if len(index):
+                queue.append((plans[sid][4][0], plans[sid][5][0], sid, 0))
+        heapq.heapify(queue)
+
+        open_exits: List[int] = []  # أوقات إغلاق الصفقات المفتوحة (كومة)
+        taken: List[List[int]] = [[] for _ in symbols]
+        max_trades = int(params['max_trades'])
+        while queue:
+            t, _, sid, pos = heapq.heappop(queue)
+            while open_exits and open_exits[0] <= t:
+                heapq.heappop(open_exits)
+            times, negative_score, exit_times, following = plans[sid][4:]
+            if len(open_exits) >= max_trades:
+                # لا مكان: القفز إلى أول إشارة عند أقرب إغلاق أو بعده
+                next_pos = max(bisect.bisect_left(times, open_exits[0]), pos + 1)
+            else:
+                taken[sid].append(pos)
+                heapq.heappush(open_exits, exit_times[pos])
+                next_pos = following[pos]
+            if next_pos < len(times):
+                heapq.heappush(queue, (times[next_pos], negative_score[next_pos], sid, next_pos))
+
+        trades = []
+        amount = float(params['per_trade_amount'])
+        fee = float(params['fee_rate'])
+        for sid, positions in enumerate(taken):
+            if not positions:
+                continue
+            item = self.data[symbols[sid]]
+            index, ratio, reason, exit_at = plans[sid][:4]
+            positions = np.asarray(positions)
+            entries, exits, values = index[positions], exit_at[positions], ratio[positions]
+            entry_prices = item.series.close[entries]
+            profits = amount * (values * (1 - fee) - 1 - fee)
+            columns = zip(item.series.close_time[entries].tolist(), item.series.close_time[exits].tolist(),
+                          entry_prices.tolist(), (entry_prices * values).tolist(), (exits - entries).tolist(),
+                          reason[positions].tolist(), np.round(profits / amount * 100, 4).tolist(),
+                          profits.tolist())
+            for entry_time, exit_time, entry_price, exit_price, bars, code, profit_pct, profit in columns:
+                trades.append({
+                    'symbol': item.symbol,
+                    'entry_time': entry_time,
+                    'exit_time': exit_time,
+                    'entry_price': entry_price,
+                    'exit_price': exit_price,
+                    'bars_held': bars,
+                    'reason': EXIT_REASONS[code],
+                    'profit_pct': profit_pct,
+                    'profit': profit
+                })
+
+        result = summarize(trades, params['initial_capital'])
+        result['params'] = {k: v for k, v in params.items() if not k.startswith('_')}
+        result['summary']['symbols'] = len(symbols)
+        result['summary']['bars'] = int(sum(len(item.series) for item in self.data.values()))
+        result['summary']['duration'] = round(time.time() - started, 3)
+        return result
+
+
+def summarize(trades: List[Dict[str, Any]], initial_capital: float) -> Dict[str, Any]:
+    """
+    إحصاءات النتائج: الربح، نسبة الصفقات الرابحة، أقصى تراجع (على منحنى رأس المال المحقق)
+
+    :param trades: قائمة الصفقات
+    :param initial_capital: رأس المال الابتدائي
+    """
+    trades = sorted(trades, key=lambda t: t['exit_time'])
+    profits = np.array([t['profit'] for t in trades], dtype=np.float64)
+    equity = initial_capital + np.cumsum(profits)
+    peaks = np.maximum.accumulate(np.concatenate(([initial_capital], equity)))[1:]
+    drawdown = float(np.max((peaks - equity) / peaks)) if len(equity) else 0.0
+    wins = profits[profits > 0]
+    losses = profits[profits <= 0]
+    reasons = Counter(t['reason'] for t in trades)
+    per_symbol: Dict[str, Dict[str, Any]] = {}
+    symbols = np.array([t['symbol'] for t in trades])
+    for symbol in np.unique(symbols).tolist():
+        mask = symbols == symbol
+        per_symbol[symbol] = {
+            'trades': int(mask.sum()),
+            'wins': int((profits[mask] > 0).sum()),
+            'profit': float(profits[mask].sum())
+        }
+    total = float(profits.sum())
+    return {
+        'summary': {
+            'trades': len(trades),
+            'wins': int(len(wins)),
+            'losses': int(len(losses)),
+            'win_rate': round(len(wins) / len(trades) * 100, 2) if trades else 0.0,
+            'total_profit': round(total, 6),
+            'return_pct': round(total / initial_capital * 100, 4) if initial_capital else 0.0,
+            'avg_profit_pct': round(float(np.mean([t['profit_pct'] for t in trades])), 4) if trades else 0.0,
+            'profit_factor': round(float(wins.sum() / -losses.sum()), 4) if losses.sum() < 0 else None,
+            'max_drawdown_pct': round(drawdown * 100, 4),
+            'final_equity': round(float(equity[-1]), 6) if len(equity) else initial_capital,
+            'exit_reasons': dict(reasons)
+        },
+        'per_symbol': per_symbol,
+        'trades': trades
+    }
+
+
+def fetch_history(symbol: str, interval: str, days: int) -> OHLCVSeries:
+    """
+    تحميل تاريخ طويل من MEXC على دفعات (1000 شمعة لكل طلب) عبر محدد المعدل المشترك
+
+    :param symbol: رمز العملة
+    :param interval: الفاصل الزمني بتنسيق MEXC
+    :param days: عدد الأيام
+    """
+    from app.mexc_api import BASE_URL, public_get
+    step = interval_ms(interval)
+    end = int(time.time() * 1000)
+    start = end - days * 86400 * 1000
+    rows = []
+    while start < end:
+        response = public_get(f"{BASE_URL}/api/v3/klines", params={
+            'symbol': symbol, 'interval': INTERVAL_ALIASES.get(interval, interval),
+            'startTime': start, 'endTime': min(start + 1000 * step, end), 'limit': 1000
+        }, timeout=10)
+        if response.status_code != 200:
+            logger.warning(f"فشل تحميل تاريخ {symbol}: {response.status_code} {response.text[:200]}")
+            break
+        batch = response.json()
+        if not batch:
+            start += 1000 * step
+            continue
+        rows.extend(batch)
+        start = int(batch[-1][0]) + step
+    if not rows:
+        return OHLCVSeries.empty()
+    matrix = np.array([[float(v) for v in r[:7]] for r in rows])
+    _, unique = np.unique(matrix[:, 0], return_index=True)
+    return OHLCVSeries.from_matrix(matrix[unique])
+
+
+def save_history(series: OHLCVSeries, symbol: str, interval: str, directory: str = BACKTEST_DATA_DIR) -> str:
+    """حفظ سلسلة في ملف SYMBOL_INTERVAL.npz لإعادة استخدامها في load_files"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{symbol}_{interval}.npz")
+    matrix = np.column_stack([series.open_time, series.open, series.high, series.low,
+                              series.close, series.volume, series.close_time]).astype(np.float64)
+    np.savez_compressed(path, klines=matrix)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="اختبار تاريخي لاستراتيجية البوت")
+    parser.add_argument('--symbols', default='', help="قائمة عملات مفصولة بفواصل (الافتراضي جميع الملفات)")
+    parser.add_argument('--interval', default='15m')
+    parser.add_argument('--data-dir', default=BACKTEST_DATA_DIR)
+    parser.add_argument('--fetch-days', type=int, default=0, help="تحميل التاريخ من MEXC قبل الاختبار")
+    parser.add_argument('--strategy', default=DEFAULT_PARAMS['strategy'], choices=['scanner', 'candlestick', 'both'])
+    parser.add_argument('--params', default='{}', help="معاملات إضافية بصيغة JSON")
+    parser.add_argument('--trades', action='store_true', help="طباعة قائمة الصفقات")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    symbols = [s.strip() for s in args.symbols.split(',') if s.strip()]
+    if args.fetch_days:
+        for symbol in symbols:
+            series = fetch_history(symbol, args.interval, args.fetch_days)
+            logger.info(f"{symbol}: {len(series)} شمعة -> {save_history(series, symbol, args.interval, args.data_dir)}")
+
+    backtester = Backtester(args.interval)
+    if os.path.isdir(args.data_dir):
+        backtester.load_files(args.data_dir, symbols or None)
+    if not backtester.data and symbols:
+        backtester.load_from_store(symbols)
+    if not backtester.data:
+        logger.error("لا توجد بيانات للاختبار")
+        return
+
+    params = json.loads(args.params)
+    params['strategy'] = args.strategy
+    result = backtester.run(params)
+    if not args.trades:
+        result.pop('trades')
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,19 @@
 وحدة تحليل أنماط الشموع اليابانية للتعرف على فرص التداول
 """
 import logging
+import threading
+from collections import deque
 import numpy as np
 from typing import List, Dict, Any, Tuple, Optional
 
+from app.levels import find_levels, nearest_above, nearest_below
+from app.ohlcv import as_ohlcv
+
+try:
+    from app.config import PATTERN_ENGINE_MAX_CANDLES
+except (ImportError, AttributeError):
+    PATTERN_ENGINE_MAX_CANDLES = 500
+
 # إعداد التسجيل
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -135,23 +145,20 @@ def is_three_white_soldiers(klines: List[Dict[str, Any]]) -> bool:
         return False
     
     # الثلاث شموع الأخيرة
-    candle1 = klines[-3]
-    candle2 = klines[-2]
-    candle3 = klines[-1]
+    series = as_ohlcv(klines)
+    o1, o2, o3 = series.open[-3:]
+    c1, c2, c3 = series.close[-3:]
     
     # تحقق من أن جميع الشموع صاعدة (خضراء)
-    if not (float(candle1['close']) > float(candle1['open']) and
-            float(candle2['close']) > float(candle2['open']) and
-            float(candle3['close']) > float(candle3['open'])):
+    if not (c1 > o1 and c2 > o2 and c3 > o3):
         return False
     
     # تحقق من أن سعر الإغلاق يزداد في كل شمعة
-    if not (float(candle3['close']) > float(candle2['close']) > float(candle1['close'])):
+    if not (c3 > c2 > c1):
         return False
     
     # تحقق من أن كل شمعة تفتح ضمن نطاق الشمعة السابقة وتغلق فوقها
-    if not (float(candle2['open']) >= float(candle1['open']) and
-            float(candle3['open']) >= float(candle2['open'])):
+    if not (o2 >= o1 and o3 >= o2):
         return False
     
     return True
@@ -167,23 +174,20 @@ def is_three_black_crows(klines: List[Dict[str, Any]]) -> bool:
         return False
     
     # الثلاث شموع الأخيرة
-    candle1 = klines[-3]
-    candle2 = klines[-2]
-    candle3 = klines[-1]
+    series = as_ohlcv(klines)
+    o1, o2, o3 = series.open[-3:]
+    c1, c2, c3 = series.close[-3:]
     
     # تحقق من أن جميع الشموع هابطة (حمراء)
-    if not (float(candle1['close']) < float(candle1['open']) and
-            float(candle2['close']) < float(candle2['open']) and
-            float(candle3['close']) < float(candle3['open'])):
+    if not (c1 < o1 and c2 < o2 and c3 < o3):
         return False
     
     # تحقق من أن سعر الإغلاق ينخفض في كل شمعة
-    if not (float(candle3['close']) < float(candle2['close']) < float(candle1['close'])):
+    if not (c3 < c2 < c1):
         return False
     
     # تحقق من أن كل شمعة تفتح ضمن نطاق الشمعة السابقة وتغلق تحتها
-    if not (float(candle2['open']) <= float(candle1['open']) and
-            float(candle3['open']) <= float(candle2['open'])):
+    if not (o2 <= o1 and o3 <= o2):
         return False
     
     return True
@@ -198,27 +202,26 @@ def is_morning_star(klines: List[Dict[str, Any]]) -> bool:
     if len(klines) < 3:
         return False
     
-    # الثلاث شموع الأخيرة
-    candle1 = klines[-3]  # الشمعة الأولى (هابطة)
-    candle2 = klines[-2]  # الشمعة الوسطى (دوجي أو صغيرة)
-    candle3 = klines[-1]  # الشمعة الثالثة (صاعدة)
+    # الثلاث شموع الأخيرة: الأولى (هابطة)، الوسطى (دوجي أو صغيرة)، الثالثة (صاعدة)
+    series = as_ohlcv(klines)
+    o1, o2, o3 = series.open[-3:]
+    c1, c2, c3 = series.close[-3:]
     
     # الشمعة الأولى هابطة (حمراء) والشمعة الثالثة صاعدة (خضراء)
-    if not (float(candle1['close']) < float(candle1['open']) and
-            float(candle3['close']) > float(candle3['open'])):
+    if not (c1 < o1 and c3 > o3):
         return False
     
     # حجم الشمعة الوسطى صغير نسبياً
-    middle_body_size = abs(float(candle2['close']) - float(candle2['open']))
-    first_body_size = abs(float(candle1['close']) - float(candle1['open']))
-    third_body_size = abs(float(candle3['close']) - float(candle3['open']))
+    middle_body_size = abs(c2 - o2)
+    first_body_size = abs(c1 - o1)
+    third_body_size = abs(c3 - o3)
     
     if not middle_body_size < 0.5 * min(first_body_size, third_body_size):
         return False
     
     # الشمعة الثالثة يجب أن تغلق فوق منتصف الشمعة الأولى
-    first_mid_point = (float(candle1['open']) + float(candle1['close'])) / 2
-    if not float(candle3['close']) > first_mid_point:
+    first_mid_point = (o1 + c1) / 2
+    if not c3 > first_mid_point:
         return False
     
     return True
@@ -233,153 +236,323 @@ def is_evening_star(klines: List[Dict[str, Any]]) -> bool:
     if len(klines) < 3:
         return False
     
-    # الثلاث شموع الأخيرة
-    candle1 = klines[-3]  # الشمعة الأولى (صاعدة)
-    candle2 = klines[-2]  # الشمعة الوسطى (دوجي أو صغيرة)
-    candle3 = klines[-1]  # الشمعة الثالثة (هابطة)
+    # الثلاث شموع الأخيرة: الأولى (صاعدة)، الوسطى (دوجي أو صغيرة)، الثالثة (هابطة)
+    series = as_ohlcv(klines)
+    o1, o2, o3 = series.open[-3:]
+    c1, c2, c3 = series.close[-3:]
     
     # الشمعة الأولى صاعدة (خضراء) والشمعة الثالثة هابطة (حمراء)
-    if not (float(candle1['close']) > float(candle1['open']) and
-            float(candle3['close']) < float(candle3['open'])):
+    if not (c1 > o1 and c3 < o3):
         return False
     
     # حجم الشمعة الوسطى صغير نسبياً
-    middle_body_size = abs(float(candle2['close']) - float(candle2['open']))
-    first_body_size = abs(float(candle1['close']) - float(candle1['open']))
-    third_body_size = abs(float(candle3['close']) - float(candle3['open']))
+    middle_body_size = abs(c2 - o2)
+    first_body_size = abs(c1 - o1)
+    third_body_size = abs(c3 - o3)
     
     if not middle_body_size < 0.5 * min(first_body_size, third_body_size):
         return False
     
     # الشمعة الثالثة يجب أن تغلق تحت منتصف الشمعة الأولى
-    first_mid_point = (float(candle1['open']) + float(candle1['close'])) / 2
-    if not float(candle3['close']) < first_mid_point:
+    first_mid_point = (o1 + c1) / 2
+    if not c3 < first_mid_point:
         return False
     
     return True
 
-def detect_candlestick_patterns(klines: List[Dict[str, Any]]) -> Dict[str, Any]:
+def detect_candlestick_patterns(klines: List[Dict[str, Any]], key: Optional[Any] = None) -> Dict[str, Any]:
     """
-    اكتشاف أنماط الشموع اليابانية في بيانات الشموع
+    اكتشاف أنماط الشموع اليابانية المنتهية عند آخر شمعة
     
-    :param klines: بيانات الشموع
+    :param klines: بيانات الشموع (OHLCVSeries أو قائمة قواميس)
+    :param key: مفتاح السلسلة مثل (العملة، الإطار) لاستخدام الحالة التدريجية في pattern_engine
     :return: قاموس يحتوي على الأنماط المكتشفة والاتجاه المحتمل
     """
     if not klines or len(klines) < 3:
         return {"patterns": [], "trend": "neutral", "strength": 0}
     
-    patterns = []
-    trend = "neutral"
-    strength = 0  # قوة الإشارة (0-1)
-    
-    # استخراج البيانات للشمعة الحالية والسابقة
-    current_candle = klines[-1]
-    prev_candle = klines[-2]
-    
-    current_open = float(current_candle['open'])
-    current_close = float(current_candle['close'])
-    current_high = float(current_candle['high'])
-    current_low = float(current_candle['low'])
-    
-    prev_open = float(prev_candle['open'])
-    prev_close = float(prev_candle['close'])
-    
-    # اكتشاف الأنماط
-    
-    # 1. نموذج دوجي
-    if is_doji(current_open, current_close, current_high, current_low):
-        patterns.append("doji")
-        # دوجي لوحده لا يعطي اتجاه واضح، لكن يمكن أن يشير إلى تردد السوق
-    
-    # 2. نموذج المطرقة (صاعد)
-    if is_hammer(current_open, current_close, current_high, current_low):
-        patterns.append("hammer")
-        trend = "up"
-        strength += 0.5
-    
-    # 3. نموذج النجمة الهابطة (هابط)
-    if is_shooting_star(current_open, current_close, current_high, current_low):
-        patterns.append("shooting_star")
-        trend = "down"
-        strength += 0.5
-    
-    # 4. نموذج الابتلاع الصاعد
-    if is_engulfing_bullish(current_open, current_close, prev_open, prev_close):
-        patterns.append("bullish_engulfing")
-        trend = "up"
-        strength += 0.7
-    
-    # 5. نموذج الابتلاع الهابط
-    if is_engulfing_bearish(current_open, current_close, prev_open, prev_close):
-        patterns.append("bearish_engulfing")
-        trend = "down"
-        strength += 0.7
-    
-    # 6. نموذج البن بار
-    if is_pin_bar(current_open, current_close, current_high, current_low):
-        patterns.append("pin_bar")
-        # تحديد الاتجاه بناءً على شكل البن بار
-        if current_close > current_open:  # شمعة صاعدة
-            trend = "up"
-            strength += 0.5
-        else:  # شمعة هابطة
-            trend = "down"
-            strength += 0.5
-    
-    # 7. نموذج ثلاث جنود بيض (صاعد قوي)
-    if is_three_white_soldiers(klines):
-        patterns.append("three_white_soldiers")
-        trend = "up"
-        strength += 0.9
-    
-    # 8. نموذج ثلاث غربان سود (هابط قوي)
-    if is_three_black_crows(klines):
-        patterns.append("three_black_crows")
-        trend = "down"
-        strength += 0.9
-    
-    # 9. نموذج نجمة الصباح (صاعد)
-    if is_morning_star(klines):
-        patterns.append("morning_star")
-        trend = "up"
-        strength += 0.8
-    
-    # 10. نموذج نجمة المساء (هابط)
-    if is_evening_star(klines):
-        patterns.append("evening_star")
-        trend = "down"
-        strength += 0.8
-    
-    # تقييد قوة الإشارة بين 0 و 1
-    strength = min(strength, 1.0)
-    
-    return {
-        "patterns": patterns,
-        "trend": trend,
-        "strength": strength
+    # مع مفتاح السلسلة: تقييم الشموع الجديدة فقط عبر الحالة المحفوظة للسلسلة
+    if key is not None:
+        return pattern_engine.detect(key, klines)
+    
+    # بدون مفتاح: الأنماط المنتهية عند الشمعة الأخيرة تحتاج آخر 3 شموع فقط
+    series = as_ohlcv(klines)
+    return flags_result(candle_flags(series, len(series) - 1), series.close[-1] > series.open[-1])
+
+# ترتيب الأنماط كما في detect_candlestick_patterns: (الاسم، الاتجاه، الوزن)
+# الاتجاه: 1 صاعد، -1 هابط، 0 بدون اتجاه، None حسب لون الشمعة (البن بار)
+PATTERN_RULES = (
+    ("doji", 0, 0.0),
+    ("hammer", 1, 0.5),
+    ("shooting_star", -1, 0.5),
+    ("bullish_engulfing", 1, 0.7),
+    ("bearish_engulfing", -1, 0.7),
+    ("pin_bar", None, 0.5),
+    ("three_white_soldiers", 1, 0.9),
+    ("three_black_crows", -1, 0.9),
+    ("morning_star", 1, 0.8),
+    ("evening_star", -1, 0.8),
+)
+
+TREND_NAMES = {1: "up", -1: "down", 0: "neutral"}
+
+
+def detect_candlestick_patterns_array(klines) -> Dict[str, Any]:
+    """
+    نسخة متجهة من detect_candlestick_patterns تحسب النتيجة لكل شمعة في السلسلة دفعة واحدة
+    (قيمة الشمعة i تساوي نتيجة detect_candlestick_patterns(klines[:i + 1]))
+    
+    :param klines: بيانات الشموع (OHLCVSeries أو قائمة)
+    :return: {'patterns': {اسم النمط: مصفوفة منطقية}, 'trend': مصفوفة (1/-1/0), 'strength': مصفوفة}
+    """
+    series = as_ohlcv(klines)
+    n = len(series)
+    o, h, l, c = series.open, series.high, series.low, series.close
+    
+    def shifted(values, k):
+        out = np.full(n, np.nan)
+        if n > k:
+            out[k:] = values[:n - k]
+        return out
+    
+    body = np.abs(c - o)
+    rng = h - l
+    upper = h - np.maximum(o, c)
+    lower = np.minimum(o, c) - l
+    with np.errstate(divide='ignore', invalid='ignore'):
+        valid = (rng > 0) & (body > 0)
+        hammer = valid & (lower / body >= 2.0) & (upper / body <= 0.5) & (lower / rng >= 0.6)
+        shooting = valid & (upper / body >= 2.0) & (lower / body <= 0.5) & (upper / rng >= 0.6)
+        doji = (rng > 0) & (body / rng < 0.1)
+    
+    po, pc = shifted(o, 1), shifted(c, 1)
+    bull_engulf = (pc < po) & (c > o) & (o <= pc) & (c >= po)
+    bear_engulf = (pc > po) & (c < o) & (o >= pc) & (c <= po)
+    
+    o1, c1, o2, c2 = shifted(o, 2), shifted(c, 2), po, pc
+    soldiers = (c1 > o1) & (c2 > o2) & (c > o) & (c > c2) & (c2 > c1) & (o2 >= o1) & (o >= o2)
+    crows = (c1 < o1) & (c2 < o2) & (c < o) & (c < c2) & (c2 < c1) & (o2 <= o1) & (o <= o2)
+    small_middle = np.abs(c2 - o2) < 0.5 * np.minimum(np.abs(c1 - o1), body)
+    mid_first = (o1 + c1) / 2
+    morning = (c1 < o1) & (c > o) & small_middle & (c > mid_first)
+    evening = (c1 > o1) & (c < o) & small_middle & (c < mid_first)
+    
+    masks = {
+        "doji": doji, "hammer": hammer, "shooting_star": shooting,
+        "bullish_engulfing": bull_engulf, "bearish_engulfing": bear_engulf,
+        "pin_bar": hammer | shooting, "three_white_soldiers": soldiers,
+        "three_black_crows": crows, "morning_star": morning, "evening_star": evening
     }
+    # detect_candlestick_patterns تعيد نتيجة محايدة لأقل من 3 شموع
+    for mask in masks.values():
+        mask[:2] = False
+    
+    trend = np.zeros(n, dtype=np.int8)
+    strength = np.zeros(n)
+    candle_direction = np.where(c > o, 1, -1).astype(np.int8)
+    for name, direction, weight in PATTERN_RULES:
+        mask = masks[name]
+        if direction is None:
+            trend = np.where(mask, candle_direction, trend)
+        elif direction:
+            trend = np.where(mask, direction, trend)
+        strength = strength + mask * weight
+    
+    return {"patterns": masks, "trend": trend, "strength": np.minimum(strength, 1.0)}
+
+# بت لكل نمط (بترتيب PATTERN_RULES) لتخزين أنماط الشمعة كعدد صحيح واحد
+PATTERN_BITS = {name: 1 << bit for bit, (name, _, _) in enumerate(PATTERN_RULES)}
+
+
+def candle_flags(series, index: int) -> int:
+    """
+    أنماط الشمعة index (المنتهية عندها) كقناع بتات - نفس شروط detect_candlestick_patterns_array
+    لشمعة واحدة بدون كلفة عمليات NumPy على مصفوفات صغيرة
+    
+    :param series: سلسلة OHLCV
+    :param index: موضع الشمعة (موجب؛ أقل من 2 يعني عدم وجود أنماط كما في النسخة المتجهة)
+    :return: قناع البتات
+    """
+    if index < 2:
+        return 0
+    o1, o2, o3 = series.open[index - 2:index + 1].tolist()
+    c1, c2, c3 = series.close[index - 2:index + 1].tolist()
+    h3, l3 = float(series.high[index]), float(series.low[index])
+    
+    flags = 0
+    if is_doji(o3, c3, h3, l3):
+        flags |= PATTERN_BITS["doji"]
+    hammer = is_hammer(o3, c3, h3, l3)
+    shooting = is_shooting_star(o3, c3, h3, l3)
+    if hammer:
+        flags |= PATTERN_BITS["hammer"]
+    if shooting:
+        flags |= PATTERN_BITS["shooting_star"]
+    if is_engulfing_bullish(o3, c3, o2, c2):
+        flags |= PATTERN_BITS["bullish_engulfing"]
+    if is_engulfing_bearish(o3, c3, o2, c2):
+        flags |= PATTERN_BITS["bearish_engulfing"]
+    if hammer or shooting:
+        flags |= PATTERN_BITS["pin_bar"]
+    if c1 > o1 and c2 > o2 and c3 > o3 and c3 > c2 > c1 and o2 >= o1 and o3 >= o2:
+        flags |= PATTERN_BITS["three_white_soldiers"]
+    if c1 < o1 and c2 < o2 and c3 < o3 and c3 < c2 < c1 and o2 <= o1 and o3 <= o2:
+        flags |= PATTERN_BITS["three_black_crows"]
+    small_middle = abs(c2 - o2) < 0.5 * min(abs(c1 - o1), abs(c3 - o3))
+    mid_first = (o1 + c1) / 2
+    if c1 < o1 and c3 > o3 and small_middle and c3 > mid_first:
+        flags |= PATTERN_BITS["morning_star"]
+    if c1 > o1 and c3 < o3 and small_middle and c3 < mid_first:
+        flags |= PATTERN_BITS["evening_star"]
+    return flags
+
 
-def get_entry_signal(klines_1h, klines_15m, klines_5m) -> Tuple[bool, str, float, Dict[str, Any]]:
+def flags_result(flags: int, candle_up: bool) -> Dict[str, Any]:
+    """
+    تحويل قناع بتات الأنماط إلى قاموس detect_candlestick_patterns
+    (الاتجاه من آخر نمط ذي اتجاه، والقوة مجموع الأوزان بحد أقصى 1)
+    
+    :param flags: قناع البتات
+    :param candle_up: هل الشمعة صاعدة (لتحديد اتجاه البن بار)
+    :return: {'patterns': [...], 'trend': ..., 'strength': ...}
+    """
+    patterns = []
+    trend = 0
+    strength = 0.0
+    for name, direction, weight in PATTERN_RULES:
+        if flags & PATTERN_BITS[name]:
+            patterns.append(name)
+            if direction is None:
+                trend = 1 if candle_up else -1
+            elif direction:
+                trend = direction
+            strength += weight
+    return {"patterns": patterns, "trend": TREND_NAMES[trend], "strength": min(strength, 1.0)}
+
+
+class PatternEngine:
+    """
+    محرك أنماط تدريجي: يحفظ لكل سلسلة (عملة، إطار) أقنعة أنماط آخر الشموع
+    أول تحميل (أو دفعة كبيرة من الشموع الجديدة) يُحسب بتمريرة متجهة واحدة،
+    وبعدها تُقيّم فقط الأنماط المنتهية عند الشموع الجديدة.
+    الشمعة الأخيرة المحفوظة تعتبر مؤقتة لأنها قد تكون ما زالت مفتوحة، فيُعاد تقييمها دائماً
+    """
+    
+    def __init__(self, max_candles: int = PATTERN_ENGINE_MAX_CANDLES, batch_size: int = 8):
+        self.max_candles = max_candles
+        # عدد الشموع الجديدة الذي يصبح عنده التقييم المتجه أسرع من التقييم شمعة بشمعة
+        self.batch_size = batch_size
+        self.lock = threading.RLock()
+        # المفتاح -> deque من (وقت الافتتاح، سعر الإغلاق، قناع الأنماط)
+        self._states: Dict[Any, deque] = {}
+        self.stats = {'full': 0, 'incremental': 0, 'evaluated': 0}
+    
+    @staticmethod
+    def _resume_index(state: Optional[deque], series) -> int:
+        """
+        موضع أول شمعة تحتاج تقييماً في السلسلة الجديدة (0 يعني إعادة حساب كاملة)
+        يُستأنف من الشمعة المؤقتة المحفوظة إذا كانت الشمعة المغلقة قبلها لم تتغير
+        """
+        if not state or len(state) < 2:
+            return 0
+        provisional = state[-1][0]
+        index = int(np.searchsorted(series.open_time, provisional))
+        if index < 1 or index >= len(series) or series.open_time[index] != provisional:
+            return 0
+        closed_time, closed_close, _ = state[-2]
+        if series.open_time[index - 1] != closed_time or series.close[index - 1] != closed_close:
+            return 0
+        return index
+    
+    def update(self, key: Any, klines) -> deque:
+        """
+        تحديث حالة السلسلة بالشموع الجديدة
+        
+        :param key: مفتاح السلسلة مثل (العملة، الإطار)
+        :param klines: نافذة الشموع الحالية (OHLCVSeries أو قائمة)
+        :return: حالة السلسلة: deque من (وقت الافتتاح، سعر الإغلاق، قناع الأنماط)
+        """
+        series = as_ohlcv(klines)
+        n = len(series)
+        with self.lock:
+            state = self._states.get(key)
+            start = self._resume_index(state, series)
+            if start and n - start <= self.batch_size:
+                state.pop()
+                for i in range(start, n):
+                    state.append((int(series.open_time[i]), float(series.close[i]), candle_flags(series, i)))
+                self.stats['incremental'] += 1
+            else:
+                # تمريرة متجهة واحدة مع شمعتي سياق قبل أول شمعة جديدة
+                if start:
+                    state.pop()
+                else:
+                    state = deque(maxlen=self.max_candles)
+                    self._states[key] = state
+                context = max(start - 2, 0)
+                masks = detect_candlestick_patterns_array(series[context:])['patterns']
+                flags = np.zeros(n - context, dtype=np.int64)
+                for name, bit in PATTERN_BITS.items():
+                    flags |= masks[name].astype(np.int64) * bit
+                offset = start - context
+                state.extend(zip(series.open_time[start:].tolist(), series.close[start:].tolist(),
+                                 flags[offset:].tolist()))
+                self.stats['full' if not start else 'incremental'] += 1
+            self.stats['evaluated'] += n - start
+            return state
+    
+    def detect(self, key: Any, klines) -> Dict[str, Any]:
+        """
+        نفس نتيجة detect_candlestick_patterns للشمعة الأخيرة مع تقييم الشموع الجديدة فقط
+        
+        :param key: مفتاح السلسلة مثل (العملة، الإطار)
+        :param klines: نافذة الشموع الحالية
+        :return: {'patterns': [...], 'trend': ..., 'strength': ...}
+        """
+        if not klines or len(klines) < 3:
+            return {"patterns": [], "trend": "neutral", "strength": 0}
+        series = as_ohlcv(klines)
+        flags = self.update(key, series)[-1][2]
+        return flags_result(flags, series.close[-1] > series.open[-1])
+    
+    def reset(self, key: Optional[Any] = None):
+        """مسح حالة سلسلة محددة أو جميع السلاسل"""
+        with self.lock:
+            if key is None:
+                self._states.clear()
+            else:
+                self._states.pop(key, None)
+
+
+# نسخة عامة مشتركة لحالة الأنماط لكل سلسلة
+pattern_engine = PatternEngine()
+
+def get_entry_signal(klines_1h, klines_15m, klines_5m,
+                     symbol: Optional[str] = None) -> Tuple[bool, str, float, Dict[str, Any]]:
     """
     تحليل شامل للإطارات الزمنية المتعددة (1 ساعة، 15 دقيقة، 5 دقائق) ليقرر إشارة دخول
     
     :param klines_1h: بيانات شموع الإطار الزمني 1 ساعة
     :param klines_15m: بيانات شموع الإطار الزمني 15 دقيقة
     :param klines_5m: بيانات شموع الإطار الزمني 5 دقائق
+    :param symbol: رمز العملة (اختياري) لتقييم الشموع الجديدة فقط عبر pattern_engine
     :return: (هل توجد إشارة دخول، الاتجاه، قوة الإشارة، معلومات إضافية)
     """
+    def key(interval):
+        return (symbol, interval) if symbol else None
+    
     # 1. تحليل الإطار الزمني 1 ساعة للاتجاه العام
-    patterns_1h = detect_candlestick_patterns(klines_1h)
+    patterns_1h = detect_candlestick_patterns(klines_1h, key('1h'))
     trend_1h = patterns_1h['trend']
     strength_1h = patterns_1h['strength']
     
     # 2. تحليل الإطار الزمني 15 دقيقة للتأكيد
-    patterns_15m = detect_candlestick_patterns(klines_15m)
+    patterns_15m = detect_candlestick_patterns(klines_15m, key('15m'))
     trend_15m = patterns_15m['trend']
     strength_15m = patterns_15m['strength']
     
     # 3. تحليل الإطار الزمني 5 دقائق لنقطة الدخول
-    patterns_5m = detect_candlestick_patterns(klines_5m)
+    patterns_5m = detect_candlestick_patterns(klines_5m, key('5m'))
     trend_5m = patterns_5m['trend']
     strength_5m = patterns_5m['strength']
     
@@ -431,6 +604,30 @@ def get_entry_signal(klines_1h, klines_15m, klines_5m) -> Tuple[bool, str, float
     
     return signal, trend, strength, additional_info
 
+def entry_signal_arrays(trend_1h, strength_1h, trend_15m, strength_15m,
+                        trend_5m, strength_5m) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    نسخة متجهة من قرار get_entry_signal لمصفوفات اتجاه/قوة الإطارات الثلاثة بعد محاذاتها زمنياً
+    
+    :return: (مصفوفة الإشارة، مصفوفة الاتجاه 1/-1/0، مصفوفة القوة)
+    """
+    t1, t15, t5 = (np.asarray(t) for t in (trend_1h, trend_15m, trend_5m))
+    s1, s15, s5 = (np.asarray(s, dtype=np.float64) for s in (strength_1h, strength_15m, strength_5m))
+    
+    strong = (t1 == t15) & (t15 == t5) & (t1 != 0)
+    medium = ~strong & (t1 == t15) & (t1 != 0) & (s5 >= 0.7)
+    weak = ~strong & ~medium & (t1 == t5) & (t1 != 0) & (s5 >= 0.9)
+    
+    strength = np.select(
+        [strong, medium, weak],
+        [s1 * 0.5 + s15 * 0.3 + s5 * 0.2,
+         s1 * 0.4 + s15 * 0.4 + s5 * 0.2,
+         s1 * 0.6 + s15 * 0.1 + s5 * 0.3],
+        0.0
+    )
+    signal = strong | medium | weak
+    return signal, np.where(signal, t1, 0).astype(np.int8), strength
+
 def calculate_take_profit_stop_loss(entry_price: float, trend: str, 
                                    klines_1h, risk_reward_ratio=2.0) -> Tuple[float, float]:
     """
@@ -451,18 +648,10 @@ def calculate_take_profit_stop_loss(entry_price: float, trend: str,
         # أخذ الربح: عند مستوى المقاومة التالي
         
         # تحديد مستوى الدعم الأقرب تحت سعر الدخول
-        closest_support = entry_price * 0.99  # قيمة افتراضية (1% تحت سعر الدخول)
-        for support in sorted(supports, reverse=True):
-            if support < entry_price:
-                closest_support = support
-                break
+        closest_support = nearest_below(sorted(supports), entry_price) or entry_price * 0.99  # الافتراضي 1% تحت سعر الدخول
         
         # تحديد مستوى المقاومة الأقرب فوق سعر الدخول
-        closest_resistance = entry_price * 1.03  # قيمة افتراضية (3% فوق سعر الدخول)
-        for resistance in sorted(resistances):
-            if resistance > entry_price:
-                closest_resistance = resistance
-                break
+        closest_resistance = nearest_above(sorted(resistances), entry_price) or entry_price * 1.03  # الافتراضي 3% فوق سعر الدخول
         
         # حساب المسافة إلى وقف الخسارة
         stop_loss_distance = entry_price - closest_support
@@ -480,18 +669,10 @@ def calculate_take_profit_stop_loss(entry_price: float, trend: str,
         # أخذ الربح: عند مستوى الدعم التالي
         
         # تحديد مستوى المقاومة الأقرب فوق سعر الدخول
-        closest_resistance = entry_price * 1.01  # قيمة افتراضية (1% فوق سعر الدخول)
-        for resistance in sorted(resistances):
-            if resistance > entry_price:
-                closest_resistance = resistance
-                break
+        closest_resistance = nearest_above(sorted(resistances), entry_price) or entry_price * 1.01  # الافتراضي 1% فوق سعر الدخول
         
         # تحديد مستوى الدعم الأقرب تحت سعر الدخول
-        closest_support = entry_price * 0.97  # قيمة افتراضية (3% تحت سعر الدخول)
-        for support in sorted(supports, reverse=True):
-            if support < entry_price:
-                closest_support = support
-                break
+        closest_support = nearest_below(sorted(supports), entry_price) or entry_price * 0.97  # الافتراضي 3% تحت سعر الدخول
         
         # حساب المسافة إلى وقف الخسارة
         stop_loss_distance = closest_resistance - entry_price
@@ -517,63 +698,15 @@ def calculate_take_profit_stop_loss(entry_price: float, trend: str,
 def find_support_resistance_levels(klines, num_levels=5) -> Tuple[List[float], List[float]]:
     """
     تحديد مستويات الدعم والمقاومة من بيانات الشموع
+    (قمم وقيعان محلية صارمة بشمعة واحدة على كل جانب، مدموجة بنسبة 0.5%)
     
     :param klines: بيانات الشموع
     :param num_levels: عدد المستويات المراد إرجاعها
-    :return: قائمتان بمستويات الدعم والمقاومة
+    :return: قائمتان بمستويات الدعم (تصاعدياً) والمقاومة (تنازلياً)
     """
     if not klines or len(klines) < 10:
         return [], []
     
-    # استخراج القمم والقيعان
-    highs = [float(k['high']) for k in klines]
-    lows = [float(k['low']) for k in klines]
-    
-    # تحديد القمم المحلية
-    local_maxima = []
-    for i in range(1, len(highs) - 1):
-        if highs[i] > highs[i-1] and highs[i] > highs[i+1]:
-            local_maxima.append(highs[i])
-    
-    # تحديد القيعان المحلية
-    local_minima = []
-    for i in range(1, len(lows) - 1):
-        if lows[i] < lows[i-1] and lows[i] < lows[i+1]:
-            local_minima.append(lows[i])
-    
-    # دمج القمم والقيعان المتقاربة
-    def merge_levels(levels, tolerance=0.005):
-        if not levels:
-            return []
-        
-        # فرز المستويات
-        sorted_levels = sorted(levels)
-        merged = []
-        current_level = sorted_levels[0]
-        current_count = 1
-        
-        for i in range(1, len(sorted_levels)):
-            # حساب الفرق النسبي
-            relative_diff = abs(sorted_levels[i] - current_level) / current_level
-            
-            if relative_diff <= tolerance:
-                # دمج المستويات المتقاربة عن طريق حساب المتوسط
-                current_level = ((current_level * current_count) + sorted_levels[i]) / (current_count + 1)
-                current_count += 1
-            else:
-                merged.append(current_level)
-                current_level = sorted_levels[i]
-                current_count = 1
-        
-        merged.append(current_level)
-        return merged
-    
-    # دمج المستويات المتقاربة
-    resistance_levels = merge_levels(local_maxima)
-    support_levels = merge_levels(local_minima)
-    
-    # ترتيب المستويات وأخذ أكثرها أهمية
-    resistance_levels.sort(reverse=True)
-    support_levels.sort()
-    
-    return support_levels[:num_levels], resistance_levels[:num_levels]
\ No newline at end of file
+    series = as_ohlcv(klines)
+    levels = find_levels(series.high, series.low, 1, 0.005, strict=True)
+    return levels.supports[:num_levels], levels.resistances[::-1][:num_levels]
\ No newline at end of file
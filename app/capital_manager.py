@@ -12,6 +12,7 @@ from app.config import (
 from app.exchange_manager import get_balance, get_open_orders, get_account_balance
 from app.trade_logic import close_trade, get_current_price
 from app.trade_executor import get_open_trades, load_trades
+from app.trade_analytics import trade_analytics
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('capital_manager')
@@ -200,36 +201,10 @@ def is_within_daily_loss_limit():
     try:
         current_date = datetime.now().strftime('%Y-%m-%d')
         
-        # تحميل الصفقات المغلقة اليوم
-        all_trades = load_trades()
-        today_trades = []
-        
-        for trade in all_trades:
-            if trade.get('status') != 'CLOSED':
-                continue
-                
-            close_timestamp = trade.get('close_timestamp')
-            if not close_timestamp:
-                continue
-                
-            close_date = datetime.fromtimestamp(close_timestamp / 1000).strftime('%Y-%m-%d')
-            if close_date == current_date:
-                today_trades.append(trade)
-        
-        # حساب الأرباح والخسائر اليومية
-        daily_loss = 0
-        daily_profit = 0
-        net_profit = 0
-        
-        for trade in today_trades:
-            profit_pct = trade.get('profit_pct', 0)
-            if profit_pct < 0:
-                daily_loss += abs(profit_pct)
-            else:
-                daily_profit += profit_pct
-                
-        # حساب صافي الربح اليومي
-        net_profit = daily_profit - daily_loss
+        # أرباح وخسائر اليوم من المجاميع الجارية (دون تحميل الصفقات)
+        today = trade_analytics.daily_pnl(current_date)
+        daily_loss = today['loss']
+        net_profit = today['net']
                 
         # تحديث قاموس الخسائر اليومية
         daily_losses[current_date] = daily_loss
@@ -1,59 +1,55 @@
 """
-أداة لتنظيف ملف الصفقات وإزالة السجلات المكررة والخاطئة والصفقات الوهمية
+أداة لتنظيف مخزن الصفقات وإصلاح السجلات الخاطئة وإغلاق الصفقات الوهمية
+(تعمل على مخزن الصفقات app/trade_store.py وليس ملف active_trades.json القديم)
 """
-import json
 import logging
-import os
 import time
 from datetime import datetime
 
+from app.order_tracker import order_tracker
+from app.trade_store import trade_store
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('clean_trades')
 
-TRADES_FILE = 'active_trades.json'
-BACKUP_FILE = 'active_trades.json.backup'
-
 def backup_trades_file():
     """
-    إنشاء نسخة احتياطية من ملف الصفقات
+    إنشاء نسخة احتياطية من مخزن الصفقات
+    (لا تُنشأ أكثر من مرة كل TRADE_BACKUP_MIN_INTERVAL ثانية؛ سجل الأحداث يحفظ كل تغيير بينها)
     """
     try:
-        if os.path.exists(TRADES_FILE):
-            import shutil
-            backup_name = f"{BACKUP_FILE}.{int(time.time())}"
-            shutil.copy2(TRADES_FILE, backup_name)
-            logger.info(f"تم إنشاء نسخة احتياطية: {backup_name}")
-            return True
-        return False
+        backup_path = trade_store.backup()
+        return bool(backup_path)
     except Exception as e:
         logger.error(f"خطأ في إنشاء نسخة احتياطية: {e}")
         return False
 
 def load_trades():
     """
-    تحميل الصفقات من ملف JSON
+    تحميل الصفقات من مخزن الصفقات كقائمة مسطحة
+    (الحقل status يُكمل من قسم الصفقة في المخزن إذا كان مفقوداً)
     
     :return: قائمة بالصفقات المحملة
     """
     try:
-        if os.path.exists(TRADES_FILE):
-            with open(TRADES_FILE, 'r') as f:
-                return json.load(f)
-        return []
+        data = trade_store.load_all()
+        for status, section in (('OPEN', 'open'), ('CLOSED', 'closed')):
+            for trade in data[section]:
+                trade.setdefault('status', status)
+        return data['open'] + data['closed']
     except Exception as e:
         logger.error(f"خطأ في تحميل الصفقات: {e}")
         return []
 
 def save_trades(trades):
     """
-    حفظ الصفقات في ملف JSON
+    حفظ الصفقات في مخزن الصفقات (تُكتب الصفقات المتغيرة فقط)
     
     :param trades: قائمة بالصفقات
     """
     try:
-        with open(TRADES_FILE, 'w') as f:
-            json.dump(trades, f, indent=2)
-        logger.info(f"تم حفظ {len(trades)} صفقة في الملف")
+        changed = trade_store.save_list(trades)
+        logger.info(f"تم حفظ {changed} صفقة متغيرة في المخزن")
         return True
     except Exception as e:
         logger.error(f"خطأ في حفظ الصفقات: {e}")
@@ -76,7 +72,7 @@ def clean_trades():
         # تحميل الصفقات الحالية
         trades = load_trades()
         original_count = len(trades)
-        logger.info(f"تم تحميل {original_count} صفقة من الملف")
+        logger.info(f"تم تحميل {original_count} صفقة من المخزن")
         
         # تنظيف وإصلاح البيانات
         cleaned_trades = []
@@ -160,15 +156,10 @@ def clean_fake_trades():
         backup_trades_file()
         
         # تحميل الصفقات الحالية
-        trades_data = {}
         try:
-            with open(TRADES_FILE, 'r') as f:
-                trades_data = json.load(f)
-                if not isinstance(trades_data, dict):
-                    # تحويل إلى صيغة dict في حال كان التنسيق قديماً (قائمة)
-                    trades_data = {'open': trades_data, 'closed': []}
+            trades_data = trade_store.load_all()
         except Exception as e:
-            logger.error(f"خطأ في تحميل ملف الصفقات: {e}")
+            logger.error(f"خطأ في تحميل الصفقات: {e}")
             trades_data = {'open': [], 'closed': []}
         
         # تحديد العدد الأصلي
@@ -221,6 +212,12 @@ def clean_fake_trades():
         # تحليل كل صفقة مفتوحة بطرق تحقق متعددة
         for trade in trades_data.get('open', []):
             symbol = trade.get('symbol', 'UNKNOWN')
+            
+            # أوامر الشراء بانتظار تأكيد التنفيذ في الخلفية ليست صفقات وهمية
+            if order_tracker.is_pending(trade.get('orderId', '')) or trade.get('confirmation') == 'PENDING':
+                cleaned_open.append(trade)
+                continue
+            
             # الصفقات بدون رمز تعتبر وهمية تلقائياً
             if symbol == 'UNKNOWN':
                 trade['status'] = 'CLOSED'
@@ -292,13 +289,12 @@ def clean_fake_trades():
                 logger.info(f"✅ صفقة حقيقية مؤكدة: {symbol}")
                 cleaned_open.append(trade)
         
-        # تحديث ملف الصفقات
+        # تحديث الصفقات
         trades_data['open'] = cleaned_open
         trades_data['closed'].extend(closed_fake)
         
-        # حفظ البيانات المحدثة
-        with open(TRADES_FILE, 'w') as f:
-            json.dump(trades_data, f, indent=2)
+        # حفظ البيانات المحدثة في المخزن
+        trade_store.save_all(trades_data)
         
         # النتائج
         num_cleaned = original_open - len(cleaned_open)
@@ -6,13 +6,12 @@
 import time
 import logging
 from typing import Dict, List, Set, Tuple
-from app.utils import load_json_data, save_json_data
 from app.config import ENFORCE_COIN_DIVERSITY, MAX_TRADES_PER_COIN, COOLDOWN_AFTER_TRADE
+from app.position_index import position_index
 
 logger = logging.getLogger(__name__)
 
-# قائمة العملات المستبعدة مؤقتًا (في فترة الراحة)
-_coin_cooldown_periods = {}  # تخزين {symbol: وقت_آخر_بيع}
+# فترات الراحة والمراكز المفتوحة محفوظة في فهرس المراكز (position_index)
 
 
 def get_trade_diversity_status() -> Dict:
@@ -21,25 +20,20 @@ def get_trade_diversity_status() -> Dict:
     
     :return: إحصائيات حول تنوع العملات المتداولة
     """
-    trades = load_json_data('active_trades.json', [])
-    open_trades = [t for t in trades if t.get('status') == 'OPEN']
-    
     # عدد الصفقات المفتوحة لكل عملة
-    coin_counts = {}
-    for trade in open_trades:
-        symbol = trade.get('symbol', '')
-        coin_counts[symbol] = coin_counts.get(symbol, 0) + 1
+    coin_counts = position_index.counts()
+    total_open = sum(coin_counts.values())
     
     # تحليل التنوع
     unique_coins = len(coin_counts)
     max_per_coin = max(coin_counts.values()) if coin_counts else 0
     
     return {
-        'total_open_trades': len(open_trades),
+        'total_open_trades': total_open,
         'unique_coins': unique_coins,
         'max_trades_per_coin': max_per_coin,
         'coin_distribution': coin_counts,
-        'diversity_score': unique_coins / max(1, len(open_trades)) if open_trades else 1.0
+        'diversity_score': unique_coins / max(1, total_open) if total_open else 1.0
     }
 
 
@@ -54,22 +48,17 @@ def is_coin_allowed(symbol: str) -> Tuple[bool, str]:
         return True, "آلية التنويع غير مفعلة"
     
     # فحص فترة الراحة الإلزامية
-    cooldown_until = _coin_cooldown_periods.get(symbol, 0)
-    current_time = time.time()
+    remaining = position_index.cooldown_remaining(symbol)
     
-    if cooldown_until > current_time:
-        remaining_time = int(cooldown_until - current_time)
+    if remaining > 0:
+        remaining_time = int(remaining)
         remaining_minutes = remaining_time // 60
         remaining_seconds = remaining_time % 60
         
         return False, f"العملة في فترة راحة إلزامية (متبقي {remaining_minutes}:{remaining_seconds:02d} دقيقة)"
     
     # فحص عدد الصفقات المفتوحة لهذه العملة
-    trades = load_json_data('active_trades.json', [])
-    open_trades = [t for t in trades if t.get('status') == 'OPEN']
-    
-    # عدد الصفقات المفتوحة لهذه العملة
-    coin_count = sum(1 for t in open_trades if t.get('symbol') == symbol)
+    coin_count = position_index.open_count(symbol)
     
     if coin_count >= MAX_TRADES_PER_COIN:
         return False, f"وصلت للحد الأقصى من الصفقات المسموح بها لهذه العملة ({MAX_TRADES_PER_COIN})"
@@ -97,8 +86,7 @@ def record_coin_sale(symbol: str) -> None:
     :param symbol: رمز العملة
     """
     if ENFORCE_COIN_DIVERSITY:
-        current_time = time.time()
-        _coin_cooldown_periods[symbol] = current_time + COOLDOWN_AFTER_TRADE
+        position_index.start_cooldown(symbol, time.time() + COOLDOWN_AFTER_TRADE)
         logger.info(f"تم إضافة {symbol} إلى فترة الراحة الإلزامية لمدة {COOLDOWN_AFTER_TRADE//60} دقيقة")
 
 
@@ -110,18 +98,9 @@ def get_coin_cooldown_status() -> Dict:
     """
     current_time = time.time()
     
-    # تنظيف القائمة من العملات التي انتهت فترة راحتها
-    expired_coins = []
-    for symbol, end_time in _coin_cooldown_periods.items():
-        if end_time <= current_time:
-            expired_coins.append(symbol)
-    
-    for symbol in expired_coins:
-        del _coin_cooldown_periods[symbol]
-    
-    # تحضير المعلومات الحالية
+    # تحضير المعلومات الحالية (الفهرس يحذف الفترات المنتهية)
     cooldown_status = {}
-    for symbol, end_time in _coin_cooldown_periods.items():
+    for symbol, end_time in position_index.cooldowns().items():
         remaining_time = max(0, int(end_time - current_time))
         cooldown_status[symbol] = {
             'end_time': end_time,
@@ -145,9 +124,7 @@ def get_diverse_watchlist(available_symbols: List[str], active_trades: List[Dict
     active_symbols = {t.get('symbol') for t in active_trades if t.get('status') == 'OPEN'}
     
     # العملات في فترة الراحة (لتجنبها)
-    current_time = time.time()
-    cooldown_symbols = {symbol for symbol, end_time in _coin_cooldown_periods.items() 
-                       if end_time > current_time}
+    cooldown_symbols = set(position_index.cooldowns())
     
     # العملات المتاحة (تستبعد العملات النشطة والعملات في فترة الراحة)
     available_diverse = [s for s in available_symbols 
@@ -0,0 +1,107 @@
+"""
+تنفيذ متوازٍ لعمليات فحص العملات عبر مجموعة خيوط محدودة الحجم
+تُرجع النتائج فور اكتمالها وتسجل الزمن الفعلي لكل عملية فحص
+(معدل الطلبات الفعلي يضبطه المحدد المشترك في rate_limiter)
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import SCAN_MAX_WORKERS
+except (ImportError, AttributeError):
+    SCAN_MAX_WORKERS = 8
+
+try:
+    from app.config import SCAN_CONCURRENT
+except (ImportError, AttributeError):
+    SCAN_CONCURRENT = True
+
+# إحصائيات آخر عملية فحص لكل نوع
+SCAN_STATS: Dict[str, Dict[str, Any]] = {}
+_stats_lock = threading.RLock()
+
+
+def scan_concurrently(items: Iterable[Any], worker: Callable[[Any], Any],
+                      max_workers: Optional[int] = None, label: str = 'scan',
+                      on_result: Optional[Callable[[Any, Any], None]] = None) -> Iterator[Tuple[Any, Any]]:
+    """
+    تنفيذ worker على كل عنصر بالتوازي وإرجاع (العنصر، النتيجة) فور اكتمال كل منها
+
+    :param items: العناصر المطلوب فحصها (عادةً رموز العملات)
+    :param worker: دالة الفحص لعنصر واحد (الاستثناءات تُسجل وتُعاد النتيجة None)
+    :param max_workers: عدد الخيوط الأقصى (افتراضياً SCAN_MAX_WORKERS)
+    :param label: اسم العملية في السجلات والإحصائيات
+    :param on_result: دالة تُستدعى مع (العنصر، النتيجة) فور اكتمال كل عنصر
+    :return: مولّد أزواج (العنصر، النتيجة) بترتيب الاكتمال
+    """
+    items = list(items)
+    workers = max_workers or SCAN_MAX_WORKERS
+    if not SCAN_CONCURRENT:
+        workers = 1
+    workers = max(1, min(workers, len(items) or 1))
+    started = time.time()
+    completed = failed = 0
+
+    def run(item):
+        try:
+            return worker(item)
+        except Exception as e:
+            logger.error(f"خطأ في فحص {item}: {e}")
+            raise
+
+    try:
+        if workers == 1:
+            results = ((item, _call(run, item)) for item in items)
+            for item, (result, ok) in results:
+                completed += 1
+                failed += 0 if ok else 1
+                if on_result:
+                    on_result(item, result)
+                yield item, result
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=label) as executor:
+                futures = {executor.submit(run, item): item for item in items}
+                for future in as_completed(futures):
+                    item = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception:
+                        result = None
+                        failed += 1
+                    completed += 1
+                    if on_result:
+                        on_result(item, result)
+                    yield item, result
+    finally:
+        elapsed = time.time() - started
+        with _stats_lock:
+            SCAN_STATS[label] = {
+                'items': len(items),
+                'completed': completed,
+                'failed': failed,
+                'workers': workers,
+                'duration': round(elapsed, 3),
+                'finished_at': time.time()
+            }
+        logger.info(f"اكتمل فحص {label}: {completed}/{len(items)} عنصر خلال {elapsed:.2f} ثانية ({workers} خيط)")
+
+
+def _call(func: Callable[[Any], Any], item: Any) -> Tuple[Any, bool]:
+    """تنفيذ متسلسل مع التقاط الاستثناء (نفس سلوك الخيوط)"""
+    try:
+        return func(item), True
+    except Exception:
+        return None, False
+
+
+def get_scan_stats(label: Optional[str] = None) -> Dict[str, Any]:
+    """إحصائيات آخر عملية فحص (لنوع محدد أو للكل)"""
+    with _stats_lock:
+        if label:
+            return dict(SCAN_STATS.get(label, {}))
+        return {k: dict(v) for k, v in SCAN_STATS.items()}
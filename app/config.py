@@ -62,6 +62,30 @@ AUTO_TRADING_ENABLED = True  # تفعيل وضع التداول التلقائي
 # إعدادات التخزين المؤقت
 CACHE_EXPIRY = 600  # مدة التخزين المؤقت الافتراضية بالثواني (10 دقائق)
 
+# إعدادات المخزن المحلي للشموع (جلب الشموع الجديدة فقط بدلاً من إعادة التحميل الكامل)
+KLINE_STORE_ENABLED = True  # تفعيل المخزن المحلي للشموع
+KLINE_STORE_PATH = 'klines_store.db'  # ملف قاعدة بيانات الشموع
+KLINE_STORE_MAX_ROWS = 5000  # الحد الأقصى للشموع المحفوظة لكل (عملة، فاصل زمني)
+TIMEFRAME_AGGREGATION_ENABLED = True  # اشتقاق الإطارات الزمنية محلياً من سلسلة أساسية واحدة لكل عملة
+TIMEFRAME_BASE_INTERVAL = '1m'  # الإطار الأساسي المفضل (يُستخدم إطار أكبر تلقائياً إذا تجاوز العمق سعة المخزن)
+TIMEFRAME_REFRESH_SECONDS = 20  # مدة إعادة استخدام السلسلة الأساسية قبل جلب الشموع الجديدة
+EXCHANGE_INFO_INDEX_PATH = 'exchange_info_index.json'  # ملف فهرس مرشحات الرموز للبدء السريع
+EXCHANGE_INFO_REFRESH_INTERVAL = 3600  # فترة تحديث فهرس الرموز بالثواني
+TRADE_STORE_PATH = 'trades_store.db'  # قاعدة بيانات الصفقات (SQLite بوضع WAL)
+TRADES_JSON_PATH = 'active_trades.json'  # ملف الصفقات القديم (يُرحّل تلقائياً عند أول تشغيل)
+TRADE_BACKUP_MIN_INTERVAL = 3600  # أقل فترة بين النسخ الاحتياطية التلقائية للصفقات بالثواني
+TRADE_BACKUP_KEEP = 24  # عدد النسخ الاحتياطية المحفوظة للصفقات (تُحذف الأقدم)
+TRADE_JOURNAL_PATH = 'trades_journal.jsonl'  # سجل أحداث الصفقات الإلحاقي (استعادة المخزن عند فقدانه أو تلفه)
+TRADE_JOURNAL_FSYNC_INTERVAL = 1.0  # فترة كتابة أحداث السجل على القرص (fsync مجمع) بالثواني
+TRADE_JOURNAL_CHECKPOINT_INTERVAL = 3600  # فترة نقاط التثبيت (نسخة احتياطية ثم تفريغ السجل) بالثواني
+TRADE_ARCHIVE_DIR = 'trade_archive'  # مجلد أرشيف الصفقات المغلقة (ملفات JSONL مضغوطة مقسمة حسب الشهر)
+TRADE_ARCHIVE_AFTER_HOURS = 24  # نقل الصفقات المغلقة الأقدم من هذه المدة من المخزن إلى الأرشيف
+TRADE_ARCHIVE_INTERVAL = 3600  # فترة تشغيل الأرشفة والدمج بالثواني
+TRADE_ARCHIVE_COMPACT_PARTS = 8  # دمج أجزاء الشهر الحالي في ملف واحد عند تجاوز هذا العدد
+DASHBOARD_FEED_INTERVAL = 5  # فترة تحديث حالة لوحة التحكم المشتركة المدفوعة عبر SSE بالثواني
+DASHBOARD_FEED_KEEPALIVE = 15  # فترة رسائل الإبقاء على اتصال SSE بالثواني
+DASHBOARD_FEED_HISTORY = 100  # عدد الفروق المحفوظة لإعادة إرسال الفائت عند إعادة اتصال المتصفح
+
 # إعدادات لكل صفقة
 RISK_CAPITAL_RATIO = 0.01  # تخصيص 1% من رأس المال لكل صفقة
 
@@ -89,6 +113,27 @@ SCAN_INTERVAL = 300  # فحص السوق كل 5 دقائق (بدلاً من كل
 CACHE_EXPIRY = 600  # صلاحية البيانات المخزنة مؤقتًا بالثواني (10 دقائق)
 LIMIT_COINS_SCAN = 50  # الحد الأقصى لعدد العملات للفحص في كل دورة
 API_RATE_LIMIT = 0.2  # حد للطلبات API (5 طلبات في الثانية)
+API_RATE_BURST = 5  # أقصى عدد طلبات متتالية مسموح بها دفعة واحدة ضمن حد المعدل
+PRICE_SNAPSHOT_MAX_AGE = 10  # أقصى عمر (بالثواني) للقطة أسعار جميع الرموز قبل إعادة جلبها
+MARKET_FEED_ENABLED = True  # تفعيل تغذية الأسعار اللحظية عبر WebSocket (تتطلب مكتبة websocket-client)
+MARKET_FEED_URL = 'wss://wbs.mexc.com/ws'  # عنوان WebSocket للبيانات العامة في MEXC
+MARKET_FEED_MAX_AGE = 2.0  # أقصى عمر (بالثواني) لسعر التغذية اللحظية قبل الرجوع للاستعلام الدوري
+MARKET_FEED_INTERVALS = []  # الفواصل الزمنية للشموع المشترك بها في التغذية (قناة لكل فاصل ورمز؛ السعر يأتي من قناة الصفقات)
+MARKET_FEED_BOOK_TICKER = False  # الاشتراك في أفضل عرض/طلب (قناة إضافية لكل رمز)
+MARKET_FEED_MAX_CHANNELS = 30  # حد MEXC لعدد الاشتراكات في اتصال WebSocket واحد (تُوزع الرموز على عدة اتصالات)
+EXIT_ENGINE_ENABLED = True  # تفعيل محرك الخروج اللحظي (أهداف الربح ووقف الخسارة عند كل تحديث سعر)
+EXIT_ENGINE_POLL_INTERVAL = 5  # فترة الفحص الاحتياطي لمحرك الخروج بالثواني (عند غياب التغذية اللحظية)
+ENGINE_MAX_WORKERS = 2  # عدد عمال محرك التداول الموحد (المهام التي تكتب الصفقات تعمل واحدة تلو الأخرى على عامل محجوز إضافي)
+ENGINE_MAX_LONG_TASKS = 1  # أقصى عدد مسوحات سوق طويلة متزامنة (أقل من ENGINE_MAX_WORKERS ليبقى عامل للمهام القصيرة)
+ENGINE_SCAN_SHARE_SECONDS = 120  # مدة مشاركة نتيجة مسح السوق بين مهام المحرك بالثواني
+CONFIG_RELOAD_CHECK_INTERVAL = 5  # أقل فترة بين فحوص تغيّر ملف الإعدادات بالثواني
+ORDER_CONFIRM_TIMEOUT = 30  # المهلة القصوى لتأكيد تنفيذ الأمر في الخلفية بالثواني
+ORDER_CONFIRM_MAX_INTERVAL = 3  # أقصى فترة بين فحوص حالة الأمر المعلّق بالثواني
+SCAN_CONCURRENT = True  # فحص العملات بالتوازي بدلاً من واحدة تلو الأخرى
+SCAN_MAX_WORKERS = 8  # الحد الأقصى لخيوط الفحص المتوازي
+HTTP_POOL_SIZE = 20  # حجم مجمّع الاتصالات المفتوحة (keep-alive) لكل مضيف
+HTTP_TIMEOUT = (3.05, 10)  # المهلة الافتراضية (الاتصال، القراءة) بالثواني لطلبات HTTP
+HTTP_MAX_RETRIES = 2  # عدد إعادة المحاولات لأخطاء الخادم المؤقتة (الطلبات الآمنة للتكرار فقط)
 
 # قائمة العملات ذات حجم التداول المرتفع (تحديث بتاريخ 09-05-2025)
 HIGH_VOLUME_SYMBOLS = [
@@ -107,6 +152,8 @@ TIMEFRAMES = {
     "signal": "15m",  # لتحديد مناطق الدعم/المقاومة
     "entry": "5m"     # لتحديد نقاط الدخول والخروج الدقيقة
 }
+PATTERN_ENGINE_MAX_CANDLES = 500  # عدد الشموع المحفوظة لكل سلسلة في محرك أنماط الشموع التدريجي
+LEVEL_INDEX_MAX_PIVOTS = 500  # عدد القمم/القيعان المحفوظة لكل سلسلة في فهرس مستويات الدعم والمقاومة
 
 # الحد الأدنى لمبلغ الصفقة بالدولار
 MIN_TRADE_AMOUNT = 1.0  # تم تخفيض الحد الأدنى لمبلغ الصفقة إلى $1.0 مؤقتاً بسبب الرصيد الحالي
@@ -130,6 +177,9 @@ STOP_LOSS_MARGIN = 0.01  # الوقف عند 1% إذا كانت الصفقة خ
 # المنصة النشطة (MEXC فقط)
 ACTIVE_EXCHANGE = "MEXC"
 
+# عنوان واجهة MEXC REST (يمكن توجيهه إلى المحاكي المحلي app.mexc_simulator للاختبارات)
+MEXC_BASE_URL = os.environ.get("MEXC_BASE_URL", "https://api.mexc.com")
+
 # معلومات API الخاصة بمنصة MEXC
 # الحصول على مفاتيح API من متغيرات البيئة بشكل مباشر، بدون قيم افتراضية
 API_KEY = os.environ.get("MEXC_API_KEY")
@@ -148,6 +198,14 @@ if API_KEY and len(API_KEY) > 10:
 # إعدادات التلجرام
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "8129105671:AAEW5tgtdAI9GDKyuEFMMN2Wg7q0Stq6aqY")
 TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID", "1336248130")
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org")  # يمكن توجيهه إلى خادم محلي للاختبار
+
+# إعدادات طابور إشعارات التلجرام (إرسال في الخلفية دون إيقاف التداول)
+TELEGRAM_ASYNC_ENABLED = True  # False = إرسال متزامن كالسابق
+TELEGRAM_QUEUE_MAX = 200  # الحد الأقصى للرسائل المعلّقة (تُحذف الأقدم عند الامتلاء)
+TELEGRAM_BATCH_WINDOW = 2.0  # ثوانٍ لانتظار الرسائل المتتالية ودمجها في رسالة ملخص واحدة
+TELEGRAM_RATE_PER_CHAT = 1.0  # رسالة في الثانية لكل محادثة (حد تلجرام)
+TELEGRAM_MAX_RETRIES = 5  # عدد محاولات الإرسال قبل التخلي عن الرسالة
 
 # تم نقل إعدادات وقف الخسارة الزمني إلى الأعلى
 
@@ -203,21 +261,24 @@ def update_api_keys(new_api_key, new_api_secret):
     logger.info(f"Updated API_KEY: {new_api_key[:3]}...{new_api_key[-3:] if len(new_api_key) > 6 else ''}")
     logger.info("تم تحديث مفاتيح MEXC API بنجاح")
     
-    # إعادة تحميل وحدات API
+    # إبلاغ مزود المفاتيح بالتحديث (بدون إعادة تحميل وحدة mexc_api وفقدان جلساتها وذاكرتها المؤقتة)
     try:
-        import sys
-        import importlib
-        if 'app.mexc_api' in sys.modules:
-            importlib.reload(sys.modules['app.mexc_api'])
-            logger.info("تم إعادة تحميل وحدة mexc_api بنجاح")
+        from app.credentials import config_provider
+        config_provider.reload()
     except Exception as e:
-        logger.error(f"فشل في إعادة تحميل وحدة mexc_api: {e}")
+        logger.error(f"فشل في تحديث مزود المفاتيح: {e}")
         
     return True
 
 
 # تم إزالة دوال OKX
 
+# إعدادات الاختبار التاريخي (app/backtester.py)
+BACKTEST_FEE_RATE = 0.001  # عمولة كل عملية شراء/بيع (0.1%)
+BACKTEST_DATA_DIR = 'backtest_data'  # مجلد ملفات الشموع التاريخية (SYMBOL_INTERVAL.npz)
+OPTIMIZER_OUTPUT_DIR = 'optimizer_results'  # مجلد نتائج البحث والإعدادات المرشحة (app/optimizer.py)
+OPTIMIZER_MIN_TRADES = 30  # أقل عدد صفقات لاعتماد تركيبة في الترتيب
+
 # إضافة SYSTEM_SETTINGS للاستخدام في نظام التداول الموحد
 SYSTEM_SETTINGS = {
     'blacklisted_symbols': API_UNSUPPORTED_SYMBOLS,
@@ -25,7 +25,6 @@ logger = logging.getLogger(__name__)
 
 # متغير للإشارة إلى استمرار التشغيل
 running = False
-trader_thread = None
 
 def handle_exit(signum, frame):
     """
@@ -34,6 +33,8 @@ def handle_exit(signum, frame):
     global running
     logger.info("استلام إشارة خروج، إيقاف الخدمة")
     running = False
+    from app.engine import trading_engine
+    trading_engine.unregister(TRADER_TASK)
 
 def run_trading_cycle():
     """
@@ -54,85 +55,67 @@ def run_trading_cycle():
         logger.error(f"خطأ في تشغيل دورة التداول: {e}")
         return {'sold_trades': 0, 'opened_trades': 0}
 
-def trader_service():
+# اسم مهمة دورة التداول في المحرك الموحد
+TRADER_TASK = 'continuous_trader.cycle'
+
+# مدة الانتظار بين الدورات (بالثواني)
+CYCLE_INTERVAL = 300  # 5 دقائق
+
+# عدد الدورات قبل دورة البيع الإلزامي
+CYCLES_BEFORE_FORCE_SELL = 12  # كل ساعة إذا كانت المدة 5 دقائق
+
+cycle_count = 0
+
+def trader_cycle():
     """
-    خدمة التداول الرئيسية - تعمل في الخلفية
+    دورة واحدة لخدمة التداول المستمر (مهمة دورية في محرك التداول الموحد)
     """
-    global running
+    global cycle_count
     
-    logger.info("بدء خدمة التداول المستمر")
+    cycle_start = time.time()
     
-    # مدة الانتظار بين الدورات (بالثواني)
-    cycle_interval = 300  # 5 دقائق
+    logger.info(f"بدء دورة التداول رقم {cycle_count+1}")
     
-    # عدد الدورات قبل دورة البيع الإلزامي
-    cycles_before_force_sell = 12  # كل ساعة إذا كانت المدة 5 دقائق
+    # دورة بيع إلزامي كل عدة دورات
+    if cycle_count % CYCLES_BEFORE_FORCE_SELL == 0 and cycle_count > 0:
+        from app.auto_trade import force_sell_all
+        logger.info("تشغيل دورة بيع إلزامي للتأكد من تحقيق الأرباح")
+        sold_count = force_sell_all()
+        logger.info(f"تم بيع {sold_count} صفقة بشكل إلزامي")
     
-    cycle_count = 0
+    # تشغيل دورة تداول عادية
+    stats = run_trading_cycle()
     
-    while running:
-        try:
-            cycle_start = time.time()
-            
-            logger.info(f"بدء دورة التداول رقم {cycle_count+1}")
-            
-            # دورة بيع إلزامي كل عدة دورات
-            if cycle_count % cycles_before_force_sell == 0 and cycle_count > 0:
-                from app.auto_trade import force_sell_all
-                logger.info("تشغيل دورة بيع إلزامي للتأكد من تحقيق الأرباح")
-                sold_count = force_sell_all()
-                logger.info(f"تم بيع {sold_count} صفقة بشكل إلزامي")
-            
-            # تشغيل دورة تداول عادية
-            stats = run_trading_cycle()
-            
-            # عرض الوقت المستغرق
-            cycle_time = time.time() - cycle_start
-            logger.info(f"استغرقت الدورة {cycle_time:.2f} ثانية")
-            
-            # زيادة عداد الدورات
-            cycle_count += 1
-            
-            # انتظار قبل الدورة التالية، مع مراعاة الوقت المستغرق
-            wait_time = max(1, cycle_interval - cycle_time)
-            logger.info(f"انتظار {wait_time:.2f} ثانية قبل الدورة التالية")
-            
-            # انتظار مع فحص متكرر لحالة التشغيل
-            end_time = time.time() + wait_time
-            while time.time() < end_time and running:
-                time.sleep(1)
-                
-        except KeyboardInterrupt:
-            logger.info("تم إيقاف الخدمة بواسطة المستخدم")
-            running = False
-            break
-        except Exception as e:
-            logger.error(f"خطأ في دورة التداول: {e}")
-            # انتظار قبل المحاولة مرة أخرى
-            time.sleep(60)
+    # عرض الوقت المستغرق
+    cycle_time = time.time() - cycle_start
+    logger.info(f"استغرقت الدورة {cycle_time:.2f} ثانية")
     
-    logger.info("انتهت خدمة التداول المستمر")
+    # زيادة عداد الدورات
+    cycle_count += 1
 
 def start_trader():
     """
-    بدء تشغيل خدمة التداول
+    بدء تشغيل خدمة التداول (كمهمة دورية في محرك التداول الموحد)
     """
-    global running, trader_thread
+    from app.engine import trading_engine
+    global running, cycle_count
     
-    if running and trader_thread and trader_thread.is_alive():
+    if running and trading_engine.is_registered(TRADER_TASK):
         logger.warning("خدمة التداول قيد التشغيل بالفعل")
         return False
     
-    # تسجيل معالجات الإشارات
-    signal.signal(signal.SIGINT, handle_exit)
-    signal.signal(signal.SIGTERM, handle_exit)
+    # تسجيل معالجات الإشارات (متاح فقط من الخيط الرئيسي)
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGINT, handle_exit)
+        signal.signal(signal.SIGTERM, handle_exit)
     
     running = True
+    cycle_count = 0
     
-    # إنشاء وتشغيل خيط التداول
-    trader_thread = threading.Thread(target=trader_service)
-    trader_thread.daemon = True
-    trader_thread.start()
+    logger.info("بدء خدمة التداول المستمر")
+    # انتظار دقيقة قبل إعادة المحاولة بعد دورة فاشلة
+    trading_engine.register(TRADER_TASK, trader_cycle, CYCLE_INTERVAL, error_interval=60,
+                            exclusive=True, uses_prices=True)
     
     logger.info("تم بدء تشغيل خدمة التداول")
     return True
@@ -141,18 +124,16 @@ def stop_trader():
     """
     إيقاف خدمة التداول
     """
-    global running, trader_thread
+    from app.engine import trading_engine
+    global running
     
-    if not running or not trader_thread:
+    if not running:
         logger.warning("خدمة التداول ليست قيد التشغيل")
         return False
     
     logger.info("إيقاف خدمة التداول")
     running = False
-    
-    # انتظار انتهاء الخيط (بحد أقصى 10 ثواني)
-    if trader_thread.is_alive():
-        trader_thread.join(10)
+    trading_engine.unregister(TRADER_TASK)
     
     logger.info("تم إيقاف خدمة التداول")
     return True
@@ -161,12 +142,14 @@ def get_trader_status():
     """
     الحصول على حالة خدمة التداول
     """
-    global running, trader_thread
+    from app.engine import trading_engine
+    global running
     
-    if running and trader_thread and trader_thread.is_alive():
-        return {"status": "running", "thread_alive": True}
+    registered = trading_engine.is_registered(TRADER_TASK)
+    if running and registered:
+        return {"status": "running", "thread_alive": trading_engine.running}
     else:
-        return {"status": "stopped", "thread_alive": trader_thread and trader_thread.is_alive()}
+        return {"status": "stopped", "thread_alive": registered and trading_engine.running}
 
 if __name__ == "__main__":
     if len(sys.argv) > 1:
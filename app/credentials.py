@@ -0,0 +1,132 @@
+"""
+مزود الإعدادات ومفاتيح API
+يحمّل وحدة app.config مرة واحدة ويعيد تحميلها فقط عند تغيّر مصدرها (وقت تعديل ملف config.py
+أو تغيّر متغيرات البيئة MEXC_API_KEY/MEXC_API_SECRET)، بدلاً من importlib.reload مع كل طلب موقّع.
+المسار الساخن get_credentials() هو قراءة قاموس بدون إعادة تنفيذ ملف الإعدادات.
+"""
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import CONFIG_RELOAD_CHECK_INTERVAL
+except (ImportError, AttributeError):
+    CONFIG_RELOAD_CHECK_INTERVAL = 5
+
+API_KEY_ENV = 'MEXC_API_KEY'
+API_SECRET_ENV = 'MEXC_API_SECRET'
+
+
+class ConfigProvider:
+    """مزود إعدادات آمن للاستخدام من عدة خيوط مع إعادة تحميل عند تغيّر المصدر فقط"""
+
+    def __init__(self, module_name: str = 'app.config', check_interval: float = CONFIG_RELOAD_CHECK_INTERVAL):
+        """
+        :param module_name: اسم وحدة الإعدادات
+        :param check_interval: أقل فترة بين فحوص وقت تعديل الملف بالثواني
+        """
+        self.module_name = module_name
+        self.check_interval = check_interval
+        self.lock = threading.RLock()
+        self._module = None
+        self._mtime = None
+        self._last_check = 0.0
+        self._env = (None, None)
+        self._credentials: Tuple[Optional[str], Optional[str]] = (None, None)
+        self.reload_count = 0
+
+    def _config_path(self) -> Optional[str]:
+        module = self._module or sys.modules.get(self.module_name)
+        return getattr(module, '__file__', None)
+
+    def _file_mtime(self) -> Optional[float]:
+        path = self._config_path()
+        try:
+            return os.stat(path).st_mtime if path else None
+        except OSError:
+            return None
+
+    def _load(self, reload_module: bool):
+        """تحميل (أو إعادة تحميل) وحدة الإعدادات وتحديث المفاتيح المخزنة"""
+        with self.lock:
+            module = sys.modules.get(self.module_name)
+            if module is None:
+                module = importlib.import_module(self.module_name)
+            elif reload_module:
+                module = importlib.reload(module)
+                self.reload_count += 1
+                logger.info("تم إعادة تحميل ملف الإعدادات بعد تغيّره")
+            self._module = module
+            self._mtime = self._file_mtime()
+            self._last_check = time.time()
+            self._refresh_credentials()
+
+    def _refresh_credentials(self):
+        env = (os.environ.get(API_KEY_ENV), os.environ.get(API_SECRET_ENV))
+        self._env = env
+        # متغيرات البيئة لها الأولوية (update_api_keys تحدّثها أيضاً)، ثم قيم وحدة الإعدادات
+        self._credentials = (env[0] or getattr(self._module, 'API_KEY', None),
+                             env[1] or getattr(self._module, 'API_SECRET', None))
+
+    def _check_source(self):
+        """إعادة التحميل عند تغيّر ملف الإعدادات (يُفحص مرة كل check_interval ثانية)"""
+        if self._module is None:
+            self._load(reload_module=False)
+            return
+        now = time.time()
+        if now - self._last_check < self.check_interval:
+            return
+        with self.lock:
+            self._last_check = now
+            mtime = self._file_mtime()
+            if mtime is not None and mtime != self._mtime:
+                self._load(reload_module=True)
+
+    def get_credentials(self) -> Tuple[Optional[str], Optional[str]]:
+        """
+        مفاتيح MEXC API الحالية
+
+        :return: (API_KEY, API_SECRET)
+        """
+        self._check_source()
+        if (os.environ.get(API_KEY_ENV), os.environ.get(API_SECRET_ENV)) != self._env:
+            with self.lock:
+                self._refresh_credentials()
+        return self._credentials
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """
+        قيمة إعداد من وحدة الإعدادات المحملة
+
+        :param name: اسم الإعداد
+        :param default: القيمة الافتراضية إذا لم يوجد
+        """
+        self._check_source()
+        return getattr(self._module, name, default)
+
+    def reload(self, force_module: bool = False):
+        """
+        إعادة تحميل صريحة (من صفحة الإعدادات بعد تحديث المفاتيح)
+
+        :param force_module: إعادة تنفيذ ملف الإعدادات حتى لو لم يتغير
+        """
+        with self.lock:
+            if self._module is None or force_module or self._file_mtime() != self._mtime:
+                self._load(reload_module=self._module is not None)
+            else:
+                self._refresh_credentials()
+
+
+# نسخة عامة مشتركة من المزود
+config_provider = ConfigProvider()
+
+
+def get_credentials() -> Tuple[Optional[str], Optional[str]]:
+    """مفاتيح MEXC API الحالية (API_KEY, API_SECRET)"""
+    return config_provider.get_credentials()
@@ -0,0 +1,278 @@
+"""
+تغذية لوحة التحكم المدفوعة من الخادم (Server-Sent Events)
+بدلاً من أن يستعلم كل تبويب مفتوح عن الحالة كل 30 ثانية (مع استدعاءات المنصة لكل طلب):
+- حالة واحدة مشتركة مقسمة إلى أقسام (حالة البوت، الصفقات، رأس المال، الأداء، العملات المراقبة)
+  تُحسب في مهمة واحدة بمحرك التداول، كل قسم بفاصله الزمني
+- كل تغيير يرفع رقم الإصدار ويُرسل كفرق (delta) يحتوي الأقسام المتغيرة فقط لجميع المشتركين
+- المشترك الجديد يتلقى لقطة كاملة، والمشترك العائد (Last-Event-ID) يتلقى الفروق الفائتة فقط
+- تغير الصفقات في المخزن يقدّم تحديث الأقسام المرتبطة بها فوراً
+N تبويب مفتوح = حساب واحد للحالة بدلاً من N استعلام
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import DASHBOARD_FEED_INTERVAL, DASHBOARD_FEED_KEEPALIVE, DASHBOARD_FEED_HISTORY
+except (ImportError, AttributeError):
+    DASHBOARD_FEED_INTERVAL = 5
+    DASHBOARD_FEED_KEEPALIVE = 15
+    DASHBOARD_FEED_HISTORY = 100
+
+FEED_TASK = 'dashboard_feed.refresh'
+# حد رسائل المشترك المعلقة: المشترك البطيء يتلقى لقطة كاملة بدلاً من تراكم الفروق
+SUBSCRIBER_QUEUE_SIZE = 50
+RESYNC = object()
+
+
+class Subscriber:
+    """متصفح مشترك في التغذية مع الأقسام التي يطلبها (None = جميع الأقسام)"""
+
+    __slots__ = ('queue', 'sections')
+
+    def __init__(self, sections: Optional[Set[str]] = None):
+        self.queue: queue.Queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.sections = sections
+
+    def wants(self, name: str) -> bool:
+        return self.sections is None or name in self.sections
+
+    def select(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        if self.sections is None:
+            return data
+        return {k: v for k, v in data.items() if k in self.sections or k == 'timestamp'}
+
+
+class FeedSection:
+    """قسم من حالة لوحة التحكم مع دالة حسابه وفاصل تحديثه"""
+
+    __slots__ = ('name', 'loader', 'interval', 'last_run', 'encoded', 'triggers')
+
+    def __init__(self, name: str, loader: Callable[[], Any], interval: float, triggers: tuple = ()):
+        self.name = name
+        self.loader = loader
+        self.interval = float(interval)
+        self.last_run = 0.0
+        self.encoded = None
+        self.triggers = triggers
+
+
+class DashboardFeed:
+    """حالة لوحة التحكم المشتركة ذات الإصدارات مع بث الفروق للمشتركين"""
+
+    def __init__(self, history: int = DASHBOARD_FEED_HISTORY):
+        self.sections: Dict[str, FeedSection] = {}
+        self.state: Dict[str, Any] = {}
+        self.version = 0
+        self.history = deque(maxlen=history)  # (الإصدار، الفرق)
+        self.subscribers: List[Subscriber] = []
+        self.lock = threading.RLock()
+        # قفل التحديث: حساب واحد للحالة في كل لحظة مهما كان عدد الطالبين
+        self.refresh_lock = threading.Lock()
+        self.started = False
+        self.stats = {'refreshes': 0, 'deltas': 0, 'snapshots_sent': 0, 'resyncs': 0, 'errors': 0}
+
+    # ---------- الأقسام ----------
+
+    def register(self, name: str, loader: Callable[[], Any], interval: float = DASHBOARD_FEED_INTERVAL,
+                 triggers: tuple = ()):
+        """
+        تسجيل قسم في الحالة المشتركة
+
+        :param name: اسم القسم (مفتاحه في الحالة)
+        :param loader: دالة حساب القسم (بدون معاملات، نتيجة قابلة للتحويل إلى JSON)
+        :param interval: أقل فترة بين حسابين بالثواني
+        :param triggers: أحداث تجعل القسم مستحقاً فوراً ('trades' = تغير في مخزن الصفقات)
+        """
+        with self.lock:
+            self.sections[name] = FeedSection(name, loader, interval, triggers)
+
+    def invalidate(self, trigger: str):
+        """جعل الأقسام المرتبطة بالحدث مستحقة للتحديث في الدورة التالية"""
+        with self.lock:
+            touched = False
+            for section in self.sections.values():
+                if trigger in section.triggers:
+                    section.last_run = 0.0
+                    touched = True
+        if touched and self.started and self.subscribers:
+            from app.engine import trading_engine
+            trading_engine.run_now(FEED_TASK)
+
+    # ---------- التحديث ----------
+
+    def refresh(self, force: bool = False, sections: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        حساب الأقسام المستحقة ونشر فرق بالأقسام المتغيرة فقط
+
+        :param force: حساب الأقسام حتى لو لم يحل موعدها
+        :param sections: أقسام محددة (الافتراضي جميع الأقسام)
+        :return: الفرق المنشور أو None إذا لم يتغير شيء
+        """
+        with self.refresh_lock:
+            now = time.time()
+            with self.lock:
+                wanted = set(sections) if sections is not None else None
+                due = [s for s in self.sections.values()
+                       if (wanted is None or s.name in wanted) and (force or now - s.last_run >= s.interval)]
+            delta = {}
+            for section in due:
+                try:
+                    value = section.loader()
+                    encoded = json.dumps(value, sort_keys=True, default=str)
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    logger.error(f"خطأ في حساب قسم لوحة التحكم {section.name}: {e}")
+                    continue
+                finally:
+                    section.last_run = now
+                if encoded != section.encoded:
+                    section.encoded = encoded
+                    # القيمة بعد التحويل إلى JSON: ما يراه المتصفح تماماً
+                    delta[section.name] = json.loads(encoded)
+            self.stats['refreshes'] += 1
+            if not delta:
+                return None
+            with self.lock:
+                self.version += 1
+                self.state.update(delta)
+                self.state['timestamp'] = int(now)
+                self.history.append((self.version, delta))
+                self.stats['deltas'] += 1
+                for subscriber in list(self.subscribers):
+                    if any(subscriber.wants(name) for name in delta):
+                        self._offer(subscriber, (self.version, delta))
+            return delta
+
+    def _offer(self, subscriber: Subscriber, message):
+        try:
+            subscriber.queue.put_nowait(message)
+        except queue.Full:
+            # مشترك بطيء: تُستبدل الفروق المتراكمة بطلب لقطة كاملة
+            while True:
+                try:
+                    subscriber.queue.get_nowait()
+                except queue.Empty:
+                    break
+            subscriber.queue.put_nowait(RESYNC)
+            self.stats['resyncs'] += 1
+
+    def _wanted(self) -> Optional[Set[str]]:
+        """الأقسام التي يطلبها المشتركون الحاليون (None = جميع الأقسام)"""
+        with self.lock:
+            wanted: Set[str] = set()
+            for subscriber in self.subscribers:
+                if subscriber.sections is None:
+                    return None
+                wanted |= subscriber.sections
+            return wanted
+
+    def snapshot(self, sections: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        الحالة المشتركة الحالية بعد حساب الأقسام المطلوبة المستحقة فقط
+
+        :param sections: الأقسام المطلوبة (الافتراضي جميع الأقسام)
+        :return: نسخة من الحالة مع رقم الإصدار
+        """
+        sections = list(sections) if sections is not None else None
+        self.refresh(sections=sections)
+        with self.lock:
+            state = self.state if sections is None else {k: v for k, v in self.state.items()
+                                                         if k in sections or k == 'timestamp'}
+            return dict(state, version=self.version)
+
+    # ---------- البث ----------
+
+    @staticmethod
+    def _event(name: str, version: int, data: Dict[str, Any]) -> str:
+        return f"event: {name}\nid: {version}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    def stream(self, last_event_id: Optional[str] = None, sections: Optional[Iterable[str]] = None,
+               keepalive: float = DASHBOARD_FEED_KEEPALIVE) -> Iterator[str]:
+        """
+        مولد رسائل SSE لمشترك واحد: لقطة كاملة أو الفروق الفائتة، ثم الفروق الجديدة عند حدوثها
+
+        :param last_event_id: آخر إصدار تلقاه المتصفح (ترويسة Last-Event-ID عند إعادة الاتصال)
+        :param sections: الأقسام التي تعرضها الصفحة (الافتراضي جميع الأقسام)
+        :param keepalive: فترة رسائل الإبقاء على الاتصال بالثواني
+        """
+        subscriber = Subscriber(set(sections) if sections else None)
+        self.refresh(sections=subscriber.sections)
+        with self.lock:
+            self.subscribers.append(subscriber)
+            missed = None
+            try:
+                last = int(last_event_id) if last_event_id else None
+            except ValueError:
+                last = None
+            if last is not None and last <= self.version and self.history and self.history[0][0] <= last + 1:
+                missed = [(v, subscriber.select(d)) for v, d in self.history if v > last]
+            if missed is None:
+                first = [self._event('snapshot', self.version,
+                                     dict(subscriber.select(self.state), version=self.version))]
+                self.stats['snapshots_sent'] += 1
+            else:
+                first = [self._event('delta', v, dict(d, version=v)) for v, d in missed if d]
+        self.start()
+        try:
+            yield "retry: 3000\n\n"
+            for message in first:
+                yield message
+            while True:
+                try:
+                    message = subscriber.queue.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is RESYNC:
+                    with self.lock:
+                        message = self._event('snapshot', self.version,
+                                              dict(subscriber.select(self.state), version=self.version))
+                        self.stats['snapshots_sent'] += 1
+                    yield message
+                    continue
+                version, delta = message
+                yield self._event('delta', version, dict(subscriber.select(delta), version=version))
+        finally:
+            with self.lock:
+                if subscriber in self.subscribers:
+                    self.subscribers.remove(subscriber)
+
+    # ---------- التشغيل ----------
+
+    def start(self) -> bool:
+        """تسجيل مهمة التحديث في محرك التداول والاستماع لتغيرات الصفقات"""
+        with self.lock:
+            if self.started:
+                return False
+            self.started = True
+        from app.engine import trading_engine
+        from app.trade_store import trade_store
+        trade_store.add_listener(lambda: self.invalidate('trades'))
+        trading_engine.register(FEED_TASK, self._tick, DASHBOARD_FEED_INTERVAL, error_interval=30)
+        return True
+
+    def _tick(self):
+        """دورة مهمة التحديث: الأقسام التي يطلبها المشتركون فقط (الصفحات تحسب عند الطلب عبر snapshot)"""
+        if self.subscribers:
+            self.refresh(sections=self._wanted())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات التغذية"""
+        with self.lock:
+            return {
+                'version': self.version,
+                'subscribers': len(self.subscribers),
+                'sections': list(self.sections),
+                'stats': dict(self.stats)
+            }
+
+
+# نسخة عامة مشتركة
+dashboard_feed = DashboardFeed()
@@ -4,7 +4,6 @@
 """
 import logging
 import time
-import threading
 from typing import Dict, Any, List
 from datetime import datetime
 
@@ -13,6 +12,7 @@ from app.ai_model import predict_trend, analyze_market_sentiment
 from app.utils import load_json_data, save_json_data
 from app.trade_executor import get_open_trades, close_trade
 from app.auto_trader import trade_settings, start_auto_trader, stop_auto_trader
+from app.engine import trading_engine
 
 # إعداد التسجيل
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -20,13 +20,15 @@ logger = logging.getLogger('dynamic_trading')
 
 # المتغيرات العالمية
 dynamic_trader_running = False
-dynamic_trader_thread = None
 last_settings_update = 0
 market_conditions = 'normal'  # normal, bullish, bearish, volatile
 
 # فترة تحديث الإعدادات (بالثواني)
 SETTINGS_UPDATE_INTERVAL = 900  # 15 دقيقة
 
+# اسم مهمة تحديث الإعدادات في محرك التداول الموحد
+DYNAMIC_TASK = 'dynamic_trading.settings'
+
 # قائمة مؤقتة للعملات ذات الأداء الجيد
 performing_coins = set()
 blacklisted_coins = set()
@@ -234,31 +236,13 @@ def update_trading_settings() -> None:
         logger.error(f"خطأ في تحديث إعدادات التداول: {e}")
 
 
-def dynamic_trading_loop() -> None:
-    """
-    الحلقة الرئيسية للتداول الديناميكي
-    """
-    global dynamic_trader_running
-    
-    while dynamic_trader_running:
-        try:
-            # تحديث إعدادات التداول بناءً على ظروف السوق
-            update_trading_settings()
-            
-            # انتظار قبل التحديث التالي
-            time.sleep(60)  # فحص كل دقيقة
-        except Exception as e:
-            logger.error(f"خطأ في حلقة التداول الديناميكي: {e}")
-            time.sleep(300)  # انتظار 5 دقائق في حالة الخطأ
-
-
 def start_dynamic_trading() -> bool:
     """
-    بدء التداول الديناميكي
+    بدء التداول الديناميكي (تحديث الإعدادات كل دقيقة كمهمة في محرك التداول الموحد)
     
     :return: True إذا تم البدء بنجاح
     """
-    global dynamic_trader_running, dynamic_trader_thread
+    global dynamic_trader_running
     
     if dynamic_trader_running:
         logger.warning("التداول الديناميكي قيد التشغيل بالفعل")
@@ -273,10 +257,9 @@ def start_dynamic_trading() -> bool:
         logger.error("فشل في بدء التداول الآلي")
         return False
     
-    # بدء التداول الديناميكي
+    # بدء التداول الديناميكي (انتظار 5 دقائق بعد التحديث الفاشل)
     dynamic_trader_running = True
-    dynamic_trader_thread = threading.Thread(target=dynamic_trading_loop, daemon=True)
-    dynamic_trader_thread.start()
+    trading_engine.register(DYNAMIC_TASK, update_trading_settings, 60, error_interval=300)
     
     logger.info("تم بدء التداول الديناميكي")
     return True
@@ -288,7 +271,7 @@ def stop_dynamic_trading() -> bool:
     
     :return: True إذا تم الإيقاف بنجاح
     """
-    global dynamic_trader_running, dynamic_trader_thread
+    global dynamic_trader_running
     
     if not dynamic_trader_running:
         logger.warning("التداول الديناميكي متوقف بالفعل")
@@ -296,10 +279,7 @@ def stop_dynamic_trading() -> bool:
     
     # إيقاف التداول الديناميكي
     dynamic_trader_running = False
-    
-    # انتظار إنهاء الخيط
-    if dynamic_trader_thread:
-        dynamic_trader_thread.join(timeout=1.0)
+    trading_engine.unregister(DYNAMIC_TASK)
     
     # إيقاف التداول الآلي
     stop_auto_trader()
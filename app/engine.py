@@ -0,0 +1,355 @@
+"""
+محرك التداول الموحد: مجدول واحد يشغّل حلقات النظام كمهام دورية مسجلة
+بدلاً من خيط مستقل لكل حلقة (trading_bot، auto_trader، trade_executor، continuous_trader،
+dynamic_trading، market_scanner، market_monitor) يستعلم كل منها من المنصة بنفسه:
+- خيط مجدول واحد ومجموعة عمال صغيرة ثابتة الحجم
+- المهام التي تكتب الصفقات (exclusive) لا تعمل بالتزامن فلا تتنافس على مخزن الصفقات؛ المجدول لا يرسل
+  مهمة exclusive إلا إذا لم تكن أخرى تعمل، وتعمل على عامل محجوز لها فلا تنتظر خلف مسوحات السوق
+- المسوحات الطويلة (long_running) محدودة بـ ENGINE_MAX_LONG_TASKS أقل من حجم المجموعة،
+  فيبقى عامل متاح دائماً للمهام القصيرة (تغذية لوحة التحكم وغيرها)
+- المهام الطويلة التي تجلب بيانات السوق تبقى غير exclusive وتقفل أقسام الكتابة فقط (exclusive())
+- بيانات السوق تُجلب مرة واحدة لكل نبضة (tick) وتتشاركها المهام المستحقة فيها
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import ENGINE_MAX_WORKERS
+except (ImportError, AttributeError):
+    ENGINE_MAX_WORKERS = 2
+
+try:
+    from app.config import ENGINE_MAX_LONG_TASKS
+except (ImportError, AttributeError):
+    ENGINE_MAX_LONG_TASKS = 1
+
+
+class EngineTask:
+    """مهمة دورية مسجلة في المحرك"""
+
+    __slots__ = ('name', 'func', 'interval', 'error_interval', 'exclusive', 'uses_prices', 'long_running',
+                 'next_run', 'running', 'runs', 'errors', 'last_run', 'last_duration', 'last_error')
+
+    def __init__(self, name: str, func: Callable[[], Any], interval: float,
+                 error_interval: Optional[float] = None, exclusive: bool = False,
+                 uses_prices: bool = False, initial_delay: float = 0.0, long_running: bool = False):
+        self.name = name
+        self.func = func
+        self.interval = float(interval)
+        self.error_interval = float(error_interval if error_interval is not None else interval)
+        self.exclusive = exclusive
+        self.uses_prices = uses_prices
+        self.long_running = long_running
+        self.next_run = time.time() + initial_delay
+        self.running = False
+        self.runs = 0
+        self.errors = 0
+        self.last_run = 0.0
+        self.last_duration = 0.0
+        self.last_error = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'interval': self.interval,
+            'exclusive': self.exclusive,
+            'long_running': self.long_running,
+            'running': self.running,
+            'runs': self.runs,
+            'errors': self.errors,
+            'last_run': self.last_run,
+            'last_duration': round(self.last_duration, 3),
+            'last_error': self.last_error,
+            'next_run_in': round(max(0.0, self.next_run - time.time()), 1)
+        }
+
+
+class MarketTick:
+    """بيانات سوق مشتركة لنبضة واحدة من المجدول (تُحسب عند أول طلب فقط)"""
+
+    def __init__(self, number: int):
+        self.number = number
+        self.started = time.time()
+        self.values: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """قيمة مشتركة داخل النبضة: أول مهمة تطلبها تحسبها والبقية تعيد استخدامها"""
+        with self.lock:
+            if key not in self.values:
+                self.values[key] = loader()
+            return self.values[key]
+
+
+class TradingEngine:
+    """مجدول المهام الدورية: خيط واحد يحدد المهام المستحقة ويرسلها إلى مجموعة عمال محدودة"""
+
+    def __init__(self, max_workers: int = ENGINE_MAX_WORKERS, max_long_tasks: int = ENGINE_MAX_LONG_TASKS):
+        self.max_workers = max(1, int(max_workers))
+        # المسوحات الطويلة لا تشغل جميع العمال: يبقى عامل واحد على الأقل للمهام القصيرة
+        self.max_long_tasks = max(1, min(int(max_long_tasks), self.max_workers - 1))
+        self.tasks: Dict[str, EngineTask] = {}
+        self.tick: Optional[MarketTick] = None
+        self.lock = threading.RLock()
+        # قفل المهام التي تكتب الصفقات: مهمة واحدة منها (أو قسم كتابة واحد) فقط في كل لحظة
+        self.trade_lock = threading.RLock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread = None
+        self.executor = None
+        # عامل محجوز للمهام exclusive (مراقبة الأهداف ووقف الخسارة وغيرها) لا تشغله المسوحات
+        self.exclusive_executor = None
+        self._shared: Dict[str, Any] = {}
+        self.stats = {'ticks': 0, 'runs': 0, 'errors': 0, 'price_refreshes': 0}
+
+    # ---------- تسجيل المهام ----------
+
+    def register(self, name: str, func: Callable[[], Any], interval: float,
+                 error_interval: Optional[float] = None, exclusive: bool = False,
+                 uses_prices: bool = False, initial_delay: float = 0.0,
+                 long_running: bool = False) -> EngineTask:
+        """
+        تسجيل مهمة دورية (أو استبدال مهمة بنفس الاسم) وتشغيل المحرك إن لم يكن يعمل
+
+        :param name: اسم المهمة الفريد
+        :param func: الدالة المنفذة في كل دورة (بدون معاملات)
+        :param interval: الفاصل بين بدايات الدورات بالثواني
+        :param error_interval: الفاصل بعد دورة فاشلة (الافتراضي interval)
+        :param exclusive: المهمة تكتب الصفقات فلا تعمل بالتزامن مع مهمة exclusive أخرى
+        :param uses_prices: تحديث لقطة الأسعار المشتركة قبل تشغيلها
+        :param initial_delay: تأخير أول تشغيل بالثواني
+        :param long_running: مسح سوق طويل (عدد المسوحات المتزامنة محدود بـ ENGINE_MAX_LONG_TASKS)
+        :return: المهمة المسجلة
+        """
+        task = EngineTask(name, func, interval, error_interval, exclusive, uses_prices, initial_delay,
+                          long_running)
+        with self.lock:
+            self.tasks[name] = task
+        logger.info(f"تسجيل المهمة الدورية {name} في محرك التداول (كل {interval:g} ثانية)")
+        self.start()
+        self.wakeup.set()
+        return task
+
+    def unregister(self, name: str) -> bool:
+        """إزالة مهمة (الدورة الجارية إن وجدت تكتمل ولا تُجدول مرة أخرى)"""
+        with self.lock:
+            removed = self.tasks.pop(name, None) is not None
+        if removed:
+            logger.info(f"إزالة المهمة الدورية {name} من محرك التداول")
+        return removed
+
+    def is_registered(self, name: str) -> bool:
+        with self.lock:
+            return name in self.tasks
+
+    def set_interval(self, name: str, interval: float) -> bool:
+        """تغيير الفاصل الزمني لمهمة مسجلة"""
+        with self.lock:
+            task = self.tasks.get(name)
+            if task is None:
+                return False
+            task.next_run += float(interval) - task.interval
+            task.interval = float(interval)
+        self.wakeup.set()
+        return True
+
+    def run_now(self, name: str) -> bool:
+        """تقديم الدورة التالية لمهمة مسجلة إلى الآن"""
+        with self.lock:
+            task = self.tasks.get(name)
+            if task is None:
+                return False
+            task.next_run = min(task.next_run, time.time())
+        self.wakeup.set()
+        return True
+
+    # ---------- البيانات المشتركة ----------
+
+    def shared(self, key: str, loader: Callable[[], Any], max_age: Optional[float] = None) -> Any:
+        """
+        قيمة مشتركة بين المهام: داخل النبضة الحالية، أو لمدة max_age ثانية عبر النبضات
+
+        :param key: مفتاح القيمة
+        :param loader: دالة حساب القيمة عند عدم وجودها
+        :param max_age: مدة الصلاحية عبر النبضات (None = النبضة الحالية فقط)
+        """
+        if max_age is not None:
+            with self.lock:
+                entry = self._shared.get(key)
+            if entry is not None and time.time() - entry[0] <= max_age:
+                return entry[1]
+            value = loader()
+            with self.lock:
+                self._shared[key] = (time.time(), value)
+            return value
+        tick = self.tick
+        if tick is None:
+            return loader()
+        return tick.get(key, loader)
+
+    def _refresh_prices(self):
+        """جلب لقطة أسعار جميع الرموز مرة واحدة للنبضة (إذا لم تكن حديثة)"""
+        from app.price_snapshot import price_snapshot
+        if price_snapshot.is_stale():
+            if price_snapshot.refresh():
+                self.stats['price_refreshes'] += 1
+
+    # ---------- التنفيذ ----------
+
+    @contextmanager
+    def exclusive(self):
+        """
+        قسم يكتب الصفقات داخل مهمة غير exclusive (لا يتزامن مع المهام exclusive)
+        يُستخدم حول الكتابة فقط وليس حول جلب بيانات السوق
+        """
+        with self.trade_lock:
+            yield
+        self.wakeup.set()
+
+    def _run_task(self, task: EngineTask):
+        started = time.time()
+        failed = False
+        try:
+            if task.exclusive:
+                with self.trade_lock:
+                    task.func()
+            else:
+                task.func()
+        except Exception as e:
+            failed = True
+            task.errors += 1
+            task.last_error = str(e)
+            self.stats['errors'] += 1
+            logger.error(f"خطأ في المهمة الدورية {task.name}: {e}")
+        finally:
+            with self.lock:
+                task.last_duration = time.time() - started
+                task.runs += 1
+                self.stats['runs'] += 1
+                # الفاصل يُحسب من بداية الدورة، والدورات الفائتة لا تُكرر
+                task.next_run = started + (task.error_interval if failed else task.interval)
+                task.running = False
+            self.wakeup.set()
+
+    def _exclusive_running(self) -> bool:
+        return any(t.running and t.exclusive for t in self.tasks.values())
+
+    def _long_running_count(self) -> int:
+        return sum(1 for t in self.tasks.values() if t.running and t.long_running and not t.exclusive)
+
+    def _deferred(self, task: EngineTask, exclusive_busy: bool, long_count: int) -> bool:
+        """هل تُؤجل المهمة المستحقة حتى ينتهي ما يحجز مكانها"""
+        if task.exclusive:
+            return exclusive_busy
+        return task.long_running and long_count >= self.max_long_tasks
+
+    def _due_tasks(self) -> List[EngineTask]:
+        now = time.time()
+        with self.lock:
+            candidates = [t for t in self.tasks.values() if not t.running and t.next_run <= now]
+            candidates.sort(key=lambda t: t.next_run)
+            # مهمة exclusive واحدة فقط في كل لحظة: البقية تنتظر انتهاءها في المجدول وليس في عامل
+            exclusive_busy = self._exclusive_running()
+            long_count = self._long_running_count()
+            due = []
+            for task in candidates:
+                if self._deferred(task, exclusive_busy, long_count):
+                    continue
+                if task.exclusive:
+                    exclusive_busy = True
+                elif task.long_running:
+                    long_count += 1
+                task.running = True
+                task.last_run = now
+                due.append(task)
+            return due
+
+    def _next_wait(self) -> float:
+        with self.lock:
+            exclusive_busy = self._exclusive_running()
+            long_count = self._long_running_count()
+            # المهام المؤجلة لا تُحتسب: انتهاء المهمة التي تحجز مكانها يوقظ المجدول
+            pending = [t.next_run for t in self.tasks.values()
+                       if not t.running and not self._deferred(t, exclusive_busy, long_count)]
+        if not pending:
+            return 1.0
+        return min(1.0, max(0.0, min(pending) - time.time()))
+
+    def _loop(self):
+        while self.running:
+            self.wakeup.clear()
+            due = self._due_tasks()
+            if due:
+                self.stats['ticks'] += 1
+                self.tick = MarketTick(self.stats['ticks'])
+                if any(t.uses_prices for t in due):
+                    try:
+                        self._refresh_prices()
+                    except Exception as e:
+                        logger.warning(f"تعذر تحديث لقطة الأسعار للنبضة: {e}")
+                for task in due:
+                    self._submit(task)
+            self.wakeup.wait(self._next_wait())
+
+    def _submit(self, task: EngineTask):
+        """إرسال مهمة إلى العمال (بعد إيقاف المحرك تُلغى دون تشغيل)"""
+        with self.lock:
+            executor = None
+            if self.running:
+                executor = self.exclusive_executor if task.exclusive else self.executor
+        try:
+            if executor is None:
+                raise RuntimeError('engine stopped')
+            executor.submit(self._run_task, task)
+        except RuntimeError:
+            # المحرك أُوقف بين تحديد المهام المستحقة وإرسالها (shutdown يرفض المهام الجديدة)
+            with self.lock:
+                task.running = False
+
+    # ---------- التشغيل ----------
+
+    def start(self) -> bool:
+        """بدء المجدول (يُستدعى تلقائياً عند تسجيل أول مهمة)"""
+        with self.lock:
+            if self.running:
+                return False
+            self.running = True
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='engine')
+            self.exclusive_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='engine_exclusive')
+            self.thread = threading.Thread(target=self._loop, daemon=True, name='trading_engine')
+            self.thread.start()
+        logger.info(f"تم تشغيل محرك التداول الموحد ({self.max_workers} عامل + عامل محجوز لمهام الصفقات)")
+        return True
+
+    def stop(self, wait: bool = False):
+        """إيقاف المجدول (المهام الجارية تكتمل)"""
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+            executors = [self.executor, self.exclusive_executor]
+        self.wakeup.set()
+        for executor in executors:
+            if executor:
+                executor.shutdown(wait=wait)
+
+    def get_status(self) -> Dict[str, Any]:
+        """حالة المحرك ومهامه"""
+        with self.lock:
+            return {
+                'running': self.running,
+                'workers': self.max_workers,
+                'max_long_tasks': self.max_long_tasks,
+                'tasks': [t.to_dict() for t in self.tasks.values()],
+                'stats': dict(self.stats)
+            }
+
+
+# نسخة عامة مشتركة يسجل فيها كل مكون حلقته
+trading_engine = TradingEngine()
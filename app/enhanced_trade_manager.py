@@ -11,6 +11,8 @@ import random
 from typing import List, Dict, Any, Tuple
 from datetime import datetime, timedelta
 
+from app.trade_store import trade_store
+
 logger = logging.getLogger(__name__)
 
 # العملات المفضلة للتنويع - عند عدم وجود فرص تداول عالية الجودة
@@ -36,42 +38,18 @@ DIVERSE_COINS = [
 BANNED_COINS = ['XRPUSDT']
 
 def load_trades():
-    """تحميل الصفقات من الملف"""
+    """تحميل الصفقات من مخزن الصفقات"""
     try:
-        if os.path.exists('active_trades.json'):
-            with open('active_trades.json', 'r') as f:
-                data = json.load(f)
-            
-            # تحويل البيانات إلى التنسيق الصحيح إذا لزم الأمر
-            if isinstance(data, dict) and 'open' in data and 'closed' in data:
-                return data
-            elif isinstance(data, list):
-                return {
-                    'open': [t for t in data if t.get('status') == 'OPEN'],
-                    'closed': [t for t in data if t.get('status') != 'OPEN']
-                }
-            else:
-                logger.warning(f"صيغة غير متوقعة لملف الصفقات: {type(data)}")
-                return {'open': [], 'closed': []}
-        
-        return {'open': [], 'closed': []}
+        return trade_store.load_all()
     except Exception as e:
         logger.error(f"خطأ في تحميل الصفقات: {e}")
         return {'open': [], 'closed': []}
 
 def save_trades(data):
-    """حفظ الصفقات في الملف"""
+    """حفظ الصفقات في مخزن الصفقات (تُكتب الصفقات المتغيرة فقط)"""
     try:
-        # إنشاء نسخة احتياطية
-        backup_name = f"active_trades.json.backup.{int(time.time())}"
-        if os.path.exists('active_trades.json'):
-            os.system(f"cp active_trades.json {backup_name}")
-        
-        # حفظ البيانات
-        with open('active_trades.json', 'w') as f:
-            json.dump(data, f, indent=2)
-            
-        logger.info(f"تم حفظ {len(data.get('open', []))} صفقة مفتوحة و {len(data.get('closed', []))} صفقة مغلقة")
+        changed = trade_store.save_all(data)
+        logger.info(f"تم حفظ {len(data.get('open', []))} صفقة مفتوحة و {len(data.get('closed', []))} صفقة مغلقة ({changed} صف معدل)")
         return True
     except Exception as e:
         logger.error(f"خطأ في حفظ الصفقات: {e}")
@@ -9,6 +9,8 @@ logger = logging.getLogger('exchange_manager')
 
 # استيراد واجهة MEXC API
 from app import mexc_api
+from app.ohlcv import OHLCVSeries
+from app.timeframes import timeframe_aggregator
 
 # منصة MEXC فقط
 ACTIVE_EXCHANGE = "MEXC"
@@ -62,6 +64,25 @@ def get_current_price(symbol: str) -> Optional[float]:
     mexc_symbol = convert_symbol_format(symbol)
     return mexc_api.get_current_price(mexc_symbol)
 
+def get_prices(symbols: List[str]) -> Dict[str, Optional[float]]:
+    """
+    أسعار عدة عملات من لقطة أسعار واحدة (طلب واحد بدلاً من طلب لكل عملة)
+    
+    :param symbols: رموز العملات
+    :return: قاموس الرمز -> السعر (None إذا لم يكن الرمز ضمن اللقطة)
+    """
+    mexc_symbols = {symbol: convert_symbol_format(symbol) for symbol in symbols}
+    prices = mexc_api.price_snapshot.get_prices(mexc_symbols.values())
+    return {symbol: prices.get(mexc_symbol) for symbol, mexc_symbol in mexc_symbols.items()}
+
+def get_price_snapshot_age() -> Optional[float]:
+    """
+    عمر لقطة الأسعار الحالية بالثواني
+    
+    :return: العمر بالثواني أو None إذا لم تُجلب بعد
+    """
+    return mexc_api.price_snapshot.age()
+
 def get_balance(asset: str = "USDT") -> float:
     """
     الحصول على رصيد العملة
@@ -93,6 +114,37 @@ def get_klines(symbol: str, interval: str = '15m', limit: int = 100) -> List[Dic
         logger.error(f"خطأ في جلب بيانات الشموع لـ {symbol}: {e}")
         return []
 
+def get_ohlcv(symbol: str, interval: str = '15m', limit: int = 100) -> OHLCVSeries:
+    """
+    الحصول على بيانات الشموع كسلسلة عمودية OHLCVSeries
+    
+    :param symbol: رمز العملة
+    :param interval: الفاصل الزمني
+    :param limit: عدد الشموع
+    :return: سلسلة OHLCV (فارغة في حالة الفشل)
+    """
+    try:
+        mexc_symbol = convert_symbol_format(symbol)
+        return mexc_api.get_ohlcv(mexc_symbol, interval, limit)
+    except Exception as e:
+        logger.error(f"خطأ في جلب سلسلة الشموع لـ {symbol}: {e}")
+        return OHLCVSeries.empty()
+
+def get_timeframes(symbol: str, limits: Dict[str, int]) -> Dict[str, OHLCVSeries]:
+    """
+    الحصول على عدة إطارات زمنية لعملة واحدة مشتقة من سلسلة أساسية واحدة
+    (طلب واحد للمنصة بدلاً من طلب لكل إطار)
+    
+    :param symbol: رمز العملة
+    :param limits: قاموس {الإطار: عدد الشموع} مثل {'5m': 60, '15m': 48, '1h': 24}
+    :return: قاموس {الإطار: سلسلة OHLCV} (سلاسل فارغة في حالة الفشل)
+    """
+    try:
+        return timeframe_aggregator.get_frames(convert_symbol_format(symbol), limits)
+    except Exception as e:
+        logger.error(f"خطأ في جلب الإطارات الزمنية لـ {symbol}: {e}")
+        return {interval: OHLCVSeries.empty() for interval in limits}
+
 def get_all_symbols_24h_data() -> List[Dict[str, Any]]:
     """
     الحصول على بيانات 24 ساعة لجميع العملات
@@ -0,0 +1,305 @@
+"""
+محرك الخروج القائم على الأحداث
+يفهرس الصفقات المفتوحة حسب الرمز مع أسعار تفعيل محسوبة مسبقاً (أهداف الربح ووقف الخسارة)
+ويُغذّى بتحديثات الأسعار فيُطلق البيع لحظة عبور أي مستوى بدلاً من انتظار دورة التداول التالية.
+تكلفة كل تحديث سعر O(log n) للرمز عبر البحث الثنائي في مستويات مرتبة، بدون إعادة فحص جميع الصفقات.
+"""
+import bisect
+import heapq
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import EXIT_ENGINE_POLL_INTERVAL
+except (ImportError, AttributeError):
+    EXIT_ENGINE_POLL_INTERVAL = 5
+
+# أنواع أحداث الخروج (نفس أسباب الإغلاق في check_and_sell_trades)
+TAKE_PROFIT = 'take_profit'
+STOP_LOSS = 'stop_loss'
+MAX_HOLD_TIME = 'max_hold_time'
+
+TradeKey = Tuple[str, Any]
+
+
+def trade_key(trade: Dict[str, Any]) -> TradeKey:
+    """مفتاح الصفقة (الرمز، الطابع الزمني) - نفس طريقة التعرف في trading_system"""
+    return trade.get('symbol'), trade.get('timestamp')
+
+
+class _SymbolLevels:
+    """
+    مستويات التفعيل المرتبة لرمز واحد
+    upper: مستويات تُفعّل عند السعر >= المستوى (أهداف الربح)
+    lower: مستويات تُفعّل عند السعر <= المستوى (وقف الخسارة)
+    """
+
+    __slots__ = ('upper_prices', 'upper_items', 'lower_prices', 'lower_items')
+
+    def __init__(self):
+        self.upper_prices: List[float] = []
+        self.upper_items: List[Tuple[TradeKey, str, int]] = []
+        self.lower_prices: List[float] = []
+        self.lower_items: List[Tuple[TradeKey, str, int]] = []
+
+    def add_upper(self, price: float, item):
+        i = bisect.bisect_right(self.upper_prices, price)
+        self.upper_prices.insert(i, price)
+        self.upper_items.insert(i, item)
+
+    def add_lower(self, price: float, item):
+        i = bisect.bisect_left(self.lower_prices, price)
+        self.lower_prices.insert(i, price)
+        self.lower_items.insert(i, item)
+
+    def pop_triggered(self, price: float) -> List[Tuple[float, Tuple[TradeKey, str, int]]]:
+        """إزالة وإرجاع جميع المستويات التي عبرها السعر"""
+        fired = []
+        # أهداف الربح: كل المستويات <= السعر (بداية القائمة)
+        n = bisect.bisect_right(self.upper_prices, price)
+        if n:
+            fired.extend(zip(self.upper_prices[:n], self.upper_items[:n]))
+            del self.upper_prices[:n]
+            del self.upper_items[:n]
+        # وقف الخسارة: كل المستويات >= السعر (نهاية القائمة)
+        m = bisect.bisect_left(self.lower_prices, price)
+        if m < len(self.lower_prices):
+            fired.extend(zip(self.lower_prices[m:], self.lower_items[m:]))
+            del self.lower_prices[m:]
+            del self.lower_items[m:]
+        return fired
+
+    def remove_trade(self, key: TradeKey):
+        keep = [(p, it) for p, it in zip(self.upper_prices, self.upper_items) if it[0] != key]
+        self.upper_prices = [p for p, _ in keep]
+        self.upper_items = [it for _, it in keep]
+        keep = [(p, it) for p, it in zip(self.lower_prices, self.lower_items) if it[0] != key]
+        self.lower_prices = [p for p, _ in keep]
+        self.lower_items = [it for _, it in keep]
+
+    def __len__(self):
+        return len(self.upper_prices) + len(self.lower_prices)
+
+
+class ExitEngine:
+    """محرك الخروج: فهرس مستويات التفعيل لكل رمز ومُنفّذ أحداث البيع"""
+
+    def __init__(self, handler: Optional[Callable[[Dict[str, Any], str, float], Any]] = None,
+                 max_hold_hours: Optional[float] = None):
+        """
+        :param handler: دالة تُستدعى مع (الصفقة، نوع الحدث، السعر) عند تفعيل أي مستوى
+        :param max_hold_hours: أقصى مدة احتفاظ بالساعات (None = من SYSTEM_SETTINGS)
+        """
+        self.handler = handler
+        self.max_hold_hours = max_hold_hours
+        self.levels: Dict[str, _SymbolLevels] = {}
+        self.trades: Dict[TradeKey, Dict[str, Any]] = {}
+        self.deadlines: List[Tuple[float, TradeKey]] = []
+        self.in_flight = set()
+        self.lock = threading.RLock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='exit_engine')
+        self.running = False
+        self.thread = None
+        self.fired_count = 0
+
+    def _hold_hours(self) -> float:
+        if self.max_hold_hours is not None:
+            return self.max_hold_hours
+        try:
+            from app.config import SYSTEM_SETTINGS
+            return float(SYSTEM_SETTINGS.get('max_hold_hours', 2))
+        except (ImportError, AttributeError):
+            return 2.0
+
+    @staticmethod
+    def is_eligible(trade: Dict[str, Any]) -> bool:
+        """الصفقات التي يديرها المحرك: مؤكدة عبر API وقيمتها 5 دولار فأكثر (نفس شروط check_and_sell_trades)"""
+        if not trade.get('api_confirmed', False):
+            return False
+        entry_price = trade.get('entry_price', 0)
+        if not trade.get('symbol') or not entry_price:
+            return False
+        return trade.get('quantity', 0) * entry_price >= 5.0
+
+    def _index_trade(self, trade: Dict[str, Any]):
+        key = trade_key(trade)
+        symbol = key[0]
+        entry_price = float(trade['entry_price'])
+        levels = self.levels.setdefault(symbol, _SymbolLevels())
+        self.trades[key] = trade
+
+        for i, target in enumerate(trade.get('take_profit_targets', []) or []):
+            if target.get('hit', False):
+                continue
+            trigger = entry_price * (1 + float(target.get('percent', 0)) / 100)
+            levels.add_upper(trigger, (key, TAKE_PROFIT, i))
+
+        stop_loss = float(trade.get('stop_loss', -3.0))
+        levels.add_lower(entry_price * (1 + stop_loss / 100), (key, STOP_LOSS, -1))
+
+        timestamp = trade.get('timestamp', 0) or 0
+        deadline = timestamp / 1000 + self._hold_hours() * 3600
+        heapq.heappush(self.deadlines, (deadline, key))
+
+    def rebuild(self, open_trades: Iterable[Dict[str, Any]]):
+        """
+        إعادة بناء الفهرس من قائمة الصفقات المفتوحة (تُستدعى بعد كل حفظ للصفقات)
+        الصفقات قيد التنفيذ حالياً لا يُعاد فهرستها لتفادي البيع المزدوج
+
+        :param open_trades: الصفقات المفتوحة
+        """
+        with self.lock:
+            self.levels = {}
+            self.trades = {}
+            self.deadlines = []
+            for trade in open_trades:
+                if self.is_eligible(trade) and trade_key(trade) not in self.in_flight:
+                    self._index_trade(trade)
+
+    def remove(self, trade: Dict[str, Any]):
+        """إزالة صفقة من الفهرس"""
+        key = trade_key(trade)
+        with self.lock:
+            self.trades.pop(key, None)
+            levels = self.levels.get(key[0])
+            if levels:
+                levels.remove_trade(key)
+
+    def symbols(self) -> List[str]:
+        """الرموز التي لديها مستويات تفعيل"""
+        with self.lock:
+            return [s for s, levels in self.levels.items() if len(levels)]
+
+    def on_price(self, symbol: str, price: float) -> int:
+        """
+        معالجة تحديث سعر لرمز واحد (O(log n) + عدد المستويات المفعّلة)
+
+        :param symbol: رمز العملة
+        :param price: السعر الجديد
+        :return: عدد الأحداث المُطلقة
+        """
+        with self.lock:
+            levels = self.levels.get(symbol)
+            if not levels:
+                return 0
+            fired = levels.pop_triggered(price)
+            events = []
+            for _, (key, kind, _) in fired:
+                trade = self.trades.get(key)
+                if trade is None:
+                    continue
+                if kind == STOP_LOSS:
+                    # وقف الخسارة يغلق الصفقة: إزالة أهدافها المتبقية
+                    levels.remove_trade(key)
+                events.append((trade, kind))
+        for trade, kind in events:
+            self._dispatch(trade, kind, price)
+        return len(events)
+
+    def check_deadlines(self, now: Optional[float] = None) -> int:
+        """إطلاق أحداث تجاوز مدة الاحتفاظ القصوى"""
+        now = now or time.time()
+        events = []
+        with self.lock:
+            while self.deadlines and self.deadlines[0][0] <= now:
+                _, key = heapq.heappop(self.deadlines)
+                trade = self.trades.get(key)
+                if trade is not None:
+                    events.append(trade)
+        for trade in events:
+            self._dispatch(trade, MAX_HOLD_TIME, None)
+        return len(events)
+
+    def _dispatch(self, trade: Dict[str, Any], kind: str, price: Optional[float]):
+        """تنفيذ معالج الحدث في خيط منفصل (تسلسلياً) حتى لا يُحجب مصدر الأسعار"""
+        key = trade_key(trade)
+        with self.lock:
+            if kind != TAKE_PROFIT:
+                if key in self.in_flight:
+                    return
+                self.in_flight.add(key)
+                self.trades.pop(key, None)
+            self.fired_count += 1
+        logger.info(f"⚡ محرك الخروج: تفعيل {kind} للعملة {key[0]} عند السعر {price}")
+
+        def run():
+            try:
+                if self.handler:
+                    self.handler(trade, kind, price)
+            except Exception as e:
+                logger.error(f"خطأ في تنفيذ حدث الخروج {kind} للعملة {key[0]}: {e}")
+            finally:
+                with self.lock:
+                    self.in_flight.discard(key)
+
+        self.executor.submit(run)
+
+    def handle_feed_event(self, event: str, symbol: str, data: Dict[str, Any]):
+        """مستمع لتغذية السوق اللحظية (market_feed.add_listener)"""
+        if event == 'price':
+            self.on_price(symbol, data['price'])
+        elif event == 'kline':
+            self.on_price(symbol, data['close'])
+
+    def _poll(self):
+        """
+        حلقة احتياطية: فحص المهل الزمنية، وتغذية المحرك من لقطة الأسعار
+        للرموز التي لا تصل أسعارها من تغذية WebSocket
+        """
+        from app.market_feed import market_feed
+        from app.price_snapshot import price_snapshot
+        while self.running:
+            try:
+                self.check_deadlines()
+                symbols = [s for s in self.symbols() if market_feed.get_price(s) is None]
+                if symbols:
+                    for symbol, price in price_snapshot.get_prices(symbols).items():
+                        if price:
+                            self.on_price(symbol, price)
+            except Exception as e:
+                logger.error(f"خطأ في حلقة محرك الخروج: {e}")
+            time.sleep(EXIT_ENGINE_POLL_INTERVAL)
+
+    def start(self):
+        """بدء الحلقة الاحتياطية للمحرك"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._poll, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """إيقاف المحرك"""
+        self.running = False
+
+
+# نسخة عامة مشتركة من المحرك
+exit_engine = ExitEngine()
+
+
+def start_exit_engine() -> bool:
+    """
+    تشغيل محرك الخروج: فهرسة الصفقات المفتوحة وربطه بتغذية الأسعار اللحظية
+
+    :return: True إذا بدأ المحرك
+    """
+    try:
+        from app.config import EXIT_ENGINE_ENABLED
+    except (ImportError, AttributeError):
+        EXIT_ENGINE_ENABLED = True
+    if not EXIT_ENGINE_ENABLED:
+        return False
+    from app.market_feed import market_feed
+    from app.trading_system import load_trades, process_exit_event
+    exit_engine.handler = process_exit_event
+    exit_engine.rebuild(load_trades().get('open', []))
+    market_feed.add_listener(exit_engine.handle_feed_event)
+    market_feed.subscribe(exit_engine.symbols())
+    exit_engine.start()
+    logger.info(f"تم تشغيل محرك الخروج ({len(exit_engine.trades)} صفقة مفهرسة)")
+    return True
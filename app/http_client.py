@@ -0,0 +1,130 @@
+"""
+طبقة HTTP مشتركة لجميع طلبات MEXC و Telegram
+- جلسة requests واحدة مع تجميع الاتصالات (keep-alive) بدلاً من مصافحة TCP+TLS جديدة لكل طلب
+- مهلة لكل نقطة نهاية (endpoint) بدلاً من الانتظار غير المحدود
+- إعادة محاولة تلقائية بتأخير تصاعدي لأخطاء الخادم المؤقتة في الطلبات الآمنة للتكرار فقط
+  (لا تتم إعادة محاولة أوامر POST مثل إنشاء الأوامر لتفادي التنفيذ المزدوج)
+"""
+import logging
+import threading
+from typing import Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import HTTP_POOL_SIZE, HTTP_TIMEOUT, HTTP_MAX_RETRIES
+except (ImportError, AttributeError):
+    HTTP_POOL_SIZE = 20
+    HTTP_TIMEOUT = (3.05, 10)
+    HTTP_MAX_RETRIES = 2
+
+# مهلة (الاتصال، القراءة) بالثواني لكل نقطة نهاية - المطابقة بأطول بادئة للمسار
+ENDPOINT_TIMEOUTS = {
+    '/api/v3/ticker/price': (3.05, 5),
+    '/api/v3/ticker/24hr': (3.05, 10),
+    '/api/v3/klines': (3.05, 5),
+    '/api/v3/market/kline': (3.05, 5),
+    '/api/v3/exchangeInfo': (3.05, 15),
+    '/api/v3/order': (3.05, 10),
+    '/api/v3/openOrders': (3.05, 10),
+    '/api/v3/account': (3.05, 10),
+    '/api/v3/myTrades': (3.05, 10),
+    '/bot': (3.05, 10),  # Telegram Bot API
+}
+
+# رموز الحالة التي تستدعي إعادة المحاولة (أخطاء خادم مؤقتة)
+# 429 ليست منها: يعالجها محدد المعدل المشترك (rate_limiter) وحده حتى لا يتضاعف التأخير وعدد الطلبات
+RETRY_STATUSES = (500, 502, 503, 504)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    """إنشاء جلسة مع محول اتصالات مجمّع وسياسة إعادة المحاولة"""
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        read=HTTP_MAX_RETRIES,
+        status=HTTP_MAX_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'DELETE', 'HEAD']),
+        raise_on_status=False,
+        # urllib3 يعيد محاولة 429 (و413 و503) عند وجود ترويسة Retry-After حتى خارج status_forcelist
+        respect_retry_after_header=False
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    الجلسة المشتركة (تُنشأ عند أول استخدام)
+    مجمّع اتصالات urllib3 آمن للاستخدام من عدة خيوط
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def reset_session():
+    """إغلاق الجلسة الحالية وإنشاء جلسة جديدة عند الطلب التالي (مثلاً بعد انقطاع الشبكة)"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def timeout_for(url: str) -> Union[float, Tuple[float, float]]:
+    """
+    المهلة المناسبة لعنوان معين
+
+    :param url: عنوان الطلب
+    :return: مهلة (الاتصال، القراءة)
+    """
+    path = urlparse(url).path
+    best = None
+    for prefix in ENDPOINT_TIMEOUTS:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return ENDPOINT_TIMEOUTS[best] if best else HTTP_TIMEOUT
+
+
+def request(method: str, url: str, timeout=None, **kwargs) -> requests.Response:
+    """
+    تنفيذ طلب عبر الجلسة المشتركة
+
+    :param method: نوع الطلب (GET/POST/DELETE)
+    :param url: عنوان الطلب
+    :param timeout: مهلة صريحة (تتجاوز مهلة نقطة النهاية)
+    :return: كائن الاستجابة
+    """
+    return get_session().request(method, url, timeout=timeout or timeout_for(url), **kwargs)
+
+
+def get(url: str, params=None, **kwargs) -> requests.Response:
+    """طلب GET عبر الجلسة المشتركة"""
+    return request('GET', url, params=params, **kwargs)
+
+
+def post(url: str, params=None, **kwargs) -> requests.Response:
+    """طلب POST عبر الجلسة المشتركة (بدون إعادة محاولة تلقائية)"""
+    return request('POST', url, params=params, **kwargs)
+
+
+def delete(url: str, params=None, **kwargs) -> requests.Response:
+    """طلب DELETE عبر الجلسة المشتركة"""
+    return request('DELETE', url, params=params, **kwargs)
@@ -0,0 +1,514 @@
+"""
+محرك المؤشرات الفنية الموحد (RSI / EMA / SMA / Bollinger / ATR)
+- دوال متجهة تحسب السلسلة كاملة دفعة واحدة عبر NumPy بدون حلقات لكل عنصر
+- حالة تراكمية لكل (عملة، فاصل زمني) بحيث تحدّث إضافة شمعة جديدة المؤشرات بتكلفة O(1)
+  بدلاً من إعادة حساب النافذة كاملة في كل عملية مسح
+"""
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.ohlcv import OHLCVSeries, as_ohlcv
+
+logger = logging.getLogger(__name__)
+
+# حجم الكتلة في حساب المرشح الأسي المتجه (يحافظ على القوى ضمن مدى الأعداد العشرية)
+_EWM_BLOCK = 64
+
+# عدد التحديثات قبل إعادة حساب المجاميع المتحركة من الصفر لتفادي تراكم أخطاء التقريب
+_RESUM_EVERY = 1000
+
+
+def _ewm(values: np.ndarray, alpha: float, initial: float) -> np.ndarray:
+    """
+    مرشح أسي متجه: y[i] = (1 - alpha) * y[i-1] + alpha * x[i] مع y[-1] = initial
+    يُحسب على كتل متتالية بصيغة مغلقة (مجموع تراكمي موزون) بدلاً من حلقة لكل عنصر
+
+    :param values: القيم المدخلة
+    :param alpha: معامل التنعيم (0-1]
+    :param initial: القيمة السابقة لأول عنصر
+    :return: مصفوفة القيم المنعّمة
+    """
+    x = np.asarray(values, dtype=np.float64)
+    out = np.empty_like(x)
+    beta = 1.0 - alpha
+    prev = float(initial)
+    if beta == 0.0:
+        out[:] = x
+        return out
+    for start in range(0, len(x), _EWM_BLOCK):
+        block = x[start:start + _EWM_BLOCK]
+        exponents = np.arange(len(block))
+        decay = beta ** exponents
+        # y[k] = beta^(k+1) * prev + alpha * beta^k * sum_{j<=k} x[j] * beta^-j
+        weighted = np.cumsum(block / decay)
+        out[start:start + len(block)] = decay * beta * prev + alpha * decay * weighted
+        prev = out[start + len(block) - 1]
+    return out
+
+
+def sma(values: Iterable[float], period: int) -> np.ndarray:
+    """
+    المتوسط المتحرك البسيط لكل نقطة (NaN قبل اكتمال النافذة)
+
+    :param values: سلسلة القيم
+    :param period: طول النافذة
+    :return: سلسلة SMA
+    """
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if period <= 0 or len(x) < period:
+        return out
+    csum = np.cumsum(np.insert(x, 0, 0.0))
+    out[period - 1:] = (csum[period:] - csum[:-period]) / period
+    return out
+
+
+def rolling_std(values: Iterable[float], period: int) -> np.ndarray:
+    """
+    الانحراف المعياري المتحرك (مجتمع كامل ddof=0 مثل np.std) لكل نقطة
+
+    :param values: سلسلة القيم
+    :param period: طول النافذة
+    :return: سلسلة الانحراف المعياري (NaN قبل اكتمال النافذة)
+    """
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if period <= 0 or len(x) < period:
+        return out
+    out[period - 1:] = sliding_window_view(x, period).std(axis=1)
+    return out
+
+
+def ema(values: Iterable[float], period: int) -> np.ndarray:
+    """
+    المتوسط المتحرك الأسي (EMA) مبدوءاً من القيمة الأولى
+    (نفس تعريف ai_model.calculate_ema لكن بدون حلقة لكل عنصر)
+
+    :param values: سلسلة القيم
+    :param period: فترة المتوسط
+    :return: سلسلة EMA
+    """
+    x = np.asarray(values, dtype=np.float64)
+    if len(x) < period or len(x) == 0:
+        return x.copy()
+    out = np.empty_like(x)
+    out[0] = x[0]
+    out[1:] = _ewm(x[1:], 2.0 / (period + 1), x[0])
+    return out
+
+
+def _wilder_average(values: np.ndarray, period: int) -> np.ndarray:
+    """متوسط وايلدر: بذرة بمتوسط أول period قيمة ثم تنعيم أسي بمعامل 1/period"""
+    out = np.full(len(values), np.nan)
+    if len(values) < period:
+        return out
+    seed = float(np.mean(values[:period]))
+    out[period - 1] = seed
+    out[period:] = _ewm(values[period:], 1.0 / period, seed)
+    return out
+
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    """تحويل متوسطي الربح والخسارة إلى قيمة RSI (100 إذا كانت الخسارة صفراً)"""
+    avg_gain = np.asarray(avg_gain, dtype=np.float64)
+    avg_loss = np.asarray(avg_loss, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    return np.where(avg_loss == 0, 100.0, rsi)
+
+
+def rsi(closes: Iterable[float], period: int = 14) -> np.ndarray:
+    """
+    مؤشر القوة النسبية بطريقة وايلدر على كامل السلسلة
+    (البذرة من أول period فروق ثم تنعيم جميع الفروق اللاحقة)
+
+    :param closes: أسعار الإغلاق
+    :param period: فترة المؤشر
+    :return: سلسلة RSI بطول closes (NaN قبل توفر بيانات كافية)
+    """
+    x = np.asarray(closes, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if len(x) < period + 1:
+        return out
+    deltas = np.diff(x)
+    avg_gain = _wilder_average(np.clip(deltas, 0, None), period)
+    avg_loss = _wilder_average(np.clip(-deltas, 0, None), period)
+    out[period:] = _rsi_from_averages(avg_gain[period - 1:], avg_loss[period - 1:])
+    return out
+
+
+def true_range(high, low, close) -> np.ndarray:
+    """المدى الحقيقي لكل شمعة (الشمعة الأولى: high - low)"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    tr = high - low
+    if len(tr) > 1:
+        prev_close = close[:-1]
+        tr[1:] = np.maximum.reduce([tr[1:], np.abs(high[1:] - prev_close), np.abs(low[1:] - prev_close)])
+    return tr
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    """
+    متوسط المدى الحقيقي (ATR) بطريقة وايلدر
+
+    :return: سلسلة ATR (NaN قبل اكتمال الفترة)
+    """
+    return _wilder_average(true_range(high, low, close), period)
+
+
+def bollinger_bands(values: Iterable[float], period: int = 20,
+                    num_std: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    نطاقات بولينجر
+
+    :param values: سلسلة القيم
+    :param period: طول النافذة
+    :param num_std: عدد الانحرافات المعيارية
+    :return: (النطاق العلوي، الأوسط، السفلي)
+    """
+    middle = sma(values, period)
+    std = rolling_std(values, period)
+    return middle + num_std * std, middle, middle - num_std * std
+
+
+def last_value(series: np.ndarray, default: Optional[float] = None) -> Optional[float]:
+    """آخر قيمة صالحة (غير NaN) في السلسلة"""
+    if len(series) == 0 or np.isnan(series[-1]):
+        return default
+    return float(series[-1])
+
+
+class _RingBuffer:
+    """مخزن دائري ثابت الحجم لآخر القيم مع وصول O(1) بالإزاحة من النهاية"""
+
+    __slots__ = ('data', 'size', 'count', 'head')
+
+    def __init__(self, size: int):
+        self.data = np.zeros(size, dtype=np.float64)
+        self.size = size
+        self.count = 0
+        self.head = 0  # موضع الكتابة التالي
+
+    def append(self, value: float):
+        self.data[self.head] = value
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def set_last(self, value: float):
+        self.data[(self.head - 1) % self.size] = value
+
+    def back(self, offset: int) -> float:
+        """القيمة رقم offset من النهاية (1 = آخر قيمة)"""
+        return float(self.data[(self.head - offset) % self.size])
+
+    def last(self, n: int) -> np.ndarray:
+        """آخر n قيمة بترتيب زمني"""
+        n = min(n, self.count)
+        idx = (self.head - n + np.arange(n)) % self.size
+        return self.data[idx]
+
+
+class IndicatorState:
+    """
+    حالة المؤشرات التراكمية لسلسلة واحدة (عملة، فاصل زمني)
+    كل مؤشر يحفظ قيمته الحالية وقيمته قبل آخر شمعة، بحيث يمكن:
+    - إضافة شمعة جديدة بتكلفة O(1)
+    - استبدال الشمعة الأخيرة (التي ما زالت مفتوحة) بتكلفة O(1) أيضاً
+    """
+
+    def __init__(self, ema_periods=(9, 12, 21, 26), sma_periods=(7, 20, 25),
+                 rsi_period: int = 14, atr_period: int = 14,
+                 bb_period: int = 20, bb_std: float = 2.0):
+        self.ema_periods = tuple(ema_periods)
+        self.sma_periods = tuple(sorted(set(sma_periods) | {bb_period}))
+        self.rsi_period = rsi_period
+        self.atr_period = atr_period
+        self.bb_period = bb_period
+        self.bb_std = bb_std
+        self.buffer = _RingBuffer(max(self.sma_periods) + 1)
+        self.count = 0
+        self.last_open_time = None
+        self.updates = 0
+        # القيم قبل آخر شمعة (prev) والقيم الحالية (value)
+        self.prev_close = None
+        self.ema_prev = {p: None for p in self.ema_periods}
+        self.ema_value = dict(self.ema_prev)
+        self.gain_prev = self.loss_prev = None
+        self.gain_value = self.loss_value = None
+        self.atr_prev = self.atr_value = None
+        self.sums = {p: 0.0 for p in self.sma_periods}
+        self.sumsq = {p: 0.0 for p in self.sma_periods}
+        # قيم مؤقتة لبذر متوسطات وايلدر قبل اكتمال الفترة
+        self._seed_gains = []
+        self._seed_losses = []
+        self._seed_trs = []
+        self._last_high = self._last_low = None
+
+    @classmethod
+    def from_series(cls, klines: Any, **kwargs) -> 'IndicatorState':
+        """
+        بناء الحالة من سلسلة كاملة باستخدام الحساب المتجه (مرة واحدة لكل سلسلة)
+
+        :param klines: OHLCVSeries أو أي تنسيق شموع مدعوم
+        :return: حالة جاهزة للتحديث التدريجي
+        """
+        series = as_ohlcv(klines)
+        state = cls(**kwargs)
+        n = len(series)
+        if n == 0:
+            return state
+        closes = series.close
+        if n == 1:
+            state.update(int(series.open_time[0]), float(series.high[0]),
+                         float(series.low[0]), float(closes[0]))
+            return state
+
+        # الحساب المتجه للمؤشرات على كامل السلسلة
+        for p in state.ema_periods:
+            values = _ema_state_series(closes, p)
+            state.ema_prev[p] = float(values[-2])
+            state.ema_value[p] = float(values[-1])
+
+        deltas = np.diff(closes)
+        if len(deltas) >= state.rsi_period:
+            gains = _wilder_average(np.clip(deltas, 0, None), state.rsi_period)
+            losses = _wilder_average(np.clip(-deltas, 0, None), state.rsi_period)
+            state.gain_value, state.loss_value = float(gains[-1]), float(losses[-1])
+            if len(deltas) > state.rsi_period:
+                state.gain_prev, state.loss_prev = float(gains[-2]), float(losses[-2])
+            else:
+                state._seed_gains = np.clip(deltas, 0, None).tolist()[:-1]
+                state._seed_losses = np.clip(-deltas, 0, None).tolist()[:-1]
+        else:
+            state._seed_gains = np.clip(deltas, 0, None).tolist()
+            state._seed_losses = np.clip(-deltas, 0, None).tolist()
+
+        trs = true_range(series.high, series.low, closes)
+        if n >= state.atr_period:
+            atr_values = _wilder_average(trs, state.atr_period)
+            state.atr_value = float(atr_values[-1])
+            if n > state.atr_period:
+                state.atr_prev = float(atr_values[-2])
+            else:
+                state._seed_trs = trs.tolist()[:-1]
+        else:
+            state._seed_trs = trs.tolist()
+
+        for value in closes[-state.buffer.size:]:
+            state.buffer.append(float(value))
+        state.count = n
+        state.prev_close = float(closes[-2])
+        state.last_open_time = int(series.open_time[-1])
+        state._last_high = float(series.high[-1])
+        state._last_low = float(series.low[-1])
+        state._resum()
+        return state
+
+    def _resum(self):
+        """إعادة حساب المجاميع المتحركة من المخزن الدائري"""
+        for p in self.sma_periods:
+            window = self.buffer.last(p)
+            self.sums[p] = float(window.sum())
+            self.sumsq[p] = float(np.dot(window, window))
+
+    def update(self, open_time: int, high: float, low: float, close: float) -> Dict[str, Any]:
+        """
+        تحديث المؤشرات بشمعة واحدة بتكلفة O(1)
+        إذا كان وقت الافتتاح مطابقاً لآخر شمعة تُستبدل (شمعة ما زالت مفتوحة)، وإلا تُضاف
+
+        :param open_time: وقت افتتاح الشمعة
+        :param high: أعلى سعر
+        :param low: أدنى سعر
+        :param close: سعر الإغلاق
+        :return: لقطة المؤشرات الحالية
+        """
+        close = float(close)
+        replace = self.last_open_time is not None and open_time == self.last_open_time
+        if self.last_open_time is not None and open_time < self.last_open_time:
+            logger.debug(f"تجاهل شمعة أقدم من آخر شمعة في حالة المؤشرات: {open_time}")
+            return self.snapshot()
+
+        if replace:
+            old_close = self.buffer.back(1)
+            for p in self.sma_periods:
+                self.sums[p] += close - old_close
+                self.sumsq[p] += close * close - old_close * old_close
+            self.buffer.set_last(close)
+            # التراجع عن مساهمة النسخة السابقة من الشمعة في مرحلة البذر
+            if self.gain_prev is None and self.count >= 2 and self._seed_gains:
+                self._seed_gains.pop()
+                self._seed_losses.pop()
+                self.gain_value = self.loss_value = None
+            if self.atr_prev is None and self._seed_trs:
+                self._seed_trs.pop()
+                self.atr_value = None
+        else:
+            # إزاحة القيم الحالية إلى السابقة قبل إضافة الشمعة الجديدة
+            if self.count > 0:
+                self.prev_close = self.buffer.back(1)
+            for p in self.ema_periods:
+                self.ema_prev[p] = self.ema_value[p]
+            self.gain_prev, self.loss_prev = self.gain_value, self.loss_value
+            self.atr_prev = self.atr_value
+            for p in self.sma_periods:
+                leaving = self.buffer.back(p) if self.buffer.count >= p else 0.0
+                self.sums[p] += close - leaving
+                self.sumsq[p] += close * close - leaving * leaving
+            self.buffer.append(close)
+            self.count += 1
+            self.last_open_time = open_time
+
+        self._apply(close, float(high), float(low))
+        self.updates += 1
+        if self.updates % _RESUM_EVERY == 0:
+            self._resum()
+        return self.snapshot()
+
+    def _apply(self, close: float, high: float, low: float):
+        """حساب قيم المؤشرات للشمعة الأخيرة انطلاقاً من القيم السابقة"""
+        self._last_high, self._last_low = high, low
+        # EMA: تبدأ من أول قيمة كما في calculate_ema
+        for p in self.ema_periods:
+            prev = self.ema_prev[p]
+            alpha = 2.0 / (p + 1)
+            self.ema_value[p] = close if prev is None else prev + alpha * (close - prev)
+
+        if self.prev_close is None or self.count < 2:
+            tr = high - low
+            self._update_atr(tr)
+            return
+
+        delta = close - self.prev_close
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        if self.gain_prev is None:
+            # مرحلة البذر: تجميع أول rsi_period فرق ثم أخذ المتوسط
+            self._seed_gains.append(gain)
+            self._seed_losses.append(loss)
+            if len(self._seed_gains) >= self.rsi_period:
+                self.gain_value = float(np.mean(self._seed_gains[:self.rsi_period]))
+                self.loss_value = float(np.mean(self._seed_losses[:self.rsi_period]))
+        else:
+            p = self.rsi_period
+            self.gain_value = self.gain_prev + (gain - self.gain_prev) / p
+            self.loss_value = self.loss_prev + (loss - self.loss_prev) / p
+
+        tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self._update_atr(tr)
+
+    def _update_atr(self, tr: float):
+        """تحديث ATR بطريقة وايلدر (مع مرحلة بذر)"""
+        if self.atr_prev is None:
+            self._seed_trs.append(tr)
+            if len(self._seed_trs) >= self.atr_period:
+                self.atr_value = float(np.mean(self._seed_trs[:self.atr_period]))
+        else:
+            self.atr_value = self.atr_prev + (tr - self.atr_prev) / self.atr_period
+
+    def sma_value(self, period: int) -> Optional[float]:
+        """المتوسط البسيط لآخر period قيمة (أو المتاح منها إذا كانت أقل)"""
+        n = min(period, self.buffer.count)
+        if n == 0:
+            return None
+        if period in self.sums and self.buffer.count >= period:
+            return self.sums[period] / period
+        return float(np.mean(self.buffer.last(n)))
+
+    def std_value(self, period: int) -> Optional[float]:
+        """الانحراف المعياري لآخر period قيمة (ddof=0)"""
+        n = min(period, self.buffer.count)
+        if n == 0:
+            return None
+        if period in self.sums and self.buffer.count >= period:
+            mean = self.sums[period] / period
+            return float(np.sqrt(max(self.sumsq[period] / period - mean * mean, 0.0)))
+        return float(np.std(self.buffer.last(n)))
+
+    def rsi_value(self) -> float:
+        """قيمة RSI الحالية (50 إذا لم تتوفر بيانات كافية)"""
+        if self.gain_value is None:
+            return 50.0
+        return float(_rsi_from_averages(self.gain_value, self.loss_value))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """لقطة من قيم جميع المؤشرات الحالية"""
+        middle = self.sma_value(self.bb_period)
+        std = self.std_value(self.bb_period)
+        bands = None
+        if middle is not None and std is not None:
+            bands = {
+                'upper': middle + self.bb_std * std,
+                'middle': middle,
+                'lower': middle - self.bb_std * std
+            }
+        return {
+            'count': self.count,
+            'open_time': self.last_open_time,
+            'close': self.buffer.back(1) if self.buffer.count else None,
+            'prev_close': self.prev_close,
+            'rsi': self.rsi_value(),
+            'ema': dict(self.ema_value),
+            'sma': {p: self.sma_value(p) for p in self.sma_periods},
+            'std': {self.bb_period: std},
+            'bollinger': bands,
+            'atr': self.atr_value
+        }
+
+
+def _ema_state_series(closes: np.ndarray, period: int) -> np.ndarray:
+    """EMA مبدوء من القيمة الأولى بغض النظر عن طول السلسلة (متوافق مع التحديث التدريجي)"""
+    out = np.empty_like(closes)
+    out[0] = closes[0]
+    out[1:] = _ewm(closes[1:], 2.0 / (period + 1), closes[0])
+    return out
+
+
+# سجل الحالات التراكمية لكل (عملة، فاصل زمني)
+_states: Dict[Tuple[str, str], IndicatorState] = {}
+_states_lock = threading.RLock()
+
+
+def get_state(symbol: str, interval: str) -> Optional[IndicatorState]:
+    """الحصول على الحالة التراكمية المسجلة لسلسلة معينة"""
+    with _states_lock:
+        return _states.get((symbol, interval))
+
+
+def update_from_series(symbol: str, interval: str, klines: Any) -> Dict[str, Any]:
+    """
+    تحديث حالة المؤشرات لسلسلة (عملة، فاصل زمني) من أحدث بيانات الشموع
+    - إذا كانت الحالة موجودة ومتصلة بالسلسلة: تطبيق الشموع الجديدة فقط (عادةً 1-2 شمعة)
+    - خلاف ذلك: بناء الحالة من جديد بالحساب المتجه
+
+    :param symbol: رمز العملة
+    :param interval: الفاصل الزمني
+    :param klines: OHLCVSeries أو أي تنسيق شموع مدعوم
+    :return: لقطة المؤشرات الحالية
+    """
+    series = as_ohlcv(klines)
+    key = (symbol, interval)
+    with _states_lock:
+        state = _states.get(key)
+        if state is not None and state.last_open_time is not None and len(series):
+            times = series.open_time
+            start = int(np.searchsorted(times, state.last_open_time))
+            # الحالة متصلة إذا كانت آخر شمعة فيها موجودة ضمن السلسلة الجديدة
+            if start < len(series) and times[start] == state.last_open_time:
+                for i in range(start, len(series)):
+                    state.update(int(times[i]), float(series.high[i]),
+                                 float(series.low[i]), float(series.close[i]))
+                return state.snapshot()
+        state = IndicatorState.from_series(series)
+        _states[key] = state
+        return state.snapshot()
+
+
+def reset_states():
+    """مسح جميع الحالات التراكمية"""
+    with _states_lock:
+        _states.clear()
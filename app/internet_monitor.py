@@ -7,7 +7,7 @@ import time
 import logging
 import requests
 from datetime import datetime, timedelta
-from app.telegram_notify import send_telegram_message
+from app.telegram_notify import send_telegram_message, send_telegram_message_now
 
 logger = logging.getLogger('internet_monitor')
 
@@ -172,8 +172,7 @@ def ping_telegram():
     :return: True إذا نجح الإرسال، False إذا فشل
     """
     try:
-        send_telegram_message("🔄 هذا اختبار لنظام الإشعارات. البوت يعمل بشكل طبيعي.")
-        return True
+        return send_telegram_message_now("🔄 هذا اختبار لنظام الإشعارات. البوت يعمل بشكل طبيعي.")
     except Exception as e:
         logger.error(f"فشل في إرسال رسالة اختبار إلى تلجرام: {e}")
         return False
@@ -0,0 +1,299 @@
+"""
+مخزن محلي دائم لبيانات الشموع (klines) مع تعبئة الفجوات بشكل تدريجي
+يحفظ الشموع على القرص في قاعدة SQLite مفهرسة حسب (الرمز، الفاصل الزمني، وقت الافتتاح)
+بحيث يتم جلب الشموع الأحدث فقط من المنصة بدلاً من إعادة تحميل النافذة كاملة في كل دورة
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.ohlcv import OHLCVSeries
+
+logger = logging.getLogger('kline_store')
+
+# مسار ملف قاعدة البيانات الافتراضي
+try:
+    from app.config import KLINE_STORE_PATH, KLINE_STORE_MAX_ROWS
+except ImportError:
+    KLINE_STORE_PATH = 'klines_store.db'
+    KLINE_STORE_MAX_ROWS = 5000
+
+# مدة كل فاصل زمني بالمللي ثانية (فواصل MEXC المدعومة)
+INTERVAL_MS = {
+    '1m': 60 * 1000,
+    '5m': 5 * 60 * 1000,
+    '15m': 15 * 60 * 1000,
+    '30m': 30 * 60 * 1000,
+    '60m': 60 * 60 * 1000,
+    '4h': 4 * 60 * 60 * 1000,
+    '1d': 24 * 60 * 60 * 1000,
+    '1M': 30 * 24 * 60 * 60 * 1000,  # تقريبي - يكفي لحساب حجم الفجوة
+}
+
+
+class KlineStore:
+    """مخزن شموع دائم وآمن للاستخدام من عدة خيوط"""
+
+    def __init__(self, db_path: str = KLINE_STORE_PATH, max_rows: int = KLINE_STORE_MAX_ROWS):
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.lock = threading.RLock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """فتح الاتصال بقاعدة البيانات عند أول استخدام وإنشاء الجدول"""
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS klines (
+                    symbol TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    open_time INTEGER NOT NULL,
+                    open REAL NOT NULL,
+                    high REAL NOT NULL,
+                    low REAL NOT NULL,
+                    close REAL NOT NULL,
+                    volume REAL NOT NULL,
+                    close_time INTEGER NOT NULL,
+                    PRIMARY KEY (symbol, interval, open_time)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get_last_open_time(self, symbol: str, interval: str) -> Optional[int]:
+        """
+        وقت افتتاح آخر شمعة مخزنة للسلسلة
+
+        :param symbol: رمز العملة
+        :param interval: الفاصل الزمني (بتنسيق MEXC)
+        :return: وقت الافتتاح بالمللي ثانية أو None إذا كانت السلسلة فارغة
+        """
+        with self.lock:
+            row = self._connect().execute(
+                "SELECT MAX(open_time) FROM klines WHERE symbol = ? AND interval = ?",
+                (symbol, interval)
+            ).fetchone()
+        return row[0] if row and row[0] is not None else None
+
+    def get_first_open_time(self, symbol: str, interval: str) -> Optional[int]:
+        """
+        وقت افتتاح أقدم شمعة مخزنة للسلسلة (نقطة البداية لاستكمال التاريخ الأقدم)
+
+        :param symbol: رمز العملة
+        :param interval: الفاصل الزمني (بتنسيق MEXC)
+        :return: وقت الافتتاح بالمللي ثانية أو None إذا كانت السلسلة فارغة
+        """
+        with self.lock:
+            row = self._connect().execute(
+                "SELECT MIN(open_time) FROM klines WHERE symbol = ? AND interval = ?",
+                (symbol, interval)
+            ).fetchone()
+        return row[0] if row and row[0] is not None else None
+
+    def count(self, symbol: str, interval: str) -> int:
+        """عدد الشموع المخزنة للسلسلة"""
+        with self.lock:
+            row = self._connect().execute(
+                "SELECT COUNT(*) FROM klines WHERE symbol = ? AND interval = ?",
+                (symbol, interval)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def _gap_start(self, conn: sqlite3.Connection, symbol: str, interval: str) -> Optional[int]:
+        """
+        وقت افتتاح أول شمعة بعد آخر فجوة في السلسلة (شموع ناقصة بسبب توقف البوت مثلاً)
+
+        :return: وقت الافتتاح بالمللي ثانية أو None إذا كانت السلسلة متصلة
+        """
+        step = INTERVAL_MS.get(interval)
+        if not step:
+            return None
+        # هامش نصف فاصل: طول الشهر في 1M تقريبي
+        row = conn.execute(
+            """
+            SELECT MAX(open_time) FROM (
+                SELECT open_time, LAG(open_time) OVER (ORDER BY open_time) AS prev_time
+                FROM klines WHERE symbol = ? AND interval = ?
+            ) WHERE open_time - prev_time > ?
+            """,
+            (symbol, interval, step + step // 2)
+        ).fetchone()
+        return row[0] if row and row[0] is not None else None
+
+    def contiguous_count(self, symbol: str, interval: str) -> int:
+        """
+        عدد الشموع المتصلة للخلف من أحدث شمعة مخزنة (الشموع السابقة لفجوة لا تُحتسب)
+
+        :param symbol: رمز العملة
+        :param interval: الفاصل الزمني (بتنسيق MEXC)
+        :return: عدد الشموع
+        """
+        with self.lock:
+            conn = self._connect()
+            start = self._gap_start(conn, symbol, interval)
+            row = conn.execute(
+                "SELECT COUNT(*) FROM klines WHERE symbol = ? AND interval = ? AND open_time >= ?",
+                (symbol, interval, start if start is not None else 0)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def append(self, symbol: str, interval: str, klines: List[Dict[str, Any]]) -> int:
+        """
+        إضافة شموع جديدة إلى السلسلة (الشمعة الأخيرة المفتوحة يتم استبدالها بأحدث نسخة)
+        إذا لم تتصل الشموع الجديدة بالسلسلة المخزنة (فجوة بعد توقف) تُستبدل السلسلة بها
+        حتى تبقى السلسلة المخزنة متصلة دائماً
+
+        :param symbol: رمز العملة
+        :param interval: الفاصل الزمني (بتنسيق MEXC)
+        :param klines: قائمة قواميس الشموع بتنسيق get_klines
+        :return: عدد الشموع المكتوبة
+        """
+        if not klines:
+            return 0
+        rows = [
+            (symbol, interval, int(k['open_time']), float(k['open']), float(k['high']),
+             float(k['low']), float(k['close']), float(k['volume']), int(k['close_time']))
+            for k in klines
+        ]
+        with self.lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO klines VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            gap_start = self._gap_start(conn, symbol, interval)
+            if gap_start is not None:
+                dropped = conn.execute(
+                    "DELETE FROM klines WHERE symbol = ? AND interval = ? AND open_time < ?",
+                    (symbol, interval, gap_start)
+                ).rowcount
+                logger.info(f"فجوة في شموع {symbol} ({interval}): تم استبدال {dropped} شمعة قديمة غير متصلة")
+            conn.commit()
+            self._prune(symbol, interval)
+        return len(rows)
+
+    def _prune(self, symbol: str, interval: str):
+        """حذف أقدم الشموع عند تجاوز الحد الأقصى للسلسلة بهامش 20%"""
+        if not self.max_rows:
+            return
+        conn = self._connect()
+        total = conn.execute(
+            "SELECT COUNT(*) FROM klines WHERE symbol = ? AND interval = ?",
+            (symbol, interval)
+        ).fetchone()[0]
+        if total <= int(self.max_rows * 1.2):
+            return
+        conn.execute(
+            """
+            DELETE FROM klines WHERE symbol = ? AND interval = ? AND open_time < (
+                SELECT open_time FROM klines WHERE symbol = ? AND interval = ?
+                ORDER BY open_time DESC LIMIT 1 OFFSET ?
+            )
+            """,
+            (symbol, interval, symbol, interval, self.max_rows - 1)
+        )
+        conn.commit()
+
+    def get_recent(self, symbol: str, interval: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        قراءة آخر الشموع المخزنة بترتيب زمني تصاعدي وبنفس تنسيق get_klines
+
+        :param symbol: رمز العملة
+        :param interval: الفاصل الزمني (بتنسيق MEXC)
+        :param limit: عدد الشموع
+        :return: قائمة قواميس الشموع
+        """
+        with self.lock:
+            rows = self._connect().execute(
+                """
+                SELECT open_time, open, high, low, close, volume, close_time FROM klines
+                WHERE symbol = ? AND interval = ? ORDER BY open_time DESC LIMIT ?
+                """,
+                (symbol, interval, int(limit))
+            ).fetchall()
+        rows.reverse()
+        return [
+            {
+                'open_time': r[0],
+                'open': r[1],
+                'high': r[2],
+                'low': r[3],
+                'close': r[4],
+                'volume': r[5],
+                'close_time': r[6]
+            }
+            for r in rows
+        ]
+
+    def get_recent_ohlcv(self, symbol: str, interval: str, limit: int) -> OHLCVSeries:
+        """
+        قراءة آخر الشموع المخزنة مباشرة كسلسلة عمودية OHLCVSeries دون المرور بالقواميس
+
+        :param symbol: رمز العملة
+        :param interval: الفاصل الزمني (بتنسيق MEXC)
+        :param limit: عدد الشموع
+        :return: سلسلة OHLCV بترتيب زمني تصاعدي
+        """
+        with self.lock:
+            rows = self._connect().execute(
+                """
+                SELECT open_time, open, high, low, close, volume, close_time FROM klines
+                WHERE symbol = ? AND interval = ? ORDER BY open_time DESC LIMIT ?
+                """,
+                (symbol, interval, int(limit))
+            ).fetchall()
+        if not rows:
+            return OHLCVSeries.empty()
+        return OHLCVSeries.from_matrix(np.array(rows[::-1], dtype=np.float64))
+
+    def needs_full_fetch(self, symbol: str, interval: str, limit: int) -> bool:
+        """
+        تحديد ما إذا كانت السلسلة تحتاج لجلب كامل بدلاً من التعبئة التدريجية
+        (سلسلة فارغة، أو فجوة حتى الآن أكبر من النافذة المطلوبة، أو أقل من limit شمعة متصلة
+        للخلف من أحدث شمعة أي من newest_open_time - (limit - 1) * interval)
+        """
+        last_open_time = self.get_last_open_time(symbol, interval)
+        step = INTERVAL_MS.get(interval)
+        if last_open_time is None or not step:
+            return True
+        missing = (int(time.time() * 1000) - last_open_time) // step
+        if missing >= limit:
+            return True
+        return self.contiguous_count(symbol, interval) < limit
+
+    def clear(self, symbol: Optional[str] = None, interval: Optional[str] = None):
+        """مسح السلاسل المخزنة (كلها أو لرمز/فاصل محدد)"""
+        with self.lock:
+            conn = self._connect()
+            if symbol and interval:
+                conn.execute("DELETE FROM klines WHERE symbol = ? AND interval = ?", (symbol, interval))
+            elif symbol:
+                conn.execute("DELETE FROM klines WHERE symbol = ?", (symbol,))
+            else:
+                conn.execute("DELETE FROM klines")
+            conn.commit()
+
+    def close(self):
+        """إغلاق الاتصال بقاعدة البيانات"""
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# نسخة عامة مشتركة من المخزن
+kline_store = KlineStore()
@@ -0,0 +1,263 @@
+"""
+مكوّن موحد لمستويات الدعم والمقاومة
+- القمم والقيعان المحلية تُحسب بعمليات متجهة (نوافذ منزلقة) بدلاً من حلقات على كل شمعة
+- المستويات المتقاربة تُجمّع في تمريرة واحدة على القيم المرتبة (O(n log n))
+- البحث عن أقرب مستوى يتم بالبحث الثنائي على المستويات المرتبة
+- LevelIndex يحفظ القمم والقيعان المؤكدة لكل (عملة، إطار) ويضيف فقط ما تؤكده الشموع الجديدة
+"""
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import LEVEL_INDEX_MAX_PIVOTS
+except (ImportError, AttributeError):
+    LEVEL_INDEX_MAX_PIVOTS = 500
+
+
+def pivot_mask(values, half_window: int, kind: str = 'low', strict: bool = False,
+               partial_tail: bool = False) -> np.ndarray:
+    """
+    تحديد القيعان (أو القمم) المحلية: قيمة لا تزيد (لا تقل) عن جميع جيرانها ضمن half_window على كل جانب
+
+    :param values: مصفوفة القيم
+    :param half_window: عدد الجيران على كل جانب
+    :param kind: 'low' للقيعان أو 'high' للقمم
+    :param strict: مقارنة صارمة (أصغر/أكبر تماماً من الجيران)
+    :param partial_tail: السماح للشموع الأخيرة بالمقارنة مع الجيران المتاحين فقط على اليمين
+    :return: مصفوفة منطقية بطول القيم
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    mask = np.zeros(n, dtype=bool)
+    if half_window < 1:
+        return mask
+    if partial_tail:
+        values = np.concatenate([values, np.full(half_window, np.inf if kind == 'low' else -np.inf)])
+    if len(values) < 2 * half_window + 1:
+        return mask
+    reduce = np.minimum if kind == 'low' else np.maximum
+    length = len(values) - 2 * half_window
+    center = values[half_window:half_window + length]
+    if strict:
+        # أقصى الجيران بدون الشمعة نفسها: الجانب الأيسر والأيمن كل على حدة
+        if half_window == 1:
+            extreme = reduce(values[:-2], values[2:])
+        else:
+            left = sliding_window_view(values[:half_window + length - 1], half_window)
+            right = sliding_window_view(values[half_window + 1:], half_window)
+            extreme = reduce(reduce.reduce(left, axis=1), reduce.reduce(right, axis=1))
+        found = center < extreme if kind == 'low' else center > extreme
+    else:
+        # النافذة كاملة تشمل الشمعة نفسها: القاع المحلي يساوي أدنى قيمة في نافذته
+        extreme = reduce.reduce(sliding_window_view(values, 2 * half_window + 1), axis=1)
+        found = center == extreme
+    mask[half_window:half_window + length] = found
+    return mask
+
+
+def cluster_levels(levels, tolerance: float) -> List[float]:
+    """
+    دمج المستويات المتقاربة في تمريرة واحدة على القيم المرتبة: كل قيمة تبعد عن متوسط المجموعة
+    الحالية بنسبة لا تتجاوز tolerance تنضم إليها، وإلا تبدأ مجموعة جديدة
+
+    :param levels: قيم المستويات (بأي ترتيب)
+    :param tolerance: الفرق النسبي الأقصى للدمج
+    :return: متوسطات المجموعات مرتبة تصاعدياً
+    """
+    ordered = np.sort(np.asarray(levels, dtype=np.float64)).tolist()
+    if not ordered:
+        return []
+    merged = []
+    current, count = ordered[0], 1
+    for value in ordered[1:]:
+        if value == current:
+            count += 1
+        elif abs(value - current) / current <= tolerance:
+            current = (current * count + value) / (count + 1)
+            count += 1
+        else:
+            merged.append(current)
+            current, count = value, 1
+    merged.append(current)
+    return merged
+
+
+def nearest_below(levels: Sequence[float], price: float) -> Optional[float]:
+    """أعلى مستوى تحت السعر (levels مرتبة تصاعدياً) أو None"""
+    index = bisect_left(levels, price)
+    return levels[index - 1] if index else None
+
+
+def nearest_above(levels: Sequence[float], price: float) -> Optional[float]:
+    """أدنى مستوى فوق السعر (levels مرتبة تصاعدياً) أو None"""
+    index = bisect_right(levels, price)
+    return levels[index] if index < len(levels) else None
+
+
+class LevelSet:
+    """مستويات الدعم والمقاومة مرتبة تصاعدياً مع استعلامات بالبحث الثنائي"""
+
+    __slots__ = ('supports', 'resistances')
+
+    def __init__(self, supports: Optional[List[float]] = None, resistances: Optional[List[float]] = None):
+        self.supports = supports or []
+        self.resistances = resistances or []
+
+    def __repr__(self) -> str:
+        return f"LevelSet(supports={len(self.supports)}, resistances={len(self.resistances)})"
+
+    def nearest_support(self, price: float) -> Optional[float]:
+        """أقرب دعم تحت السعر"""
+        return nearest_below(self.supports, price)
+
+    def nearest_resistance(self, price: float) -> Optional[float]:
+        """أقرب مقاومة فوق السعر"""
+        return nearest_above(self.resistances, price)
+
+    def to_dict(self) -> Dict[str, List[float]]:
+        """بتنسيق {'support': [...], 'resistance': [...]}"""
+        return {'support': list(self.supports), 'resistance': list(self.resistances)}
+
+
+def _select(prices: np.ndarray, tolerance: float, reference: Optional[float],
+            max_distance: Optional[float]) -> List[float]:
+    """استبعاد المستويات البعيدة عن السعر المرجعي ثم تجميع الباقي"""
+    if reference and max_distance is not None and len(prices):
+        prices = prices[np.abs(prices / reference - 1) <= max_distance]
+    return cluster_levels(prices, tolerance)
+
+
+def find_levels(highs, lows, half_window: int, tolerance: float, strict: bool = False,
+                partial_tail: bool = False, start: int = 0, stop: Optional[int] = None,
+                reference: Optional[float] = None, max_distance: Optional[float] = None) -> LevelSet:
+    """
+    حساب مستويات الدعم (من القيعان) والمقاومة (من القمم) لسلسلة واحدة دون حالة محفوظة
+
+    :param highs: القمم (أو أسعار الإغلاق)
+    :param lows: القيعان (أو أسعار الإغلاق)
+    :param half_window: عدد الجيران على كل جانب للقمة/القاع المحلي
+    :param tolerance: نسبة دمج المستويات المتقاربة
+    :param strict: مقارنة صارمة مع الجيران
+    :param partial_tail: قبول القمم/القيعان في آخر السلسلة قبل اكتمال جيرانها
+    :param start: أول موضع مسموح للقمة/القاع
+    :param stop: الموضع الذي تنتهي قبله المواضع المسموحة (None حتى النهاية)
+    :param reference: السعر المرجعي لاستبعاد المستويات البعيدة
+    :param max_distance: أقصى بعد نسبي عن السعر المرجعي
+    :return: LevelSet
+    """
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    allowed = slice(start, stop)
+    low_mask = pivot_mask(lows, half_window, 'low', strict, partial_tail)[allowed]
+    high_mask = pivot_mask(highs, half_window, 'high', strict, partial_tail)[allowed]
+    return LevelSet(
+        _select(lows[allowed][low_mask], tolerance, reference, max_distance),
+        _select(highs[allowed][high_mask], tolerance, reference, max_distance)
+    )
+
+
+class LevelIndex:
+    """
+    فهرس مستويات لكل (عملة، إطار): يحفظ القمم والقيعان المؤكدة مع أوقات شموعها، وعند وصول
+    شموع جديدة يفحص فقط الشموع التي اكتمل جيرانها حديثاً بدلاً من إعادة فحص السلسلة كاملة
+    (القيم الافتراضية هي قواعد market_scanner.find_support_resistance)
+    """
+
+    def __init__(self, half_window: int = 10, tolerance: float = 0.01,
+                 max_pivots: int = LEVEL_INDEX_MAX_PIVOTS):
+        self.half_window = half_window
+        self.tolerance = tolerance
+        self.max_pivots = max_pivots
+        self.lock = threading.RLock()
+        self._states: Dict[Any, Dict[str, Any]] = {}
+        self.stats = {'full': 0, 'incremental': 0, 'scanned': 0}
+
+    def update(self, key: Any, times, highs, lows) -> Dict[str, Any]:
+        """
+        إضافة القمم والقيعان التي أكدتها الشموع الجديدة
+
+        :param key: مفتاح السلسلة مثل (العملة، الإطار)
+        :param times: أوقات افتتاح الشموع (تصاعدياً)
+        :param highs: القمم (أو أسعار الإغلاق)
+        :param lows: القيعان (أو أسعار الإغلاق)
+        :return: حالة السلسلة {'lows': (أوقات، أسعار), 'highs': (أوقات، أسعار), 'scanned': آخر وقت مفحوص}
+        """
+        times = np.asarray(times, dtype=np.int64)
+        half = self.half_window
+        last_final = len(times) - 1 - half  # آخر شمعة اكتمل جيرانها
+        with self.lock:
+            state = self._states.get(key)
+            resume = half
+            if state is not None and state['scanned'] is not None:
+                index = int(np.searchsorted(times, state['scanned']))
+                if index < len(times) and times[index] == state['scanned']:
+                    resume = max(index + 1, half)
+                    self.stats['incremental'] += 1
+                else:
+                    state = None
+            if state is None:
+                empty = (np.empty(0, dtype=np.int64), np.empty(0))
+                state = {'lows': empty, 'highs': empty, 'scanned': None}
+                self._states[key] = state
+                self.stats['full'] += 1
+            if last_final < resume:
+                return state
+
+            # نافذة الفحص: الشموع المراد فحصها مع جيرانها على الجانبين
+            region = slice(resume - half, last_final + half + 1)
+            centers = times[resume:last_final + 1]
+            for kind, values in (('lows', lows), ('highs', highs)):
+                values = np.asarray(values, dtype=np.float64)[region]
+                mask = pivot_mask(values, half, 'low' if kind == 'lows' else 'high')[half:len(values) - half]
+                old_times, old_prices = state[kind]
+                state[kind] = (np.concatenate([old_times, centers[mask]])[-self.max_pivots:],
+                               np.concatenate([old_prices, values[half:len(values) - half][mask]])[-self.max_pivots:])
+            state['scanned'] = int(times[last_final])
+            self.stats['scanned'] += last_final + 1 - resume
+            return state
+
+    def levels(self, key: Any, times, highs, lows, margin: Optional[int] = None,
+               reference: Optional[float] = None, max_distance: Optional[float] = None) -> LevelSet:
+        """
+        مستويات الدعم والمقاومة لنافذة الشموع الحالية
+
+        :param key: مفتاح السلسلة مثل (العملة، الإطار)
+        :param times: أوقات افتتاح الشموع
+        :param highs: القمم (أو أسعار الإغلاق)
+        :param lows: القيعان (أو أسعار الإغلاق)
+        :param margin: عدد الشموع المستبعدة من طرفي النافذة (الافتراضي half_window)
+        :param reference: السعر المرجعي لاستبعاد المستويات البعيدة
+        :param max_distance: أقصى بعد نسبي عن السعر المرجعي
+        :return: LevelSet
+        """
+        times = np.asarray(times, dtype=np.int64)
+        margin = self.half_window if margin is None else margin
+        if len(times) <= 2 * margin:
+            return LevelSet()
+        state = self.update(key, times, highs, lows)
+        first, last = times[margin], times[len(times) - margin - 1]
+        selected = []
+        for kind in ('lows', 'highs'):
+            pivot_times, pivot_prices = state[kind]
+            lo, hi = np.searchsorted(pivot_times, [first, last + 1])
+            selected.append(_select(pivot_prices[lo:hi], self.tolerance, reference, max_distance))
+        return LevelSet(*selected)
+
+    def reset(self, key: Optional[Any] = None):
+        """مسح حالة سلسلة محددة أو جميع السلاسل"""
+        with self.lock:
+            if key is None:
+                self._states.clear()
+            else:
+                self._states.pop(key, None)
+
+
+# نسخة عامة مشتركة (بقواعد market_scanner.find_support_resistance)
+level_index = LevelIndex()
@@ -0,0 +1,513 @@
+"""
+تغذية بيانات السوق اللحظية عبر WebSocket
+- ذاكرة حية لآخر سعر (الصفقات)، وأفضل عرض/طلب (bookTicker)، وآخر شمعة لكل فاصل زمني
+- طبقة نقل قابلة للاستبدال: WebSocketClientTransport للمنصة الحقيقية (تتطلب مكتبة websocket-client)
+  و QueueTransport كبديل محلي يمكن تغذيته يدوياً أو من خادم محلي وهمي
+- إعادة اتصال تلقائية بتأخير تصاعدي وإعادة الاشتراك في جميع القنوات
+- MEXC تقبل 30 اشتراكاً على الأكثر لكل اتصال: الرموز تُوزع على عدة اتصالات (FeedConnection)
+  لا يتجاوز أي منها MARKET_FEED_MAX_CHANNELS قناة
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+try:
+    import websocket  # مكتبة websocket-client (اختيارية)
+except ImportError:
+    websocket = None
+
+try:
+    from app.config import MARKET_FEED_URL, MARKET_FEED_MAX_AGE, MARKET_FEED_INTERVALS
+except (ImportError, AttributeError):
+    MARKET_FEED_URL = 'wss://wbs.mexc.com/ws'
+    MARKET_FEED_MAX_AGE = 2.0
+    MARKET_FEED_INTERVALS = []
+
+try:
+    from app.config import MARKET_FEED_MAX_CHANNELS, MARKET_FEED_BOOK_TICKER
+except (ImportError, AttributeError):
+    MARKET_FEED_MAX_CHANNELS = 30
+    MARKET_FEED_BOOK_TICKER = False
+
+# تحويل الفواصل الزمنية من تنسيق REST إلى تنسيق قنوات WebSocket في MEXC
+WS_INTERVALS = {
+    '1m': 'Min1',
+    '5m': 'Min5',
+    '15m': 'Min15',
+    '30m': 'Min30',
+    '60m': 'Min60',
+    '4h': 'Hour4',
+    '1d': 'Day1',
+    '1M': 'Month1',
+}
+REST_INTERVALS = {v: k for k, v in WS_INTERVALS.items()}
+
+# فاصل رسائل PING للحفاظ على الاتصال (بالثواني)
+PING_INTERVAL = 20
+# حدود التأخير التصاعدي لإعادة الاتصال
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+
+
+class FeedTransport:
+    """واجهة طبقة النقل: اتصال نصي ثنائي الاتجاه"""
+
+    def connect(self, url: str):
+        raise NotImplementedError
+
+    def send(self, text: str):
+        raise NotImplementedError
+
+    def recv(self, timeout: float) -> Optional[str]:
+        """استلام رسالة واحدة أو None عند انتهاء المهلة"""
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+
+class WebSocketClientTransport(FeedTransport):
+    """النقل الحقيقي عبر مكتبة websocket-client"""
+
+    def __init__(self):
+        if websocket is None:
+            raise RuntimeError("مكتبة websocket-client غير مثبتة")
+        self.ws = None
+
+    def connect(self, url: str):
+        self.ws = websocket.create_connection(url, timeout=10)
+
+    def send(self, text: str):
+        self.ws.send(text)
+
+    def recv(self, timeout: float) -> Optional[str]:
+        self.ws.settimeout(timeout)
+        try:
+            message = self.ws.recv()
+        except websocket.WebSocketTimeoutException:
+            return None
+        if isinstance(message, bytes):
+            message = message.decode('utf-8', errors='ignore')
+        return message
+
+    def close(self):
+        if self.ws is not None:
+            try:
+                self.ws.close()
+            finally:
+                self.ws = None
+
+
+class QueueTransport(FeedTransport):
+    """
+    نقل محلي عبر طوابير في الذاكرة (بديل للخادم الحقيقي)
+    push() يضع رسالة كأنها قادمة من الخادم، و sent يحفظ الرسائل المرسلة
+    """
+
+    def __init__(self):
+        self.inbound: 'queue.Queue[Optional[str]]' = queue.Queue()
+        self.sent: List[str] = []
+        self.connected = False
+        self.url = None
+
+    def connect(self, url: str):
+        self.url = url
+        self.connected = True
+
+    def send(self, text: str):
+        if not self.connected:
+            raise ConnectionError("النقل غير متصل")
+        self.sent.append(text)
+
+    def recv(self, timeout: float) -> Optional[str]:
+        if not self.connected:
+            raise ConnectionError("النقل غير متصل")
+        try:
+            message = self.inbound.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if message is None:
+            # رسالة None تحاكي انقطاع الاتصال من الخادم
+            self.connected = False
+            raise ConnectionError("أغلق الخادم الاتصال")
+        return message
+
+    def push(self, message: Any):
+        """وضع رسالة في الطابور (قاموس يحوّل إلى JSON)"""
+        self.inbound.put(message if isinstance(message, str) or message is None else json.dumps(message))
+
+    def close(self):
+        self.connected = False
+
+
+def default_transport() -> FeedTransport:
+    """النقل الافتراضي (WebSocket حقيقي)"""
+    return WebSocketClientTransport()
+
+
+class FeedConnection:
+    """اتصال واحد بالتغذية مع رموزه (لا تتجاوز قنواته MARKET_FEED_MAX_CHANNELS)"""
+
+    def __init__(self, feed: 'MarketFeed', index: int):
+        self.feed = feed
+        self.index = index
+        self.symbols: Set[str] = set()
+        self.send_lock = threading.Lock()
+        self.transport: Optional[FeedTransport] = None
+        self.connected = False
+        self.thread = None
+
+    def send(self, payload: Dict[str, Any]) -> bool:
+        with self.send_lock:
+            if not self.connected or self.transport is None:
+                return False
+            try:
+                self.transport.send(json.dumps(payload))
+                return True
+            except Exception as e:
+                logger.warning(f"فشل الإرسال عبر اتصال تغذية السوق {self.index}: {e}")
+                return False
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, daemon=True, name=f'market_feed_{self.index}')
+            self.thread.start()
+
+    def join(self, timeout: float):
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        self.thread = None
+
+    def disconnect(self):
+        with self.send_lock:
+            self.connected = False
+            if self.transport is not None:
+                try:
+                    self.transport.close()
+                except Exception:
+                    pass
+                self.transport = None
+
+    def _connect(self):
+        transport = self.feed.transport_factory()
+        transport.connect(self.feed.url)
+        with self.send_lock:
+            self.transport = transport
+            self.connected = True
+        with self.feed.lock:
+            symbols = list(self.symbols)
+        if symbols:
+            self.send({"method": "SUBSCRIPTION", "params": self.feed.channels(symbols)})
+        logger.info(f"تم الاتصال بتغذية السوق (اتصال {self.index}، {len(symbols)} رمز مشترك)")
+
+    def _run(self):
+        delay = RECONNECT_MIN_DELAY
+        while self.feed.running:
+            try:
+                self._connect()
+                delay = RECONNECT_MIN_DELAY
+                last_ping = time.time()
+                while self.feed.running:
+                    message = self.transport.recv(timeout=1.0)
+                    if message is not None:
+                        self.feed.handle_message(message)
+                    if time.time() - last_ping >= PING_INTERVAL:
+                        self.send({"method": "PING"})
+                        last_ping = time.time()
+            except Exception as e:
+                if self.feed.running:
+                    logger.warning(f"انقطع اتصال تغذية السوق {self.index}: {e} - إعادة المحاولة بعد {delay:.0f} ثانية")
+            finally:
+                self.disconnect()
+            if self.feed.running:
+                time.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+
+class MarketFeed:
+    """تغذية بيانات السوق اللحظية مع ذاكرة آمنة للاستخدام من عدة خيوط"""
+
+    def __init__(self, url: str = MARKET_FEED_URL,
+                 transport_factory: Callable[[], FeedTransport] = default_transport,
+                 intervals: Iterable[str] = MARKET_FEED_INTERVALS,
+                 book_ticker: bool = MARKET_FEED_BOOK_TICKER,
+                 max_channels: int = MARKET_FEED_MAX_CHANNELS):
+        self.url = url
+        self.transport_factory = transport_factory
+        self.book_ticker = book_ticker
+        self.max_channels = max(1, int(max_channels))
+        intervals = [i for i in intervals if i in WS_INTERVALS]
+        # قنوات الرمز الواحد يجب أن تتسع في اتصال واحد
+        fixed = 2 if book_ticker else 1
+        if fixed + len(intervals) > self.max_channels:
+            intervals = intervals[:max(0, self.max_channels - fixed)]
+            logger.warning(f"تقليص فواصل شموع التغذية إلى {intervals} (حد {self.max_channels} قناة لكل اتصال)")
+        self.intervals = intervals
+        self.symbols: Set[str] = set()
+        self.connections: List[FeedConnection] = []
+        self.prices: Dict[str, Dict[str, float]] = {}
+        self.book_tickers: Dict[str, Dict[str, float]] = {}
+        self.klines: Dict[tuple, Dict[str, Any]] = {}
+        self.listeners: List[Callable[[str, str, Dict[str, Any]], None]] = []
+        self.lock = threading.RLock()
+        self.running = False
+        self.messages_received = 0
+        self.last_message_at = 0.0
+
+    @property
+    def connected(self) -> bool:
+        return any(c.connected for c in self.connections)
+
+    # ---------- الاشتراكات ----------
+
+    def channels_for(self, symbol: str) -> List[str]:
+        """قنوات الاشتراك لرمز واحد (الصفقات دائماً، وأفضل عرض/طلب والشموع حسب الإعدادات)"""
+        channels = [f"spot@public.deals.v3.api@{symbol}"]
+        if self.book_ticker:
+            channels.append(f"spot@public.bookTicker.v3.api@{symbol}")
+        channels.extend(f"spot@public.kline.v3.api@{symbol}@{WS_INTERVALS[i]}" for i in self.intervals)
+        return channels
+
+    def channels(self, symbols: Iterable[str]) -> List[str]:
+        """قنوات الاشتراك لعدة رموز"""
+        return [c for s in symbols for c in self.channels_for(s)]
+
+    @property
+    def symbols_per_connection(self) -> int:
+        return max(1, self.max_channels // len(self.channels_for('')))
+
+    def _assign(self, symbols: List[str]) -> Dict[FeedConnection, List[str]]:
+        """توزيع رموز جديدة على الاتصالات التي فيها متسع، وإنشاء اتصالات جديدة عند الحاجة (داخل القفل)"""
+        capacity = self.symbols_per_connection
+        assigned: Dict[FeedConnection, List[str]] = {}
+        for symbol in symbols:
+            connection = next((c for c in self.connections if len(c.symbols) < capacity), None)
+            if connection is None:
+                connection = FeedConnection(self, len(self.connections))
+                self.connections.append(connection)
+                if self.running:
+                    connection.start()
+            connection.symbols.add(symbol)
+            assigned.setdefault(connection, []).append(symbol)
+        return assigned
+
+    def subscribe(self, symbols: Iterable[str]):
+        """
+        الاشتراك في بيانات رموز جديدة (يتم تجاهل المشترك بها مسبقاً)
+
+        :param symbols: رموز العملات
+        """
+        with self.lock:
+            new_symbols = list(dict.fromkeys(s for s in symbols if s and s not in self.symbols))
+            self.symbols.update(new_symbols)
+            assigned = self._assign(new_symbols)
+        # الاتصال الجديد يشترك في رموزه بنفسه عند الاتصال
+        for connection, connection_symbols in assigned.items():
+            connection.send({"method": "SUBSCRIPTION", "params": self.channels(connection_symbols)})
+        if new_symbols:
+            logger.info(f"الاشتراك في تغذية السوق لـ {len(new_symbols)} رمز ({len(self.connections)} اتصال)")
+
+    def unsubscribe(self, symbols: Iterable[str]):
+        """إلغاء الاشتراك في رموز (تُعاد سعة اتصالاتها للرموز الجديدة)"""
+        with self.lock:
+            removed = [s for s in symbols if s in self.symbols]
+            self.symbols.difference_update(removed)
+            released: Dict[FeedConnection, List[str]] = {}
+            for symbol in removed:
+                for connection in self.connections:
+                    if symbol in connection.symbols:
+                        connection.symbols.discard(symbol)
+                        released.setdefault(connection, []).append(symbol)
+                        break
+        for connection, connection_symbols in released.items():
+            connection.send({"method": "UNSUBSCRIPTION", "params": self.channels(connection_symbols)})
+
+    def add_listener(self, callback: Callable[[str, str, Dict[str, Any]], None]):
+        """
+        تسجيل دالة تُستدعى مع (نوع الحدث، الرمز، البيانات) عند كل تحديث
+        أنواع الأحداث: 'price'، 'book'، 'kline'
+        """
+        with self.lock:
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """إزالة دالة مسجلة"""
+        with self.lock:
+            if callback in self.listeners:
+                self.listeners.remove(callback)
+
+    # ---------- معالجة الرسائل ----------
+
+    def _notify(self, event: str, symbol: str, data: Dict[str, Any]):
+        for callback in list(self.listeners):
+            try:
+                callback(event, symbol, data)
+            except Exception as e:
+                logger.error(f"خطأ في معالج أحداث تغذية السوق: {e}")
+
+    def handle_message(self, text: str):
+        """
+        معالجة رسالة واحدة من الخادم وتحديث الذاكرة
+
+        :param text: نص الرسالة (JSON)
+        """
+        try:
+            message = json.loads(text)
+        except (TypeError, ValueError):
+            return
+        channel = message.get('c')
+        if not channel:
+            return  # رد على PING أو تأكيد اشتراك
+        symbol = message.get('s')
+        if not symbol:
+            parts = channel.split('@')
+            symbol = parts[2] if len(parts) > 2 else None
+        if not symbol:
+            return
+        data = message.get('d') or {}
+        now = time.time()
+        self.messages_received += 1
+        self.last_message_at = now
+
+        if '.deals.' in channel:
+            deals = data.get('deals') or []
+            if not deals:
+                return
+            last = max(deals, key=lambda d: d.get('t', 0))
+            entry = {'price': float(last['p']), 'event_time': last.get('t'), 'received_at': now}
+            with self.lock:
+                self.prices[symbol] = entry
+            self._notify('price', symbol, entry)
+        elif '.bookTicker.' in channel:
+            entry = {
+                'bid': float(data.get('b', 0)),
+                'bid_qty': float(data.get('B', 0)),
+                'ask': float(data.get('a', 0)),
+                'ask_qty': float(data.get('A', 0)),
+                'received_at': now
+            }
+            with self.lock:
+                self.book_tickers[symbol] = entry
+            self._notify('book', symbol, entry)
+        elif '.kline.' in channel:
+            k = data.get('k') or {}
+            interval = REST_INTERVALS.get(k.get('i') or channel.rsplit('@', 1)[-1])
+            if not interval:
+                return
+            candle = {
+                'open_time': int(k.get('t', 0)) * 1000,
+                'open': float(k.get('o', 0)),
+                'high': float(k.get('h', 0)),
+                'low': float(k.get('l', 0)),
+                'close': float(k.get('c', 0)),
+                'volume': float(k.get('v', 0)),
+                'close_time': int(k.get('T', 0)) * 1000,
+                'received_at': now
+            }
+            with self.lock:
+                self.klines[(symbol, interval)] = candle
+                # سعر إغلاق الشمعة الحالية هو آخر سعر تداول أيضاً
+                current = self.prices.get(symbol)
+                if current is None or current['received_at'] < now:
+                    self.prices[symbol] = {'price': candle['close'], 'event_time': None, 'received_at': now}
+            self._notify('kline', symbol, dict(candle, interval=interval))
+
+    # ---------- القراءة ----------
+
+    def get_price(self, symbol: str, max_age: Optional[float] = MARKET_FEED_MAX_AGE) -> Optional[float]:
+        """
+        آخر سعر للرمز إذا كان حديثاً بما يكفي
+
+        :param symbol: رمز العملة
+        :param max_age: أقصى عمر مقبول بالثواني (None = أي عمر)
+        :return: السعر أو None
+        """
+        with self.lock:
+            entry = self.prices.get(symbol)
+        if not entry:
+            return None
+        if max_age is not None and time.time() - entry['received_at'] > max_age:
+            return None
+        return entry['price']
+
+    def get_book_ticker(self, symbol: str, max_age: Optional[float] = MARKET_FEED_MAX_AGE) -> Optional[Dict[str, float]]:
+        """أفضل عرض وطلب للرمز إذا كان حديثاً بما يكفي"""
+        with self.lock:
+            entry = self.book_tickers.get(symbol)
+        if not entry:
+            return None
+        if max_age is not None and time.time() - entry['received_at'] > max_age:
+            return None
+        return dict(entry)
+
+    def get_kline(self, symbol: str, interval: str) -> Optional[Dict[str, Any]]:
+        """آخر شمعة (قد تكون مفتوحة) للرمز والفاصل الزمني"""
+        with self.lock:
+            candle = self.klines.get((symbol, interval))
+        return dict(candle) if candle else None
+
+    def get_status(self) -> Dict[str, Any]:
+        """حالة التغذية"""
+        with self.lock:
+            return {
+                'running': self.running,
+                'connected': self.connected,
+                'connections': len(self.connections),
+                'connections_up': sum(1 for c in self.connections if c.connected),
+                'symbols': len(self.symbols),
+                'messages_received': self.messages_received,
+                'last_message_age': time.time() - self.last_message_at if self.last_message_at else None
+            }
+
+    # ---------- دورة الاتصال ----------
+
+    def start(self) -> bool:
+        """بدء خيوط اتصالات التغذية"""
+        with self.lock:
+            if self.running:
+                return True
+            self.running = True
+            connections = list(self.connections)
+        for connection in connections:
+            connection.start()
+        logger.info(f"تم بدء تغذية بيانات السوق ({self.url}، {len(connections)} اتصال)")
+        return True
+
+    def stop(self):
+        """إيقاف خيوط التغذية وإغلاق الاتصالات"""
+        self.running = False
+        with self.lock:
+            connections = list(self.connections)
+        for connection in connections:
+            connection.disconnect()
+        for connection in connections:
+            connection.join(5)
+
+
+# نسخة عامة مشتركة من التغذية
+market_feed = MarketFeed()
+
+
+def start_market_feed(symbols: Iterable[str] = ()) -> bool:
+    """
+    بدء التغذية العامة إذا كانت مفعلة في الإعدادات ومكتبة WebSocket متاحة
+
+    :param symbols: رموز الاشتراك الأولية
+    :return: True إذا بدأت التغذية
+    """
+    try:
+        from app.config import MARKET_FEED_ENABLED
+    except (ImportError, AttributeError):
+        MARKET_FEED_ENABLED = False
+    if not MARKET_FEED_ENABLED:
+        return False
+    if market_feed.transport_factory is default_transport and websocket is None:
+        logger.warning("تغذية السوق غير متاحة: مكتبة websocket-client غير مثبتة، سيتم الاعتماد على الاستعلام الدوري")
+        return False
+    market_feed.subscribe(symbols)
+    return market_feed.start()
@@ -3,18 +3,18 @@
 تعمل بشكل منفصل عن البوت الرئيسي وتركز على تحليل عميق للسوق
 """
 import logging
-import threading
 import time
 from typing import List, Dict, Any, Tuple
 import os
 import json
 from datetime import datetime, timedelta
 
-from app.exchange_manager import get_klines, get_all_symbols_24h_data, get_current_price
+from app.exchange_manager import get_timeframes, get_all_symbols_24h_data, get_current_price
 from app.ai_model import predict_trend, predict_potential_profit, analyze_market_sentiment
 from app.utils import get_timestamp_str, load_json_data, save_json_data
 from app.candlestick_patterns import detect_candlestick_patterns, get_entry_signal
 from app.config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
+from app.concurrent_scan import scan_concurrently
 
 # إعداد التسجيل
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -22,10 +22,12 @@ logger = logging.getLogger(__name__)
 
 # متغيرات عالمية
 monitor_running = False
-monitor_thread = None
 market_opportunities = []  # فرص السوق المكتشفة
 daily_reports = []  # تقارير يومية لحركة الأسعار
 
+# اسم مهمة المراقبة في محرك التداول الموحد
+MONITOR_TASK = 'market_monitor.scan'
+
 # العملات ذات الأولوية العالية للمراقبة (تركيز على العملات الرئيسية والنشطة)
 HIGH_PRIORITY_COINS = [
     'DOGEUSDT',    # دوجكوين - التركيز الرئيسي
@@ -123,11 +125,14 @@ def analyze_price_action(symbol: str) -> Dict[str, Any]:
         '1h': {'limit': 24, 'description': 'طويل المدى'},   # آخر 24 ساعة
     }
     
+    # جميع الإطارات مشتقة من سلسلة أساسية واحدة (طلب واحد للمنصة بدلاً من طلب لكل إطار)
+    frames = get_timeframes(symbol, {tf: tf_info['limit'] for tf, tf_info in timeframes.items()})
+    
     # جمع بيانات جميع الإطارات الزمنية
     for tf, tf_info in timeframes.items():
         try:
-            tf_value = tf if tf != '1h' else '60m'  # تصحيح الفاصل الزمني لـ MEXC API
-            klines = get_klines(symbol, tf_value, tf_info['limit'])
+            # سلسلة عمودية واحدة تشاركها جميع دوال التحليل لهذا الإطار
+            klines = frames.get(tf)
             if not klines:
                 continue
                 
@@ -136,7 +141,7 @@ def analyze_price_action(symbol: str) -> Dict[str, Any]:
             potential_profit = predict_potential_profit(klines)
             
             # تحليل أنماط الشموع
-            patterns = detect_candlestick_patterns(klines)
+            patterns = detect_candlestick_patterns(klines, (symbol, tf))
             
             # تحليل الشعور العام للسوق
             sentiment = analyze_market_sentiment(klines)
@@ -212,10 +217,12 @@ def analyze_price_action(symbol: str) -> Dict[str, Any]:
     return results
 
 
-def scan_for_opportunities() -> List[MarketOpportunity]:
+def scan_for_opportunities(on_result=None) -> List[MarketOpportunity]:
     """
     فحص شامل للعملات الرئيسية والأكثر نشاطاً للعثور على فرص تداول مربحة
+    يتم تحليل العملات بالتوازي عبر مجموعة خيوط محدودة وضمن حد معدل الطلبات المشترك
     
+    :param on_result: دالة اختيارية تُستدعى مع (الرمز، الفرصة أو None) فور اكتمال تحليل كل عملة
     :return: قائمة بفرص التداول
     """
     opportunities = []
@@ -272,39 +279,42 @@ def scan_for_opportunities() -> List[MarketOpportunity]:
     
     logger.info(f"تحليل {len(symbols_to_analyze)} عملة بحثاً عن فرص تداول...")
     
-    # تحليل كل عملة بعمق
-    for symbol_tuple in symbols_to_analyze:
-        symbol = symbol_tuple[0]
-        symbol_info = symbol_tuple[1]
+    # تحليل العملات بالتوازي (النتائج تصل فور اكتمال كل عملة)
+    symbol_infos = dict(symbols_to_analyze)
+    
+    def analyze_symbol(symbol):
+        # تحليل شامل متعدد الإطارات الزمنية
+        analysis = analyze_price_action(symbol)
+        
+        # التحقق من ملاءمة العملة للتداول
+        if not analysis['summary'].get('suitable_for_trading', False):
+            return None
+        
+        # إنشاء فرصة جديدة
+        opportunity = MarketOpportunity(
+            symbol=symbol,
+            entry_price=analysis['price'],
+            potential_profit=analysis['summary']['weighted_profit'] * 100,  # تحويل إلى نسبة مئوية
+            confidence=analysis['summary']['confidence'],
+            reason=analysis['summary'].get('trading_reason', 'تحليل فني'),
+            timeframe=max(analysis['timeframes'].keys(), key=lambda k: analysis['timeframes'][k]['trend_strength'])
+        )
         
-        try:
-            # تحليل شامل متعدد الإطارات الزمنية
-            analysis = analyze_price_action(symbol)
-            
-            # التحقق من ملاءمة العملة للتداول
-            if analysis['summary'].get('suitable_for_trading', False):
-                # إنشاء فرصة جديدة
-                opportunity = MarketOpportunity(
-                    symbol=symbol,
-                    entry_price=analysis['price'],
-                    potential_profit=analysis['summary']['weighted_profit'] * 100,  # تحويل إلى نسبة مئوية
-                    confidence=analysis['summary']['confidence'],
-                    reason=analysis['summary'].get('trading_reason', 'تحليل فني'),
-                    timeframe=max(analysis['timeframes'].keys(), key=lambda k: analysis['timeframes'][k]['trend_strength'])
-                )
-                
-                # إضافة معلومات إضافية
-                opportunity.volume_24h = symbol_info['volume']
-                
-                # إضافة معلومات الأنماط من جميع الإطارات الزمنية
-                for tf, tf_data in analysis['timeframes'].items():
-                    if 'patterns' in tf_data and tf_data['patterns'].get('pattern_names'):
-                        opportunity.pattern_info[tf] = tf_data['patterns'].get('pattern_names', [])
-                
-                opportunities.append(opportunity)
-                logger.info(f"تم العثور على فرصة تداول لـ {symbol} - الربح المحتمل: {opportunity.potential_profit:.2f}%")
-        except Exception as e:
-            logger.error(f"خطأ في تحليل العملة {symbol}: {e}")
+        # إضافة معلومات إضافية
+        opportunity.volume_24h = symbol_infos[symbol]['volume']
+        
+        # إضافة معلومات الأنماط من جميع الإطارات الزمنية
+        for tf, tf_data in analysis['timeframes'].items():
+            if 'patterns' in tf_data and tf_data['patterns'].get('pattern_names'):
+                opportunity.pattern_info[tf] = tf_data['patterns'].get('pattern_names', [])
+        
+        return opportunity
+    
+    for symbol, opportunity in scan_concurrently(symbol_infos.keys(), analyze_symbol,
+                                                 label='scan_for_opportunities', on_result=on_result):
+        if opportunity:
+            opportunities.append(opportunity)
+            logger.info(f"تم العثور على فرصة تداول لـ {symbol} - الربح المحتمل: {opportunity.potential_profit:.2f}%")
     
     # ترتيب الفرص حسب الثقة والربح المحتمل
     sorted_opportunities = sorted(
@@ -494,43 +504,32 @@ def send_telegram_report(report: Dict[str, Any]):
         logger.error(f"خطأ في إرسال تقرير السوق عبر تيليجرام: {e}")
 
 
-def monitor_market(interval=1800):
+def monitor_market_cycle():
     """
-    مراقبة السوق بشكل مستمر والبحث عن فرص جديدة
-    
-    :param interval: الفاصل الزمني بين عمليات الفحص (بالثواني)
+    فحص واحد للسوق والبحث عن فرص جديدة (مهمة دورية في محرك التداول الموحد)
     """
-    global market_opportunities, monitor_running
+    global market_opportunities
     
-    while monitor_running:
-        try:
-            logger.info("بدء فحص السوق بحثاً عن فرص جديدة...")
-            
-            # البحث عن فرص جديدة
-            new_opportunities = scan_for_opportunities()
-            
-            # تحديث قائمة الفرص
-            market_opportunities = new_opportunities
-            
-            # حفظ الفرص
-            save_opportunities(market_opportunities)
-            
-            # توليد تقرير يومي إذا كان وقت التقرير (الساعة 8 مساءً)
-            now = datetime.now()
-            if now.hour == 20 and now.minute < 30:  # بين الساعة 8:00 و 8:30 مساءً
-                generate_daily_market_report()
-            
-            # فحص الفرص الحالية ومعرفة إذا تم تحقيقها
-            check_opportunity_status()
-            
-            logger.info(f"تم العثور على {len(market_opportunities)} فرصة تداول جديدة")
-            logger.info(f"انتظار {interval//60} دقيقة قبل الفحص التالي...")
-            
-            # انتظار الفاصل الزمني المحدد
-            time.sleep(interval)
-        except Exception as e:
-            logger.error(f"خطأ في مراقبة السوق: {e}")
-            time.sleep(300)  # انتظار 5 دقائق في حالة حدوث خطأ
+    logger.info("بدء فحص السوق بحثاً عن فرص جديدة...")
+    
+    # البحث عن فرص جديدة
+    new_opportunities = scan_for_opportunities()
+    
+    # تحديث قائمة الفرص
+    market_opportunities = new_opportunities
+    
+    # حفظ الفرص
+    save_opportunities(market_opportunities)
+    
+    # توليد تقرير يومي إذا كان وقت التقرير (الساعة 8 مساءً)
+    now = datetime.now()
+    if now.hour == 20 and now.minute < 30:  # بين الساعة 8:00 و 8:30 مساءً
+        generate_daily_market_report()
+    
+    # فحص الفرص الحالية ومعرفة إذا تم تحقيقها
+    check_opportunity_status()
+    
+    logger.info(f"تم العثور على {len(market_opportunities)} فرصة تداول جديدة")
 
 
 def check_opportunity_status():
@@ -588,11 +587,12 @@ def check_opportunity_status():
 
 def start_market_monitor(interval=1800):
     """
-    بدء مراقبة السوق في خيط منفصل
+    بدء مراقبة السوق كمهمة دورية في محرك التداول الموحد
     
     :param interval: الفاصل الزمني بين عمليات الفحص (بالثواني)
     """
-    global monitor_running, monitor_thread, market_opportunities
+    from app.engine import trading_engine
+    global monitor_running, market_opportunities
     
     if monitor_running:
         logger.warning("مراقبة السوق قيد التشغيل بالفعل")
@@ -601,10 +601,10 @@ def start_market_monitor(interval=1800):
     # تحميل الفرص السابقة
     market_opportunities = load_opportunities()
     
-    # بدء المراقبة
+    # بدء المراقبة (انتظار 5 دقائق بعد الفحص الفاشل)
     monitor_running = True
-    monitor_thread = threading.Thread(target=monitor_market, args=(interval,), daemon=True)
-    monitor_thread.start()
+    trading_engine.register(MONITOR_TASK, monitor_market_cycle, interval, error_interval=300,
+                            uses_prices=True, long_running=True)
     
     logger.info(f"تم بدء مراقبة السوق (الفاصل الزمني: {interval//60} دقيقة)")
     return True
@@ -616,7 +616,8 @@ def stop_market_monitor():
     
     :return: True إذا تم الإيقاف بنجاح
     """
-    global monitor_running, monitor_thread
+    from app.engine import trading_engine
+    global monitor_running
     
     if not monitor_running:
         logger.warning("مراقبة السوق متوقفة بالفعل")
@@ -624,10 +625,7 @@ def stop_market_monitor():
     
     # إيقاف المراقبة
     monitor_running = False
-    
-    # انتظار إنهاء الخيط
-    if monitor_thread:
-        monitor_thread.join(timeout=1.0)
+    trading_engine.unregister(MONITOR_TASK)
     
     logger.info("تم إيقاف مراقبة السوق")
     return True
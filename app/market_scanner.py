@@ -1,11 +1,21 @@
 import logging
 import time
-import threading
 from datetime import datetime
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app import indicators
+from app.concurrent_scan import scan_concurrently, get_scan_stats
+from app.levels import find_levels, level_index, nearest_below
+from app.ohlcv import as_ohlcv
 
 logger = logging.getLogger(__name__)
 
+try:
+    from app.config import ENGINE_SCAN_SHARE_SECONDS
+except (ImportError, AttributeError):
+    ENGINE_SCAN_SHARE_SECONDS = 120
+
 # مخزن مؤقت للبيانات
 symbols_cache = {}
 prices_cache = {}
@@ -14,20 +24,22 @@ patterns_cache = {}
 # حالة المسح
 SCANNER_STATE = {
     'running': False,
-    'thread': None,
     'last_scan': None,
     'opportunities': [],
     'watched_symbols': [],
-    'interval': 300  # فترة المسح الافتراضية بالثواني
+    'interval': 300,  # فترة المسح الافتراضية بالثواني
+    'last_scan_duration': None  # الزمن الفعلي لآخر عملية مسح بالثواني
 }
 
-def scan_market():
+def scan_market(on_result=None):
     """
     فحص السوق للبحث عن فرص تداول ممتازة باستخدام تحليل تقني متقدم
+    يتم تحليل العملات بالتوازي عبر مجموعة خيوط محدودة وضمن حد معدل الطلبات المشترك
     
+    :param on_result: دالة اختيارية تُستدعى مع (الرمز، الفرصة أو None) فور اكتمال تحليل كل عملة
     :return: قائمة الفرص المتاحة
     """
-    from app.exchange_manager import get_exchange_symbols, get_current_price, get_historical_klines
+    from app.exchange_manager import get_exchange_symbols
     from app.config import CACHE_EXPIRY
     
     # التحقق مما إذا كانت البيانات محفوظة مؤقتًا
@@ -56,9 +68,8 @@ def scan_market():
     
     # الحصول على معلومات حجم التداول لهذه العملات
     symbols_with_volume = []
-    for symbol in priority_symbols:
+    for symbol, ticker_info in scan_concurrently(priority_symbols, get_ticker_info, label='scan_market_volume'):
         try:
-            ticker_info = get_ticker_info(symbol)
             if ticker_info and 'volume' in ticker_info:
                 volume = float(ticker_info['volume']) * float(ticker_info['lastPrice'])
                 # تحديد حد أدنى لحجم التداول (بالدولار) - 500,000 دولار يومياً
@@ -89,141 +100,235 @@ def scan_market():
     
     opportunities = []
     
-    for symbol in filtered_symbols:
-        try:
-            # الحصول على السعر الحالي
-            current_price = get_current_price(symbol)
-            if not current_price:
-                continue
-            
-            # الحصول على البيانات التاريخية
-            klines = get_historical_klines(symbol, "15m", limit=50)
-            if not klines or len(klines) < 20:
-                continue
-            
-            # استخراج أسعار الإغلاق
-            close_prices = np.array([float(k[4]) for k in klines])
-            
-            # حساب المتوسطات المتحركة
-            ma7 = np.mean(close_prices[-7:])
-            ma25 = np.mean(close_prices[-25:])
-            
-            # حساب النطاقات (Bollinger Bands)
-            std20 = np.std(close_prices[-20:])
-            upper_band = ma25 + (std20 * 2)
-            lower_band = ma25 - (std20 * 2)
-            
-            # حساب مؤشر القوة النسبية (RSI)
-            delta = np.diff(close_prices)
-            gain = delta.copy()
-            loss = delta.copy()
-            gain[gain < 0] = 0
-            loss[loss > 0] = 0
-            loss = abs(loss)
-            
-            avg_gain = np.mean(gain[-14:]) if len(gain) >= 14 else 0
-            avg_loss = np.mean(loss[-14:]) if len(loss) >= 14 else 0
-            
-            rs = avg_gain / avg_loss if avg_loss != 0 else 0
-            rsi = 100 - (100 / (1 + rs))
-            
-            # تحليل الفرص باستخدام المؤشرات الفنية
-            potential_profit = 0
-            reason = ""
-            signals = 0
-            
-            # 1. تحقق من تقاطع المتوسطات (golden cross)
-            if close_prices[-2] < ma7 and close_prices[-1] >= ma7:
-                potential_profit += 0.01  # زيادة الربح المحتمل بنسبة 1%
-                signals += 1
-                reason += "تقاطع إيجابي للمتوسطات، "
-            
-            # 2. تحقق من مؤشر القوة النسبية (RSI)
-            if 30 <= rsi <= 40:  # منطقة ذروة البيع المتوسطة
-                potential_profit += 0.005
-                signals += 1
-                reason += "RSI في منطقة ذروة البيع، "
-            elif rsi < 30:  # منطقة ذروة البيع القوية
-                potential_profit += 0.01
-                signals += 1
-                reason += "RSI في منطقة ذروة البيع القوية، "
-            
-            # 3. تحقق من نطاقات بولينجر
-            if float(current_price) <= lower_band:
-                potential_profit += 0.015
-                signals += 1
-                reason += "السعر عند/أسفل النطاق السفلي لبولينجر، "
-            
-            # 4. تحقق من أنماط الشموع اليابانية
-            if detect_hammer_pattern(klines[-5:]):
-                potential_profit += 0.01
-                signals += 1
-                reason += "نمط المطرقة مكتشف، "
-            
-            # 5. تحقق من دعم/مقاومة
-            key_levels = find_support_resistance(close_prices)
-            nearest_support = find_nearest_level(float(current_price), key_levels['support'])
-            if nearest_support and (float(current_price) / nearest_support - 1) < 0.02:
-                potential_profit += 0.01
-                signals += 1
-                reason += "السعر قريب من مستوى دعم، "
-            
-            # تعديل الربح المحتمل بناءً على عدد الإشارات
-            if signals >= 3:
-                potential_profit *= 1.5  # تعزيز الفرص المؤكدة بعدة إشارات
-            
-            # تطبيق عامل احتمالية
-            confidence_factor = min(signals / 5.0, 1.0)  # الحد الأقصى 5 إشارات = 100% ثقة
-            
-            # التأكد من أن هناك إشارة واحدة على الأقل
-            if signals > 0:
-                # إزالة الفاصلة الأخيرة من الأسباب
-                if reason.endswith(", "):
-                    reason = reason[:-2]
-                
-                opportunities.append({
-                    'symbol': symbol,
-                    'current_price': current_price,
-                    'potential_profit': round(potential_profit, 4),
-                    'signals': signals,
-                    'confidence': round(confidence_factor, 2),
-                    'reason': reason
-                })
-        except Exception as e:
-            logger.error(f"خطأ في فحص {symbol}: {e}")
+    # تحليل العملات بالتوازي (النتائج تصل فور اكتمال كل عملة)
+    for symbol, opportunity in scan_concurrently(filtered_symbols, analyze_symbol_opportunity,
+                                                 label='scan_market', on_result=on_result):
+        if opportunity:
+            opportunities.append(opportunity)
+    
+    SCANNER_STATE['last_scan_duration'] = get_scan_stats('scan_market').get('duration')
     
     # ترتيب الفرص حسب الربح المحتمل
     opportunities = sorted(opportunities, key=lambda x: x['potential_profit'] * x['confidence'], reverse=True)
     
     return opportunities[:10]  # إرجاع أفضل 10 فرص
 
+def analyze_symbol_opportunity(symbol):
+    """
+    تحليل عملة واحدة بحثاً عن فرصة تداول (وحدة العمل في الفحص المتوازي)
+    
+    :param symbol: رمز العملة
+    :return: قاموس الفرصة أو None إذا لم تتوفر إشارات
+    """
+    from app.exchange_manager import get_current_price, get_ohlcv
+    
+    try:
+        # الحصول على السعر الحالي
+        current_price = get_current_price(symbol)
+        if not current_price:
+            return None
+        
+        # الحصول على البيانات التاريخية كسلسلة عمودية
+        klines = get_ohlcv(symbol, "15m", limit=50)
+        if len(klines) < 20:
+            return None
+        
+        # استخراج أسعار الإغلاق
+        close_prices = klines.close
+        
+        # تحديث المؤشرات تدريجياً (الشموع الجديدة فقط) من المحرك الموحد
+        snapshot = indicators.update_from_series(symbol, "15m", klines)
+        
+        # المتوسطات المتحركة
+        ma7 = snapshot['sma'][7]
+        ma25 = snapshot['sma'][25]
+        
+        # حساب النطاقات (Bollinger Bands)
+        std20 = snapshot['std'][20]
+        upper_band = ma25 + (std20 * 2)
+        lower_band = ma25 - (std20 * 2)
+        
+        # مؤشر القوة النسبية (RSI)
+        rsi = snapshot['rsi']
+        
+        # تحليل الفرص باستخدام المؤشرات الفنية
+        potential_profit = 0
+        reason = ""
+        signals = 0
+        
+        # 1. تحقق من تقاطع المتوسطات (golden cross)
+        if close_prices[-2] < ma7 and close_prices[-1] >= ma7:
+            potential_profit += 0.01  # زيادة الربح المحتمل بنسبة 1%
+            signals += 1
+            reason += "تقاطع إيجابي للمتوسطات، "
+        
+        # 2. تحقق من مؤشر القوة النسبية (RSI)
+        if 30 <= rsi <= 40:  # منطقة ذروة البيع المتوسطة
+            potential_profit += 0.005
+            signals += 1
+            reason += "RSI في منطقة ذروة البيع، "
+        elif rsi < 30:  # منطقة ذروة البيع القوية
+            potential_profit += 0.01
+            signals += 1
+            reason += "RSI في منطقة ذروة البيع القوية، "
+        
+        # 3. تحقق من نطاقات بولينجر
+        if float(current_price) <= lower_band:
+            potential_profit += 0.015
+            signals += 1
+            reason += "السعر عند/أسفل النطاق السفلي لبولينجر، "
+        
+        # 4. تحقق من أنماط الشموع اليابانية
+        if detect_hammer_pattern(klines[-5:]):
+            potential_profit += 0.01
+            signals += 1
+            reason += "نمط المطرقة مكتشف، "
+        
+        # 5. تحقق من دعم/مقاومة
+        key_levels = find_support_resistance(close_prices, key=(symbol, '15m'), times=klines.open_time)
+        nearest_support = find_nearest_level(float(current_price), key_levels['support'])
+        if nearest_support and (float(current_price) / nearest_support - 1) < 0.02:
+            potential_profit += 0.01
+            signals += 1
+            reason += "السعر قريب من مستوى دعم، "
+        
+        # تعديل الربح المحتمل بناءً على عدد الإشارات
+        if signals >= 3:
+            potential_profit *= 1.5  # تعزيز الفرص المؤكدة بعدة إشارات
+        
+        # تطبيق عامل احتمالية
+        confidence_factor = min(signals / 5.0, 1.0)  # الحد الأقصى 5 إشارات = 100% ثقة
+        
+        # التأكد من أن هناك إشارة واحدة على الأقل
+        if signals > 0:
+            # إزالة الفاصلة الأخيرة من الأسباب
+            if reason.endswith(", "):
+                reason = reason[:-2]
+        
+            return {
+                'symbol': symbol,
+                'current_price': current_price,
+                'potential_profit': round(potential_profit, 4),
+                'signals': signals,
+                'confidence': round(confidence_factor, 2),
+                'reason': reason
+            }
+    except Exception as e:
+        logger.error(f"خطأ في فحص {symbol}: {e}")
+    return None
+
+# عدد الشموع التي يحللها analyze_symbol_opportunity في كل فحص
+SCAN_WINDOW = 50
+
+def opportunity_arrays(klines, window=SCAN_WINDOW):
+    """
+    نسخة متجهة من analyze_symbol_opportunity على كامل السلسلة (للاختبار التاريخي)
+    قيمة الشمعة i تقابل فحص آخر window شمعة تنتهي عندها مع اعتبار سعر الإغلاق سعراً حالياً
+    
+    :param klines: سلسلة الشموع (OHLCVSeries أو قائمة)
+    :param window: عدد الشموع في كل فحص
+    :return: قاموس مصفوفات: signals, potential_profit, confidence, score
+    """
+    series = as_ohlcv(klines)
+    n = len(series)
+    close = series.close
+    ma7 = indicators.sma(close, 7)
+    ma25 = indicators.sma(close, 25)
+    std20 = indicators.rolling_std(close, 20)
+    rsi = indicators.rsi(close, 14)
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    
+    # 1. تقاطع المتوسطات
+    golden = (prev_close < ma7) & (close >= ma7)
+    # 2. RSI
+    rsi_mid = (rsi >= 30) & (rsi <= 40)
+    rsi_low = rsi < 30
+    # 3. النطاق السفلي لبولينجر
+    below_band = close <= ma25 - std20 * 2
+    # 4. نمط المطرقة على آخر 5 شموع
+    hammer = _hammer_pattern_array(series)
+    # 5. قرب مستوى دعم (قاع محلي ضمن نطاق find_support_resistance داخل نافذة الفحص)
+    near_support = _near_support_array(close, window)
+    
+    signals = (golden.astype(int) + rsi_mid + rsi_low + below_band + hammer + near_support)
+    potential = (golden * 0.01 + rsi_mid * 0.005 + rsi_low * 0.01 + below_band * 0.015
+                 + hammer * 0.01 + near_support * 0.01)
+    potential = np.where(signals >= 3, potential * 1.5, potential)
+    # الفحص الحي يتطلب نافذة كاملة من الشموع
+    signals[:min(window - 1, n)] = 0
+    potential = np.where(signals > 0, np.round(potential, 4), 0.0)
+    confidence = np.round(np.minimum(signals / 5.0, 1.0), 2)
+    return {
+        'signals': signals,
+        'potential_profit': potential,
+        'confidence': confidence,
+        'score': potential * confidence
+    }
+
+def _hammer_pattern_array(series):
+    """detect_hammer_pattern(klines[i-4:i+1]) لكل شمعة i"""
+    n = len(series)
+    out = np.zeros(n, dtype=bool)
+    if n < 5:
+        return out
+    o, h, l, c = series.open, series.high, series.low, series.close
+    total = h - l
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shape = ((total > 0) & ((np.minimum(o, c) - l) / total > 0.6) &
+                 (np.abs(o - c) / total < 0.3) & ((h - np.maximum(o, c)) / total < 0.1))
+    # ترند هابط: إغلاقات الشموع الثلاث الأولى من الخمس متناقصة تماماً
+    out[4:] = (c[:-4] > c[1:-3]) & (c[1:-3] > c[2:-2]) & shape[4:]
+    return out
+
+def _near_support_array(close, window=SCAN_WINDOW, pivot_window=20):
+    """
+    شرط "السعر قريب من مستوى دعم" لكل شمعة بنفس قواعد find_support_resistance و find_nearest_level:
+    القاع المحلي هو إغلاق لا يزيد عن pivot_window//2 إغلاقاً على كل جانب، ويُبحث عنه في المواضع
+    [pivot_window, window - pivot_window) من نافذة الفحص. القيعان داخل هذا المدى لا تختلف إلا إذا تساوت
+    لذلك لا يغيّر التجميع بنسبة 1% قيمة المستوى
+    """
+    n = len(close)
+    out = np.zeros(n, dtype=bool)
+    half = pivot_window // 2
+    span = window - 2 * pivot_window
+    if n < window or span <= 0:
+        return out
+    pivot = np.zeros(n, dtype=bool)
+    neighborhood = sliding_window_view(close, 2 * half + 1).min(axis=1)
+    pivot[half:n - half] = close[half:n - half] <= neighborhood
+    levels = np.where(pivot, close, -np.inf)
+    # مواضع القيعان المؤهلة للشمعة i: من i - window + 1 + pivot_window حتى i - pivot_window
+    candidates = sliding_window_view(levels, span).max(axis=1)
+    first = window - 1
+    level = candidates[first - (window - 1 - pivot_window):n - pivot_window - span + 1]
+    price = close[first:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[first:] = ((level > 0) & (level < price) & (np.abs(level / price - 1) <= 0.2) &
+                       (price / level - 1 < 0.02))
+    return out
+
 def detect_hammer_pattern(candles):
     """
     اكتشاف نمط المطرقة في الشموع اليابانية
     
-    :param candles: قائمة الشموع (OHLCV)
+    :param candles: سلسلة الشموع (OHLCVSeries أو قائمة قوائم OHLCV)
     :return: True إذا تم اكتشاف النمط، False خلاف ذلك
     """
-    if not candles or len(candles) < 3:
+    candles = as_ohlcv(candles)
+    if len(candles) < 3:
         return False
     
     # نمط المطرقة يظهر عادة في نهاية الترند الهابط
-    # التحقق من وجود ترند هابط
-    downtrend = True
-    for i in range(len(candles) - 3):
-        if float(candles[i][4]) <= float(candles[i+1][4]):  # مقارنة أسعار الإغلاق
-            downtrend = False
-            break
-    
-    if not downtrend:
+    # التحقق من وجود ترند هابط (أسعار إغلاق متناقصة تماماً)
+    closes = candles.close
+    if np.any(closes[:-3] <= closes[1:-2]):
         return False
     
     # التحقق من آخر شمعة للنمط
-    last_candle = candles[-1]
-    open_price = float(last_candle[1])
-    high_price = float(last_candle[2])
-    low_price = float(last_candle[3])
-    close_price = float(last_candle[4])
+    open_price = float(candles.open[-1])
+    high_price = float(candles.high[-1])
+    low_price = float(candles.low[-1])
+    close_price = float(closes[-1])
     
     body_size = abs(open_price - close_price)
     total_range = high_price - low_price
@@ -246,111 +351,79 @@ def detect_hammer_pattern(candles):
     
     return False
 
-def find_support_resistance(prices, window=20):
+def find_support_resistance(prices, window=20, key=None, times=None):
     """
     العثور على مستويات الدعم والمقاومة من بيانات الأسعار
     
     :param prices: مصفوفة الأسعار
     :param window: حجم النافذة للبحث عن القمم والقيعان
-    :return: قاموس يحتوي على قوائم مستويات الدعم والمقاومة
+    :param key: مفتاح السلسلة مثل (العملة، الإطار) لاستخدام الفهرس التدريجي level_index
+    :param times: أوقات افتتاح الشموع (مطلوبة مع key)
+    :return: قاموس يحتوي على قوائم مستويات الدعم والمقاومة (مرتبة تصاعدياً)
     """
-    supports = []
-    resistances = []
+    prices = np.asarray(prices, dtype=np.float64)
     
     # نحتاج إلى عدد كافٍ من النقاط للتحليل
     if len(prices) < window * 2:
-        return {'support': supports, 'resistance': resistances}
-    
-    # البحث عن القمم والقيعان المحلية
-    for i in range(window, len(prices) - window):
-        # التحقق من القاع المحتمل (دعم)
-        if all(prices[i] <= prices[i-j] for j in range(1, window//2+1)) and \
-           all(prices[i] <= prices[i+j] for j in range(1, window//2+1)):
-            supports.append(prices[i])
-        
-        # التحقق من القمة المحتملة (مقاومة)
-        if all(prices[i] >= prices[i-j] for j in range(1, window//2+1)) and \
-           all(prices[i] >= prices[i+j] for j in range(1, window//2+1)):
-            resistances.append(prices[i])
-    
-    # إضافة السعر الحالي
-    current_price = prices[-1]
-    
-    # فلترة المستويات لإزالة المتكررة
-    filtered_supports = []
-    filtered_resistances = []
-    
-    # التجميع بناءً على التقارب
-    threshold = 0.01  # 1% تقارب
-    
-    for level in supports:
-        # تخطي المستويات البعيدة جداً من السعر الحالي
-        if abs(level / current_price - 1) > 0.2:  # 20% بعيد عن السعر الحالي
-            continue
-        
-        # البحث عن مستويات قريبة
-        found_similar = False
-        for i, existing in enumerate(filtered_supports):
-            if abs(level / existing - 1) < threshold:
-                # تحديث المستوى بالمتوسط
-                filtered_supports[i] = (existing + level) / 2
-                found_similar = True
-                break
-        
-        if not found_similar:
-            filtered_supports.append(level)
-    
-    for level in resistances:
-        # تخطي المستويات البعيدة جداً من السعر الحالي
-        if abs(level / current_price - 1) > 0.2:  # 20% بعيد عن السعر الحالي
-            continue
-        
-        # البحث عن مستويات قريبة
-        found_similar = False
-        for i, existing in enumerate(filtered_resistances):
-            if abs(level / existing - 1) < threshold:
-                # تحديث المستوى بالمتوسط
-                filtered_resistances[i] = (existing + level) / 2
-                found_similar = True
-                break
-        
-        if not found_similar:
-            filtered_resistances.append(level)
-    
-    # ترتيب المستويات
-    filtered_supports.sort()
-    filtered_resistances.sort()
+        return {'support': [], 'resistance': []}
     
-    return {'support': filtered_supports, 'resistance': filtered_resistances}
+    # القمم والقيعان المحلية (window//2 سعراً على كل جانب) في المواضع [window, len - window)،
+    # مع استبعاد المستويات الأبعد من 20% عن السعر الحالي ودمج المتقاربة بنسبة 1%
+    if key is not None and times is not None and window // 2 == level_index.half_window:
+        levels = level_index.levels(key, times, prices, prices, margin=window,
+                                    reference=float(prices[-1]), max_distance=0.2)
+    else:
+        levels = find_levels(prices, prices, window // 2, 0.01, start=window, stop=len(prices) - window,
+                             reference=float(prices[-1]), max_distance=0.2)
+    return levels.to_dict()
 
 def find_nearest_level(price, levels):
     """
-    العثور على أقرب مستوى دعم/مقاومة للسعر الحالي
+    العثور على أقرب مستوى دعم تحت السعر الحالي (بحث ثنائي)
     
     :param price: السعر الحالي
-    :param levels: قائمة المستويات
-    :return: أقرب مستوى أو None إذا كانت القائمة فارغة
+    :param levels: قائمة المستويات مرتبة تصاعدياً (كما يعيدها find_support_resistance)
+    :return: أعلى مستوى تحت السعر الحالي أو None
     """
     if not levels:
         return None
+    return nearest_below(levels, price)
+
+
+# اسم مهمة المسح في محرك التداول الموحد
+SCANNER_TASK = 'market_scanner.scan'
+
+def scanner_cycle():
+    """
+    عملية مسح واحدة وتحديث حالة الماسح (مهمة دورية في محرك التداول الموحد)
+    نتيجة المسح مشتركة مع دورة التداول في trading_bot إذا كانت حديثة
+    """
+    from app.engine import trading_engine
     
-    # التركيز على المستويات تحت السعر الحالي (للدعم)
-    below_levels = [level for level in levels if level < price]
+    # تنفيذ عملية المسح
+    opportunities = trading_engine.shared('market_scan', scan_market, max_age=ENGINE_SCAN_SHARE_SECONDS)
     
-    if not below_levels:
-        return None
+    # تحديث الفرص المتاحة
+    SCANNER_STATE['opportunities'] = opportunities
     
-    # إرجاع أعلى مستوى تحت السعر الحالي
-    return max(below_levels)
-
+    # تحديث وقت آخر مسح
+    SCANNER_STATE['last_scan'] = datetime.now()
+    
+    # تحديث العملات المراقبة
+    if opportunities:
+        watched = [opp['symbol'] for opp in opportunities]
+        SCANNER_STATE['watched_symbols'] = watched
+    
+    logger.info(f"تم العثور على {len(opportunities)} فرصة في عملية المسح الحالية")
 
 def start_market_scanner(interval=300):
     """
-    بدء تشغيل مسح السوق الدوري
+    بدء تشغيل مسح السوق الدوري (كمهمة في محرك التداول الموحد)
     
     :param interval: الفاصل الزمني بين عمليات المسح (بالثواني)
     :return: True إذا تم البدء بنجاح، False خلاف ذلك
     """
+    from app.engine import trading_engine
     global SCANNER_STATE
     
     # التحقق مما إذا كان المسح قيد التشغيل بالفعل
@@ -364,36 +437,8 @@ def start_market_scanner(interval=300):
     # تحديث حالة التشغيل
     SCANNER_STATE['running'] = True
     
-    # بدء خيط جديد لمسح السوق
-    def scanner_thread():
-        logger.info(f"بدء تشغيل مسح السوق كل {interval} ثانية")
-        
-        while SCANNER_STATE['running']:
-            try:
-                # تنفيذ عملية المسح
-                opportunities = scan_market()
-                
-                # تحديث الفرص المتاحة
-                SCANNER_STATE['opportunities'] = opportunities
-                
-                # تحديث وقت آخر مسح
-                SCANNER_STATE['last_scan'] = datetime.now()
-                
-                # تحديث العملات المراقبة
-                if opportunities:
-                    watched = [opp['symbol'] for opp in opportunities]
-                    SCANNER_STATE['watched_symbols'] = watched
-                
-                logger.info(f"تم العثور على {len(opportunities)} فرصة في عملية المسح الحالية")
-            except Exception as e:
-                logger.error(f"خطأ أثناء مسح السوق: {e}")
-            
-            # انتظار الفاصل الزمني المحدد
-            time.sleep(interval)
-    
-    # تشغيل الخيط
-    SCANNER_STATE['thread'] = threading.Thread(target=scanner_thread, daemon=True)
-    SCANNER_STATE['thread'].start()
+    logger.info(f"بدء تشغيل مسح السوق كل {interval} ثانية")
+    trading_engine.register(SCANNER_TASK, scanner_cycle, interval, uses_prices=True, long_running=True)
     
     logger.info("تم بدء تشغيل مسح السوق بنجاح")
     return True
@@ -404,6 +449,7 @@ def stop_market_scanner():
     
     :return: True إذا تم الإيقاف بنجاح، False خلاف ذلك
     """
+    from app.engine import trading_engine
     global SCANNER_STATE
     
     # التحقق مما إذا كان المسح قيد التشغيل
@@ -411,16 +457,9 @@ def stop_market_scanner():
         logger.info("مسح السوق متوقف بالفعل")
         return True
     
-    # تحديث حالة التشغيل
+    # تحديث حالة التشغيل وإزالة المهمة من المحرك
     SCANNER_STATE['running'] = False
-    
-    # إذا كان هناك خيط تشغيل، انتظر انتهائه
-    if SCANNER_STATE['thread'] and SCANNER_STATE['thread'].is_alive():
-        # مهلة الانتظار (5 ثواني كحد أقصى)
-        SCANNER_STATE['thread'].join(5)
-    
-    # إعادة تعيين حالة الخيط
-    SCANNER_STATE['thread'] = None
+    trading_engine.unregister(SCANNER_TASK)
     
     logger.info("تم إيقاف مسح السوق بنجاح")
     return True
@@ -473,7 +512,7 @@ def get_symbol_analysis(symbol):
     :return: تحليل العملة
     """
     # الحصول على البيانات التاريخية
-    from app.exchange_manager import get_historical_klines, get_current_price
+    from app.exchange_manager import get_ohlcv, get_current_price
     
     # التحقق من وجود العملة
     current_price = get_current_price(symbol)
@@ -481,49 +520,43 @@ def get_symbol_analysis(symbol):
         return {"error": f"لم يتم العثور على عملة بالرمز {symbol}"}
     
     # الحصول على البيانات التاريخية
-    klines_15m = get_historical_klines(symbol, "15m", limit=50)
-    klines_1h = get_historical_klines(symbol, "1h", limit=24)
-    klines_4h = get_historical_klines(symbol, "4h", limit=30)
+    klines_15m = get_ohlcv(symbol, "15m", limit=50)
+    klines_1h = get_ohlcv(symbol, "1h", limit=24)
+    klines_4h = get_ohlcv(symbol, "4h", limit=30)
     
     if not klines_15m or not klines_1h or not klines_4h:
         return {"error": f"لا توجد بيانات تاريخية كافية للعملة {symbol}"}
     
     # استخراج أسعار الإغلاق
-    close_prices_15m = np.array([float(k[4]) for k in klines_15m])
-    close_prices_1h = np.array([float(k[4]) for k in klines_1h])
-    close_prices_4h = np.array([float(k[4]) for k in klines_4h])
+    close_prices_15m = klines_15m.close
+    close_prices_1h = klines_1h.close
+    close_prices_4h = klines_4h.close
+    
+    # تحديث المؤشرات لكل إطار زمني من المحرك الموحد
+    snapshot_15m = indicators.update_from_series(symbol, "15m", klines_15m)
+    snapshot_1h = indicators.update_from_series(symbol, "1h", klines_1h)
+    snapshot_4h = indicators.update_from_series(symbol, "4h", klines_4h)
     
-    # حساب المتوسطات المتحركة
-    ma7_15m = np.mean(close_prices_15m[-7:])
-    ma25_15m = np.mean(close_prices_15m[-25:])
+    # المتوسطات المتحركة
+    ma7_15m = snapshot_15m['sma'][7]
+    ma25_15m = snapshot_15m['sma'][25]
     
-    ma7_1h = np.mean(close_prices_1h[-7:])
-    ma25_1h = np.mean(close_prices_1h[-25:])
+    ma7_1h = snapshot_1h['sma'][7]
+    ma25_1h = snapshot_1h['sma'][25]
     
-    ma7_4h = np.mean(close_prices_4h[-7:])
-    ma25_4h = np.mean(close_prices_4h[-25:])
+    ma7_4h = snapshot_4h['sma'][7]
+    ma25_4h = snapshot_4h['sma'][25]
     
     # حساب النطاقات (Bollinger Bands)
-    std20_15m = np.std(close_prices_15m[-20:])
+    std20_15m = snapshot_15m['std'][20]
     upper_band_15m = ma25_15m + (std20_15m * 2)
     lower_band_15m = ma25_15m - (std20_15m * 2)
     
-    # حساب مؤشر القوة النسبية (RSI)
-    delta_15m = np.diff(close_prices_15m)
-    gain_15m = delta_15m.copy()
-    loss_15m = delta_15m.copy()
-    gain_15m[gain_15m < 0] = 0
-    loss_15m[loss_15m > 0] = 0
-    loss_15m = abs(loss_15m)
-    
-    avg_gain_15m = np.mean(gain_15m[-14:]) if len(gain_15m) >= 14 else 0
-    avg_loss_15m = np.mean(loss_15m[-14:]) if len(loss_15m) >= 14 else 0
-    
-    rs_15m = avg_gain_15m / avg_loss_15m if avg_loss_15m != 0 else 0
-    rsi_15m = 100 - (100 / (1 + rs_15m))
+    # مؤشر القوة النسبية (RSI)
+    rsi_15m = snapshot_15m['rsi']
     
     # تحديد مستويات الدعم والمقاومة
-    support_resistance = find_support_resistance(close_prices_15m)
+    support_resistance = find_support_resistance(close_prices_15m, key=(symbol, '15m'), times=klines_15m.open_time)
     
     # تحديد الاتجاه العام
     trend = "غير محدد"
@@ -4,15 +4,18 @@ import time
 import hashlib
 import hmac
 import logging
-import importlib
-import sys
 import threading
 from datetime import datetime, timedelta
+from urllib.parse import urlencode
 from functools import wraps
 from typing import Dict, List, Optional, Union, Any, Tuple
 
-# إعدادات API MEXC
-BASE_URL = "https://api.mexc.com"
+# إعدادات API MEXC (MEXC_BASE_URL يسمح بالتوجيه إلى المحاكي المحلي)
+try:
+    from app.config import MEXC_BASE_URL as BASE_URL
+except (ImportError, AttributeError):
+    BASE_URL = "https://api.mexc.com"
+BASE_URL = BASE_URL.rstrip('/')
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('mexc_api')
 
@@ -71,6 +74,57 @@ try:
 except (ImportError, AttributeError):
     cache = MexcCache(expiry_seconds=600)  # القيمة الافتراضية: 10 دقائق
 
+# المخزن المحلي الدائم للشموع (تعبئة تدريجية بدلاً من إعادة التحميل الكامل)
+from app.kline_store import kline_store, INTERVAL_MS
+from app.ohlcv import OHLCVSeries
+try:
+    from app.config import KLINE_STORE_ENABLED
+except (ImportError, AttributeError):
+    KLINE_STORE_ENABLED = True
+
+# اشتقاق الإطارات غير المدعومة في MEXC (2h، 6h، 1w...) محلياً من سلسلة أساسية
+from app.timeframes import timeframe_aggregator, is_derived
+try:
+    from app.config import TIMEFRAME_AGGREGATION_ENABLED
+except (ImportError, AttributeError):
+    TIMEFRAME_AGGREGATION_ENABLED = True
+
+# جلسة HTTP مشتركة مع تجميع الاتصالات (keep-alive) ومهلة لكل نقطة نهاية
+from app import http_client
+
+# مزود المفاتيح (يعيد تحميل الإعدادات فقط عند تغيّر مصدرها)
+from app.credentials import get_credentials
+
+# فهرس مرشحات الرموز (الخطوة، الحد الأدنى، الدقة) المحفوظ على القرص
+from app.symbol_index import symbol_index
+
+# لقطة أسعار جميع الرموز (طلب واحد يخدم جميع استعلامات السعر في الدورة)
+from app.price_snapshot import price_snapshot
+
+# تغذية بيانات السوق اللحظية (WebSocket) - تُستخدم أولاً إذا كانت تعمل
+from app.market_feed import market_feed
+
+# محدد المعدل المشترك لجميع الخيوط (يمنع تجاوز API_RATE_LIMIT عند الفحص المتوازي)
+from app.rate_limiter import api_limiter, retry_after_seconds
+
+def public_get(url, params=None, timeout=None):
+    """
+    طلب GET عام إلى MEXC عبر محدد المعدل المشترك
+    يسجل استجابات 429 في المحدد ليتم إيقاف جميع الخيوط مؤقتاً
+    
+    :param url: عنوان الطلب
+    :param params: معلمات الطلب
+    :param timeout: مهلة الطلب بالثواني
+    :return: كائن الاستجابة
+    """
+    api_limiter.acquire()
+    response = http_client.get(url, params=params, timeout=timeout)
+    if response.status_code == 429:
+        api_limiter.report_throttled(retry_after_seconds(response))
+    else:
+        api_limiter.report_success()
+    return response
+
 # مزين (decorator) للتخزين المؤقت
 def cached(key_prefix, expiry=None):
     """مزين للتخزين المؤقت لعمليات API"""
@@ -97,18 +151,14 @@ def cached(key_prefix, expiry=None):
         return wrapper
     return decorator
 
-# دالة لإعادة تحميل وحدة التكوين للحصول على أحدث المفاتيح
+# دالة للحصول على أحدث المفاتيح (من مزود الإعدادات بدون إعادة تنفيذ ملف الإعدادات)
 def reload_config() -> Tuple[str, str]:
-    # إعادة تحميل وحدة التكوين
-    try:
-        if 'app.config' in sys.modules:
-            importlib.reload(sys.modules['app.config'])
-        from app.config import API_KEY, API_SECRET
-        return API_KEY, API_SECRET
-    except Exception as e:
-        logger.error(f"Failed to reload config: {e}")
-        from app.config import API_KEY, API_SECRET
-        return API_KEY, API_SECRET
+    """
+    مفاتيح API الحالية - يُعاد تحميل الإعدادات فقط عند تغيّر ملف config.py أو متغيرات البيئة
+    
+    :return: (API_KEY, API_SECRET)
+    """
+    return get_credentials()
 
 # دالة لحساب التوقيع (Signature) للطلب وفقًا لمواصفات MEXC
 def sign_request(params):
@@ -117,7 +167,7 @@ def sign_request(params):
     https://mexcdevelop.github.io/apidocs/spot_v3_en/#signed-endpoint-security
     """
     api_key, api_secret = reload_config()
-    logger.info(f"Signing request with API_KEY starting with: {api_key[:3] if api_key and len(api_key) > 3 else 'NONE'}...")
+    logger.debug(f"Signing request with API_KEY starting with: {api_key[:3] if api_key and len(api_key) > 3 else 'NONE'}...")
     
     if not api_secret:
         logger.error("API_SECRET is empty or invalid")
@@ -135,7 +185,6 @@ def sign_request(params):
             params_copy[key] = str(value)
     
     # استخدام urlencode - بدون ترتيب إضافي
-    from urllib.parse import urlencode
     query_string = urlencode(params_copy)
     
     logger.debug(f"Query string for signing: {query_string}")
@@ -156,7 +205,7 @@ def get_server_time():
     """جلب الوقت الرسمي للسيرفر"""
     try:
         url = f"{BASE_URL}/api/v3/time"
-        response = requests.get(url)
+        response = http_client.get(url)
         if response.status_code != 200:
             logger.error(f"Server time request failed: {response.text}")
             return None
@@ -179,19 +228,35 @@ API_UNSUPPORTED_SYMBOLS = [
     'SNTUSDT',      # عملة لا تدعم API
 ]
 
-# دالة للحصول على سعر العملة (مع تخزين مؤقت)
-@cached("price", expiry=60)  # تخزين السعر لمدة 60 ثانية
+# دالة للحصول على سعر العملة (من لقطة الأسعار المجمّعة)
 def get_current_price(symbol):
-    """جلب سعر العملة الحالية (مثال: BTCUSDT) مع تخزين مؤقت"""
+    """
+    جلب سعر العملة الحالية (مثال: BTCUSDT)
+    يُقرأ السعر من تغذية WebSocket اللحظية إن كانت حديثة، وإلا من لقطة أسعار جميع الرموز
+    (طلب واحد لكل دورة)، مع طلب منفصل فقط إذا لم يكن الرمز ضمن اللقطة
+    """
     # التحقق أولاً ما إذا كانت العملة غير مدعومة من API
     if symbol in API_UNSUPPORTED_SYMBOLS:
         logger.warning(f"العملة {symbol} لا تدعم API، تجاهل الطلب")
         return None
-        
+    
+    # السعر اللحظي من تغذية WebSocket إذا كان حديثاً
+    price = market_feed.get_price(symbol)
+    if price is not None:
+        return price
+    
+    price = price_snapshot.get_price(symbol)
+    if price is not None:
+        return price
+    return fetch_symbol_price(symbol)
+
+@cached("price", expiry=60)  # تخزين السعر لمدة 60 ثانية
+def fetch_symbol_price(symbol):
+    """جلب سعر عملة واحدة مباشرة من المنصة (مع تخزين مؤقت)"""
     try:
         url = f"{BASE_URL}/api/v3/ticker/price"
         params = {"symbol": symbol}
-        response = requests.get(url, params=params)
+        response = public_get(url, params=params)
         if response.status_code != 200:
             logger.error(f"Price request failed for {symbol}: {response.text}")
             return None
@@ -201,6 +266,24 @@ def get_current_price(symbol):
         logger.error(f"Error getting price for {symbol}: {e}")
         return None
 
+def fetch_all_prices():
+    """
+    جلب أسعار جميع الرموز بطلب واحد (تستخدمه لقطة الأسعار)
+    
+    :return: قائمة [{'symbol': ..., 'price': ...}] أو None في حالة الفشل
+    """
+    try:
+        url = f"{BASE_URL}/api/v3/ticker/price"
+        response = public_get(url)
+        if response.status_code != 200:
+            logger.error(f"All prices request failed: {response.text}")
+            return None
+        data = response.json()
+        return data if isinstance(data, list) else None
+    except Exception as e:
+        logger.error(f"Error getting all prices: {e}")
+        return None
+
 # دالة للحصول على معلومات التداول الحالية (مع تخزين مؤقت)
 @cached("ticker", expiry=60)  # تخزين معلومات التداول لمدة 60 ثانية
 def get_ticker_info(symbol):
@@ -218,7 +301,7 @@ def get_ticker_info(symbol):
     try:
         url = f"{BASE_URL}/api/v3/ticker/24hr"
         params = {"symbol": symbol}
-        response = requests.get(url, params=params)
+        response = public_get(url, params=params)
         if response.status_code != 200:
             logger.error(f"Ticker request failed for {symbol}: {response.text}")
             return None
@@ -242,12 +325,16 @@ def get_klines(symbol, interval='15m', limit=100):
     if symbol in API_UNSUPPORTED_SYMBOLS:
         logger.warning(f"العملة {symbol} لا تدعم API، تجاهل طلب بيانات الشموع")
         return []
+    # الفواصل غير المدعومة تُجمّع محلياً بقيم صحيحة بدلاً من استبدالها بأقرب فاصل مدعوم
+    if TIMEFRAME_AGGREGATION_ENABLED and is_derived(interval):
+        return timeframe_aggregator.get_klines(symbol, interval, limit)
     try:
         # التحقق من صحة الفاصل الزمني - فواصل MEXC المدعومة حسب التوثيق المحدث
         # https://mexcdevelop.github.io/apidocs/spot_v3_en/#kline-candlestick-data
         valid_intervals = ['1m', '5m', '15m', '30m', '60m', '4h', '1d', '1M']
         
         # قاموس لتحويل الفواصل الزمنية الشائعة إلى الفواصل المدعومة في MEXC
+        # (استبدال الفواصل غير المدعومة بأقرب بديل يحدث فقط عند تعطيل TIMEFRAME_AGGREGATION_ENABLED)
         interval_mapping = {
             '1m': '1m',
             '3m': '5m',    # أقرب بديل مدعوم
@@ -271,6 +358,15 @@ def get_klines(symbol, interval='15m', limit=100):
         if interval != corrected_interval:
             logger.info(f"تم تصحيح الفاصل الزمني من {interval} إلى {corrected_interval} (MEXC API)")
         
+        # إذا كانت السلسلة محفوظة محلياً، نجلب فقط الشموع الأحدث من آخر شمعة مخزنة
+        if KLINE_STORE_ENABLED:
+            try:
+                if not kline_store.needs_full_fetch(symbol, corrected_interval, limit):
+                    if fetch_new_klines(symbol, corrected_interval) is not None:
+                        return kline_store.get_recent(symbol, corrected_interval, limit)
+            except Exception as e:
+                logger.warning(f"تعذر استخدام المخزن المحلي للشموع لـ {symbol}: {e}")
+        
         # آلية إعادة المحاولة مع التأخير التدريجي
         max_retries = 3
         retry_delay = 1  # ثانية
@@ -288,13 +384,13 @@ def get_klines(symbol, interval='15m', limit=100):
                 }
                 
                 logger.debug(f"طلب بيانات الشموع لـ {symbol} بفاصل زمني {corrected_interval} وحد {limit}")
-                response = requests.get(url, params=params, timeout=5)  # خفض timeout لتجنب الانتظار الطويل
+                response = public_get(url, params=params, timeout=5)  # خفض timeout لتجنب الانتظار الطويل
                 
                 if response.status_code == 200:
                     break  # نجحت المحاولة، الخروج من الحلقة
                 elif response.status_code == 429:  # تجاوز حد الطلبات
+                    # التأخير التصاعدي يطبقه محدد المعدل المشترك على جميع الخيوط
                     logger.warning(f"تجاوز حد الطلبات (429) للعملة {symbol}، محاولة {retry+1}/{max_retries}")
-                    time.sleep(retry_delay * (2 ** retry))  # تأخير تصاعدي
                     continue
                 elif 'Invalid interval' in response.text:
                     # محاولة باستخدام فاصل زمني مختلف
@@ -303,7 +399,7 @@ def get_klines(symbol, interval='15m', limit=100):
                         if fallback != corrected_interval:
                             logger.info(f"محاولة باستخدام فاصل زمني بديل: {fallback} لـ {symbol}")
                             params["interval"] = fallback
-                            response = requests.get(url, params=params, timeout=5)
+                            response = public_get(url, params=params, timeout=5)
                             if response.status_code == 200:
                                 logger.info(f"نجحت المحاولة باستخدام {fallback} لـ {symbol}")
                                 break
@@ -312,7 +408,7 @@ def get_klines(symbol, interval='15m', limit=100):
                         # محاولة باستخدام طريقة بديلة - /market/kline بدلاً من /api/v3/klines
                         alt_url = f"{BASE_URL}/api/v3/market/kline"
                         logger.info(f"محاولة استخدام واجهة بديلة: {alt_url} للعملة {symbol}")
-                        alt_response = requests.get(alt_url, params=params, timeout=5)
+                        alt_response = public_get(alt_url, params=params, timeout=5)
                         if alt_response.status_code == 200:
                             response = alt_response
                             break
@@ -352,22 +448,15 @@ def get_klines(symbol, interval='15m', limit=100):
             return []
             
         try:
-            klines = response.json()
-            formatted_klines = []
-            for k in klines:
+            formatted_klines = format_klines(response.json())
+            
+            # حفظ الشموع في المخزن المحلي لتصبح الطلبات التالية تدريجية
+            # (فقط عند نجاح الفاصل المطلوب نفسه وليس فاصلاً بديلاً)
+            if KLINE_STORE_ENABLED and formatted_klines and params.get("interval") == corrected_interval:
                 try:
-                    formatted_klines.append({
-                        'open_time': k[0],
-                        'open': float(k[1]),
-                        'high': float(k[2]),
-                        'low': float(k[3]),
-                        'close': float(k[4]),
-                        'volume': float(k[5]),
-                        'close_time': k[6]
-                    })
-                except (IndexError, ValueError) as e:
-                    logger.warning(f"تنسيق خاطئ للشمعة: {k}, خطأ: {e}")
-                    continue
+                    kline_store.append(symbol, corrected_interval, formatted_klines)
+                except Exception as e:
+                    logger.warning(f"تعذر حفظ الشموع في المخزن المحلي لـ {symbol}: {e}")
                     
             return formatted_klines
         except Exception as e:
@@ -377,6 +466,111 @@ def get_klines(symbol, interval='15m', limit=100):
         logger.error(f"Error getting klines for {symbol}: {e}")
         return []
 
+# دالة للحصول على بيانات الشموع كسلسلة عمودية OHLCVSeries (مع تخزين مؤقت)
+@cached("ohlcv", expiry=300)  # نفس مدة تخزين الشموع
+def get_ohlcv(symbol, interval='15m', limit=100):
+    """
+    جلب بيانات الشموع كسلسلة عمودية OHLCVSeries يتم تحليلها مرة واحدة
+    ومشاركتها بين جميع دوال التحليل
+    
+    :param symbol: رمز العملة (مثل BTCUSDT)
+    :param interval: الفاصل الزمني للشموع
+    :param limit: عدد الشموع
+    :return: سلسلة OHLCVSeries (فارغة في حالة الفشل)
+    """
+    if TIMEFRAME_AGGREGATION_ENABLED and is_derived(interval) and symbol not in API_UNSUPPORTED_SYMBOLS:
+        return timeframe_aggregator.get_ohlcv(symbol, interval, limit)
+    return OHLCVSeries.from_dicts(get_klines(symbol, interval, limit))
+
+def format_klines(klines):
+    """
+    تحويل استجابة الشموع الخام من MEXC إلى قائمة قواميس
+    
+    :param klines: قائمة الشموع الخام [open_time, open, high, low, close, volume, close_time, ...]
+    :return: قائمة قواميس الشموع
+    """
+    formatted_klines = []
+    for k in klines:
+        try:
+            formatted_klines.append({
+                'open_time': k[0],
+                'open': float(k[1]),
+                'high': float(k[2]),
+                'low': float(k[3]),
+                'close': float(k[4]),
+                'volume': float(k[5]),
+                'close_time': k[6]
+            })
+        except (IndexError, ValueError) as e:
+            logger.warning(f"تنسيق خاطئ للشمعة: {k}, خطأ: {e}")
+            continue
+    return formatted_klines
+
+def fetch_new_klines(symbol, interval):
+    """
+    جلب الشموع الأحدث فقط منذ آخر شمعة مخزنة محلياً وإضافتها إلى المخزن
+    تتم إعادة جلب الشمعة الأخيرة لأنها قد تكون ما زالت مفتوحة
+    
+    :param symbol: رمز العملة
+    :param interval: الفاصل الزمني (بتنسيق MEXC)
+    :return: عدد الشموع المضافة أو None في حالة الفشل
+    """
+    last_open_time = kline_store.get_last_open_time(symbol, interval)
+    if last_open_time is None:
+        return None
+    try:
+        url = f"{BASE_URL}/api/v3/klines"
+        params = {
+            "symbol": symbol,
+            "interval": interval,
+            "startTime": str(last_open_time),
+            "limit": "1000"
+        }
+        response = public_get(url, params=params, timeout=5)
+        if response.status_code != 200:
+            logger.warning(f"فشل الجلب التدريجي للشموع لـ {symbol} ({interval}): {response.status_code}")
+            return None
+        new_klines = format_klines(response.json())
+        added = kline_store.append(symbol, interval, new_klines)
+        logger.debug(f"تم جلب {added} شمعة جديدة لـ {symbol} ({interval}) من المخزن التدريجي")
+        return added
+    except Exception as e:
+        logger.warning(f"خطأ في الجلب التدريجي للشموع لـ {symbol}: {e}")
+        return None
+
+def fetch_older_klines(symbol, interval, end_time, limit=1000):
+    """
+    جلب دفعة من الشموع الأقدم من أقدم شمعة مخزنة محلياً وإضافتها إلى المخزن
+    (لاستكمال عمق السلسلة الأساسية عندما يتجاوز حد الطلب الواحد)
+    
+    :param symbol: رمز العملة
+    :param interval: الفاصل الزمني (بتنسيق MEXC)
+    :param end_time: آخر وقت افتتاح مطلوب بالمللي ثانية
+    :param limit: عدد الشموع (الحد الأقصى 1000)
+    :return: عدد الشموع المضافة أو None في حالة الفشل
+    """
+    step = INTERVAL_MS.get(interval)
+    if not step:
+        return None
+    try:
+        url = f"{BASE_URL}/api/v3/klines"
+        params = {
+            "symbol": symbol,
+            "interval": interval,
+            "startTime": str(end_time - limit * step + 1),
+            "endTime": str(end_time),
+            "limit": str(limit)
+        }
+        response = public_get(url, params=params, timeout=5)
+        if response.status_code != 200:
+            logger.warning(f"فشل جلب الشموع الأقدم لـ {symbol} ({interval}): {response.status_code}")
+            return None
+        older_klines = [k for k in format_klines(response.json()) if k['open_time'] <= end_time]
+        return kline_store.append(symbol, interval, older_klines)
+    except Exception as e:
+        logger.warning(f"خطأ في جلب الشموع الأقدم لـ {symbol}: {e}")
+        return None
+
 # دالة لتنفيذ أمر شراء أو بيع
 def place_order(symbol, side, quantity, price=None, order_type="MARKET"):
     """تنفيذ أمر شراء أو بيع"""
@@ -403,39 +597,19 @@ def place_order(symbol, side, quantity, price=None, order_type="MARKET"):
         path = "/api/v3/order"
         timestamp = get_timestamp()
         
-        # التحقق من معلومات السوق للعملة
-        exchange_info = get_exchange_info()
-        symbol_info = None
-        
-        # البحث عن معلومات العملة في بيانات السوق
-        if exchange_info and 'symbols' in exchange_info:
-            for info in exchange_info['symbols']:
-                if info.get('symbol') == symbol:
-                    symbol_info = info
-                    break
+        # التحقق من معلومات السوق للعملة من الفهرس المحلي (O(1) بدون تنزيل exchangeInfo)
+        symbol_filters = symbol_index.get(symbol)
         
         # تعيين دقة الكمية استنادًا إلى معلومات العملة
         quantity_precision = 4  # القيمة الافتراضية
         min_quantity = 0.0001  # الحد الأدنى الافتراضي
         
-        if symbol_info:
-            # استخراج دقة الكمية من معلومات العملة
-            if 'filters' in symbol_info:
-                for filter_item in symbol_info['filters']:
-                    if filter_item.get('filterType') == 'LOT_SIZE':
-                        step_size = filter_item.get('stepSize', '0.0001')
-                        min_qty = filter_item.get('minQty', '0.0001')
-                        
-                        # حساب دقة الكمية من stepSize
-                        if float(step_size) < 1:
-                            step_str = str(step_size).rstrip('0').rstrip('.')
-                            decimal_places = len(step_str) - step_str.find('.') - 1
-                            quantity_precision = decimal_places
-                        
-                        # تعيين الحد الأدنى للكمية
-                        min_quantity = float(min_qty)
-                        logger.info(f"Symbol {symbol} info - stepSize: {step_size}, minQty: {min_qty}, precision: {quantity_precision}")
-                        break
+        if symbol_filters:
+            if symbol_filters.get('quantity_precision') is not None:
+                quantity_precision = symbol_filters['quantity_precision']
+            if symbol_filters.get('min_qty'):
+                min_quantity = symbol_filters['min_qty']
+            logger.info(f"Symbol {symbol} info - stepSize: {symbol_filters.get('step_size')}, minQty: {min_quantity}, precision: {quantity_precision}")
         
         # التأكد من أن الكمية رقم وليست نص
         if isinstance(quantity, str):
@@ -605,7 +779,7 @@ def place_order(symbol, side, quantity, price=None, order_type="MARKET"):
 
         params["signature"] = sign_request(params)
 
-        response = requests.post(
+        response = http_client.post(
             f"{BASE_URL}{path}", 
             headers={"X-MEXC-APIKEY": api_key},
             params=params
@@ -674,7 +848,7 @@ def get_open_orders(symbol=None):
         logger.debug(f"Request params: {params}")
         
         # تنفيذ الطلب
-        response = requests.get(url, params=params, headers=headers)
+        response = http_client.get(url, params=params, headers=headers)
         
         # التحقق من نجاح الطلب
         if response.status_code != 200:
@@ -744,7 +918,7 @@ def get_recent_trades():
             logger.debug(f"Request params: {params}")
             
             # تنفيذ الطلب
-            response = requests.get(url, params=params, headers=headers)
+            response = http_client.get(url, params=params, headers=headers)
             
             # التحقق من نجاح الطلب
             if response.status_code != 200:
@@ -819,7 +993,7 @@ def get_account_balance():
         logger.debug(f"Request params: {params}")
         
         # تنفيذ الطلب
-        response = requests.get(url, params=params, headers=headers)
+        response = http_client.get(url, params=params, headers=headers)
         
         # التحقق من نجاح الطلب
         if response.status_code != 200:
@@ -957,7 +1131,7 @@ def get_total_balance(asset):
         
         # إرسال الطلب
         headers = {"X-MEXC-APIKEY": api_key}
-        response = requests.get(url, params=params, headers=headers)
+        response = http_client.get(url, params=params, headers=headers)
         
         if response.status_code != 200:
             logger.error(f"Total balance request failed with status code: {response.status_code}")
@@ -1005,7 +1179,7 @@ def get_funding_balance(asset):
         
         # إرسال الطلب
         headers = {"X-MEXC-APIKEY": api_key}
-        response = requests.get(url, params=params, headers=headers)
+        response = http_client.get(url, params=params, headers=headers)
         
         if response.status_code != 200:
             logger.error(f"Funding balance request failed with status code: {response.status_code}")
@@ -1066,7 +1240,7 @@ def try_alternative_funding_method(api_key, api_secret, asset):
         
         # إرسال الطلب
         headers = {"X-MEXC-APIKEY": api_key}
-        response = requests.get(url, params=params, headers=headers)
+        response = http_client.get(url, params=params, headers=headers)
         
         if response.status_code == 200:
             data = response.json()
@@ -1092,7 +1266,7 @@ def try_alternative_funding_method(api_key, api_secret, asset):
         params['signature'] = signature
         
         # إرسال الطلب
-        response = requests.get(url, params=params, headers=headers)
+        response = http_client.get(url, params=params, headers=headers)
         
         if response.status_code == 200:
             data = response.json()
@@ -1121,7 +1295,7 @@ def try_alternative_funding_method(api_key, api_secret, asset):
             params['signature'] = signature
             
             # إرسال الطلب
-            response = requests.get(url, params=params, headers=headers)
+            response = http_client.get(url, params=params, headers=headers)
             
             if response.status_code == 200:
                 data = response.json()
@@ -1151,7 +1325,7 @@ def try_alternative_funding_method(api_key, api_secret, asset):
             params['signature'] = signature
             
             # إرسال الطلب
-            response = requests.get(url, params=params, headers=headers)
+            response = http_client.get(url, params=params, headers=headers)
             
             if response.status_code == 200:
                 data = response.json()
@@ -1223,7 +1397,7 @@ def test_api_permissions():
         params["signature"] = sign_request(params)
         
         # إرسال الطلب
-        response = requests.get(
+        response = http_client.get(
             f"{BASE_URL}{path}", 
             headers={"X-MEXC-APIKEY": api_key},
             params=params
@@ -1274,7 +1448,7 @@ def get_user_asset(asset):
         
         # إرسال الطلب كـ POST وفقًا لتوثيق MEXC
         headers = {"X-MEXC-APIKEY": api_key}
-        response = requests.post(url, params=params, headers=headers)
+        response = http_client.post(url, params=params, headers=headers)
         
         if response.status_code != 200:
             logger.error(f"User asset request failed with status code: {response.status_code}")
@@ -1341,7 +1515,7 @@ def get_trades_history(symbol, limit=100):
         logger.debug(f"Request headers: {{'X-MEXC-APIKEY': '{api_key[:5]}...'}}") 
         logger.debug(f"Full URL with params: {url}?{urlencode(params)}")
         
-        response = requests.get(url, params=params, headers=headers)
+        response = http_client.get(url, params=params, headers=headers)
         
         # سجل المعلومات الكاملة عن الاستجابة في حالة الخطأ
         if response.status_code != 200:
@@ -1410,7 +1584,7 @@ def cancel_order(symbol, order_id):
         logger.debug(f"Request headers: {{'X-MEXC-APIKEY': '{api_key[:5]}...'}}") 
         logger.debug(f"Full URL with params: {url}?{urlencode(params)}")
         
-        response = requests.delete(url, params=params, headers=headers)
+        response = http_client.delete(url, params=params, headers=headers)
         
         # سجل المعلومات الكاملة عن الاستجابة في حالة الخطأ
         if response.status_code != 200:
@@ -1473,7 +1647,7 @@ def get_order_status(symbol, order_id):
         logger.debug(f"Request headers: {{'X-MEXC-APIKEY': '{api_key[:5]}...'}}") 
         logger.debug(f"Full URL with params: {url}?{urlencode(params)}")
         
-        response = requests.get(url, params=params, headers=headers)
+        response = http_client.get(url, params=params, headers=headers)
         
         # سجل المعلومات الكاملة عن الاستجابة في حالة الخطأ
         if response.status_code != 200:
@@ -1495,9 +1669,13 @@ def get_order_status(symbol, order_id):
 @cached("exchange_info", expiry=3600)  # تخزين معلومات السوق لمدة ساعة
 def get_exchange_info():
     """جلب معلومات عن جميع الرموز المتاحة للتداول"""
+    return fetch_exchange_info()
+
+def fetch_exchange_info():
+    """تنزيل exchangeInfo مباشرة من المنصة (بدون تخزين مؤقت - يستخدمه فهرس الرموز)"""
     try:
         url = f"{BASE_URL}/api/v3/exchangeInfo"
-        response = requests.get(url)
+        response = http_client.get(url)
         if response.status_code != 200:
             logger.error(f"Exchange info request failed: {response.text}")
             return None
@@ -1519,19 +1697,11 @@ def get_all_symbols(market_type='SPOT'):
     try:
         if market_type == 'SPOT':
             # السوق الفوري
-            exchange_info = get_exchange_info()
-            if not exchange_info:
-                return []
-                
-            symbols = []
-            for symbol_info in exchange_info.get('symbols', []):
-                if symbol_info.get('status') == 'TRADING' and symbol_info.get('quoteAsset') == 'USDT':
-                    symbols.append(symbol_info.get('symbol'))
-            return symbols
+            return symbol_index.trading_symbols('USDT')
         elif market_type == 'FUTURES':
             # العقود الفورية
             futures_url = "https://contract.mexc.com/api/v1/contract/detail"
-            response = requests.get(futures_url)
+            response = http_client.get(futures_url)
             if response.status_code != 200:
                 logger.error(f"Failed to get futures symbols: {response.text}")
                 return []
@@ -1551,7 +1721,7 @@ def get_all_symbols_24h_data():
     """جلب بيانات 24 ساعة لجميع العملات"""
     try:
         url = f"{BASE_URL}/api/v3/ticker/24hr"
-        response = requests.get(url)
+        response = public_get(url)
         if response.status_code != 200:
             logger.error(f"24h data request failed: {response.text}")
             return []
@@ -1582,7 +1752,7 @@ def fetch_recent_trades(symbol, limit=10):
             'symbol': symbol,
             'limit': limit
         }
-        response = requests.get(url, params=params)
+        response = http_client.get(url, params=params)
         
         if response.status_code == 200:
             return response.json()
@@ -0,0 +1,631 @@
+"""
+محاكي محلي لواجهة MEXC REST لاختبارات التكامل والحمل بدون مفاتيح حقيقية
+يغطي: time, ticker/price, ticker/24hr, klines, exchangeInfo, order (إنشاء/استعلام/إلغاء),
+openOrders, myTrades, account
+مع تأخير قابل للضبط، حقن أخطاء 429، ومسارات أسعار قابلة لإعادة التشغيل بشكل حتمي.
+
+الاستخدام:
+    python -m app.mexc_simulator --port 8900 --latency-ms 50 --throttle-rate 0.05
+    MEXC_BASE_URL=http://127.0.0.1:8900 python main_full.py
+
+أو من الشيفرة:
+    server = start_simulator(port=0)
+    use_simulator(server.url)
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import math
+import random
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlencode
+
+from flask import Flask, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+# مدد الفواصل الزمنية للشموع بالمللي ثانية (نفس الفواصل المدعومة في MEXC)
+INTERVAL_MS = {
+    '1m': 60_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000, '60m': 3_600_000,
+    '1h': 3_600_000, '4h': 14_400_000, '1d': 86_400_000, '1W': 604_800_000, '1M': 2_592_000_000
+}
+
+DEFAULT_SYMBOLS = {
+    'BTCUSDT': 65000.0, 'ETHUSDT': 3200.0, 'BNBUSDT': 580.0, 'SOLUSDT': 150.0,
+    'XRPUSDT': 0.55, 'DOGEUSDT': 0.15, 'ADAUSDT': 0.45, 'LTCUSDT': 80.0
+}
+
+# نقاط النهاية التي تتطلب توقيعاً
+SIGNED_PATHS = ('/api/v3/order', '/api/v3/openOrders', '/api/v3/myTrades', '/api/v3/account')
+
+
+def generate_path(start: float, steps: int, volatility: float = 0.002, seed: int = 0) -> List[float]:
+    """
+    مسار أسعار حتمي (سير عشوائي هندسي ببذرة ثابتة)
+
+    :param start: السعر الابتدائي
+    :param steps: عدد النقاط
+    :param volatility: الانحراف المعياري للعائد في كل خطوة
+    :param seed: البذرة (نفس البذرة = نفس المسار)
+    """
+    rng = random.Random(seed)
+    prices = [start]
+    for _ in range(steps - 1):
+        prices.append(prices[-1] * math.exp(rng.gauss(0, volatility)))
+    return prices
+
+
+class PricePath:
+    """
+    مسار أسعار قابل لإعادة التشغيل لرمز واحد
+    step_seconds=None: يتقدم المسار فقط عند tick() (حتمي تماماً)
+    step_seconds>0: يتقدم مع الوقت منذ البدء (مناسب لاختبارات الحمل)
+    """
+
+    def __init__(self, prices: List[float], step_seconds: Optional[float] = None, loop: bool = True):
+        if not prices:
+            raise ValueError("مسار الأسعار فارغ")
+        self.prices = [float(p) for p in prices]
+        self.step_seconds = step_seconds
+        self.loop = loop
+        self.index = 0
+        self.started = time.time()
+
+    def _position(self) -> int:
+        if self.step_seconds:
+            position = int((time.time() - self.started) / self.step_seconds)
+        else:
+            position = self.index
+        if self.loop:
+            return position % len(self.prices)
+        return min(position, len(self.prices) - 1)
+
+    def current(self) -> float:
+        return self.prices[self._position()]
+
+    def history(self, count: int) -> List[float]:
+        """آخر count سعر حتى الموضع الحالي (يُكمَّل بأول سعر إذا لم يكفِ المسار)"""
+        position = self._position()
+        start = position - count + 1
+        return [self.prices[max(i, 0)] for i in range(start, position + 1)]
+
+    def tick(self, steps: int = 1):
+        self.index += steps
+
+    def reset(self):
+        self.index = 0
+        self.started = time.time()
+
+
+class SimulatedExchange:
+    """حالة المنصة المحاكاة: الأسعار والأرصدة والأوامر والصفقات"""
+
+    def __init__(self, symbols: Optional[Dict[str, float]] = None, seed: int = 0,
+                 balances: Optional[Dict[str, float]] = None, path_length: int = 10_000,
+                 step_seconds: Optional[float] = None, api_secret: Optional[str] = None):
+        """
+        :param symbols: الرموز وأسعارها الابتدائية
+        :param seed: بذرة المسارات والتأخير وحقن الأخطاء
+        :param balances: الأرصدة الابتدائية
+        :param path_length: طول المسار المولد لكل رمز
+        :param step_seconds: تقدم المسارات مع الوقت (None = يدوي عبر tick)
+        :param api_secret: إذا حُدد يتم التحقق من توقيع الطلبات الموقعة
+        """
+        self.seed = seed
+        self.api_secret = api_secret
+        self.lock = threading.RLock()
+        self.initial_balances = dict(balances or {'USDT': 1000.0})
+        self.paths: Dict[str, PricePath] = {}
+        for i, (symbol, price) in enumerate((symbols or DEFAULT_SYMBOLS).items()):
+            self.paths[symbol] = PricePath(generate_path(price, path_length, seed=seed + i), step_seconds)
+        # إعدادات الأعطال
+        self.latency_ms = 0.0
+        self.jitter_ms = 0.0
+        self.throttle_rate = 0.0
+        self.throttle_every = 0
+        self.max_rps = 0
+        self.retry_after = 1
+        self.fill_delay = 0.0
+        self._rng = random.Random(seed)
+        self.reset()
+
+    # ---------- الإعداد ----------
+
+    def reset(self):
+        """إعادة الأرصدة والأوامر والإحصاءات والمسارات إلى البداية"""
+        with self.lock:
+            self.balances = {asset: {'free': amount, 'locked': 0.0} for asset, amount in self.initial_balances.items()}
+            self.orders: Dict[int, Dict[str, Any]] = {}
+            self.trades: List[Dict[str, Any]] = []
+            self.next_order_id = 1
+            self.next_trade_id = 1
+            self.stats = {'requests': 0, 'throttled': 0, 'orders': 0, 'by_path': {}}
+            self._window = (0, 0)
+            self._rng = random.Random(self.seed)
+            for path in self.paths.values():
+                path.reset()
+
+    def configure(self, **options):
+        """
+        تعديل إعدادات المحاكاة: latency_ms, jitter_ms, throttle_rate, throttle_every,
+        max_rps, retry_after, fill_delay
+        """
+        with self.lock:
+            for key, value in options.items():
+                if hasattr(self, key) and key in ('latency_ms', 'jitter_ms', 'throttle_rate', 'throttle_every',
+                                                  'max_rps', 'retry_after', 'fill_delay'):
+                    setattr(self, key, type(getattr(self, key))(value))
+
+    def load_paths(self, paths: Dict[str, List[float]], step_seconds: Optional[float] = None):
+        """تحميل مسارات أسعار محددة (مثلاً من بيانات تاريخية مسجلة) لإعادة تشغيلها"""
+        with self.lock:
+            for symbol, prices in paths.items():
+                self.paths[symbol] = PricePath(prices, step_seconds)
+
+    def tick(self, steps: int = 1):
+        """تقديم جميع المسارات وتنفيذ الأوامر المحددة التي عبرها السعر"""
+        with self.lock:
+            for path in self.paths.values():
+                path.tick(steps)
+            self._match_limit_orders()
+
+    def price(self, symbol: str) -> Optional[float]:
+        path = self.paths.get(symbol)
+        return path.current() if path else None
+
+    # ---------- الأعطال والتأخير ----------
+
+    def before_request(self, path: str) -> Optional[int]:
+        """
+        تسجيل الطلب وتطبيق التأخير وحقن 429
+
+        :return: ثواني Retry-After إذا تم رفض الطلب، وإلا None
+        """
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['by_path'][path] = self.stats['by_path'].get(path, 0) + 1
+            delay = (self.latency_ms + self._rng.uniform(0, self.jitter_ms)) / 1000
+            throttled = False
+            if self.throttle_every and self.stats['requests'] % self.throttle_every == 0:
+                throttled = True
+            elif self.throttle_rate and self._rng.random() < self.throttle_rate:
+                throttled = True
+            if self.max_rps:
+                second = int(time.time())
+                window_second, count = self._window
+                count = count + 1 if window_second == second else 1
+                self._window = (second, count)
+                if count > self.max_rps:
+                    throttled = True
+            if throttled:
+                self.stats['throttled'] += 1
+        if delay > 0:
+            time.sleep(delay)
+        return self.retry_after if throttled else None
+
+    def verify_signature(self, args: Iterable) -> bool:
+        """التحقق من التوقيع بنفس طريقة sign_request (urlencode للمعاملات بترتيبها عدا signature)"""
+        if not self.api_secret:
+            return True
+        params = [(k, v) for k, v in args if k != 'signature']
+        signature = dict(args).get('signature', '')
+        expected = hmac.new(self.api_secret.encode('utf-8'), urlencode(params).encode('utf-8'),
+                            hashlib.sha256).hexdigest()
+        return hmac.compare_digest(signature, expected)
+
+    # ---------- بيانات السوق ----------
+
+    def ticker_24h(self, symbol: str) -> Dict[str, Any]:
+        path = self.paths[symbol]
+        history = path.history(1440)
+        last, open_price = history[-1], history[0]
+        change = last - open_price
+        volume = 1_000_000 / max(last, 1e-9) * (1 + random.Random(f"{self.seed}:{symbol}").random())
+        now = int(time.time() * 1000)
+        return {
+            'symbol': symbol,
+            'priceChange': f"{change:.8f}",
+            'priceChangePercent': f"{change / open_price:.6f}" if open_price else "0",
+            'prevClosePrice': f"{open_price:.8f}",
+            'lastPrice': f"{last:.8f}",
+            'bidPrice': f"{last * 0.9999:.8f}",
+            'askPrice': f"{last * 1.0001:.8f}",
+            'openPrice': f"{open_price:.8f}",
+            'highPrice': f"{max(history):.8f}",
+            'lowPrice': f"{min(history):.8f}",
+            'volume': f"{volume:.4f}",
+            'quoteVolume': f"{volume * last:.4f}",
+            'openTime': now - 86_400_000,
+            'closeTime': now,
+            'count': None
+        }
+
+    def klines(self, symbol: str, interval: str, limit: int = 500,
+               end_time: Optional[int] = None) -> List[List[Any]]:
+        """
+        شموع حتمية مشتقة من مسار الأسعار: كل شمعة تنتهي بنقطة من المسار
+        (الفتح = إغلاق الشمعة السابقة، القمة/القاع بضوضاء ثابتة البذرة)
+        """
+        step = INTERVAL_MS.get(interval, 60_000)
+        closes = self.paths[symbol].history(limit + 1)
+        now = end_time or int(time.time() * 1000)
+        last_open = now - now % step
+        rows = []
+        for i in range(1, len(closes)):
+            open_price, close = closes[i - 1], closes[i]
+            # بذرة نصية (hash() للنصوص عشوائي بين العمليات)
+            rng = random.Random(f"{self.seed}:{symbol}:{interval}:{i}")
+            high = max(open_price, close) * (1 + rng.uniform(0, 0.002))
+            low = min(open_price, close) * (1 - rng.uniform(0, 0.002))
+            volume = rng.uniform(10, 1000)
+            open_time = last_open - (len(closes) - 1 - i) * step
+            rows.append([open_time, f"{open_price:.8f}", f"{high:.8f}", f"{low:.8f}", f"{close:.8f}",
+                         f"{volume:.4f}", open_time + step - 1, f"{volume * close:.4f}"])
+        return rows
+
+    def exchange_info(self) -> Dict[str, Any]:
+        symbols = []
+        for symbol, path in self.paths.items():
+            base = symbol[:-4] if symbol.endswith('USDT') else symbol
+            price = path.prices[0]
+            quantity_precision = 6 if price > 100 else (2 if price > 1 else 0)
+            symbols.append({
+                'symbol': symbol,
+                'status': '1',
+                'baseAsset': base,
+                'quoteAsset': 'USDT',
+                'baseAssetPrecision': quantity_precision,
+                'quotePrecision': 8,
+                'quoteAssetPrecision': 8,
+                'baseSizePrecision': f"{10 ** -quantity_precision:.{quantity_precision}f}" if quantity_precision else "1",
+                'quoteAmountPrecision': '1',
+                'isSpotTradingAllowed': True,
+                'orderTypes': ['LIMIT', 'MARKET'],
+                'filters': []
+            })
+        return {'timezone': 'CST', 'serverTime': int(time.time() * 1000), 'symbols': symbols}
+
+    # ---------- الأوامر والحساب ----------
+
+    def _balance(self, asset: str) -> Dict[str, float]:
+        return self.balances.setdefault(asset, {'free': 0.0, 'locked': 0.0})
+
+    def _fill(self, order: Dict[str, Any], price: float):
+        symbol = order['symbol']
+        base = symbol[:-4]
+        qty = float(order['origQty'])
+        quote = qty * price
+        if order['side'] == 'BUY':
+            self._balance('USDT')['locked'] -= order['reserved']
+            self._balance('USDT')['free'] += order['reserved'] - quote
+            self._balance(base)['free'] += qty
+        else:
+            self._balance(base)['locked'] -= qty
+            self._balance('USDT')['free'] += quote
+        now = int(time.time() * 1000)
+        order.update({'status': 'FILLED', 'executedQty': f"{qty}", 'cummulativeQuoteQty': f"{quote:.8f}",
+                      'updateTime': now})
+        self.trades.append({
+            'symbol': symbol, 'id': self.next_trade_id, 'orderId': order['orderId'],
+            'price': f"{price:.8f}", 'qty': f"{qty}", 'quoteQty': f"{quote:.8f}",
+            'commission': '0', 'commissionAsset': 'USDT', 'time': now,
+            'isBuyer': order['side'] == 'BUY', 'isMaker': order['type'] == 'LIMIT', 'isBestMatch': True
+        })
+        self.next_trade_id += 1
+
+    def _match_limit_orders(self):
+        for order in self.orders.values():
+            if order['status'] != 'NEW':
+                continue
+            price = self.price(order['symbol'])
+            if order['type'] == 'MARKET':
+                if time.time() >= order['fill_at']:
+                    self._fill(order, price)
+            elif (order['side'] == 'BUY' and price <= float(order['price'])) or \
+                    (order['side'] == 'SELL' and price >= float(order['price'])):
+                self._fill(order, float(order['price']))
+
+    def place_order(self, params: Dict[str, str]) -> (Dict[str, Any], int):
+        """إنشاء أمر: MARKET يُنفّذ فوراً (أو بعد fill_delay)، LIMIT ينتظر عبور السعر"""
+        symbol = params.get('symbol')
+        side = params.get('side')
+        order_type = params.get('type', 'MARKET')
+        with self.lock:
+            price = self.price(symbol)
+            if price is None:
+                return {'code': -1121, 'msg': 'Invalid symbol.'}, 400
+            try:
+                qty = float(params.get('quantity', 0))
+            except ValueError:
+                qty = 0
+            if qty <= 0 or side not in ('BUY', 'SELL'):
+                return {'code': 700002, 'msg': 'Invalid parameter'}, 400
+            limit_price = float(params['price']) if order_type == 'LIMIT' and params.get('price') else price
+            base = symbol[:-4]
+            if side == 'BUY':
+                reserved = qty * max(limit_price, price) * 1.01
+                usdt = self._balance('USDT')
+                if usdt['free'] < qty * limit_price:
+                    return {'code': 30004, 'msg': 'Insufficient position'}, 400
+                reserved = min(reserved, usdt['free'])
+                usdt['free'] -= reserved
+                usdt['locked'] += reserved
+            else:
+                reserved = 0.0
+                coin = self._balance(base)
+                if coin['free'] < qty:
+                    return {'code': 30004, 'msg': 'Insufficient position'}, 400
+                coin['free'] -= qty
+                coin['locked'] += qty
+            now = int(time.time() * 1000)
+            order = {
+                'symbol': symbol, 'orderId': str(self.next_order_id), 'orderListId': -1,
+                'price': f"{limit_price:.8f}", 'origQty': f"{qty}", 'executedQty': '0',
+                'cummulativeQuoteQty': '0', 'status': 'NEW', 'timeInForce': params.get('timeInForce', 'GTC'),
+                'type': order_type, 'side': side, 'time': now, 'updateTime': now,
+                'reserved': reserved, 'fill_at': time.time() + self.fill_delay
+            }
+            self.next_order_id += 1
+            self.orders[int(order['orderId'])] = order
+            self.stats['orders'] += 1
+            if order_type == 'MARKET' and self.fill_delay <= 0:
+                self._fill(order, price)
+            return {'symbol': symbol, 'orderId': order['orderId'], 'orderListId': -1, 'price': order['price'],
+                    'origQty': order['origQty'], 'type': order_type, 'side': side, 'transactTime': now}, 200
+
+    def public_order(self, order: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in order.items() if k not in ('reserved', 'fill_at')}
+
+    def get_order(self, order_id: Any) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            self._match_limit_orders()
+            try:
+                order = self.orders.get(int(order_id))
+            except (TypeError, ValueError):
+                return None
+            return self.public_order(order) if order else None
+
+    def cancel_order(self, order_id: Any) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            try:
+                order = self.orders.get(int(order_id))
+            except (TypeError, ValueError):
+                return None
+            if order is None or order['status'] != 'NEW':
+                return None
+            base = order['symbol'][:-4]
+            if order['side'] == 'BUY':
+                usdt = self._balance('USDT')
+                usdt['locked'] -= order['reserved']
+                usdt['free'] += order['reserved']
+            else:
+                coin = self._balance(base)
+                coin['locked'] -= float(order['origQty'])
+                coin['free'] += float(order['origQty'])
+            order['status'] = 'CANCELED'
+            order['updateTime'] = int(time.time() * 1000)
+            return self.public_order(order)
+
+    def open_orders(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self.lock:
+            self._match_limit_orders()
+            return [self.public_order(o) for o in self.orders.values()
+                    if o['status'] == 'NEW' and (not symbol or o['symbol'] == symbol)]
+
+    def my_trades(self, symbol: str, limit: int = 100) -> List[Dict[str, Any]]:
+        with self.lock:
+            self._match_limit_orders()
+            return [t for t in self.trades if t['symbol'] == symbol][-limit:]
+
+    def account(self) -> Dict[str, Any]:
+        with self.lock:
+            self._match_limit_orders()
+            return {
+                'canTrade': True, 'canWithdraw': True, 'canDeposit': True, 'accountType': 'SPOT',
+                'permissions': ['SPOT'],
+                'balances': [{'asset': a, 'free': f"{b['free']:.8f}", 'locked': f"{b['locked']:.8f}"}
+                             for a, b in self.balances.items()]
+            }
+
+
+def create_app(exchange: SimulatedExchange) -> Flask:
+    """تطبيق Flask يعرض نقاط نهاية MEXC فوق حالة المنصة المحاكاة"""
+    app = Flask(__name__)
+
+    def error(code: int, msg: str, status: int = 400):
+        return jsonify({'code': code, 'msg': msg}), status
+
+    @app.before_request
+    def apply_faults():
+        if request.path.startswith('/sim/'):
+            return None
+        retry_after = exchange.before_request(request.path)
+        if retry_after is not None:
+            response = jsonify({'code': 429, 'msg': 'Too Many Requests'})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+        if request.path in SIGNED_PATHS:
+            if not request.headers.get('X-MEXC-APIKEY'):
+                return error(400, 'Api key info invalid')
+            if not exchange.verify_signature(list(request.args.items(multi=True))):
+                return error(700002, 'Signature for this request is not valid.')
+        return None
+
+    @app.route('/api/v3/ping')
+    def ping():
+        return jsonify({})
+
+    @app.route('/api/v3/time')
+    def server_time():
+        return jsonify({'serverTime': int(time.time() * 1000)})
+
+    @app.route('/api/v3/ticker/price')
+    def ticker_price():
+        symbol = request.args.get('symbol')
+        if symbol:
+            price = exchange.price(symbol)
+            if price is None:
+                return error(-1121, 'Invalid symbol.')
+            return jsonify({'symbol': symbol, 'price': f"{price:.8f}"})
+        return jsonify([{'symbol': s, 'price': f"{p.current():.8f}"} for s, p in exchange.paths.items()])
+
+    @app.route('/api/v3/ticker/24hr')
+    def ticker_24hr():
+        symbol = request.args.get('symbol')
+        if symbol:
+            if symbol not in exchange.paths:
+                return error(-1121, 'Invalid symbol.')
+            return jsonify(exchange.ticker_24h(symbol))
+        return jsonify([exchange.ticker_24h(s) for s in exchange.paths])
+
+    @app.route('/api/v3/klines')
+    def klines():
+        symbol = request.args.get('symbol')
+        if symbol not in exchange.paths:
+            return error(-1121, 'Invalid symbol.')
+        limit = min(int(request.args.get('limit', 500)), 1000)
+        end_time = request.args.get('endTime')
+        return jsonify(exchange.klines(symbol, request.args.get('interval', '1m'), limit,
+                                       int(end_time) if end_time else None))
+
+    @app.route('/api/v3/exchangeInfo')
+    def exchange_info():
+        return jsonify(exchange.exchange_info())
+
+    @app.route('/api/v3/order', methods=['POST'])
+    def new_order():
+        body, status = exchange.place_order(request.args.to_dict())
+        return jsonify(body), status
+
+    @app.route('/api/v3/order', methods=['GET'])
+    def query_order():
+        order = exchange.get_order(request.args.get('orderId'))
+        if order is None:
+            return error(-2013, 'Order does not exist.')
+        return jsonify(order)
+
+    @app.route('/api/v3/order', methods=['DELETE'])
+    def cancel_order():
+        order = exchange.cancel_order(request.args.get('orderId'))
+        if order is None:
+            return error(-2011, 'Unknown order sent.')
+        return jsonify(order)
+
+    @app.route('/api/v3/openOrders')
+    def open_orders():
+        return jsonify(exchange.open_orders(request.args.get('symbol')))
+
+    @app.route('/api/v3/myTrades')
+    def my_trades():
+        return jsonify(exchange.my_trades(request.args.get('symbol'), int(request.args.get('limit', 100))))
+
+    @app.route('/api/v3/account')
+    def account():
+        return jsonify(exchange.account())
+
+    # ---------- نقاط تحكم المحاكاة ----------
+
+    @app.route('/sim/stats')
+    def sim_stats():
+        with exchange.lock:
+            return jsonify(dict(exchange.stats))
+
+    @app.route('/sim/tick', methods=['POST'])
+    def sim_tick():
+        exchange.tick(int(request.args.get('steps', 1)))
+        return jsonify({s: p.current() for s, p in exchange.paths.items()})
+
+    @app.route('/sim/config', methods=['POST'])
+    def sim_config():
+        exchange.configure(**(request.get_json(silent=True) or request.args.to_dict()))
+        return jsonify({'ok': True})
+
+    @app.route('/sim/reset', methods=['POST'])
+    def sim_reset():
+        exchange.reset()
+        return jsonify({'ok': True})
+
+    return app
+
+
+class SimulatorServer:
+    """تشغيل المحاكي في خيط خلفي (port=0 لاختيار منفذ حر)"""
+
+    def __init__(self, exchange: Optional[SimulatedExchange] = None, host: str = '127.0.0.1', port: int = 0):
+        from werkzeug.serving import make_server
+        self.exchange = exchange or SimulatedExchange()
+        self.server = make_server(host, port, create_app(self.exchange), threaded=True)
+        self.host = host
+        self.port = self.server.server_port
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> 'SimulatorServer':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True, name='mexc_simulator')
+        self.thread.start()
+        logger.info(f"محاكي MEXC يعمل على {self.url}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def start_simulator(exchange: Optional[SimulatedExchange] = None, host: str = '127.0.0.1',
+                    port: int = 0) -> SimulatorServer:
+    """تشغيل المحاكي في الخلفية وإرجاع الخادم"""
+    return SimulatorServer(exchange, host, port).start()
+
+
+def use_simulator(url: str):
+    """
+    توجيه mexc_api إلى المحاكي أثناء التشغيل (بديل MEXC_BASE_URL)
+    مع مسح التخزين المؤقت ولقطة الأسعار حتى لا تُستخدم بيانات المنصة الحقيقية
+    """
+    from app import mexc_api
+    from app.price_snapshot import price_snapshot
+    mexc_api.BASE_URL = url.rstrip('/')
+    mexc_api.cache.clear()
+    price_snapshot.fetched_at = 0.0
+    logger.info(f"تم توجيه طلبات MEXC إلى {mexc_api.BASE_URL}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="محاكي MEXC REST محلي")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--throttle-rate', type=float, default=0, help="نسبة الطلبات المرفوضة بـ 429")
+    parser.add_argument('--throttle-every', type=int, default=0, help="رفض كل طلب رقم N بـ 429")
+    parser.add_argument('--max-rps', type=int, default=0, help="حد الطلبات في الثانية قبل 429")
+    parser.add_argument('--fill-delay', type=float, default=0, help="تأخير تنفيذ أوامر السوق بالثواني")
+    parser.add_argument('--step-seconds', type=float, default=None, help="تقدم مسار الأسعار مع الوقت")
+    parser.add_argument('--price-path', help="ملف JSON بالشكل {symbol: [prices]} لإعادة تشغيله")
+    parser.add_argument('--usdt', type=float, default=1000.0)
+    parser.add_argument('--api-secret', default=None, help="التحقق من التوقيع بهذا السر")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    exchange = SimulatedExchange(seed=args.seed, balances={'USDT': args.usdt},
+                                 step_seconds=args.step_seconds, api_secret=args.api_secret)
+    if args.price_path:
+        with open(args.price_path, 'r') as f:
+            exchange.load_paths(json.load(f), args.step_seconds)
+    exchange.configure(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, throttle_rate=args.throttle_rate,
+                       throttle_every=args.throttle_every, max_rps=args.max_rps, fill_delay=args.fill_delay)
+    app = create_app(exchange)
+    logger.info(f"محاكي MEXC على http://{args.host}:{args.port} (MEXC_BASE_URL=http://{args.host}:{args.port})")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+نوع بيانات عمودي مضغوط لسلاسل الشموع (OHLCV)
+يحوّل بيانات الشموع مرة واحدة إلى مصفوفات NumPy بدلاً من إعادة بنائها من قوائم القواميس
+في كل دالة تحليل (predict_trend، detect_candlestick_patterns، scan_market، get_volatility...)
+"""
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ترتيب الأعمدة في تنسيق القوائم المستخدم من MEXC و exchange_manager
+COLUMNS = ('open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time')
+
+
+class OHLCVSeries:
+    """
+    سلسلة شموع عمودية: كل عمود مصفوفة NumPy مستقلة
+    تدعم الفهرسة بعدد صحيح (تُرجع قاموس شمعة للتوافق مع الشيفرة القديمة)
+    والتقطيع (يُرجع سلسلة جديدة تشارك نفس الذاكرة)
+    """
+
+    __slots__ = COLUMNS
+
+    def __init__(self, open_time, open, high, low, close, volume, close_time=None):
+        self.open_time = np.asarray(open_time, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.float64)
+        if close_time is None:
+            close_time = self.open_time
+        self.close_time = np.asarray(close_time, dtype=np.int64)
+
+    @classmethod
+    def empty(cls) -> 'OHLCVSeries':
+        """سلسلة فارغة"""
+        return cls.from_matrix(np.empty((0, len(COLUMNS))))
+
+    @classmethod
+    def from_matrix(cls, matrix: np.ndarray) -> 'OHLCVSeries':
+        """
+        إنشاء سلسلة من مصفوفة ثنائية الأبعاد أعمدتها بترتيب COLUMNS
+        (الأعمدة الناقصة في النهاية تعتبر close_time = open_time)
+        """
+        matrix = np.asarray(matrix, dtype=np.float64)
+        if matrix.ndim != 2 or matrix.shape[1] < 6:
+            matrix = np.empty((0, len(COLUMNS)))
+        close_time = matrix[:, 6] if matrix.shape[1] > 6 else matrix[:, 0]
+        return cls(matrix[:, 0], matrix[:, 1], matrix[:, 2], matrix[:, 3],
+                   matrix[:, 4], matrix[:, 5], close_time)
+
+    @classmethod
+    def from_dicts(cls, klines: Sequence[Dict[str, Any]]) -> 'OHLCVSeries':
+        """
+        إنشاء سلسلة من قائمة قواميس (تنسيق mexc_api.get_klines)
+
+        :param klines: قائمة قواميس الشموع
+        :return: سلسلة OHLCV
+        """
+        if not klines:
+            return cls.empty()
+        rows = [
+            (k.get('open_time', k.get('openTime', 0)), k.get('open', 0), k.get('high', 0),
+             k.get('low', 0), k.get('close', 0), k.get('volume', 0),
+             k.get('close_time', k.get('closeTime', 0)))
+            for k in klines
+        ]
+        return cls.from_matrix(np.array(rows, dtype=np.float64))
+
+    @classmethod
+    def from_rows(cls, klines: Sequence[Sequence[Any]]) -> 'OHLCVSeries':
+        """
+        إنشاء سلسلة من قائمة قوائم [open_time, open, high, low, close, volume, close_time, ...]
+        (تنسيق exchange_manager.get_historical_klines والاستجابة الخام من MEXC)
+        """
+        if not klines:
+            return cls.empty()
+        width = min(len(klines[0]), len(COLUMNS))
+        return cls.from_matrix(np.array([k[:width] for k in klines], dtype=np.float64))
+
+    def __len__(self) -> int:
+        return int(self.close.shape[0])
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return OHLCVSeries(*(getattr(self, name)[index] for name in COLUMNS))
+        return self.candle(index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self.candle(i)
+
+    def __repr__(self) -> str:
+        return f"OHLCVSeries(len={len(self)})"
+
+    def candle(self, index: int) -> Dict[str, Any]:
+        """قاموس شمعة واحدة بنفس تنسيق get_klines"""
+        return {
+            'open_time': int(self.open_time[index]),
+            'open': float(self.open[index]),
+            'high': float(self.high[index]),
+            'low': float(self.low[index]),
+            'close': float(self.close[index]),
+            'volume': float(self.volume[index]),
+            'close_time': int(self.close_time[index])
+        }
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """تحويل السلسلة إلى قائمة قواميس (للتخزين أو الواجهات القديمة)"""
+        return [self.candle(i) for i in range(len(self))]
+
+    def to_rows(self) -> List[List[Any]]:
+        """تحويل السلسلة إلى قائمة قوائم بتنسيق get_historical_klines"""
+        return [
+            [int(self.open_time[i]), float(self.open[i]), float(self.high[i]), float(self.low[i]),
+             float(self.close[i]), float(self.volume[i]), int(self.close_time[i])]
+            for i in range(len(self))
+        ]
+
+    def tail(self, count: int) -> 'OHLCVSeries':
+        """آخر count شمعة"""
+        return self[-count:] if count > 0 else self[0:0]
+
+    @property
+    def last_close(self) -> Optional[float]:
+        """سعر إغلاق آخر شمعة"""
+        return float(self.close[-1]) if len(self) else None
+
+
+def as_ohlcv(klines: Any) -> OHLCVSeries:
+    """
+    تحويل أي تنسيق شموع مدعوم إلى OHLCVSeries (بدون نسخ إذا كانت سلسلة بالفعل)
+
+    :param klines: OHLCVSeries أو قائمة قواميس أو قائمة قوائم
+    :return: سلسلة OHLCV
+    """
+    if isinstance(klines, OHLCVSeries):
+        return klines
+    if klines is None or len(klines) == 0:
+        return OHLCVSeries.empty()
+    first = klines[0]
+    if isinstance(first, dict):
+        return OHLCVSeries.from_dicts(klines)
+    if isinstance(first, (list, tuple)):
+        return OHLCVSeries.from_rows(klines)
+    logger.warning(f"تنسيق شموع غير معروف: {type(first)}")
+    return OHLCVSeries.empty()
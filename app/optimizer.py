@@ -0,0 +1,373 @@
+"""
+محسّن المعاملات (Parameter sweep) فوق محرك الاختبار التاريخي
+يجرب تركيبات من إعدادات config.py (أهداف الربح ونسبها، وقف الخسارة، الوقف الذكي، مدة الاحتفاظ...)
+بالبحث الشبكي أو العشوائي على جميع الأنوية عبر مجموعة عمليات (ProcessPoolExecutor).
+بيانات السوق والإشارات المحسوبة مسبقاً توضع مرة واحدة في ذاكرة مشتركة (shared_memory)
+وتقرأها العمليات كمصفوفات NumPy مباشرة بدون نسخ أو تسلسل (pickle).
+النتائج تُرتب وتُكتب كملف JSON وككتلة SYSTEM_SETTINGS مرشحة جاهزة للنسخ إلى config.py.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.backtester import BACKTEST_DATA_DIR, Backtester
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import OPTIMIZER_OUTPUT_DIR, OPTIMIZER_MIN_TRADES
+except (ImportError, AttributeError):
+    OPTIMIZER_OUTPUT_DIR = 'optimizer_results'
+    OPTIMIZER_MIN_TRADES = 30
+
+# فضاء البحث الافتراضي بأسماء config.py (قائمة = قيم البحث الشبكي، صف (أدنى، أعلى) = مدى البحث العشوائي)
+DEFAULT_SPACE = {
+    'TAKE_PROFIT': [0.003, 0.005, 0.008],
+    'TAKE_PROFIT_2': [0.01, 0.015],
+    'TAKE_PROFIT_3': [0.02, 0.03],
+    'TP1_QUANTITY_RATIO': [0.4, 0.5],
+    'TP2_QUANTITY_RATIO': [0.3],
+    'STOP_LOSS': [0.01, 0.02, 0.03],
+    'SMART_STOP_THRESHOLD': [0.0, 0.02],
+    'MIN_PROFIT_TO_SELL': [None, 0.0001, 0.005],
+    'TIME_STOP_LOSS_HOURS': [2, 4],
+    'MAX_TRADE_HOLD_TIME': [4, 8]
+}
+
+# مقاييس الترتيب المدعومة (الأعلى أفضل، عدا max_drawdown_pct)
+OBJECTIVES = ('total_profit', 'return_pct', 'win_rate', 'profit_factor', 'calmar')
+
+
+def settings_to_params(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    تحويل إعدادات بأسماء config.py (كسور عشرية) إلى معاملات Backtester (نسب مئوية)
+
+    :param settings: قاموس مثل {'TAKE_PROFIT': 0.005, 'STOP_LOSS': 0.01, ...}
+    """
+    targets = sorted(settings[k] for k in ('TAKE_PROFIT', 'TAKE_PROFIT_2', 'TAKE_PROFIT_3') if k in settings)
+    params: Dict[str, Any] = {}
+    if targets:
+        params['take_profit_targets'] = [t * 100 for t in targets]
+        ratios = [settings.get('TP1_QUANTITY_RATIO'), settings.get('TP2_QUANTITY_RATIO')][:len(targets) - 1]
+        if all(r is not None for r in ratios):
+            ratios.append(max(0.0, 1.0 - sum(ratios)))
+            params['tp_quantity_ratios'] = ratios
+    if 'STOP_LOSS' in settings:
+        params['stop_loss'] = -abs(settings['STOP_LOSS']) * 100
+    if settings.get('SMART_STOP_THRESHOLD'):
+        params['smart_stop_threshold'] = settings['SMART_STOP_THRESHOLD'] * 100
+    if settings.get('MIN_PROFIT_TO_SELL') is not None:
+        params['min_profit_to_sell'] = settings['MIN_PROFIT_TO_SELL'] * 100
+    if 'TIME_STOP_LOSS_HOURS' in settings:
+        params['max_hold_hours'] = settings['TIME_STOP_LOSS_HOURS']
+    if 'MAX_TRADE_HOLD_TIME' in settings:
+        params['max_trade_hold_hours'] = settings['MAX_TRADE_HOLD_TIME']
+    return params
+
+
+def _normalize_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """ترتيب الأهداف تصاعدياً وضبط النسب والمدد لتكون تركيبة صالحة"""
+    settings = dict(settings)
+    keys = [k for k in ('TAKE_PROFIT', 'TAKE_PROFIT_2', 'TAKE_PROFIT_3') if k in settings]
+    for key, value in zip(keys, sorted(settings[k] for k in keys)):
+        settings[key] = value
+    if 'TP1_QUANTITY_RATIO' in settings and 'TP2_QUANTITY_RATIO' in settings:
+        settings['TP3_QUANTITY_RATIO'] = round(max(0.0, 1.0 - settings['TP1_QUANTITY_RATIO']
+                                                   - settings['TP2_QUANTITY_RATIO']), 6)
+    if 'MAX_TRADE_HOLD_TIME' in settings and 'TIME_STOP_LOSS_HOURS' in settings:
+        settings['MAX_TRADE_HOLD_TIME'] = max(settings['MAX_TRADE_HOLD_TIME'], settings['TIME_STOP_LOSS_HOURS'])
+    return settings
+
+
+def grid(space: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """جميع تركيبات البحث الشبكي (بدون تكرار بعد ضبط التركيبة)"""
+    keys = list(space)
+    values = [v if isinstance(v, list) else list(v) for v in space.values()]
+    seen = set()
+    combos = []
+    for combo in itertools.product(*values):
+        settings = _normalize_settings(dict(zip(keys, combo)))
+        key = json.dumps(settings, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            combos.append(settings)
+    return combos
+
+
+def random_samples(space: Dict[str, Any], count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    عينات عشوائية: صف (أدنى، أعلى) يُسحب منه بتوزيع منتظم، والقائمة يُختار منها عنصر
+
+    :param space: فضاء البحث
+    :param count: عدد العينات
+    :param seed: البذرة
+    """
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(count):
+        settings = {}
+        for key, spec in space.items():
+            if isinstance(spec, tuple):
+                low, high = spec
+                value = rng.uniform(low, high)
+                settings[key] = round(value) if isinstance(low, int) and isinstance(high, int) else round(value, 6)
+            else:
+                settings[key] = rng.choice(spec)
+        samples.append(_normalize_settings(settings))
+    return samples
+
+
+# SharedMemory(track=False) متاح منذ Python 3.13: الربط دون تسجيل في متتبع الموارد
+SHM_TRACK_PARAM = sys.version_info >= (3, 13)
+
+
+class SharedArrays:
+    """
+    مجموعة مصفوفات NumPy في كتلة ذاكرة مشتركة واحدة
+    المالك (العملية الرئيسية) ينشئها بـ create، والعمليات الفرعية تربطها بـ attach عبر manifest
+    """
+
+    ALIGN = 64
+
+    def __init__(self, shm: shared_memory.SharedMemory, manifest: Dict[str, Any], owner: bool):
+        self.shm = shm
+        self.manifest = manifest
+        self.owner = owner
+        self.arrays = {
+            key: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            for key, (dtype, shape, offset) in manifest['arrays'].items()
+        }
+
+    @classmethod
+    def create(cls, arrays: Dict[str, np.ndarray]) -> 'SharedArrays':
+        """نسخ المصفوفات مرة واحدة إلى ذاكرة مشتركة جديدة"""
+        layout = {}
+        offset = 0
+        for key, values in arrays.items():
+            values = np.ascontiguousarray(values)
+            layout[key] = (values.dtype.str, values.shape, offset)
+            offset += -(-values.nbytes // cls.ALIGN) * cls.ALIGN
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        manifest = {'name': shm.name, 'arrays': layout}
+        shared = cls(shm, manifest, owner=True)
+        for key, values in arrays.items():
+            shared.arrays[key][...] = values
+        return shared
+
+    @classmethod
+    def attach(cls, manifest: Dict[str, Any]) -> 'SharedArrays':
+        """
+        ربط كتلة موجودة (للقراءة من عملية فرعية في مجموعة عمليات المالك)
+        العمليات الفرعية (fork وspawn وforkserver) تتشارك متتبع موارد العملية الرئيسية: تسجيل الربط فيه
+        مكرر لا أثر له، أما إلغاء التسجيل من العملية الفرعية فيزيل تسجيل المالك نفسه ويُفشل unlink لاحقاً
+        """
+        if SHM_TRACK_PARAM:
+            return cls(shared_memory.SharedMemory(name=manifest['name'], track=False), manifest, owner=False)
+        return cls(shared_memory.SharedMemory(name=manifest['name']), manifest, owner=False)
+
+    def close(self):
+        """تحرير الكتلة (والحذف إذا كانت هذه العملية المالكة، حتى لو فشل التحرير)"""
+        self.arrays = {}
+        try:
+            self.shm.close()
+        finally:
+            if self.owner:
+                self.shm.unlink()
+
+
+# حالة كل عملية فرعية (تُهيأ مرة واحدة في initializer)
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(manifest: Dict[str, Any], interval: str, base_params: Dict[str, Any]):
+    shared = SharedArrays.attach(manifest)
+    _worker['shared'] = shared
+    _worker['backtester'] = Backtester.from_arrays(interval, shared.arrays)
+    _worker['base_params'] = base_params
+
+
+def _evaluate(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """تشغيل اختبار واحد داخل عملية فرعية وإرجاع الملخص فقط"""
+    params = dict(_worker['base_params'])
+    params.update(settings_to_params(settings))
+    result = _worker['backtester'].run(params)
+    return {'settings': settings, 'summary': result['summary']}
+
+
+def score(summary: Dict[str, Any], objective: str) -> float:
+    """قيمة مقياس الترتيب لملخص نتيجة"""
+    if objective == 'calmar':
+        drawdown = summary.get('max_drawdown_pct') or 0.0
+        return summary.get('return_pct', 0.0) / max(drawdown, 1.0)
+    value = summary.get(objective)
+    return float(value) if value is not None else float('-inf')
+
+
+class Optimizer:
+    """تشغيل البحث على مجموعة عمليات مع مشاركة البيانات عبر الذاكرة المشتركة"""
+
+    def __init__(self, backtester: Backtester, base_params: Optional[Dict[str, Any]] = None,
+                 workers: Optional[int] = None):
+        """
+        :param backtester: محرك محمّل بالبيانات
+        :param base_params: معاملات ثابتة لجميع التشغيلات (مثل strategy)
+        :param workers: عدد العمليات (الافتراضي عدد الأنوية)
+        """
+        self.backtester = backtester
+        self.base_params = dict(base_params or {})
+        self.workers = workers or os.cpu_count() or 1
+
+    def run(self, candidates: Iterable[Dict[str, Any]], objective: str = 'total_profit',
+            min_trades: int = OPTIMIZER_MIN_TRADES) -> List[Dict[str, Any]]:
+        """
+        تقييم جميع التركيبات وترتيبها
+
+        :param candidates: قائمة إعدادات بأسماء config.py
+        :param objective: مقياس الترتيب (OBJECTIVES)
+        :param min_trades: استبعاد التركيبات ذات الصفقات الأقل من هذا العدد من المراتب الأولى
+        :return: النتائج مرتبة من الأفضل
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f"مقياس غير معروف: {objective}")
+        candidates = list(candidates)
+        started = time.time()
+        # حساب الإشارات مرة واحدة قبل المشاركة (لا تتغير بتغير معاملات الخروج)
+        self.backtester.prepare(self.base_params.get('strategy', 'scanner'))
+        if any(c.get('SMART_STOP_THRESHOLD') for c in candidates):
+            self.backtester.prepare('candlestick')
+        shared = SharedArrays.create(self.backtester.to_arrays())
+        try:
+            chunksize = max(1, len(candidates) // (self.workers * 4))
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(shared.manifest, self.backtester.interval, self.base_params)) as pool:
+                results = list(pool.map(_evaluate, candidates, chunksize=chunksize))
+        finally:
+            # العملية الرئيسية وحدها تحذف الكتلة
+            shared.close()
+        for result in results:
+            summary = result['summary']
+            result['score'] = score(summary, objective)
+            result['eligible'] = summary['trades'] >= min_trades
+        results.sort(key=lambda r: (r['eligible'], r['score'], -r['summary']['max_drawdown_pct']), reverse=True)
+        logger.info(f"تم تقييم {len(results)} تركيبة على {self.workers} عملية خلال {time.time() - started:.1f} ثانية")
+        return results
+
+
+def render_settings_block(settings: Dict[str, Any], summary: Dict[str, Any]) -> str:
+    """
+    كتلة config.py مرشحة: الثوابت المحسنة ثم SYSTEM_SETTINGS بنفس بنية config.py
+
+    :param settings: أفضل تركيبة
+    :param summary: ملخص نتيجتها
+    """
+    lines = [
+        f"# إعدادات مرشحة من app/optimizer.py بتاريخ {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+        f"# الربح {summary['total_profit']:.4f}$ ({summary['return_pct']}%)، الصفقات {summary['trades']}، "
+        f"نسبة الربح {summary['win_rate']}%، أقصى تراجع {summary['max_drawdown_pct']}%",
+    ]
+    for key, value in settings.items():
+        lines.append(f"{key} = {value!r}")
+    def literal(key: str, fallback: str) -> str:
+        return repr(settings[key]) if key in settings else fallback
+
+    multi_tp = ', '.join(literal(k, k) for k in ('TAKE_PROFIT', 'TAKE_PROFIT_2', 'TAKE_PROFIT_3'))
+    ratios = ', '.join(literal(k, k) for k in ('TP1_QUANTITY_RATIO', 'TP2_QUANTITY_RATIO', 'TP3_QUANTITY_RATIO'))
+    max_loss = repr(abs(settings['STOP_LOSS'])) if 'STOP_LOSS' in settings else 'abs(STOP_LOSS)'
+    lines += [
+        "",
+        "SYSTEM_SETTINGS = {",
+        "    'blacklisted_symbols': API_UNSUPPORTED_SYMBOLS,",
+        "    'max_trades': MAX_ACTIVE_TRADES,",
+        "    'total_capital': 25.0,",
+        "    'per_trade_amount': 5.0,",
+        f"    'min_profit': {literal('TAKE_PROFIT', 'TAKE_PROFIT')},",
+        f"    'multi_tp_targets': [{multi_tp}],",
+        f"    'tp_quantity_ratios': [{ratios}],",
+        f"    'max_loss': {max_loss},",
+        f"    'max_hold_hours': {literal('TIME_STOP_LOSS_HOURS', 'TIME_STOP_LOSS_HOURS')},",
+        "    'trade_cycle_interval': 300,",
+        "    'enforce_diversity': ENFORCE_COIN_DIVERSITY,",
+        "    'prioritized_coins': HIGH_VOLUME_SYMBOLS",
+        "}",
+        ""
+    ]
+    return "\n".join(lines)
+
+
+def write_results(results: List[Dict[str, Any]], directory: str = OPTIMIZER_OUTPUT_DIR,
+                  top: int = 50) -> Tuple[str, str]:
+    """
+    حفظ النتائج المرتبة (JSON) وكتلة الإعدادات المرشحة لأفضل تركيبة
+
+    :return: (مسار ملف النتائج، مسار ملف الإعدادات)
+    """
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    results_path = os.path.join(directory, f"sweep_{stamp}.json")
+    with open(results_path, 'w', encoding='utf-8') as f:
+        json.dump(results[:top], f, ensure_ascii=False, indent=2, default=str)
+    settings_path = os.path.join(directory, f"system_settings_{stamp}.py")
+    if results:
+        with open(settings_path, 'w', encoding='utf-8') as f:
+            f.write(render_settings_block(results[0]['settings'], results[0]['summary']))
+    return results_path, settings_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="تحسين إعدادات البوت بالاختبار التاريخي")
+    parser.add_argument('--symbols', default='', help="قائمة عملات مفصولة بفواصل (الافتراضي جميع الملفات)")
+    parser.add_argument('--interval', default='15m')
+    parser.add_argument('--data-dir', default=BACKTEST_DATA_DIR)
+    parser.add_argument('--strategy', default='scanner', choices=['scanner', 'candlestick', 'both'])
+    parser.add_argument('--mode', default='grid', choices=['grid', 'random'])
+    parser.add_argument('--samples', type=int, default=200, help="عدد العينات في البحث العشوائي")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--space', default=None, help="ملف JSON لفضاء البحث (القوائم = قيم، [أدنى، أعلى] مع --mode random)")
+    parser.add_argument('--objective', default='total_profit', choices=OBJECTIVES)
+    parser.add_argument('--min-trades', type=int, default=OPTIMIZER_MIN_TRADES)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output-dir', default=OPTIMIZER_OUTPUT_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    space = DEFAULT_SPACE
+    if args.space:
+        with open(args.space, 'r') as f:
+            space = json.load(f)
+        if args.mode == 'random':
+            # في JSON تُكتب المديات كقوائم من عنصرين
+            space = {k: tuple(v) if isinstance(v, list) and len(v) == 2 and
+                     all(isinstance(x, (int, float)) for x in v) else v for k, v in space.items()}
+    candidates = grid(space) if args.mode == 'grid' else random_samples(space, args.samples, args.seed)
+
+    backtester = Backtester(args.interval)
+    symbols = [s.strip() for s in args.symbols.split(',') if s.strip()]
+    backtester.load_files(args.data_dir, symbols or None)
+    if not backtester.data:
+        logger.error("لا توجد بيانات للاختبار")
+        return
+
+    optimizer = Optimizer(backtester, {'strategy': args.strategy}, args.workers)
+    results = optimizer.run(candidates, args.objective, args.min_trades)
+    results_path, settings_path = write_results(results, args.output_dir)
+    for rank, result in enumerate(results[:5], 1):
+        summary = result['summary']
+        logger.info(f"#{rank} score={result['score']:.4f} trades={summary['trades']} "
+                    f"win_rate={summary['win_rate']}% drawdown={summary['max_drawdown_pct']}% {result['settings']}")
+    logger.info(f"النتائج: {results_path}")
+    logger.info(f"الإعدادات المرشحة: {settings_path}")
+
+
+if __name__ == '__main__':
+    main()
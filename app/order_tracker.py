@@ -0,0 +1,323 @@
+"""
+خط تأكيد تنفيذ الأوامر غير الحاجب
+تُسجّل الأوامر بعد إرسالها كأوامر معلّقة ويتم تأكيد تنفيذها في الخلفية برقم الأمر
+(get_order_status مع تأخير متزايد ومهلة قصوى، أو حدث دفع من تيار بيانات المستخدم)
+بدلاً من time.sleep(2) ثم فحص تاريخ التداول 3 مرات داخل خيط التداول.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import ORDER_CONFIRM_TIMEOUT, ORDER_CONFIRM_MAX_INTERVAL
+except (ImportError, AttributeError):
+    ORDER_CONFIRM_TIMEOUT = 30
+    ORDER_CONFIRM_MAX_INTERVAL = 3
+
+# حالات الأوامر في MEXC
+FILLED = 'FILLED'
+FAILED_STATUSES = ('CANCELED', 'REJECTED', 'EXPIRED')
+
+# أول فحص بعد الإرسال ثم تأخير متزايد حتى ORDER_CONFIRM_MAX_INTERVAL
+_FIRST_CHECK_DELAY = 0.5
+
+
+def fill_price(order: Dict[str, Any], default: float = 0.0) -> float:
+    """متوسط سعر التنفيذ من استجابة حالة الأمر (cummulativeQuoteQty / executedQty)"""
+    try:
+        executed = float(order.get('executedQty', 0) or 0)
+        quote = float(order.get('cummulativeQuoteQty', 0) or 0)
+        if executed > 0 and quote > 0:
+            return quote / executed
+        return float(order.get('price', 0) or 0) or default
+    except (TypeError, ValueError):
+        return default
+
+
+class PendingOrder:
+    """أمر بانتظار تأكيد التنفيذ"""
+
+    __slots__ = ('symbol', 'order_id', 'side', 'placed_at', 'deadline', 'next_check',
+                 'delay', 'attempts', 'on_filled', 'on_failed')
+
+    def __init__(self, symbol: str, order_id: str, side: str, timeout: float,
+                 on_filled: Optional[Callable[[Dict[str, Any]], Any]],
+                 on_failed: Optional[Callable[[str], Any]]):
+        now = time.time()
+        self.symbol = symbol
+        self.order_id = str(order_id)
+        self.side = side
+        self.placed_at = now
+        self.deadline = now + timeout
+        self.next_check = now + _FIRST_CHECK_DELAY
+        self.delay = _FIRST_CHECK_DELAY
+        self.attempts = 0
+        self.on_filled = on_filled
+        self.on_failed = on_failed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'symbol': self.symbol,
+            'order_id': self.order_id,
+            'side': self.side,
+            'age': round(time.time() - self.placed_at, 2),
+            'attempts': self.attempts
+        }
+
+
+class OrderTracker:
+    """متتبع الأوامر المعلّقة: خيط واحد يفحص الأوامر المستحقة ويستدعي دوال التأكيد أو الفشل"""
+
+    def __init__(self, status_fetcher: Optional[Callable[[str, str], Optional[Dict[str, Any]]]] = None,
+                 history_fetcher: Optional[Callable[[str, int], List[Dict[str, Any]]]] = None):
+        """
+        :param status_fetcher: دالة (symbol, order_id) -> حالة الأمر (افتراضياً mexc_api.get_order_status)
+        :param history_fetcher: دالة (symbol, limit) -> تاريخ التداول، تُستخدم مرة واحدة عند انتهاء المهلة
+        """
+        self.status_fetcher = status_fetcher
+        self.history_fetcher = history_fetcher
+        self.pending: Dict[str, PendingOrder] = {}
+        self.lock = threading.RLock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread = None
+        self.stats = {'filled': 0, 'failed': 0, 'timeouts': 0}
+
+    # ---------- التسجيل ----------
+
+    def track(self, symbol: str, order_id: Any, side: str,
+              on_filled: Optional[Callable[[Dict[str, Any]], Any]] = None,
+              on_failed: Optional[Callable[[str], Any]] = None,
+              timeout: float = ORDER_CONFIRM_TIMEOUT) -> PendingOrder:
+        """
+        تسجيل أمر للتأكيد في الخلفية (يعود فوراً)
+
+        :param symbol: رمز العملة
+        :param order_id: رقم الأمر
+        :param side: BUY أو SELL
+        :param on_filled: تُستدعى مع حالة الأمر عند التنفيذ الكامل
+        :param on_failed: تُستدعى مع السبب عند الإلغاء/الرفض/انتهاء المهلة
+        :param timeout: المهلة القصوى بالثواني
+        """
+        order = PendingOrder(symbol, order_id, side, timeout, on_filled, on_failed)
+        with self.lock:
+            self.pending[order.order_id] = order
+        self.start()
+        self.wakeup.set()
+        logger.info(f"⏳ تسجيل أمر {side} {symbol} ({order.order_id}) بانتظار تأكيد التنفيذ")
+        return order
+
+    def confirm_event(self, order_id: Any, order: Dict[str, Any]) -> bool:
+        """
+        تأكيد مدفوع من مصدر خارجي (مثل تيار بيانات المستخدم) بدون انتظار الفحص التالي
+
+        :return: True إذا كان الأمر معلّقاً وتمت معالجته
+        """
+        with self.lock:
+            pending = self.pending.get(str(order_id))
+        if pending is None:
+            return False
+        return self._handle_status(pending, order)
+
+    def get_pending(self) -> List[Dict[str, Any]]:
+        """الأوامر المعلّقة حالياً"""
+        with self.lock:
+            return [p.to_dict() for p in self.pending.values()]
+
+    def is_pending(self, order_id: Any) -> bool:
+        with self.lock:
+            return str(order_id) in self.pending
+
+    # ---------- المعالجة ----------
+
+    def _fetch_status(self, pending: PendingOrder) -> Optional[Dict[str, Any]]:
+        fetcher = self.status_fetcher
+        if fetcher is None:
+            from app.mexc_api import get_order_status
+            fetcher = get_order_status
+        return fetcher(pending.symbol, pending.order_id)
+
+    def _history_fill(self, pending: PendingOrder) -> Optional[Dict[str, Any]]:
+        """البحث في تاريخ التداول عند انتهاء المهلة (نفس طريقة التحقق القديمة، مرة واحدة فقط)"""
+        fetcher = self.history_fetcher
+        if fetcher is None:
+            from app.mexc_api import get_trades_history
+            fetcher = get_trades_history
+        records = [r for r in (fetcher(pending.symbol, 20) or [])
+                   if str(r.get('orderId')) == pending.order_id]
+        if not records:
+            return None
+        qty = sum(float(r.get('qty', 0) or 0) for r in records)
+        quote = sum(float(r.get('quoteQty', 0) or 0) or
+                    float(r.get('qty', 0) or 0) * float(r.get('price', 0) or 0) for r in records)
+        return {'orderId': pending.order_id, 'symbol': pending.symbol, 'status': FILLED,
+                'executedQty': qty, 'cummulativeQuoteQty': quote, 'source': 'trade_history'}
+
+    def _finish(self, pending: PendingOrder) -> bool:
+        with self.lock:
+            return self.pending.pop(pending.order_id, None) is not None
+
+    def _handle_status(self, pending: PendingOrder, order: Optional[Dict[str, Any]]) -> bool:
+        """معالجة حالة أمر: إنهاؤه إذا نُفّذ أو فشل، وإلا جدولة الفحص التالي"""
+        status = (order or {}).get('status')
+        if status == FILLED:
+            if self._finish(pending):
+                self.stats['filled'] += 1
+                logger.info(f"✅✅ تأكيد تنفيذ أمر {pending.side} {pending.symbol} ({pending.order_id}) "
+                            f"بعد {time.time() - pending.placed_at:.1f} ثانية")
+                self._run(pending.on_filled, order)
+            return True
+        if status in FAILED_STATUSES:
+            if self._finish(pending):
+                self.stats['failed'] += 1
+                logger.error(f"❌ لم يُنفّذ أمر {pending.side} {pending.symbol} ({pending.order_id}): {status}")
+                self._run(pending.on_failed, status)
+            return True
+        return False
+
+    def _run(self, callback: Optional[Callable], arg: Any):
+        if callback is None:
+            return
+        try:
+            callback(arg)
+        except Exception as e:
+            logger.error(f"خطأ في معالجة تأكيد الأمر: {e}")
+
+    def _check(self, pending: PendingOrder):
+        pending.attempts += 1
+        try:
+            order = self._fetch_status(pending)
+        except Exception as e:
+            logger.error(f"خطأ في جلب حالة الأمر {pending.order_id}: {e}")
+            order = None
+        if self._handle_status(pending, order):
+            return
+        now = time.time()
+        if now >= pending.deadline:
+            try:
+                order = self._history_fill(pending)
+            except Exception as e:
+                logger.error(f"خطأ في البحث عن الأمر {pending.order_id} في تاريخ التداول: {e}")
+                order = None
+            if order and self._handle_status(pending, order):
+                return
+            if self._finish(pending):
+                self.stats['timeouts'] += 1
+                logger.error(f"❌❌ انتهت مهلة تأكيد أمر {pending.side} {pending.symbol} ({pending.order_id})")
+                self._run(pending.on_failed, 'timeout')
+            return
+        pending.delay = min(pending.delay * 2, ORDER_CONFIRM_MAX_INTERVAL)
+        pending.next_check = min(now + pending.delay, pending.deadline)
+
+    def _loop(self):
+        while self.running:
+            self.wakeup.clear()
+            now = time.time()
+            with self.lock:
+                due = [p for p in self.pending.values() if p.next_check <= now]
+                upcoming = [p.next_check for p in self.pending.values() if p.next_check > now]
+            for pending in due:
+                self._check(pending)
+            if due:
+                continue
+            wait = (min(upcoming) - now) if upcoming else 1.0
+            self.wakeup.wait(max(0.05, min(wait, 1.0)))
+
+    def start(self):
+        """بدء خيط التأكيد (يُستدعى تلقائياً عند أول تسجيل)"""
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self._loop, daemon=True, name='order_tracker')
+            self.thread.start()
+
+    def stop(self):
+        """إيقاف خيط التأكيد"""
+        self.running = False
+        self.wakeup.set()
+
+
+# نسخة عامة مشتركة من المتتبع
+order_tracker = OrderTracker()
+
+
+def track_buy(trade: Dict[str, Any], notify: Optional[Callable[..., Any]] = None) -> PendingOrder:
+    """
+    تأكيد أمر شراء في الخلفية لصفقة مسجّلة كمعلّقة في مخزن الصفقات
+    عند التنفيذ: تُعلّم الصفقة مؤكدة بسعر وكمية التنفيذ الفعليين (فتدخل محرك الخروج)
+    عند الفشل: تُنقل الصفقة إلى المغلقة بسبب order_not_filled
+
+    :param trade: سجل الصفقة كما أُضيف إلى المخزن (يحتوي symbol و timestamp و orderId)
+    :param notify: دالة إشعار (notify_trade_status) تُستدعى بعد التأكيد
+    """
+    from app.trade_store import trade_store
+    symbol, timestamp = trade['symbol'], trade['timestamp']
+
+    def on_filled(order: Dict[str, Any]):
+        price = fill_price(order, trade.get('entry_price', 0))
+        changes = {'api_confirmed': True, 'confirmation': FILLED, 'entry_price': price}
+        executed = float(order.get('executedQty', 0) or 0)
+        if executed > 0:
+            changes['quantity'] = executed
+        trade_store.update_trade(symbol, timestamp, changes)
+        logger.info(f"✅✅ تم تسجيل صفقة حقيقية مؤكدة: {symbol}")
+        if notify:
+            notify(symbol=symbol, status="تم الشراء", price=price,
+                   order_id=trade.get('orderId'), api_verified=True)
+
+    def on_failed(reason: str):
+        trade_store.close_trade(symbol, timestamp, {
+            'status': 'CLOSED',
+            'api_confirmed': False,
+            'confirmation': 'FAILED',
+            'close_reason': 'order_not_filled',
+            'close_timestamp': int(time.time() * 1000)
+        })
+        logger.error(f"❌❌ لم يتم تأكيد صفقة الشراء {symbol}: {reason}")
+
+    return order_tracker.track(symbol, trade.get('orderId'), 'BUY', on_filled, on_failed)
+
+
+def track_sell(trade: Dict[str, Any], order_id: Any, reason: str = '',
+               notify: Optional[Callable[..., Any]] = None) -> PendingOrder:
+    """
+    تأكيد أمر بيع في الخلفية لصفقة نُقلت إلى المغلقة
+    عند التنفيذ: يُسجّل سعر البيع الفعلي ويُرسل الإشعار
+    عند الفشل: تُعاد الصفقة إلى المفتوحة ليعيد محرك الخروج أو دورة التداول محاولة بيعها
+
+    :param trade: الصفقة المغلقة
+    :param order_id: رقم أمر البيع
+    :param reason: سبب الإغلاق (للإشعار)
+    :param notify: دالة إشعار (notify_trade_status)
+    """
+    from app.trade_store import trade_store
+    symbol, timestamp = trade['symbol'], trade['timestamp']
+
+    def on_filled(order: Dict[str, Any]):
+        price = fill_price(order)
+        trade_store.update_trade(symbol, timestamp, {
+            'sell_price': price,
+            'sell_time': order.get('updateTime') or order.get('time') or int(time.time() * 1000),
+            'sell_confirmed': True
+        })
+        if notify:
+            entry_price = trade.get('entry_price', 0)
+            profit_loss = (price - entry_price) / entry_price * 100 if entry_price and price else 0
+            notify(symbol=symbol, status=f"تم البيع ({reason})" if reason else "تم البيع",
+                   price=price, profit_loss=profit_loss, order_id=order_id, api_verified=True)
+
+    def on_failed(failure: str):
+        trade_store.update_trade(symbol, timestamp, {
+            'status': 'OPEN',
+            'close_reason': None,
+            'close_timestamp': None,
+            'sell_confirmed': False,
+            'last_sell_failure': failure
+        }, status='OPEN')
+        logger.error(f"❌❌ لم يتم تأكيد بيع {symbol} ({failure}) - إعادة الصفقة إلى المفتوحة")
+
+    return order_tracker.track(symbol, order_id, 'SELL', on_filled, on_failed)
@@ -0,0 +1,194 @@
+"""
+فهرس المراكز المفتوحة في الذاكرة
+المرجع الوحيد لفحوص قبول الصفقات (التنويع، تكرار العملة، فترة الراحة بعد البيع):
+- الرمز -> الصفقات المفتوحة عليه، مع عدد المراكز وفترة الراحة لكل رمز
+- يُبنى مرة واحدة من مخزن الصفقات ثم يُحدَّث بالكتابة المباشرة (write-through) من كل معاملة ناجحة
+  في المخزن، فتصبح الفحوص بحثاً في مجموعة O(1) دون قراءة من القرص
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from app.trade_store import trade_store, OPEN, CLOSED
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import COOLDOWN_AFTER_TRADE
+except (ImportError, AttributeError):
+    COOLDOWN_AFTER_TRADE = 7200
+
+# حقول وقت إغلاق الصفقة المستخدمة في الوحدات المختلفة (بالمللي ثانية أو بالثواني)
+CLOSE_TIME_FIELDS = ('close_timestamp', 'exit_time', 'close_time', 'sell_time')
+
+
+def trade_close_time(trade: Dict[str, Any]) -> Optional[float]:
+    """وقت إغلاق الصفقة بالثواني من أول حقل متاح (None إذا لم يوجد)"""
+    for field in CLOSE_TIME_FIELDS:
+        try:
+            value = float(trade.get(field) or 0)
+        except (TypeError, ValueError):
+            continue
+        if value > 0:
+            return value / 1000 if value > 1e11 else value
+    return None
+
+
+class PositionIndex:
+    """فهرس المراكز المفتوحة لكل رمز مع فترات الراحة، متزامن مع مخزن الصفقات"""
+
+    def __init__(self, store=trade_store, cooldown: float = COOLDOWN_AFTER_TRADE):
+        self.store = store
+        self.cooldown = cooldown
+        self.lock = threading.RLock()
+        # الرمز -> {مفتاح الصفقة: الصفقة}
+        self.open_by_symbol: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # مفتاح الصفقة المفتوحة -> الرمز (لنقلها عند التحديث أو الحذف)
+        self.symbol_of: Dict[str, str] = {}
+        # الرمز -> نهاية فترة الراحة بعد آخر بيع
+        self.cooldown_until: Dict[str, float] = {}
+        self.built = False
+        self.stats = {'rebuilds': 0, 'applied': 0}
+        store.add_row_listener(self.apply)
+
+    # ---------- البناء والتحديث ----------
+
+    def rebuild(self):
+        """إعادة بناء الفهرس بالكامل من مخزن الصفقات"""
+        # قفل المخزن أولاً (نفس ترتيب الأقفال عند الكتابة) فلا تضيع كتابة بين القراءة والتثبيت
+        with self.store.lock:
+            rows = self.store.iter_rows()
+            now = time.time()
+            open_by_symbol: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            symbol_of: Dict[str, str] = {}
+            cooldown_until: Dict[str, float] = {}
+            for key, symbol, status, trade in rows:
+                symbol = (symbol or '').upper()
+                if not symbol:
+                    continue
+                if status == OPEN:
+                    open_by_symbol.setdefault(symbol, {})[key] = trade
+                    symbol_of[key] = symbol
+                else:
+                    closed_at = trade_close_time(trade)
+                    if closed_at and closed_at + self.cooldown > now:
+                        cooldown_until[symbol] = max(cooldown_until.get(symbol, 0), closed_at + self.cooldown)
+            with self.lock:
+                # فترات الراحة المسجلة يدوياً (record_coin_sale) تبقى إن كانت أطول
+                for symbol, until in self.cooldown_until.items():
+                    if until > now and until > cooldown_until.get(symbol, 0):
+                        cooldown_until[symbol] = until
+                self.open_by_symbol = open_by_symbol
+                self.symbol_of = symbol_of
+                self.cooldown_until = cooldown_until
+                self.built = True
+                self.stats['rebuilds'] += 1
+        logger.info(f"تم بناء فهرس المراكز: {len(symbol_of)} صفقة مفتوحة على {len(open_by_symbol)} عملة")
+
+    def apply(self, changes):
+        """
+        تطبيق صفوف متغيرة من مخزن الصفقات (مستمع صفوف المخزن)
+
+        :param changes: قائمة (المفتاح، الرمز، الحالة، الصفقة) أو None لإعادة البناء
+        """
+        if changes is None:
+            if self.built:
+                self.rebuild()
+            return
+        with self.lock:
+            if not self.built:
+                return
+            now = time.time()
+            for key, symbol, status, trade in changes:
+                previous = self.symbol_of.pop(key, None)
+                if previous is not None:
+                    positions = self.open_by_symbol.get(previous)
+                    if positions is not None:
+                        positions.pop(key, None)
+                        if not positions:
+                            del self.open_by_symbol[previous]
+                symbol = (symbol or '').upper()
+                if status == OPEN and symbol:
+                    self.open_by_symbol.setdefault(symbol, {})[key] = trade
+                    self.symbol_of[key] = symbol
+                elif status == CLOSED and previous is not None:
+                    # صفقة مفتوحة أُغلقت الآن: بداية فترة الراحة
+                    closed_at = trade_close_time(trade or {}) or now
+                    self.cooldown_until[previous] = max(self.cooldown_until.get(previous, 0),
+                                                        min(closed_at, now) + self.cooldown)
+                self.stats['applied'] += 1
+
+    def _ensure(self):
+        if not self.built:
+            self.rebuild()
+
+    # ---------- الاستعلامات ----------
+
+    def is_open(self, symbol: str) -> bool:
+        """هل توجد صفقة مفتوحة على الرمز"""
+        self._ensure()
+        with self.lock:
+            return (symbol or '').upper() in self.open_by_symbol
+
+    def open_count(self, symbol: Optional[str] = None) -> int:
+        """عدد الصفقات المفتوحة على رمز محدد أو إجمالاً"""
+        self._ensure()
+        with self.lock:
+            if symbol is None:
+                return len(self.symbol_of)
+            return len(self.open_by_symbol.get(symbol.upper(), ()))
+
+    def open_symbols(self) -> Set[str]:
+        """مجموعة الرموز التي عليها صفقات مفتوحة (نسخة)"""
+        self._ensure()
+        with self.lock:
+            return set(self.open_by_symbol)
+
+    def counts(self) -> Dict[str, int]:
+        """عدد الصفقات المفتوحة لكل رمز"""
+        self._ensure()
+        with self.lock:
+            return {symbol: len(positions) for symbol, positions in self.open_by_symbol.items()}
+
+    def open_trades(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        """الصفقات المفتوحة (نسخ سطحية) لرمز محدد أو جميعها"""
+        self._ensure()
+        with self.lock:
+            if symbol is not None:
+                return [dict(t) for t in self.open_by_symbol.get(symbol.upper(), {}).values()]
+            return [dict(t) for positions in self.open_by_symbol.values() for t in positions.values()]
+
+    def has_duplicates(self) -> bool:
+        """هل توجد عملة عليها أكثر من صفقة مفتوحة"""
+        self._ensure()
+        with self.lock:
+            return any(len(positions) > 1 for positions in self.open_by_symbol.values())
+
+    # ---------- فترات الراحة ----------
+
+    def start_cooldown(self, symbol: str, until: Optional[float] = None):
+        """بدء فترة راحة للرمز (الافتراضي COOLDOWN_AFTER_TRADE من الآن)"""
+        with self.lock:
+            symbol = symbol.upper()
+            until = until if until is not None else time.time() + self.cooldown
+            self.cooldown_until[symbol] = max(self.cooldown_until.get(symbol, 0), until)
+
+    def cooldown_remaining(self, symbol: str) -> float:
+        """الثواني المتبقية من فترة راحة الرمز (0 إذا لم يكن في فترة راحة)"""
+        self._ensure()
+        with self.lock:
+            return max(0.0, self.cooldown_until.get((symbol or '').upper(), 0) - time.time())
+
+    def cooldowns(self) -> Dict[str, float]:
+        """الرموز في فترة راحة حالياً -> نهاية الفترة (مع حذف المنتهية)"""
+        self._ensure()
+        now = time.time()
+        with self.lock:
+            for symbol in [s for s, until in self.cooldown_until.items() if until <= now]:
+                del self.cooldown_until[symbol]
+            return dict(self.cooldown_until)
+
+
+# نسخة عامة مشتركة
+position_index = PositionIndex()
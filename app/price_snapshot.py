@@ -0,0 +1,117 @@
+"""
+لقطة أسعار مجمّعة لجميع الرموز من طلب واحد إلى /api/v3/ticker/price
+بدلاً من طلب منفصل لكل رمز: فحص N صفقة مفتوحة أو N عملة في المسح يكلف طلباً واحداً لكل دورة
+إذا فشل التحديث وتجاوز عمر اللقطة الحد المسموح لا تُستخدم أسعارها القديمة: سعر الرمز الواحد
+يُجلب من نقطة السعر المنفردة، وأسعار عدة رموز تُعاد None
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import PRICE_SNAPSHOT_MAX_AGE
+except (ImportError, AttributeError):
+    PRICE_SNAPSHOT_MAX_AGE = 10
+
+
+class PriceSnapshot:
+    """لقطة أسعار مشتركة آمنة للاستخدام من عدة خيوط مع تحديث عند انتهاء الصلاحية"""
+
+    def __init__(self, max_age: float = PRICE_SNAPSHOT_MAX_AGE):
+        self.max_age = max_age
+        self.prices: Dict[str, float] = {}
+        self.fetched_at = 0.0
+        self.lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self.refresh_count = 0
+        self.fallback_count = 0
+        # تحذير واحد لكل فترة فشل (يُعاد تعيينه عند أول تحديث ناجح)
+        self._warned = False
+
+    def age(self) -> Optional[float]:
+        """عمر اللقطة الحالية بالثواني (None إذا لم تُجلب بعد)"""
+        return time.time() - self.fetched_at if self.fetched_at else None
+
+    def is_stale(self, max_age: Optional[float] = None) -> bool:
+        """هل تجاوز عمر اللقطة الحد المسموح"""
+        age = self.age()
+        return age is None or age > (self.max_age if max_age is None else max_age)
+
+    def refresh(self) -> bool:
+        """
+        جلب لقطة جديدة لجميع الأسعار
+        إذا كان هناك تحديث جارٍ من خيط آخر يتم انتظاره بدلاً من إرسال طلب مكرر
+
+        :return: True إذا أصبحت اللقطة محدثة
+        """
+        started = time.time()
+        with self._refresh_lock:
+            # خيط آخر أكمل التحديث أثناء الانتظار
+            if self.fetched_at >= started:
+                return True
+            from app.mexc_api import fetch_all_prices
+            data = fetch_all_prices()
+            if not data:
+                return False
+            prices = {}
+            for item in data:
+                try:
+                    prices[item['symbol']] = float(item['price'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+            with self.lock:
+                self.prices = prices
+                self.fetched_at = time.time()
+                self.refresh_count += 1
+                self._warned = False
+            logger.debug(f"تم تحديث لقطة الأسعار ({len(prices)} رمز)")
+            return True
+
+    def _ensure_fresh(self, max_age: Optional[float] = None) -> bool:
+        """
+        تحديث اللقطة إذا انتهت صلاحيتها
+
+        :return: False إذا فشل التحديث وبقيت اللقطة أقدم من الحد المسموح
+        """
+        if not self.is_stale(max_age) or self.refresh() or not self.is_stale(max_age):
+            return True
+        if not self._warned:
+            self._warned = True
+            age = self.age()
+            logger.warning(f"فشل تحديث لقطة الأسعار وعمرها "
+                           f"{'غير معروف' if age is None else f'{age:.0f} ثانية'}: لن تُستخدم أسعارها القديمة")
+        return False
+
+    def _fetch_single(self, symbol: str) -> Optional[float]:
+        """سعر رمز واحد مباشرة من المنصة عند عدم صلاحية اللقطة"""
+        from app.mexc_api import fetch_symbol_price
+        self.fallback_count += 1
+        # بدون التخزين المؤقت لـ fetch_symbol_price (60 ثانية): المطلوب سعر حديث
+        return fetch_symbol_price.__wrapped__(symbol)
+
+    def get_price(self, symbol: str, max_age: Optional[float] = None) -> Optional[float]:
+        """
+        سعر رمز من اللقطة (مع تحديثها أولاً إذا انتهت صلاحيتها)
+
+        :param symbol: رمز العملة
+        :param max_age: أقصى عمر مقبول للقطة بالثواني (افتراضياً PRICE_SNAPSHOT_MAX_AGE)
+        :return: السعر، أو None إذا لم يكن الرمز ضمن اللقطة أو تعذر جلبه
+        """
+        if not self._ensure_fresh(max_age):
+            return self._fetch_single(symbol)
+        with self.lock:
+            return self.prices.get(symbol)
+
+    def get_prices(self, symbols: Iterable[str], max_age: Optional[float] = None) -> Dict[str, Optional[float]]:
+        """أسعار عدة رموز من لقطة واحدة (None لجميعها إذا لم تكن اللقطة صالحة)"""
+        if not self._ensure_fresh(max_age):
+            return {symbol: None for symbol in symbols}
+        with self.lock:
+            return {symbol: self.prices.get(symbol) for symbol in symbols}
+
+
+# نسخة عامة مشتركة من اللقطة
+price_snapshot = PriceSnapshot()
@@ -0,0 +1,105 @@
+"""
+محدد معدل الطلبات المشترك لواجهة MEXC (Token Bucket)
+يضمن ألا يتجاوز مجموع الطلبات من جميع الخيوط حد API_RATE_LIMIT،
+ويوقف الإرسال مؤقتاً لجميع الخيوط بتأخير تصاعدي عند استلام استجابة 429
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import API_RATE_LIMIT
+except (ImportError, AttributeError):
+    API_RATE_LIMIT = 0.2
+
+try:
+    from app.config import API_RATE_BURST
+except (ImportError, AttributeError):
+    API_RATE_BURST = 5
+
+# حدود التأخير التصاعدي بعد استجابة 429 (بالثواني)
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+
+class TokenBucket:
+    """
+    دلو رموز آمن للاستخدام من عدة خيوط
+    - rate: عدد الرموز المضافة في الثانية
+    - capacity: الحد الأقصى للرموز المتراكمة (حجم الدفعة المسموحة)
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.backoff = 0.0
+        self.throttled_count = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        انتظار توفر رمز واستهلاكه
+
+        :param timeout: أقصى مدة انتظار بالثواني (None = بلا حد)
+        :return: True إذا تم الحصول على رمز، False عند انتهاء المهلة
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate if self.rate > 0 else 0.1)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(max(wait, 0.001))
+
+    def report_throttled(self, retry_after: Optional[float] = None):
+        """
+        تسجيل استجابة 429: إيقاف جميع الطلبات مؤقتاً بتأخير تصاعدي وتفريغ الدلو
+
+        :param retry_after: مدة الانتظار التي حددها الخادم (Retry-After) إن وجدت
+        """
+        with self.lock:
+            self.throttled_count += 1
+            self.backoff = min(BACKOFF_MAX, self.backoff * 2 if self.backoff else BACKOFF_BASE)
+            delay = max(self.backoff, float(retry_after or 0))
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self.tokens = 0.0
+        logger.warning(f"تجاوز حد الطلبات (429) - إيقاف الطلبات مؤقتاً لمدة {delay:.1f} ثانية")
+
+    def report_success(self):
+        """إعادة ضبط التأخير التصاعدي بعد استجابة ناجحة"""
+        if self.backoff:
+            with self.lock:
+                self.backoff = 0.0
+
+
+def retry_after_seconds(response) -> Optional[float]:
+    """استخراج قيمة Retry-After من ترويسة الاستجابة إن وجدت"""
+    try:
+        value = response.headers.get('Retry-After')
+        return float(value) if value else None
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+# المحدد المشترك لجميع طلبات MEXC (API_RATE_LIMIT = الفاصل الأدنى بين الطلبات بالثواني)
+api_limiter = TokenBucket(rate=1.0 / API_RATE_LIMIT if API_RATE_LIMIT else 100.0, capacity=API_RATE_BURST)
@@ -2,6 +2,8 @@ import logging
 import time
 from datetime import datetime, timedelta
 
+import numpy as np
+
 # إعداد المسجل
 logger = logging.getLogger(__name__)
 
@@ -25,29 +27,23 @@ def get_volatility(symbol, period=24):
     
     try:
         # استدعاء API للحصول على البيانات التاريخية
-        from app.exchange_manager import get_historical_klines
+        from app.exchange_manager import get_ohlcv
         
         # الحصول على الإطار الزمني المناسب (1h لفترة 24 ساعة أو أقل)
         timeframe = "1h"
         
         # الحصول على عدد الساعات + 1 للتأكد من وجود بيانات كافية
-        klines = get_historical_klines(symbol, timeframe, limit=period+1)
+        klines = get_ohlcv(symbol, timeframe, limit=period+1)
         
-        if not klines or len(klines) < 2:
+        if len(klines) < 2:
             logger.warning(f"بيانات غير كافية لحساب تقلب {symbol}")
             return None
         
         # استخراج أسعار الإغلاق
-        prices = [float(k[4]) for k in klines]  # عمود رقم 4 هو سعر الإغلاق
-        
-        # حساب التغييرات النسبية
-        price_changes = []
-        for i in range(1, len(prices)):
-            change = abs(prices[i] - prices[i-1]) / prices[i-1]
-            price_changes.append(change)
+        prices = klines.close
         
-        # حساب متوسط التغيير المطلق
-        volatility = sum(price_changes) / len(price_changes)
+        # حساب متوسط التغيير النسبي المطلق
+        volatility = float(np.mean(np.abs(np.diff(prices)) / prices[:-1]))
         
         # تخزين في الذاكرة المؤقتة
         volatility_cache[cache_key] = (time.time(), volatility)
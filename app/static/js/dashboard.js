@@ -1,19 +1,77 @@
-// تحديث البيانات تلقائيًا كل 30 ثانية
+// تحديثات لوحة التحكم المدفوعة من الخادم (Server-Sent Events)
+// الخادم يحسب حالة واحدة مشتركة ويرسل لقطة كاملة ثم فروق الأقسام المتغيرة فقط،
+// بدلاً من أن يستعلم كل تبويب مفتوح عن الحالة كل 30 ثانية
+var dashboardState = {};
+
+// أقسام الحالة التي تعرضها الصفحة (يمكن للصفحة تغييرها قبل تحميلها، مثل ['watched'])
+var dashboardFeedSections = window.dashboardFeedSections ||
+    ['bot_status', 'trades', 'performance', 'capital_status', 'available_capital'];
+
 window.addEventListener('DOMContentLoaded', (event) => {
-    // تحديث البيانات مباشرة عند تحميل الصفحة
-    updateDashboardData();
-    
-    // ضبط تحديث دوري
-    setInterval(updateDashboardData, 30000);
+    dashboardFeedSections = window.dashboardFeedSections || dashboardFeedSections;
+    connectDashboardFeed();
 });
 
-// دالة لتحديث البيانات من الخادم
+// الاشتراك في تغذية لوحة التحكم (مع الرجوع إلى الاستعلام الدوري إذا لم يدعم المتصفح SSE)
+function connectDashboardFeed() {
+    if (typeof EventSource === 'undefined') {
+        updateDashboardData();
+        setInterval(updateDashboardData, 30000);
+        return;
+    }
+
+    // المتصفح يعيد الاتصال تلقائياً ويرسل Last-Event-ID فيتلقى الفروق الفائتة فقط
+    var source = new EventSource('/api/dashboard/stream?sections=' + dashboardFeedSections.join(','));
+
+    source.addEventListener('snapshot', function(e) {
+        dashboardState = JSON.parse(e.data);
+        applyDashboardUpdate(Object.keys(dashboardState));
+    });
+
+    source.addEventListener('delta', function(e) {
+        var delta = JSON.parse(e.data);
+        Object.assign(dashboardState, delta);
+        applyDashboardUpdate(Object.keys(delta).filter(function(key) { return key !== 'version'; }));
+    });
+
+    source.onerror = function() {
+        console.log("Dashboard feed disconnected, reconnecting...");
+    };
+}
+
+// جلب الحالة الكاملة مرة واحدة (للمتصفحات التي لا تدعم SSE)
 function updateDashboardData() {
-    // سجل للتصحيح
-    console.log("Updating dashboard data...");
-    
+    fetch('/api/dashboard/snapshot?sections=' + dashboardFeedSections.join(','))
+        .then(response => response.json())
+        .then(data => {
+            dashboardState = data;
+            applyDashboardUpdate(Object.keys(data));
+        })
+        .catch(error => console.error("Error updating dashboard data:", error));
+}
+
+// تحديث العناصر المرتبطة بالأقسام المتغيرة وإشعار الصفحة
+function applyDashboardUpdate(changed) {
+    // عناصر مثل <span data-feed="performance.win_rate"></span>
+    document.querySelectorAll('[data-feed]').forEach(function(element) {
+        var path = element.getAttribute('data-feed').split('.');
+        if (changed.indexOf(path[0]) === -1) {
+            return;
+        }
+        var value = path.reduce(function(obj, key) {
+            return (obj === undefined || obj === null) ? undefined : obj[key];
+        }, dashboardState);
+        if (value !== undefined && value !== null) {
+            element.textContent = value;
+        }
+    });
+
+    document.dispatchEvent(new CustomEvent('dashboard:update', {
+        detail: { state: dashboardState, changed: changed }
+    }));
+
     // إذا كانت تحديثات العملات المراقبة متاحة
-    if (typeof loadWatchedCoins === 'function') {
+    if (changed.indexOf('watched') !== -1 && typeof loadWatchedCoins === 'function') {
         loadWatchedCoins();
     }
-}
\ No newline at end of file
+}
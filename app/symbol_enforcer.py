@@ -15,6 +15,10 @@ import threading
 import random
 from typing import List, Set, Dict, Any
 
+from app.trade_store import trade_store
+from app.trade_journal import trade_journal
+from app.position_index import position_index
+
 logger = logging.getLogger(__name__)
 
 # قائمة العملات البديلة للتداول إذا لم تكن هناك خيارات أخرى
@@ -54,52 +58,39 @@ def get_active_trades_file_path() -> str:
 
 def create_backup(filename='active_trades.json'):
     """
-    إنشاء نسخة احتياطية من ملف الصفقات
+    إنشاء نسخة احتياطية من مخزن الصفقات
     
-    :param filename: اسم الملف المراد عمل نسخة احتياطية منه
+    :param filename: غير مستخدم (أُبقي للتوافق؛ الصفقات أصبحت في مخزن SQLite)
     """
     try:
-        backup_name = f"{filename}.backup.{int(time.time())}"
-        os.system(f"cp {filename} {backup_name}")
-        logger.info(f"تم إنشاء نسخة احتياطية: {backup_name}")
+        backup_name = trade_journal.checkpoint()
+        if backup_name:
+            logger.info(f"تم إنشاء نسخة احتياطية: {backup_name}")
     except Exception as e:
         logger.error(f"خطأ في إنشاء نسخة احتياطية: {e}")
 
 def load_active_trades() -> Dict[str, List[Dict[str, Any]]]:
     """
-    تحميل الصفقات النشطة من الملف
+    تحميل الصفقات النشطة من مخزن الصفقات
     
     :return: قاموس يحتوي على الصفقات المفتوحة والمغلقة
     """
-    file_path = get_active_trades_file_path()
-    
     with trades_lock:
         try:
-            if os.path.exists(file_path):
-                with open(file_path, 'r') as file:
-                    return json.load(file)
-            else:
-                return {"open": [], "closed": []}
+            return trade_store.load_all()
         except Exception as e:
             logger.error(f"خطأ في تحميل الصفقات النشطة: {e}")
             return {"open": [], "closed": []}
 
 def save_active_trades(trades_data: Dict[str, List[Dict[str, Any]]]):
     """
-    حفظ الصفقات النشطة في الملف
+    حفظ الصفقات النشطة في مخزن الصفقات (تُكتب الصفقات المتغيرة فقط)
     
     :param trades_data: قاموس يحتوي على الصفقات المفتوحة والمغلقة
     """
-    file_path = get_active_trades_file_path()
-    
     with trades_lock:
         try:
-            # إنشاء نسخة احتياطية قبل الحفظ
-            create_backup()
-            
-            with open(file_path, 'w') as file:
-                json.dump(trades_data, file, indent=2)
-                
+            trade_store.save_all(trades_data)
             logger.info(f"تم حفظ {len(trades_data.get('open', []))} صفقة مفتوحة و {len(trades_data.get('closed', []))} صفقة مغلقة")
         except Exception as e:
             logger.error(f"خطأ في حفظ الصفقات النشطة: {e}")
@@ -110,11 +101,8 @@ def get_currently_traded_symbols() -> Set[str]:
     
     :return: مجموعة تحتوي على رموز العملات المتداولة حالياً
     """
-    trades_data = load_active_trades()
-    open_trades = trades_data.get('open', [])
-    
-    # استخراج الرموز من الصفقات المفتوحة
-    symbols = {trade.get('symbol', '').upper() for trade in open_trades if trade.get('symbol')}
+    # الرموز ذات الصفقات المفتوحة من فهرس المراكز
+    symbols = position_index.open_symbols()
     
     # إضافة XRPUSDT لمنعها تماماً بغض النظر عن حالتها
     symbols.add('XRPUSDT')
@@ -136,6 +124,10 @@ def enforce_trade_diversity() -> int:
     
     :return: عدد الصفقات المغلقة
     """
+    # لا توجد عملة عليها أكثر من صفقة مفتوحة: لا حاجة لقراءة المخزن وإعادة حفظه
+    if not position_index.has_duplicates():
+        return 0
+    
     with trades_lock:
         trades_data = load_active_trades()
         open_trades = trades_data.get('open', [])
@@ -10,6 +10,9 @@ import logging
 import subprocess
 from typing import Tuple, Set, List, Dict, Any
 
+from app.trade_store import trade_store
+from app.position_index import position_index
+
 logger = logging.getLogger(__name__)
 
 # العملات الممنوعة بشكل دائم
@@ -21,6 +24,10 @@ def enforce_diversity() -> int:
     
     :return: عدد الصفقات المغلقة
     """
+    # لا توجد عملة عليها أكثر من صفقة مفتوحة: لا شيء للإغلاق
+    if not position_index.has_duplicates():
+        return 0
+    
     try:
         # محاولة تنفيذ السكريبت الخارجي
         result = subprocess.run(['python', 'run_before_trade.py'], 
@@ -58,41 +65,25 @@ def _internal_enforce_diversity() -> int:
 
 def _load_trades() -> Dict[str, List[Dict[str, Any]]]:
     """
-    تحميل الصفقات من الملف
+    تحميل الصفقات من مخزن الصفقات
     
     :return: بيانات الصفقات
     """
     try:
-        if os.path.exists('active_trades.json'):
-            with open('active_trades.json', 'r') as f:
-                data = json.load(f)
-                if isinstance(data, dict) and 'open' in data and 'closed' in data:
-                    return data
-                # تحويل التنسيق القديم (قائمة) إلى التنسيق الجديد (قاموس)
-                return {
-                    'open': [t for t in data if t.get('status') == 'OPEN'],
-                    'closed': [t for t in data if t.get('status') != 'OPEN']
-                }
-        return {'open': [], 'closed': []}
+        return trade_store.load_all()
     except Exception as e:
         logger.error(f"خطأ في تحميل الصفقات: {e}")
         return {'open': [], 'closed': []}
         
 def _save_trades(trades_data: Dict[str, List[Dict[str, Any]]]) -> bool:
     """
-    حفظ الصفقات في الملف
+    حفظ الصفقات في مخزن الصفقات (تُكتب الصفقات المتغيرة فقط)
     
     :param trades_data: بيانات الصفقات
     :return: نجاح العملية
     """
     try:
-        # إنشاء نسخة احتياطية
-        backup_name = f"active_trades.json.backup.{int(time.time())}"
-        os.system(f"cp active_trades.json {backup_name}")
-        
-        # حفظ البيانات
-        with open('active_trades.json', 'w') as f:
-            json.dump(trades_data, f, indent=2)
+        trade_store.save_all(trades_data)
             
         return True
     except Exception as e:
@@ -162,15 +153,8 @@ def get_traded_symbols() -> Set[str]:
     :return: مجموعة من العملات المتداولة
     """
     try:
-        trades_data = _load_trades()
-        open_trades = trades_data.get('open', [])
-        
-        # استخراج العملات
-        symbols = set()
-        for trade in open_trades:
-            symbol = trade.get('symbol', '').upper()
-            if symbol:
-                symbols.add(symbol)
+        # العملات ذات الصفقات المفتوحة من فهرس المراكز
+        symbols = position_index.open_symbols()
                 
         # إضافة العملات المحظورة
         for symbol in BANNED_SYMBOLS:
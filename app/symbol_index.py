@@ -0,0 +1,231 @@
+"""
+فهرس معلومات الرموز من exchangeInfo (الخطوة، الحد الأدنى للكمية، دقة السعر، الحد الأدنى للقيمة، الحالة)
+- يُبنى مرة واحدة من استجابة /api/v3/exchangeInfo ويُستعلم عنه بتكلفة O(1) لكل رمز
+- يُحفظ على القرص لبدء سريع دون انتظار التنزيل الكامل
+- يُحدّث دورياً في الخلفية بحيث لا ينتظر تنفيذ الأوامر تنزيل بيانات جميع الأسواق
+"""
+import json
+import logging
+import os
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import EXCHANGE_INFO_INDEX_PATH, EXCHANGE_INFO_REFRESH_INTERVAL
+except (ImportError, AttributeError):
+    EXCHANGE_INFO_INDEX_PATH = 'exchange_info_index.json'
+    EXCHANGE_INFO_REFRESH_INTERVAL = 3600
+
+# قيم الحالة التي تعني أن الرمز متاح للتداول (MEXC تستخدم "1"/"ENABLED" وبعض الواجهات "TRADING")
+TRADING_STATUSES = {'TRADING', 'ENABLED', '1'}
+
+
+def _precision_from_step(step: Optional[str]) -> Optional[int]:
+    """عدد الأرقام العشرية المطابق لحجم الخطوة (0.001 -> 3، 1 -> 0)"""
+    if step in (None, ''):
+        return None
+    try:
+        value = Decimal(str(step)).normalize()
+    except InvalidOperation:
+        return None
+    if value <= 0:
+        return None
+    return max(0, -value.as_tuple().exponent)
+
+
+def _step_from_precision(precision: Any) -> Optional[float]:
+    """حجم الخطوة المطابق لعدد الأرقام العشرية (3 -> 0.001)"""
+    try:
+        return 10 ** -int(precision)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_symbol_info(info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    استخراج مرشحات التداول لرمز واحد من عنصر exchangeInfo
+    تُستخدم مرشحات LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL إن وجدت، وإلا حقول الدقة في MEXC
+
+    :param info: عنصر الرمز من exchangeInfo['symbols']
+    :return: قاموس مرشحات الرمز
+    """
+    filters = {f.get('filterType'): f for f in info.get('filters', []) or []}
+    lot = filters.get('LOT_SIZE', {})
+    price_filter = filters.get('PRICE_FILTER', {})
+    notional = filters.get('MIN_NOTIONAL', {}) or filters.get('NOTIONAL', {})
+
+    step_size = lot.get('stepSize') or info.get('baseSizePrecision')
+    quantity_precision = _precision_from_step(step_size)
+    if quantity_precision is None and info.get('baseAssetPrecision') is not None:
+        quantity_precision = int(info['baseAssetPrecision'])
+        step_size = _step_from_precision(quantity_precision)
+
+    tick_size = price_filter.get('tickSize') or _step_from_precision(info.get('quotePrecision'))
+    min_notional = notional.get('minNotional') or info.get('quoteAmountPrecision')
+    status = str(info.get('status', ''))
+
+    return {
+        'symbol': info.get('symbol'),
+        'status': status,
+        'is_trading': status.upper() in TRADING_STATUSES,
+        'base_asset': info.get('baseAsset'),
+        'quote_asset': info.get('quoteAsset'),
+        'step_size': float(step_size) if step_size not in (None, '') else None,
+        'min_qty': float(lot['minQty']) if lot.get('minQty') else None,
+        'quantity_precision': quantity_precision,
+        'tick_size': float(tick_size) if tick_size not in (None, '') else None,
+        'price_precision': _precision_from_step(tick_size),
+        'min_notional': float(min_notional) if min_notional not in (None, '') else None,
+    }
+
+
+class SymbolIndex:
+    """فهرس مرشحات الرموز مع حفظ على القرص وتحديث دوري آمن للاستخدام من عدة خيوط"""
+
+    def __init__(self, path: str = EXCHANGE_INFO_INDEX_PATH,
+                 refresh_interval: int = EXCHANGE_INFO_REFRESH_INTERVAL):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.symbols: Dict[str, Dict[str, Any]] = {}
+        self.updated_at = 0.0
+        self.lock = threading.RLock()
+        self._refreshing = threading.Lock()
+        self._loaded_from_disk = False
+        self._thread = None
+        self._running = False
+
+    def load(self) -> bool:
+        """تحميل الفهرس المحفوظ من القرص (بدء سريع)"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            with self.lock:
+                self.symbols = data.get('symbols', {})
+                self.updated_at = float(data.get('updated_at', 0))
+            logger.info(f"تم تحميل فهرس الرموز من القرص ({len(self.symbols)} رمز)")
+            return True
+        except Exception as e:
+            logger.warning(f"تعذر تحميل فهرس الرموز من {self.path}: {e}")
+            return False
+
+    def save(self):
+        """حفظ الفهرس على القرص (كتابة ذرية عبر ملف مؤقت)"""
+        with self.lock:
+            data = {'updated_at': self.updated_at, 'symbols': self.symbols}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"تعذر حفظ فهرس الرموز: {e}")
+
+    def rebuild(self, exchange_info: Dict[str, Any]) -> int:
+        """
+        إعادة بناء الفهرس من استجابة exchangeInfo
+
+        :param exchange_info: استجابة /api/v3/exchangeInfo
+        :return: عدد الرموز المفهرسة
+        """
+        symbols = {}
+        for info in exchange_info.get('symbols', []) or []:
+            if info.get('symbol'):
+                symbols[info['symbol']] = parse_symbol_info(info)
+        with self.lock:
+            self.symbols = symbols
+            self.updated_at = time.time()
+        self.save()
+        return len(symbols)
+
+    def refresh(self) -> bool:
+        """تنزيل exchangeInfo وإعادة بناء الفهرس (يتم تجاهل الطلب إذا كان التحديث جارياً)"""
+        if not self._refreshing.acquire(blocking=False):
+            return False
+        try:
+            from app.mexc_api import fetch_exchange_info
+            exchange_info = fetch_exchange_info()
+            if not exchange_info:
+                return False
+            count = self.rebuild(exchange_info)
+            logger.info(f"تم تحديث فهرس الرموز ({count} رمز)")
+            return True
+        finally:
+            self._refreshing.release()
+
+    def is_stale(self) -> bool:
+        """هل انتهت صلاحية الفهرس"""
+        return time.time() - self.updated_at > self.refresh_interval
+
+    def age(self) -> Optional[float]:
+        """عمر الفهرس بالثواني (None إذا لم يُبنَ بعد)"""
+        return time.time() - self.updated_at if self.updated_at else None
+
+    def _ensure_loaded(self):
+        """تحميل من القرص عند أول استخدام، والتنزيل المتزامن فقط إذا لم يتوفر أي فهرس"""
+        if self.symbols:
+            return
+        with self.lock:
+            if not self._loaded_from_disk:
+                self._loaded_from_disk = True
+                self.load()
+        if not self.symbols:
+            self.refresh()
+        elif self.is_stale():
+            self.refresh_async()
+
+    def refresh_async(self):
+        """تحديث الفهرس في خيط خلفي دون انتظار"""
+        threading.Thread(target=self.refresh, daemon=True).start()
+
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        مرشحات رمز معين بتكلفة O(1)
+
+        :param symbol: رمز العملة
+        :return: قاموس المرشحات أو None إذا لم يكن الرمز معروفاً
+        """
+        self._ensure_loaded()
+        return self.symbols.get(symbol)
+
+    def trading_symbols(self, quote_asset: Optional[str] = 'USDT') -> List[str]:
+        """قائمة الرموز المتاحة للتداول (مقابل عملة تسعير محددة)"""
+        self._ensure_loaded()
+        with self.lock:
+            return [
+                s for s, f in self.symbols.items()
+                if f.get('is_trading') and (quote_asset is None or f.get('quote_asset') == quote_asset)
+            ]
+
+    def start_auto_refresh(self):
+        """بدء التحديث الدوري في الخلفية"""
+        if self._running:
+            return
+        self._running = True
+
+        def loop():
+            while self._running:
+                try:
+                    self._ensure_loaded()
+                    if self.is_stale():
+                        self.refresh()
+                except Exception as e:
+                    logger.error(f"خطأ في التحديث الدوري لفهرس الرموز: {e}")
+                time.sleep(min(60, self.refresh_interval))
+
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+        logger.info("تم بدء التحديث الدوري لفهرس الرموز")
+
+    def stop_auto_refresh(self):
+        """إيقاف التحديث الدوري"""
+        self._running = False
+
+
+# نسخة عامة مشتركة من الفهرس
+symbol_index = SymbolIndex()
@@ -1,11 +1,17 @@
 # app/telegram_notify.py
 
-import requests
 import logging
 import threading
 import time
 import datetime
+from app import http_client
 from app.config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, BASE_CURRENCY
+from app.telegram_queue import telegram_dispatcher, post_message
+
+try:
+    from app.config import TELEGRAM_ASYNC_ENABLED
+except (ImportError, AttributeError):
+    TELEGRAM_ASYNC_ENABLED = True
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('telegram_notify')
@@ -16,19 +22,24 @@ daily_report_thread = None
 
 def send_telegram_message(message):
     """
-    إرسال رسالة إلى التلغرام
+    إرسال رسالة إلى التلغرام عبر طابور الإرسال في الخلفية (لا ينتظر استجابة تلجرام)
+    
+    :param message: النص المراد إرساله
+    :return: True إذا أضيفت الرسالة إلى الطابور (أو أرسلت في الوضع المتزامن)
+    """
+    if TELEGRAM_ASYNC_ENABLED:
+        return telegram_dispatcher.submit(message)
+    return send_telegram_message_now(message)
+
+def send_telegram_message_now(message):
+    """
+    إرسال رسالة إلى التلغرام مباشرة وانتظار النتيجة (لاختبار الاتصال)
     
     :param message: النص المراد إرساله
     :return: نتيجة الإرسال
     """
     try:
-        url = f'https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage'
-        params = {
-            'chat_id': TELEGRAM_CHAT_ID,
-            'text': message,
-            'parse_mode': 'HTML'
-        }
-        response = requests.get(url, params=params)
+        response = post_message(message)
         if response.status_code != 200:
             logger.error(f"Failed to send telegram message: {response.text}")
             return False
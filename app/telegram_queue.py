@@ -0,0 +1,382 @@
+"""
+موزّع إشعارات تلجرام غير الحاجب
+تُوضع الرسائل في طابور محدود الحجم ويرسلها خيط خلفي واحد، فلا ينتظر التداول استجابة تلجرام:
+- دمج الرسائل المتتالية لنفس المحادثة خلال نافذة قصيرة في رسالة ملخص واحدة
+- تحديد معدل لكل محادثة (TokenBucket) مع احترام retry_after عند استجابة 429
+- إعادة المحاولة بتأخير تصاعدي لأخطاء الشبكة والخادم
+يمكن توجيه الإرسال إلى خادم محلي بديل (TELEGRAM_API_URL) مثل TelegramStub للاختبار.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from app import http_client
+from app.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
+except (ImportError, AttributeError):
+    TELEGRAM_BOT_TOKEN = ''
+    TELEGRAM_CHAT_ID = ''
+
+try:
+    from app.config import TELEGRAM_API_URL
+except (ImportError, AttributeError):
+    TELEGRAM_API_URL = 'https://api.telegram.org'
+
+try:
+    from app.config import (TELEGRAM_QUEUE_MAX, TELEGRAM_BATCH_WINDOW, TELEGRAM_RATE_PER_CHAT,
+                            TELEGRAM_MAX_RETRIES)
+except (ImportError, AttributeError):
+    TELEGRAM_QUEUE_MAX = 200
+    TELEGRAM_BATCH_WINDOW = 2.0
+    TELEGRAM_RATE_PER_CHAT = 1.0
+    TELEGRAM_MAX_RETRIES = 5
+
+# الحد الأقصى لطول رسالة تلجرام
+MAX_MESSAGE_LENGTH = 4096
+
+# الفاصل بين الرسائل داخل رسالة الملخص
+DIGEST_SEPARATOR = "\n\n"
+
+# حدود التأخير التصاعدي لإعادة المحاولة (بالثواني)
+RETRY_BASE = 1.0
+RETRY_MAX = 60.0
+
+
+def post_message(text: str, chat_id: Optional[str] = None, api_url: Optional[str] = None):
+    """
+    إرسال رسالة واحدة مباشرة إلى Bot API (طلب متزامن)
+
+    :param text: نص الرسالة (HTML)
+    :param chat_id: معرف المحادثة (الافتراضي TELEGRAM_CHAT_ID)
+    :param api_url: عنوان الخادم (الافتراضي TELEGRAM_API_URL)
+    :return: كائن الاستجابة
+    """
+    url = f"{(api_url or TELEGRAM_API_URL).rstrip('/')}/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+    return http_client.post(url, data={
+        'chat_id': chat_id or TELEGRAM_CHAT_ID,
+        'text': text,
+        'parse_mode': 'HTML'
+    })
+
+
+def telegram_retry_after(response) -> Optional[float]:
+    """مدة الانتظار التي حددها تلجرام في استجابة 429 (parameters.retry_after أو ترويسة Retry-After)"""
+    try:
+        value = response.json().get('parameters', {}).get('retry_after')
+        if value:
+            return float(value)
+    except (ValueError, AttributeError, TypeError):
+        pass
+    try:
+        value = response.headers.get('Retry-After')
+        return float(value) if value else None
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class Batch:
+    """رسالة ملخص جاهزة للإرسال (رسالة واحدة أو أكثر مدموجة) مع حالة إعادة المحاولة"""
+
+    __slots__ = ('text', 'count', 'attempts', 'next_try')
+
+    def __init__(self, text: str, count: int):
+        self.text = text
+        self.count = count
+        self.attempts = 0
+        self.next_try = 0.0
+
+
+class TelegramDispatcher:
+    """خيط واحد يرسل الإشعارات المعلّقة لكل محادثة مع الدمج وتحديد المعدل وإعادة المحاولة"""
+
+    def __init__(self, api_url: Optional[str] = None, max_queue: int = TELEGRAM_QUEUE_MAX,
+                 batch_window: float = TELEGRAM_BATCH_WINDOW, rate_per_chat: float = TELEGRAM_RATE_PER_CHAT,
+                 max_retries: int = TELEGRAM_MAX_RETRIES):
+        """
+        :param api_url: عنوان Bot API (None = TELEGRAM_API_URL عند الإرسال)
+        :param max_queue: الحد الأقصى للرسائل المعلّقة (تُحذف الأقدم عند الامتلاء)
+        :param batch_window: مدة انتظار الرسائل اللاحقة قبل إرسال الملخص بالثواني
+        :param rate_per_chat: عدد الرسائل المسموح بها في الثانية لكل محادثة
+        :param max_retries: عدد محاولات الإرسال قبل التخلي عن الرسالة
+        """
+        self.api_url = api_url
+        self.max_queue = max_queue
+        self.batch_window = batch_window
+        self.rate_per_chat = rate_per_chat
+        self.max_retries = max_retries
+        # المحادثة -> رسائل معلّقة (وقت الإضافة، النص)
+        self.queues: Dict[str, Deque[Any]] = {}
+        # المحادثة -> ملخص قيد الإرسال/إعادة المحاولة
+        self.inflight: Dict[str, Batch] = {}
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.RLock()
+        self.wakeup = threading.Event()
+        self.idle = threading.Event()
+        self.idle.set()
+        self.flushing = False
+        self.running = False
+        self.thread = None
+        self.stats = {'queued': 0, 'delivered': 0, 'requests': 0, 'coalesced': 0,
+                      'retries': 0, 'throttled': 0, 'dropped': 0, 'failed': 0}
+
+    # ---------- الإضافة ----------
+
+    def submit(self, text: str, chat_id: Optional[str] = None) -> bool:
+        """
+        إضافة رسالة إلى الطابور (يعود فوراً)
+
+        :param text: نص الرسالة (HTML)
+        :param chat_id: معرف المحادثة (الافتراضي TELEGRAM_CHAT_ID)
+        :return: True إذا أضيفت الرسالة
+        """
+        if not text:
+            return False
+        chat = str(chat_id or TELEGRAM_CHAT_ID)
+        with self.lock:
+            if self.pending_count() >= self.max_queue:
+                self._drop_oldest()
+            self.queues.setdefault(chat, deque()).append((time.time(), str(text)))
+            self.stats['queued'] += 1
+            self.idle.clear()
+        self.start()
+        self.wakeup.set()
+        return True
+
+    def pending_count(self) -> int:
+        """عدد الرسائل المعلّقة (بما فيها الرسائل داخل الملخصات قيد الإرسال)"""
+        with self.lock:
+            return sum(len(q) for q in self.queues.values()) + sum(b.count for b in self.inflight.values())
+
+    def _drop_oldest(self):
+        """حذف أقدم رسالة معلّقة عند امتلاء الطابور"""
+        oldest = min((q[0][0], chat) for chat, q in self.queues.items() if q) if any(self.queues.values()) else None
+        if oldest is None:
+            return
+        self.queues[oldest[1]].popleft()
+        self.stats['dropped'] += 1
+        logger.warning("طابور إشعارات تلجرام ممتلئ - حذف أقدم رسالة معلّقة")
+
+    # ---------- الدمج ----------
+
+    def _take_batch(self, chat: str) -> Optional[Batch]:
+        """سحب أكبر عدد من الرسائل المعلّقة التي يتسع لها ملخص واحد"""
+        queue = self.queues.get(chat)
+        if not queue:
+            return None
+        parts: List[str] = []
+        length = 0
+        while queue:
+            text = queue[0][1]
+            extra = len(text) + (len(DIGEST_SEPARATOR) if parts else 0)
+            if parts and length + extra > MAX_MESSAGE_LENGTH:
+                break
+            queue.popleft()
+            parts.append(text)
+            length += extra
+        if len(parts) > 1:
+            self.stats['coalesced'] += len(parts) - 1
+        return Batch(DIGEST_SEPARATOR.join(parts), len(parts))
+
+    # ---------- الإرسال ----------
+
+    def _bucket(self, chat: str) -> TokenBucket:
+        bucket = self.buckets.get(chat)
+        if bucket is None:
+            bucket = self.buckets[chat] = TokenBucket(rate=self.rate_per_chat, capacity=1)
+        return bucket
+
+    def _send(self, chat: str, batch: Batch):
+        """محاولة إرسال ملخص: إنهاؤه عند النجاح أو جدولة إعادة المحاولة"""
+        bucket = self._bucket(chat)
+        batch.attempts += 1
+        self.stats['requests'] += 1
+        retry_after = None
+        try:
+            response = post_message(batch.text, chat, self.api_url)
+            status = response.status_code
+        except Exception as e:
+            logger.warning(f"خطأ في الاتصال بتلجرام: {e}")
+            response, status = None, None
+
+        if status == 200:
+            bucket.report_success()
+            with self.lock:
+                self.inflight.pop(chat, None)
+                self.stats['delivered'] += batch.count
+            return
+        if status == 429:
+            retry_after = telegram_retry_after(response)
+            bucket.report_throttled(retry_after)
+            self.stats['throttled'] += 1
+        elif status is not None and 400 <= status < 500:
+            # خطأ في الطلب نفسه (تنسيق، محادثة غير موجودة...) - إعادة المحاولة لن تفيد
+            logger.error(f"رفض تلجرام الرسالة ({status}): {response.text[:200]}")
+            self._give_up(chat, batch)
+            return
+
+        if batch.attempts >= self.max_retries:
+            logger.error(f"فشل إرسال إشعار تلجرام بعد {batch.attempts} محاولات")
+            self._give_up(chat, batch)
+            return
+        delay = max(min(RETRY_MAX, RETRY_BASE * 2 ** (batch.attempts - 1)), float(retry_after or 0))
+        batch.next_try = time.time() + delay
+        self.stats['retries'] += 1
+        logger.warning(f"إعادة محاولة إرسال إشعار تلجرام بعد {delay:.1f} ثانية (المحاولة {batch.attempts})")
+
+    def _give_up(self, chat: str, batch: Batch):
+        with self.lock:
+            self.inflight.pop(chat, None)
+            self.stats['failed'] += batch.count
+
+    def _next_action(self) -> Optional[float]:
+        """
+        تنفيذ ما يستحق الإرسال الآن لكل محادثة
+        :return: مدة الانتظار حتى الإجراء التالي (None إذا لا توجد رسائل معلّقة)
+        """
+        now = time.time()
+        waits = []
+        with self.lock:
+            chats = set(self.queues) | set(self.inflight)
+        for chat in chats:
+            with self.lock:
+                batch = self.inflight.get(chat)
+                if batch is None:
+                    queue = self.queues.get(chat)
+                    if not queue:
+                        continue
+                    # انتظار بقية الرسائل المتتالية لدمجها (إلا عند التفريغ)
+                    ready_at = queue[0][0] + self.batch_window
+                    if now < ready_at and not self.flushing:
+                        waits.append(ready_at - now)
+                        continue
+                    batch = self.inflight[chat] = self._take_batch(chat)
+            if batch.next_try > now:
+                waits.append(batch.next_try - now)
+                continue
+            if not self._bucket(chat).acquire(timeout=0):
+                waits.append(0.1)
+                continue
+            self._send(chat, batch)
+            waits.append(0.0)
+        return min(waits) if waits else None
+
+    def _loop(self):
+        while self.running:
+            self.wakeup.clear()
+            try:
+                wait = self._next_action()
+            except Exception as e:
+                logger.error(f"خطأ في موزّع إشعارات تلجرام: {e}")
+                wait = 1.0
+            if wait is None:
+                with self.lock:
+                    if not self.pending_count():
+                        self.idle.set()
+                self.wakeup.wait(1.0)
+            elif wait > 0:
+                self.wakeup.wait(min(wait, 1.0))
+
+    # ---------- التشغيل ----------
+
+    def start(self):
+        """بدء خيط الإرسال (يُستدعى تلقائياً عند أول رسالة)"""
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self._loop, daemon=True, name='telegram_dispatcher')
+            self.thread.start()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        إرسال جميع الرسائل المعلّقة فوراً دون انتظار نافذة الدمج
+
+        :param timeout: أقصى مدة انتظار بالثواني
+        :return: True إذا فرغ الطابور
+        """
+        if not self.pending_count():
+            return True
+        self.flushing = True
+        self.start()
+        self.wakeup.set()
+        try:
+            return self.idle.wait(timeout)
+        finally:
+            self.flushing = False
+
+    def stop(self, flush: bool = True, timeout: float = 5.0):
+        """إيقاف خيط الإرسال (مع إرسال المعلّق أولاً افتراضياً)"""
+        if flush:
+            self.flush(timeout)
+        self.running = False
+        self.wakeup.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات الموزّع"""
+        with self.lock:
+            return dict(self.stats, pending=self.pending_count())
+
+
+# نسخة عامة مشتركة
+telegram_dispatcher = TelegramDispatcher()
+
+# إرسال ما تبقى في الطابور عند إنهاء العملية (الخيط الخلفي daemon)
+atexit.register(lambda: telegram_dispatcher.running and telegram_dispatcher.stop(flush=True, timeout=5.0))
+
+
+class TelegramStub:
+    """
+    خادم Bot API محلي بديل للاختبار: يسجل الرسائل المستلمة
+    ويمكن ضبطه لإرجاع أخطاء أو إبطاء الاستجابة (يتطلب Flask)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        from flask import Flask, jsonify, request
+        from werkzeug.serving import make_server
+
+        self.messages: List[Dict[str, Any]] = []
+        self.fail_statuses: Deque[int] = deque()  # رموز حالة تُرجع للطلبات التالية بالترتيب
+        self.latency = 0.0
+        self.lock = threading.Lock()
+        app = Flask('telegram_stub')
+
+        @app.route('/bot<token>/sendMessage', methods=['GET', 'POST'])
+        def send_message(token):
+            if self.latency:
+                time.sleep(self.latency)
+            with self.lock:
+                status = self.fail_statuses.popleft() if self.fail_statuses else 200
+                if status == 200:
+                    values = request.values
+                    self.messages.append({'token': token, 'chat_id': values.get('chat_id'),
+                                          'text': values.get('text'), 'time': time.time()})
+            if status == 429:
+                return jsonify({'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                                'parameters': {'retry_after': 1}}), 429
+            if status != 200:
+                return jsonify({'ok': False, 'error_code': status}), status
+            return jsonify({'ok': True, 'result': {'message_id': len(self.messages)}})
+
+        self.server = make_server(host, port, app, threaded=True)
+        self.host = host
+        self.port = self.server.server_port
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> 'TelegramStub':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True, name='telegram_stub')
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
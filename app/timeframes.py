@@ -0,0 +1,289 @@
+"""
+تجميع الإطارات الزمنية محلياً من سلسلة شموع أساسية واحدة لكل عملة
+بدلاً من جلب كل إطار (5m، 15m، 1h...) من المنصة بطلب منفصل، تُحفظ سلسلة أساسية دقيقة
+في kline_store وتُحدّث تدريجياً، ثم تُشتق منها جميع الإطارات الأكبر بتجميع متجه (NumPy).
+يتيح ذلك أيضاً الإطارات غير المدعومة في MEXC (3m، 2h، 6h، 8h، 12h، 3d، 1w) بقيم صحيحة
+بدلاً من استبدالها بأقرب إطار مدعوم.
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.kline_store import INTERVAL_MS, kline_store
+from app.ohlcv import OHLCVSeries, as_ohlcv
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import TIMEFRAME_BASE_INTERVAL, TIMEFRAME_REFRESH_SECONDS
+except (ImportError, AttributeError):
+    TIMEFRAME_BASE_INTERVAL = '1m'
+    TIMEFRAME_REFRESH_SECONDS = 20
+
+try:
+    from app.config import KLINE_STORE_ENABLED, KLINE_STORE_MAX_ROWS
+except (ImportError, AttributeError):
+    KLINE_STORE_ENABLED = True
+    KLINE_STORE_MAX_ROWS = 5000
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+
+# الفواصل المدعومة مباشرة من MEXC ذات المدة الثابتة (1M شهري بطول متغير فلا يُجمّع)
+NATIVE_INTERVALS = tuple(name for name in INTERVAL_MS if name != '1M')
+
+# الفواصل التي تُشتق محلياً فقط (غير موجودة في واجهة MEXC)
+DERIVED_INTERVALS = {
+    '3m': 3 * MINUTE_MS,
+    '2h': 2 * HOUR_MS,
+    '6h': 6 * HOUR_MS,
+    '8h': 8 * HOUR_MS,
+    '12h': 12 * HOUR_MS,
+    '3d': 3 * DAY_MS,
+    '1w': 7 * DAY_MS,
+}
+
+# أسماء بديلة للفواصل (تنسيق MEXC يستخدم '60m' بدلاً من '1h')
+INTERVAL_ALIASES = {'1h': '60m'}
+
+# إزاحة بداية الإطار عن بداية زمن يونكس: الأسبوع في المنصة يبدأ الاثنين 00:00 UTC
+# بينما كان 1970-01-01 يوم خميس (أي أن أول اثنين بعد 4 أيام)
+BUCKET_OFFSETS = {'1w': 4 * DAY_MS}
+
+# الحد الأقصى للشموع في طلب klines واحد
+KLINE_REQUEST_LIMIT = 1000
+
+
+def normalize_interval(interval: str) -> str:
+    """توحيد اسم الفاصل الزمني ('1h' -> '60m')"""
+    return INTERVAL_ALIASES.get(interval, interval)
+
+
+def interval_ms(interval: str) -> int:
+    """
+    مدة الفاصل الزمني بالمللي ثانية (المدعوم من المنصة أو المشتق محلياً)
+
+    :param interval: الفاصل الزمني
+    :return: المدة بالمللي ثانية
+    """
+    name = normalize_interval(interval)
+    step = DERIVED_INTERVALS.get(name) or (INTERVAL_MS.get(name) if name != '1M' else None)
+    if not step:
+        raise ValueError(f"فاصل زمني غير مدعوم: {interval}")
+    return step
+
+
+def is_derived(interval: str) -> bool:
+    """هل الفاصل غير مدعوم من MEXC ويجب اشتقاقه محلياً"""
+    return normalize_interval(interval) in DERIVED_INTERVALS
+
+
+def resample(series: OHLCVSeries, step: int, offset: int = 0, complete_head: bool = False) -> OHLCVSeries:
+    """
+    تجميع سلسلة شموع إلى إطار زمني أكبر (step بالمللي ثانية)
+    وقت إغلاق كل شمعة مجمعة هو نهاية فترتها، لذلك لا تُستخدم الشمعة غير المكتملة قبل انتهائها
+
+    :param series: السلسلة الأصلية
+    :param step: مدة الإطار الجديد بالمللي ثانية
+    :param offset: إزاحة بداية الفترات عن بداية زمن يونكس (بداية الأسبوع مثلاً)
+    :param complete_head: حذف الشمعة المجمعة الأولى إذا لم تبدأ السلسلة الأصلية من بداية فترتها
+    :return: السلسلة المجمعة
+    """
+    if len(series) == 0:
+        return series
+    buckets = (series.open_time - offset) // step
+    _, starts = np.unique(buckets, return_index=True)
+    if complete_head and series.open_time[0] != buckets[0] * step + offset:
+        starts = starts[1:]
+        if len(starts) == 0:
+            return series[0:0]
+    open_time = buckets[starts] * step + offset
+    return OHLCVSeries(
+        open_time,
+        series.open[starts],
+        np.maximum.reduceat(series.high, starts),
+        np.minimum.reduceat(series.low, starts),
+        series.close[np.append(starts[1:], len(series)) - 1],
+        np.add.reduceat(series.volume, starts),
+        open_time + step - 1
+    )
+
+
+class TimeframeAggregator:
+    """
+    مصدر موحد للشموع متعددة الإطارات: سلسلة أساسية واحدة لكل (عملة، إطار أساسي)
+    تُجلب مرة واحدة في كل فترة تحديث وتُشتق منها جميع الإطارات المطلوبة
+    """
+
+    def __init__(self, base_interval: str = TIMEFRAME_BASE_INTERVAL,
+                 refresh_seconds: float = TIMEFRAME_REFRESH_SECONDS,
+                 max_rows: int = KLINE_STORE_MAX_ROWS):
+        self.base_interval = normalize_interval(base_interval)
+        self.refresh_seconds = refresh_seconds
+        self.max_rows = max_rows
+        self.lock = threading.RLock()
+        # (العملة، الإطار الأساسي) -> (السلسلة، وقت الجلب، العمق المطلوب)
+        self._bases: Dict[Tuple[str, str], Tuple[OHLCVSeries, float, int]] = {}
+        self.stats = {'base_fetches': 0, 'base_reuses': 0, 'backfills': 0, 'frames': 0}
+
+    @staticmethod
+    def rows_needed(ratio: int, limit: int) -> int:
+        """عدد الشموع الأساسية اللازمة لـ limit شمعة مجمعة (مع فترة إضافية للشمعة الأولى الناقصة)"""
+        return (int(limit) + 1) * ratio
+
+    def base_for(self, interval: str, limit: int) -> str:
+        """
+        اختيار الإطار الأساسي لإطار مطلوب: أصغر إطار مدعوم يقسم الإطار المطلوب ولا يقل عن
+        الإطار الأساسي المفضل، بشرط أن يتسع المخزن لعدد الشموع اللازمة
+
+        :param interval: الإطار المطلوب
+        :param limit: عدد الشموع المطلوبة
+        :return: اسم الإطار الأساسي (بتنسيق MEXC)
+        """
+        target = normalize_interval(interval)
+        step = interval_ms(target)
+        preferred = INTERVAL_MS.get(self.base_interval, MINUTE_MS)
+        candidates = sorted(
+            (INTERVAL_MS[name], name) for name in NATIVE_INTERVALS
+            if INTERVAL_MS[name] <= step and step % INTERVAL_MS[name] == 0
+        )
+        if not candidates:
+            return target
+        for ms, name in candidates:
+            if ms < preferred and name != target:
+                continue
+            if self.rows_needed(step // ms, limit) <= self.max_rows:
+                return name
+        # الإطار المفضل لا يقسم الإطار المطلوب (3m مع أساس 5m مثلاً): أكبر إطار أصغر منه
+        for ms, name in reversed(candidates):
+            if ms < preferred and self.rows_needed(step // ms, limit) <= self.max_rows:
+                return name
+        return candidates[-1][1]
+
+    def _fetch_base(self, symbol: str, base: str, rows: int) -> OHLCVSeries:
+        """
+        تحديث السلسلة الأساسية: جلب الشموع الجديدة فقط إذا كانت محفوظة في المخزن،
+        وإلا جلب كامل، ثم استكمال التاريخ الأقدم على دفعات إذا تجاوز العمق حد الطلب الواحد
+        """
+        from app import mexc_api
+
+        depth = min(rows, KLINE_REQUEST_LIMIT)
+        if not KLINE_STORE_ENABLED:
+            return as_ohlcv(mexc_api.get_klines(symbol, base, depth))
+
+        klines = None
+        if kline_store.needs_full_fetch(symbol, base, depth) or mexc_api.fetch_new_klines(symbol, base) is None:
+            klines = mexc_api.get_klines(symbol, base, depth)
+            if not klines:
+                return OHLCVSeries.empty()
+
+        # الشموع المتصلة فقط: شموع ما قبل فجوة توقف سابقة لا تُحتسب من العمق
+        count = kline_store.contiguous_count(symbol, base)
+        while count < rows:
+            first_open_time = kline_store.get_first_open_time(symbol, base)
+            if first_open_time is None or not mexc_api.fetch_older_klines(symbol, base, first_open_time - 1):
+                break
+            self.stats['backfills'] += 1
+            new_count = kline_store.contiguous_count(symbol, base)
+            if new_count <= count:
+                break
+            count = new_count
+
+        series = kline_store.get_recent_ohlcv(symbol, base, rows)
+        if len(series) == 0 and klines:
+            # المخزن غير متاح (أو شموع بديلة غير محفوظة): استخدام الاستجابة مباشرة
+            series = as_ohlcv(klines)
+        return series
+
+    def get_base(self, symbol: str, base: str, rows: int) -> OHLCVSeries:
+        """
+        السلسلة الأساسية لعملة بعمق rows شمعة على الأقل (يُعاد استخدامها خلال فترة التحديث)
+
+        :param symbol: رمز العملة
+        :param base: الإطار الأساسي (بتنسيق MEXC)
+        :param rows: عدد الشموع المطلوبة
+        :return: سلسلة OHLCV
+        """
+        key = (symbol, base)
+        with self.lock:
+            entry = self._bases.get(key)
+            if entry is not None:
+                series, fetched_at, depth = entry
+                if time.time() - fetched_at < self.refresh_seconds and depth >= rows:
+                    self.stats['base_reuses'] += 1
+                    return series.tail(rows)
+                # الإبقاء على أكبر عمق طُلب سابقاً حتى تخدم الجلبة التالية جميع الإطارات
+                rows = max(rows, depth)
+
+        series = self._fetch_base(symbol, base, rows)
+        with self.lock:
+            self.stats['base_fetches'] += 1
+            if len(series):
+                self._bases[key] = (series, time.time(), rows)
+        return series
+
+    def _derive(self, base_series: OHLCVSeries, base: str, interval: str, limit: int) -> OHLCVSeries:
+        """اشتقاق إطار من السلسلة الأساسية وأخذ آخر limit شمعة"""
+        target = normalize_interval(interval)
+        if target != base:
+            base_series = resample(base_series, interval_ms(target), BUCKET_OFFSETS.get(target, 0),
+                                   complete_head=True)
+            self.stats['frames'] += 1
+        return base_series.tail(int(limit))
+
+    def get_ohlcv(self, symbol: str, interval: str, limit: int = 100) -> OHLCVSeries:
+        """
+        شموع إطار زمني واحد مشتقة من السلسلة الأساسية للعملة
+
+        :param symbol: رمز العملة (بتنسيق MEXC)
+        :param interval: الإطار المطلوب (مدعوم أو مشتق مثل 2h و6h و1w)
+        :param limit: عدد الشموع
+        :return: سلسلة OHLCV (فارغة في حالة الفشل)
+        """
+        return self.get_frames(symbol, {interval: limit})[interval]
+
+    def get_klines(self, symbol: str, interval: str, limit: int = 100) -> List[Dict]:
+        """نفس get_ohlcv بتنسيق قائمة القواميس المستخدم في mexc_api.get_klines"""
+        return self.get_ohlcv(symbol, interval, limit).to_dicts()
+
+    def get_frames(self, symbol: str, limits: Dict[str, int]) -> Dict[str, OHLCVSeries]:
+        """
+        عدة إطارات لعملة واحدة بجلبة واحدة للسلسلة الأساسية المشتركة
+
+        :param symbol: رمز العملة (بتنسيق MEXC)
+        :param limits: قاموس {الإطار: عدد الشموع} مثل {'5m': 60, '15m': 48, '1h': 24}
+        :return: قاموس {الإطار: سلسلة OHLCV} بنفس مفاتيح limits
+        """
+        plan: Dict[str, Dict[str, int]] = {}
+        for interval, limit in limits.items():
+            plan.setdefault(self.base_for(interval, limit), {})[interval] = limit
+
+        frames = {}
+        for base, wanted in plan.items():
+            step = INTERVAL_MS[base]
+            rows = max(self.rows_needed(interval_ms(interval) // step, limit) for interval, limit in wanted.items())
+            try:
+                base_series = self.get_base(symbol, base, rows)
+            except Exception as e:
+                logger.error(f"خطأ في جلب السلسلة الأساسية {base} لـ {symbol}: {e}")
+                base_series = OHLCVSeries.empty()
+            for interval, limit in wanted.items():
+                frames[interval] = self._derive(base_series, base, interval, limit)
+        return frames
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """مسح السلاسل الأساسية المحفوظة في الذاكرة (لعملة محددة أو للجميع)"""
+        with self.lock:
+            if symbol is None:
+                self._bases.clear()
+            else:
+                for key in [k for k in self._bases if k[0] == symbol]:
+                    del self._bases[key]
+
+
+# نسخة عامة مشتركة
+timeframe_aggregator = TimeframeAggregator()
@@ -0,0 +1,254 @@
+"""
+إحصائيات الأداء والأرباح المحدَّثة تدريجياً
+بدلاً من تحميل تاريخ الصفقات كاملاً وإعادة فحص كل صفقة مغلقة عند كل طلب (لوحة التحكم، التقرير اليومي،
+فحص حد الخسارة اليومي) تُحفظ مجاميع جارية تُحدَّث من صفوف مخزن الصفقات المتغيرة فقط:
+- الإجماليات ونسبة النجاح
+- الأرباح والخسائر لكل يوم ولكل عملة
+- الخسارة اليومية المستخدمة مع DAILY_LOSS_LIMIT
+كل صفقة تُسجَّل مساهمتها، فتعديل صفقة أو حذفها يطرح مساهمتها القديمة ويضيف الجديدة (O(1) لكل تغيير)
+الصفقات المنقولة إلى الأرشيف تبقى مساهمتها، وإعادة البناء تقرأ الأرشيف مع المخزن
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.trade_store import trade_store, OPEN, CLOSED, ARCHIVED
+
+logger = logging.getLogger(__name__)
+
+
+def _float(value: Any, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class Contribution:
+    """مساهمة صفقة واحدة في المجاميع"""
+
+    __slots__ = ('status', 'symbol', 'result', 'result_pct', 'closed_pct', 'closed_dollar',
+                 'closed_counted', 'closed_win', 'day', 'day_pct')
+
+    def __init__(self, symbol: str, status: str, trade: Dict[str, Any]):
+        self.status = status
+        self.symbol = symbol
+        # قواعد get_performance_stats: الحقل result مع profit_pct المخزن
+        self.result = trade.get('result') if trade.get('result') in ('PROFIT', 'LOSS') else None
+        self.result_pct = _float(trade.get('profit_pct', 0)) if self.result else 0.0
+
+        # قواعد calculate_total_profit: الربح من الأسعار والكمية، وإلا profit_pct المخزن
+        self.closed_pct = 0.0
+        self.closed_dollar = 0.0
+        self.closed_counted = False
+        self.closed_win = False
+        self.day = None
+        self.day_pct = 0.0
+        if status != CLOSED:
+            return
+        entry_price = _float(trade.get('entry_price', 0))
+        close_price = _float(trade.get('close_price', 0))
+        quantity = _float(trade.get('quantity', 0))
+        if entry_price > 0 and close_price > 0 and quantity > 0:
+            self.closed_dollar = (close_price - entry_price) * quantity
+            self.closed_pct = (close_price - entry_price) / entry_price * 100
+            self.closed_counted = True
+            self.closed_win = self.closed_dollar > 0
+        elif trade.get('profit_pct') is not None:
+            self.closed_pct = _float(trade.get('profit_pct', 0))
+            self.closed_counted = True
+            self.closed_win = self.closed_pct > 0
+
+        # قواعد is_within_daily_loss_limit: يوم الإغلاق من close_timestamp مع profit_pct المخزن
+        close_timestamp = trade.get('close_timestamp')
+        if close_timestamp:
+            try:
+                self.day = datetime.fromtimestamp(float(close_timestamp) / 1000).strftime('%Y-%m-%d')
+                self.day_pct = _float(trade.get('profit_pct', 0))
+            except (TypeError, ValueError, OverflowError, OSError):
+                self.day = None
+
+
+class TradeAnalytics:
+    """مجاميع الأداء الجارية لجميع الصفقات، متزامنة مع مخزن الصفقات"""
+
+    def __init__(self, store=trade_store, archive=None):
+        self.store = store
+        # أرشيف الصفقات المغلقة (الافتراضي الأرشيف العام عند استخدام المخزن العام)
+        self.archive = archive
+        self.lock = threading.RLock()
+        self.contributions: Dict[str, Contribution] = {}
+        self.built = False
+        self.stats = {'rebuilds': 0, 'applied': 0}
+        self._reset()
+        store.add_row_listener(self.apply)
+
+    def _reset(self):
+        self.counts = {OPEN: 0, CLOSED: 0}
+        self.results = {'PROFIT': [0, 0.0], 'LOSS': [0, 0.0]}  # [العدد، مجموع profit_pct]
+        self.closed = {'count': 0, 'wins': 0, 'pct': 0.0, 'dollar': 0.0}
+        self.daily: Dict[str, Dict[str, float]] = {}
+        self.symbols: Dict[str, Dict[str, float]] = {}
+
+    # ---------- التحديث ----------
+
+    def _add(self, c: Contribution, sign: int):
+        self.counts[c.status] = self.counts.get(c.status, 0) + sign
+        if c.result:
+            entry = self.results[c.result]
+            entry[0] += sign
+            entry[1] += sign * c.result_pct
+        if c.status != CLOSED:
+            return
+        self.closed['count'] += sign
+        if c.closed_counted:
+            self.closed['pct'] += sign * c.closed_pct
+            self.closed['dollar'] += sign * c.closed_dollar
+            self.closed['wins'] += sign * c.closed_win
+        symbol = self.symbols.setdefault(c.symbol, {'trades': 0, 'wins': 0, 'profit_pct': 0.0, 'profit_dollar': 0.0})
+        symbol['trades'] += sign
+        symbol['wins'] += sign * c.closed_win
+        symbol['profit_pct'] += sign * c.closed_pct
+        symbol['profit_dollar'] += sign * c.closed_dollar
+        if not symbol['trades']:
+            del self.symbols[c.symbol]
+        if c.day:
+            day = self.daily.setdefault(c.day, {'trades': 0, 'profit': 0.0, 'loss': 0.0})
+            day['trades'] += sign
+            if c.day_pct < 0:
+                day['loss'] += sign * abs(c.day_pct)
+            else:
+                day['profit'] += sign * c.day_pct
+            if not day['trades']:
+                del self.daily[c.day]
+
+    def _archived_rows(self):
+        """صفقات الأرشيف بصيغة صفوف المخزن (يُستدعى داخل قفل المخزن حتى لا تفوت صفقة أثناء نقلها)"""
+        archive = self.archive
+        if archive is None:
+            try:
+                from app.trade_archive import trade_archive as archive
+            except Exception as e:
+                logger.error(f"تعذر تحميل أرشيف الصفقات: {e}")
+                return []
+        if archive.store is not self.store:
+            return []
+        return [(r['key'], r['symbol'], CLOSED, r['trade']) for r in archive.iter_records()]
+
+    def rebuild(self):
+        """إعادة حساب جميع المجاميع من مخزن الصفقات وأرشيفه"""
+        # قفل المخزن أولاً (نفس ترتيب الأقفال عند الكتابة)
+        with self.store.lock:
+            # صفوف المخزن بعد الأرشيف: عند التكرار تُعتمد نسخة المخزن
+            rows = self._archived_rows() + self.store.iter_rows()
+            with self.lock:
+                self._reset()
+                self.contributions = {}
+                for key, symbol, status, trade in rows:
+                    old = self.contributions.pop(key, None)
+                    if old is not None:
+                        self._add(old, -1)
+                    c = Contribution((symbol or '').upper(), status, trade)
+                    self.contributions[key] = c
+                    self._add(c, 1)
+                self.built = True
+                self.stats['rebuilds'] += 1
+        logger.info(f"تم بناء إحصائيات الأداء من {len(rows)} صفقة")
+
+    def apply(self, changes):
+        """
+        تطبيق صفوف متغيرة من مخزن الصفقات (مستمع صفوف المخزن)
+
+        :param changes: قائمة (المفتاح، الرمز، الحالة، الصفقة) أو None لإعادة البناء
+        """
+        if changes is None:
+            if self.built:
+                self.rebuild()
+            return
+        with self.lock:
+            if not self.built:
+                return
+            for key, symbol, status, trade in changes:
+                if status == ARCHIVED:
+                    # نُقلت إلى الأرشيف: المساهمة باقية كما هي
+                    continue
+                old = self.contributions.pop(key, None)
+                if old is not None:
+                    self._add(old, -1)
+                if status is not None:
+                    c = Contribution((symbol or '').upper(), status, trade or {})
+                    self.contributions[key] = c
+                    self._add(c, 1)
+                self.stats['applied'] += 1
+
+    def _ensure(self):
+        if not self.built:
+            self.rebuild()
+
+    # ---------- القراءة ----------
+
+    def performance_stats(self) -> Dict[str, Any]:
+        """إحصائيات الأداء بنفس شكل trade_executor.get_performance_stats"""
+        self._ensure()
+        with self.lock:
+            closed_trades = self.counts.get(CLOSED, 0)
+            profit_trades, total_profit = self.results['PROFIT']
+            loss_trades, total_loss = self.results['LOSS']
+            win_rate = (profit_trades / closed_trades * 100) if closed_trades > 0 else 0
+            return {
+                'total_trades': len(self.contributions),
+                'closed_trades': closed_trades,
+                'open_trades': self.counts.get(OPEN, 0),
+                'profit_trades': profit_trades,
+                'loss_trades': loss_trades,
+                'win_rate': round(win_rate, 2),
+                'total_profit': round(total_profit, 2),
+                'total_loss': round(total_loss, 2),
+                'net_profit': round(total_profit + total_loss, 2)
+            }
+
+    def total_profit(self) -> Dict[str, Any]:
+        """الربح الإجمالي للصفقات المغلقة بنفس شكل utils.calculate_total_profit"""
+        self._ensure()
+        with self.lock:
+            count = self.closed['count']
+            return {
+                'total_profit_dollar': round(self.closed['dollar'], 2),
+                'avg_profit_pct': round(self.closed['pct'] / count, 2) if count > 0 else 0,
+                'win_rate': round(self.closed['wins'] / count * 100, 2) if count > 0 else 0,
+                'num_profitable_trades': self.closed['wins'],
+                'num_closed_trades': count
+            }
+
+    def daily_pnl(self, day: Optional[str] = None) -> Dict[str, float]:
+        """
+        أرباح وخسائر يوم واحد (مجموع profit_pct للصفقات المغلقة فيه)
+
+        :param day: التاريخ بصيغة YYYY-MM-DD (الافتراضي اليوم)
+        :return: {'trades', 'profit', 'loss', 'net'}
+        """
+        self._ensure()
+        day = day or datetime.now().strftime('%Y-%m-%d')
+        with self.lock:
+            entry = self.daily.get(day, {'trades': 0, 'profit': 0.0, 'loss': 0.0})
+            return dict(entry, net=entry['profit'] - entry['loss'])
+
+    def daily_history(self) -> Dict[str, Dict[str, float]]:
+        """أرباح وخسائر كل يوم مرتبة حسب التاريخ"""
+        self._ensure()
+        with self.lock:
+            return {day: dict(v, net=v['profit'] - v['loss']) for day, v in sorted(self.daily.items())}
+
+    def symbol_pnl(self, symbol: Optional[str] = None) -> Dict[str, Any]:
+        """أرباح الصفقات المغلقة لكل عملة (أو لعملة محددة)"""
+        self._ensure()
+        with self.lock:
+            if symbol is not None:
+                return dict(self.symbols.get(symbol.upper(), {'trades': 0, 'wins': 0, 'profit_pct': 0.0,
+                                                               'profit_dollar': 0.0}))
+            return {s: dict(v) for s, v in self.symbols.items()}
+
+
+# نسخة عامة مشتركة
+trade_analytics = TradeAnalytics()
@@ -0,0 +1,376 @@
+"""
+أرشيف الصفقات المغلقة المقسم زمنياً
+المخزن الساخن (trades_store.db) يحتفظ بالصفقات المفتوحة والمغلقة حديثاً فقط، وتُنقل الصفقات المغلقة
+الأقدم من TRADE_ARCHIVE_AFTER_HOURS إلى أجزاء أرشيف ثابتة:
+- ملفات JSON Lines مضغوطة (gzip) في مجلد لكل شهر إغلاق: trade_archive/2025-05/part-<ms>.jsonl.gz
+- فهرس index.json لكل جزء: مدى وقت الإغلاق وعدد الصفقات لكل عملة، فاستعلامات الفترة والعملة
+  تفتح الأجزاء المطابقة فقط
+- الدمج (compaction) يجمع أجزاء الشهر في ملف واحد مرتب بوقت الإغلاق ويحذف المكرر
+- الأجزاء لا تُعدل بعد كتابتها، لذا النسخ الاحتياطي روابط صلبة (hard links) للأجزاء الموجودة فقط
+الفهرس هو نقطة التثبيت: جزء غير مسجل فيه بقايا عملية متوقفة ويُحذف
+"""
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.trade_store import trade_store
+from app.position_index import trade_close_time
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import (TRADE_ARCHIVE_DIR, TRADE_ARCHIVE_AFTER_HOURS, TRADE_ARCHIVE_INTERVAL,
+                            TRADE_ARCHIVE_COMPACT_PARTS)
+except (ImportError, AttributeError):
+    TRADE_ARCHIVE_DIR = 'trade_archive'
+    TRADE_ARCHIVE_AFTER_HOURS = 24
+    TRADE_ARCHIVE_INTERVAL = 3600
+    TRADE_ARCHIVE_COMPACT_PARTS = 8
+
+ARCHIVE_TASK = 'trade_archive.maintain'
+INDEX_FILE = 'index.json'
+
+
+def partition_of(closed_at: float) -> str:
+    """قسم الأرشيف (شهر الإغلاق بالتوقيت المحلي) لوقت إغلاق بالثواني"""
+    return time.strftime('%Y-%m', time.localtime(closed_at))
+
+
+class TradeArchive:
+    """أرشيف الصفقات المغلقة: أجزاء gzip JSONL ثابتة مع فهرس للفترة والعملة"""
+
+    def __init__(self, directory: str = TRADE_ARCHIVE_DIR, store=trade_store,
+                 after_hours: float = TRADE_ARCHIVE_AFTER_HOURS):
+        self.directory = directory
+        self.store = store
+        self.after_hours = after_hours
+        self.lock = threading.RLock()
+        self.segments: Optional[Dict[str, Dict[str, Any]]] = None
+        self.stats = {'archived': 0, 'compactions': 0, 'segments_read': 0, 'snapshots': 0}
+        store.add_backup_hook(self.snapshot)
+
+    # ---------- الفهرس ----------
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """تحميل الفهرس مرة واحدة (مع حذف الأجزاء غير المسجلة أو إعادة بناء فهرس مفقود)"""
+        if self.segments is not None:
+            return self.segments
+        files = self._segment_files()
+        segments = None
+        if os.path.exists(self._index_path()):
+            try:
+                with open(self._index_path(), 'r') as f:
+                    segments = json.load(f).get('segments', {})
+            except Exception as e:
+                logger.error(f"فهرس الأرشيف تالف، سيُعاد بناؤه: {e}")
+        if segments is None:
+            segments = {}
+            for name in files:
+                try:
+                    segments[name] = self._describe(self._read_segment(name), name)
+                except Exception as e:
+                    logger.error(f"تعذر قراءة جزء الأرشيف {name}: {e}")
+            if segments:
+                logger.info(f"تم إعادة بناء فهرس الأرشيف من {len(segments)} جزء")
+            self.segments = segments
+            self._save_index()
+        else:
+            for name in files:
+                if name not in segments:
+                    os.remove(os.path.join(self.directory, name))
+                    logger.info(f"حذف جزء أرشيف غير مكتمل: {name}")
+            segments = {name: meta for name, meta in segments.items()
+                        if os.path.exists(os.path.join(self.directory, name))}
+            self.segments = segments
+        return self.segments
+
+    def _segment_files(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        names = []
+        for partition in sorted(os.listdir(self.directory)):
+            folder = os.path.join(self.directory, partition)
+            if os.path.isdir(folder):
+                names.extend(f"{partition}/{name}" for name in sorted(os.listdir(folder))
+                             if name.endswith('.jsonl.gz'))
+        return names
+
+    def _save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._index_path()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': 1, 'updated': time.time(), 'segments': self.segments}, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._index_path())
+
+    @staticmethod
+    def _describe(records: List[Dict[str, Any]], name: str) -> Dict[str, Any]:
+        symbols: Dict[str, int] = {}
+        for record in records:
+            symbols[record['symbol']] = symbols.get(record['symbol'], 0) + 1
+        return {
+            'partition': name.split('/')[0],
+            'count': len(records),
+            'start': min((r['closed_at'] for r in records), default=0),
+            'end': max((r['closed_at'] for r in records), default=0),
+            'symbols': symbols,
+            'created': time.time()
+        }
+
+    # ---------- قراءة وكتابة الأجزاء ----------
+
+    def _read_segment(self, name: str) -> List[Dict[str, Any]]:
+        self.stats['segments_read'] += 1
+        with gzip.open(os.path.join(self.directory, name), 'rt', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _write_segment(self, partition: str, kind: str, records: List[Dict[str, Any]]) -> str:
+        """كتابة جزء جديد بالكامل ثم تثبيته باسمه النهائي (لا يُعدل بعدها)"""
+        folder = os.path.join(self.directory, partition)
+        os.makedirs(folder, exist_ok=True)
+        name = f"{partition}/{kind}-{int(time.time() * 1000)}.jsonl.gz"
+        path = os.path.join(self.directory, name)
+        while os.path.exists(path):
+            name = f"{name[:-len('.jsonl.gz')]}_1.jsonl.gz"
+            path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                for record in records:
+                    f.write((json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8'))
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+        return name
+
+    # ---------- الأرشفة والدمج ----------
+
+    def archive_closed(self, before: Optional[float] = None) -> int:
+        """
+        نقل الصفقات المغلقة قبل وقت محدد من المخزن الساخن إلى الأرشيف
+
+        :param before: وقت الإغلاق الأقصى بالثواني (الافتراضي الآن - TRADE_ARCHIVE_AFTER_HOURS)
+        :return: عدد الصفقات المنقولة
+        """
+        before = before if before is not None else time.time() - self.after_hours * 3600
+        by_partition: Dict[str, List[Dict[str, Any]]] = {}
+        for key, symbol, status, trade in self.store.get_closed_rows():
+            closed_at = trade_close_time(trade)
+            if closed_at is None or closed_at >= before:
+                continue
+            by_partition.setdefault(partition_of(closed_at), []).append({
+                'key': key, 'symbol': (symbol or '').upper(), 'closed_at': closed_at, 'trade': trade
+            })
+        if not by_partition:
+            return 0
+        with self.lock:
+            segments = self._load()
+            keys = []
+            for partition, records in sorted(by_partition.items()):
+                records.sort(key=lambda r: r['closed_at'])
+                name = self._write_segment(partition, 'part', records)
+                segments[name] = self._describe(records, name)
+                keys.extend(r['key'] for r in records)
+            # تثبيت الأجزاء في الفهرس قبل حذف الصفوف: التوقف بينهما يترك نسخة مكررة فقط (تُزال عند الدمج)
+            self._save_index()
+        moved = self.store.remove_archived(keys)
+        self.stats['archived'] += moved
+        logger.info(f"تمت أرشفة {moved} صفقة مغلقة في {len(by_partition)} قسم")
+        return moved
+
+    def compact(self, partition: Optional[str] = None, force: bool = False) -> int:
+        """
+        دمج أجزاء كل قسم في ملف واحد مرتب بوقت الإغلاق (مع حذف الصفقات المكررة)
+        الأقسام المنتهية تُدمج عند وجود أكثر من جزء، والشهر الحالي عند تجاوز TRADE_ARCHIVE_COMPACT_PARTS
+
+        :param partition: قسم محدد (الافتراضي جميع الأقسام)
+        :param force: دمج القسم حتى لو لم يبلغ الحد
+        :return: عدد الأقسام المدمجة
+        """
+        current = partition_of(time.time())
+        compacted = 0
+        with self.lock:
+            segments = self._load()
+            partitions: Dict[str, List[str]] = {}
+            for name, meta in segments.items():
+                partitions.setdefault(meta['partition'], []).append(name)
+            for part, names in sorted(partitions.items()):
+                if partition is not None and part != partition:
+                    continue
+                limit = TRADE_ARCHIVE_COMPACT_PARTS if part == current and not force else 1
+                if len(names) <= limit:
+                    continue
+                merged: Dict[str, Dict[str, Any]] = {}
+                for name in sorted(names, key=lambda n: segments[n]['created']):
+                    for record in self._read_segment(name):
+                        merged[record['key']] = record
+                records = sorted(merged.values(), key=lambda r: r['closed_at'])
+                new_name = self._write_segment(part, 'compact', records)
+                for name in names:
+                    del segments[name]
+                segments[new_name] = self._describe(records, new_name)
+                self._save_index()
+                for name in names:
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+                compacted += 1
+                self.stats['compactions'] += 1
+                logger.info(f"تم دمج {len(names)} جزء من القسم {part} ({len(records)} صفقة)")
+        return compacted
+
+    def maintain(self):
+        """دورة الأرشفة والدمج (مهمة دورية في محرك التداول)"""
+        self.archive_closed()
+        self.compact()
+
+    # ---------- الاستعلامات ----------
+
+    def _matching(self, start: Optional[float], end: Optional[float],
+                  symbol: Optional[str]) -> List[Tuple[str, Dict[str, Any]]]:
+        with self.lock:
+            segments = dict(self._load())
+        matching = []
+        for name, meta in segments.items():
+            if start is not None and meta['end'] < start:
+                continue
+            if end is not None and meta['start'] > end:
+                continue
+            if symbol is not None and symbol not in meta['symbols']:
+                continue
+            matching.append((name, meta))
+        return matching
+
+    def iter_records(self, start: Optional[float] = None, end: Optional[float] = None,
+                     symbol: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        سجلات الأرشيف المطابقة {'key', 'symbol', 'closed_at', 'trade'} بدون تكرار
+        (تُفتح الأجزاء التي يطابقها الفهرس فقط)
+
+        :param start: بداية فترة الإغلاق بالثواني
+        :param end: نهاية فترة الإغلاق بالثواني
+        :param symbol: رمز العملة
+        """
+        symbol = symbol.upper() if symbol else None
+        seen = set()
+        matching = self._matching(start, end, symbol)
+        # الأجزاء الأحدث أولاً: عند التكرار تُعتمد آخر نسخة مؤرشفة
+        for name, meta in sorted(matching, key=lambda item: item[1]['created'], reverse=True):
+            try:
+                records = self._read_segment(name)
+            except FileNotFoundError:
+                continue
+            for record in records:
+                if record['key'] in seen:
+                    continue
+                if start is not None and record['closed_at'] < start:
+                    continue
+                if end is not None and record['closed_at'] > end:
+                    continue
+                if symbol is not None and record['symbol'] != symbol:
+                    continue
+                seen.add(record['key'])
+                yield record
+
+    def history(self, start: Optional[float] = None, end: Optional[float] = None,
+                symbol: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        الصفقات المغلقة من المخزن الساخن والأرشيف معاً، الأحدث إغلاقاً أولاً
+
+        :param start: بداية فترة الإغلاق بالثواني
+        :param end: نهاية فترة الإغلاق بالثواني
+        :param symbol: رمز العملة
+        :param limit: الحد الأقصى لعدد الصفقات
+        :return: قائمة الصفقات
+        """
+        symbol = symbol.upper() if symbol else None
+        found: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        for key, row_symbol, status, trade in self.store.get_closed_rows():
+            closed_at = trade_close_time(trade) or 0
+            if symbol is not None and (row_symbol or '').upper() != symbol:
+                continue
+            if (start is not None and closed_at < start) or (end is not None and closed_at > end):
+                continue
+            found[key] = (closed_at, trade)
+
+        def cutoff() -> Optional[float]:
+            if limit is None or len(found) < limit:
+                return None
+            return sorted((v[0] for v in found.values()), reverse=True)[limit - 1]
+
+        # الأقسام من الأحدث: التوقف عندما لا يمكن لجزء أن يحتوي صفقة ضمن الأحدث المطلوبة
+        for name, meta in sorted(self._matching(start, end, symbol), key=lambda item: item[1]['end'], reverse=True):
+            oldest_needed = cutoff()
+            if oldest_needed is not None and meta['end'] < oldest_needed:
+                break
+            for record in self._read_segment(name):
+                if record['key'] in found:
+                    continue
+                if symbol is not None and record['symbol'] != symbol:
+                    continue
+                closed_at = record['closed_at']
+                if (start is not None and closed_at < start) or (end is not None and closed_at > end):
+                    continue
+                found[record['key']] = (closed_at, record['trade'])
+        trades = [trade for _, trade in sorted(found.values(), key=lambda v: v[0], reverse=True)]
+        return trades[:limit] if limit is not None else trades
+
+    # ---------- النسخ الاحتياطي ----------
+
+    def snapshot(self, backup_path: str) -> str:
+        """
+        نسخة احتياطية تزايدية للأرشيف بجانب نسخة المخزن: روابط صلبة للأجزاء الثابتة ونسخة من الفهرس
+        (الجزء الموجود في نسخة سابقة لا يشغل مساحة إضافية)
+
+        :param backup_path: مسار نسخة المخزن الاحتياطية
+        :return: مجلد نسخة الأرشيف أو "" إذا كان الأرشيف فارغاً
+        """
+        with self.lock:
+            segments = self._load()
+            if not segments:
+                return ""
+            target = f"{backup_path}.archive"
+            for name in segments:
+                destination = os.path.join(target, name)
+                if os.path.exists(destination):
+                    continue
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                try:
+                    os.link(os.path.join(self.directory, name), destination)
+                except OSError:
+                    shutil.copy2(os.path.join(self.directory, name), destination)
+            shutil.copy2(self._index_path(), os.path.join(target, INDEX_FILE))
+        self.stats['snapshots'] += 1
+        return target
+
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات الأرشيف"""
+        with self.lock:
+            segments = self._load()
+            return {
+                'segments': len(segments),
+                'trades': sum(meta['count'] for meta in segments.values()),
+                'partitions': sorted({meta['partition'] for meta in segments.values()}),
+                'stats': dict(self.stats)
+            }
+
+
+# نسخة عامة مشتركة
+trade_archive = TradeArchive()
+
+
+def start_archiving():
+    """تسجيل الأرشفة والدمج الدوري في محرك التداول"""
+    from app.engine import trading_engine
+    trading_engine.register(ARCHIVE_TASK, trade_archive.maintain, TRADE_ARCHIVE_INTERVAL,
+                            error_interval=600, exclusive=True, initial_delay=60)
@@ -6,10 +6,14 @@ import logging
 import threading
 from datetime import datetime
 # استخدام مدير المنصات بدلاً من MEXC مباشرة
-from app.exchange_manager import get_current_price, get_open_orders, ACTIVE_EXCHANGE, place_order, get_balance
+from app.exchange_manager import get_current_price, get_open_orders, ACTIVE_EXCHANGE, place_order, get_balance, get_account_balance
 from app.trade_logic import close_trade
 from app.config import TAKE_PROFIT, TAKE_PROFIT_2, TAKE_PROFIT_3, STOP_LOSS, MIN_TRADE_AMOUNT, BASE_CURRENCY, SMART_STOP_THRESHOLD, TIMEFRAMES, USE_MULTI_TIMEFRAME
 from app.telegram_notify import send_telegram_message
+from app.trade_store import trade_store
+from app.order_tracker import order_tracker
+from app.trade_analytics import trade_analytics
+from app.engine import trading_engine
 
 # استخدام نظام منع التكرار المحسّن
 try:
@@ -29,32 +33,79 @@ LOCK = threading.Lock()
 
 def load_trades():
     """
-    تحميل الصفقات من ملف JSON
+    تحميل الصفقات من مخزن الصفقات
     
     :return: قائمة بالصفقات المحملة
     """
     try:
-        if os.path.exists(TRADES_FILE):
-            with open(TRADES_FILE, 'r') as f:
-                return json.load(f)
-        return []
+        return trade_store.load_list()
     except Exception as e:
         logger.error(f"Error loading trades: {e}")
         return []
 
 def save_trades(trades):
     """
-    حفظ الصفقات في ملف JSON
+    حفظ الصفقات في مخزن الصفقات (تُكتب الصفقات المتغيرة فقط)
     
     :param trades: قائمة بالصفقات
     """
     try:
         with LOCK:
-            with open(TRADES_FILE, 'w') as f:
-                json.dump(trades, f, indent=2)
+            trade_store.save_list(trades)
     except Exception as e:
         logger.error(f"Error saving trades: {e}")
 
+def close_stale_local_trades(api_open_orders):
+    """
+    إغلاق الصفقات المفتوحة محلياً التي لم يعد لها أمر مفتوح أو رصيد على المنصة
+    (save_all يضيف ويحدث فقط ولا يحذف، لذا يجب إغلاق هذه الصفقات صراحةً)
+    
+    :param api_open_orders: الأوامر المفتوحة من المنصة
+    :return: عدد الصفقات المغلقة
+    """
+    api_order_ids = {str(o.get('orderId')) for o in api_open_orders if o.get('orderId')}
+    
+    # أرصدة الحساب: إذا تعذر جلبها لا نغلق أي صفقة بسبب الرصيد
+    account_balances = get_account_balance()
+    assets_with_balance = None
+    if account_balances and isinstance(account_balances, dict):
+        assets_with_balance = set()
+        for asset, balance_info in account_balances.items():
+            if balance_info and isinstance(balance_info, dict):
+                if float(balance_info.get('free', 0)) > 0 or float(balance_info.get('locked', 0)) > 0:
+                    assets_with_balance.add(asset)
+    
+    closed_count = 0
+    for trade in trade_store.get_open_trades():
+        symbol = trade.get('symbol', '')
+        timestamp = trade.get('timestamp')
+        order_id = str(trade.get('orderId') or trade.get('order_id') or '')
+        
+        # أوامر الشراء بانتظار تأكيد التنفيذ في الخلفية تبقى مفتوحة
+        if order_tracker.is_pending(order_id) or trade.get('confirmation') == 'PENDING':
+            continue
+        if not symbol or timestamp is None or order_id in api_order_ids:
+            continue
+        
+        close_reason = None
+        if trade.get('metadata', {}).get('api_source') == 'open_orders':
+            # صفقة مأخوذة من أمر مفتوح سابق: الأمر لم يعد مفتوحاً على المنصة
+            close_reason = 'ORDER_NOT_OPEN'
+        elif assets_with_balance is not None and symbol.replace(BASE_CURRENCY, '') not in assets_with_balance:
+            # صفقة منفذة ولم يعد لدينا رصيد من العملة
+            close_reason = 'NO_BALANCE'
+        
+        if close_reason:
+            closed = trade_store.close_trade(symbol, timestamp, {
+                'close_reason': close_reason,
+                'close_timestamp': int(time.time() * 1000)
+            })
+            if closed:
+                closed_count += 1
+                logger.warning(f"إغلاق صفقة محلية غير موجودة على المنصة: {symbol} - السبب: {close_reason}")
+    
+    return closed_count
+
 def get_open_trades():
     """
     الحصول على الصفقات المفتوحة مباشرة من المنصة النشطة (OKX/MEXC) أو من الملف المحلي إذا تعذر ذلك
@@ -93,19 +144,14 @@ def get_open_trades():
                     }
                     real_trades.append(trade)
                 
-                # تحديث الملف المحلي بالبيانات الحقيقية من API
+                # تحديث المخزن المحلي بالبيانات الحقيقية من API
                 try:
-                    local_trades = load_trades()
-                    
-                    # الاحتفاظ فقط بالصفقات المغلقة من الملف المحلي
-                    closed_trades = [t for t in local_trades if t.get('status') == 'CLOSED']
+                    # إغلاق الصفقات المحلية التي لم يعد لها أمر أو رصيد على المنصة
+                    closed_count = close_stale_local_trades(api_open_orders)
                     
-                    # دمج الصفقات المفتوحة من API مع الصفقات المغلقة
-                    all_trades = closed_trades + real_trades
-                    
-                    # حفظ البيانات المحدثة
-                    save_trades(all_trades)
-                    logger.info(f"تم تحديث ملف الصفقات: {len(real_trades)} مفتوحة، {len(closed_trades)} مغلقة")
+                    # إضافة/تحديث الصفقات المفتوحة من API
+                    save_trades(real_trades)
+                    logger.info(f"تم تحديث مخزن الصفقات: {len(real_trades)} مفتوحة من API، {closed_count} مغلقة لعدم وجودها على المنصة")
                 except Exception as e:
                     logger.error(f"خطأ في مزامنة بيانات الصفقات: {e}")
                 
@@ -161,12 +207,8 @@ def execute_trade(symbol, quantity):
         
         # ===== فحص التنويع الإلزامي بطريقة مباشرة ومتعددة الطبقات =====
         try:
-            # فحص مباشر لملف قاعدة البيانات (الطبقة الأولى)
-            with open('active_trades.json', 'r') as f:
-                all_trades = json.load(f)
-                
-            # فحص وجود أي صفقة مفتوحة لهذه العملة
-            symbol_trades = [t for t in all_trades if t.get('symbol') == symbol and t.get('status') == 'OPEN']
+            # فحص مباشر لمخزن الصفقات (الطبقة الأولى)
+            symbol_trades = trade_store.get_open_trades(symbol)
             
             if len(symbol_trades) > 0:
                 logger.error(f"⛔⛔⛔ منع تداول {symbol} - يوجد بالفعل {len(symbol_trades)} صفقة مفتوحة على هذه العملة ⛔⛔⛔")
@@ -193,11 +235,8 @@ def execute_trade(symbol, quantity):
             
         # الطبقة الثالثة - فحص نهائي اضافي
         try:
-            # إعادة قراءة الملف للتأكد من عدم تغييره بعد الفحوصات السابقة
-            with open('active_trades.json', 'r') as f:
-                final_trades = json.load(f)
-                
-            final_symbols = set([t.get('symbol') for t in final_trades if t.get('status') == 'OPEN'])
+            # إعادة قراءة المخزن للتأكد من عدم تغييره بعد الفحوصات السابقة
+            final_symbols = set([t.get('symbol') for t in trade_store.get_open_trades()])
             
             if symbol in final_symbols:
                 logger.error(f"⛔⛔⛔ منع نهائي لتداول {symbol} - وُجدت في قائمة العملات المتداولة: {final_symbols} ⛔⛔⛔")
@@ -636,7 +675,7 @@ def check_trades():
                     # نحاول تحليل الإطارات الزمنية المتعددة قبل اتخاذ القرار
                     from app.config import TIMEFRAMES, USE_MULTI_TIMEFRAME
                     from app.ai_model import analyze_market_sentiment, predict_trend
-                    from app.exchange_manager import get_klines
+                    from app.exchange_manager import get_timeframes
                     
                     # متغيرات التحليل
                     trend_1h = 'neutral'
@@ -645,10 +684,11 @@ def check_trades():
                     sentiment_value = 'neutral'
                     
                     if USE_MULTI_TIMEFRAME:
-                        # جلب بيانات الإطارات الزمنية للتحليل
-                        klines_1h = get_klines(symbol, TIMEFRAMES["trend"], 25)
-                        klines_15m = get_klines(symbol, TIMEFRAMES["signal"], 30)
-                        klines_5m = get_klines(symbol, TIMEFRAMES["entry"], 20)
+                        # جلب بيانات الإطارات الزمنية للتحليل (مشتقة من سلسلة أساسية واحدة)
+                        frames = get_timeframes(symbol, {TIMEFRAMES["trend"]: 25, TIMEFRAMES["signal"]: 30, TIMEFRAMES["entry"]: 20})
+                        klines_1h = frames[TIMEFRAMES["trend"]]
+                        klines_15m = frames[TIMEFRAMES["signal"]]
+                        klines_5m = frames[TIMEFRAMES["entry"]]
                         
                         # تحليل الاتجاهات
                         if klines_1h and len(klines_1h) >= 10:
@@ -711,7 +751,7 @@ def check_trades():
             elif current_price <= t.get('stop_loss'):
                 from app.config import TIMEFRAMES, USE_MULTI_TIMEFRAME
                 from app.ai_model import analyze_market_sentiment, identify_trend_reversal, predict_trend
-                from app.exchange_manager import get_klines
+                from app.exchange_manager import get_klines, get_timeframes
 
                 # متغير للتتبع إذا تم تحليل الإطارات الزمنية أم لا
                 multi_timeframe_analyzed = False
@@ -726,10 +766,11 @@ def check_trades():
                 
                 try:
                     if USE_MULTI_TIMEFRAME:
-                        # 1. جلب بيانات من ثلاثة إطارات زمنية
-                        klines_1h = get_klines(symbol, TIMEFRAMES["trend"], 25)  # إطار ساعة (اتجاه)
-                        klines_15m = get_klines(symbol, TIMEFRAMES["signal"], 30)  # إطار 15 دقيقة (إشارة)
-                        klines_5m = get_klines(symbol, TIMEFRAMES["entry"], 20)  # إطار 5 دقائق (دخول)
+                        # 1. جلب بيانات ثلاثة إطارات زمنية مشتقة من سلسلة أساسية واحدة
+                        frames = get_timeframes(symbol, {TIMEFRAMES["trend"]: 25, TIMEFRAMES["signal"]: 30, TIMEFRAMES["entry"]: 20})
+                        klines_1h = frames[TIMEFRAMES["trend"]]  # إطار ساعة (اتجاه)
+                        klines_15m = frames[TIMEFRAMES["signal"]]  # إطار 15 دقيقة (إشارة)
+                        klines_5m = frames[TIMEFRAMES["entry"]]  # إطار 5 دقائق (دخول)
                         
                         # 2. تحليل الاتجاه في كل إطار زمني
                         if klines_1h and len(klines_1h) >= 10:
@@ -871,28 +912,19 @@ def check_trades():
     except Exception as e:
         logger.error(f"Error checking trades: {e}")
 
-def monitor_trades():
-    """
-    مراقبة الصفقات في خلفية التشغيل
-    """
-    global BOT_RUNNING
-    while BOT_RUNNING:
-        try:
-            check_trades()
-            time.sleep(5)
-        except Exception as e:
-            logger.error(f"Error in monitor_trades: {e}")
-            time.sleep(30)  # أخذ استراحة أطول في حالة حدوث خطأ
+# اسم مهمة مراقبة الصفقات في محرك التداول الموحد
+MONITOR_TRADES_TASK = 'trade_executor.monitor'
 
 def start_bot():
     """
-    بدء تشغيل البوت
+    بدء تشغيل البوت (مراقبة الصفقات كل 5 ثوانٍ كمهمة في محرك التداول الموحد)
     """
     global BOT_RUNNING
     if not BOT_RUNNING:
         BOT_RUNNING = True
-        thread = threading.Thread(target=monitor_trades, daemon=True)
-        thread.start()
+        # أخذ استراحة أطول (30 ثانية) بعد دورة فاشلة
+        trading_engine.register(MONITOR_TRADES_TASK, check_trades, 5, error_interval=30,
+                                exclusive=True, uses_prices=True)
         logger.info("Bot started")
         send_telegram_message("🟢 تم تشغيل بوت التداول")
 
@@ -903,6 +935,7 @@ def stop_bot():
     global BOT_RUNNING
     if BOT_RUNNING:
         BOT_RUNNING = False
+        trading_engine.unregister(MONITOR_TRADES_TASK)
         logger.info("Bot stopped")
         send_telegram_message("🔴 تم إيقاف بوت التداول")
 
@@ -913,33 +946,8 @@ def get_performance_stats():
     :return: قاموس بإحصائيات الأداء
     """
     try:
-        trades = load_trades()
-        
-        total_trades = len(trades)
-        closed_trades = len([t for t in trades if t.get('status') == 'CLOSED'])
-        open_trades = len([t for t in trades if t.get('status') == 'OPEN'])
-        
-        profit_trades = len([t for t in trades if t.get('result') == 'PROFIT'])
-        loss_trades = len([t for t in trades if t.get('result') == 'LOSS'])
-        
-        win_rate = (profit_trades / closed_trades * 100) if closed_trades > 0 else 0
-        
-        total_profit = sum([t.get('profit_pct', 0) for t in trades if t.get('result') == 'PROFIT'])
-        total_loss = sum([t.get('profit_pct', 0) for t in trades if t.get('result') == 'LOSS'])
-        
-        net_profit = total_profit + total_loss
-        
-        return {
-            'total_trades': total_trades,
-            'closed_trades': closed_trades,
-            'open_trades': open_trades,
-            'profit_trades': profit_trades,
-            'loss_trades': loss_trades,
-            'win_rate': round(win_rate, 2),
-            'total_profit': round(total_profit, 2),
-            'total_loss': round(total_loss, 2),
-            'net_profit': round(net_profit, 2)
-        }
+        # مجاميع جارية تُحدَّث عند تغير الصفقات بدلاً من فحص السجل كاملاً
+        return trade_analytics.performance_stats()
     except Exception as e:
         logger.error(f"Error getting performance stats: {e}")
         return {
@@ -0,0 +1,296 @@
+"""
+سجل أحداث الصفقات (write-ahead journal) مع نقاط تثبيت واستعادة بالإعادة
+- كل تغيير في مخزن الصفقات يُضاف كسطر JSON صغير إلى trades_journal.jsonl (opened، updated، closed،
+  archived، removed) بدلاً من نسخ قاعدة البيانات كاملة عند كل دورة
+- الكتابة على القرص مجمعة: fsync مرة كل TRADE_JOURNAL_FSYNC_INTERVAL ثانية من خيط خلفي
+- نقطة التثبيت (checkpoint) نسخة احتياطية متسقة من المخزن مع رقم آخر حدث فيها، ثم يُفرغ السجل
+- عند بدء التشغيل إذا كانت قاعدة الصفقات مفقودة أو تالفة تُستعاد من آخر نقطة تثبيت
+  مع إعادة تطبيق أحداث السجل اللاحقة لها
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.trade_store import trade_store, OPEN, CLOSED, ARCHIVED
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import TRADE_JOURNAL_PATH, TRADE_JOURNAL_FSYNC_INTERVAL, TRADE_JOURNAL_CHECKPOINT_INTERVAL
+except (ImportError, AttributeError):
+    TRADE_JOURNAL_PATH = 'trades_journal.jsonl'
+    TRADE_JOURNAL_FSYNC_INTERVAL = 1.0
+    TRADE_JOURNAL_CHECKPOINT_INTERVAL = 3600
+
+CHECKPOINT_TASK = 'trade_journal.checkpoint'
+
+# أحداث تحذف الصف من الحالة عند الإعادة
+REMOVE_EVENTS = ('archived', 'removed')
+
+
+class TradeJournal:
+    """سجل إلحاقي لأحداث الصفقات مع fsync مجمع ونقاط تثبيت"""
+
+    def __init__(self, store=trade_store, path: str = TRADE_JOURNAL_PATH,
+                 fsync_interval: float = TRADE_JOURNAL_FSYNC_INTERVAL,
+                 checkpoint_interval: float = TRADE_JOURNAL_CHECKPOINT_INTERVAL):
+        self.store = store
+        self.path = path
+        self.checkpoint_path = f"{path}.checkpoint"
+        self.fsync_interval = fsync_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.lock = threading.RLock()
+        # قفل الكتابة على الملف: دفعة واحدة في كل مرة وبترتيب الأحداث
+        self.io_lock = threading.Lock()
+        self.pending: List[Dict[str, Any]] = []
+        self.statuses: Optional[Dict[str, str]] = None
+        self.seq: Optional[int] = None
+        self.file = None
+        self.replaying = False
+        self.last_checkpoint = 0.0
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.stats = {'events': 0, 'flushes': 0, 'checkpoints': 0, 'replayed': 0}
+        store.add_row_listener(self.record)
+
+    # ---------- التسجيل ----------
+
+    def _init_seq(self):
+        """آخر رقم حدث من نقطة التثبيت والسجل الحالي"""
+        checkpoint = self.read_checkpoint()
+        seq = checkpoint.get('seq', 0) if checkpoint else 0
+        for event in self.read_events():
+            seq = max(seq, event.get('seq', 0))
+        self.seq = seq
+        if checkpoint:
+            self.last_checkpoint = checkpoint.get('time', 0)
+
+    def _next(self, event: str, **fields) -> Dict[str, Any]:
+        self.seq += 1
+        self.stats['events'] += 1
+        return dict(seq=self.seq, ts=round(time.time(), 3), event=event, **fields)
+
+    def record(self, changes):
+        """
+        تسجيل صفوف متغيرة من مخزن الصفقات (مستمع صفوف المخزن، يُستدعى داخل قفل المخزن فيحفظ الترتيب)
+
+        :param changes: قائمة (المفتاح، الرمز، الحالة، الصفقة) أو None لتعديلات غير محددة
+        """
+        if self.replaying:
+            return
+        with self.lock:
+            if self.seq is None:
+                self._init_seq()
+            if self.statuses is None or changes is None:
+                rows = self.store.iter_rows()
+                self.statuses = {key: status for key, _, status, _ in rows}
+                if changes is None:
+                    # تعديلات غير معروفة الصفوف: لقطة كاملة للحالة
+                    self.pending.append(self._next('snapshot', rows=[list(row) for row in rows]))
+                    self._start()
+                    return
+            for key, symbol, status, trade in changes:
+                previous = self.statuses.get(key)
+                if status is None:
+                    event = 'removed'
+                    self.statuses.pop(key, None)
+                elif status == ARCHIVED:
+                    event = 'archived'
+                    self.statuses.pop(key, None)
+                else:
+                    if status == CLOSED and previous != CLOSED:
+                        event = 'closed'
+                    elif status == OPEN and previous is None:
+                        event = 'opened'
+                    else:
+                        event = 'updated'
+                    self.statuses[key] = status
+                self.pending.append(self._next(event, key=key, symbol=symbol, status=status,
+                                               trade=trade if event not in REMOVE_EVENTS else None))
+        self._start()
+
+    # ---------- الكتابة على القرص ----------
+
+    def _start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._loop, daemon=True, name='trade_journal')
+            self.thread.start()
+
+    def _loop(self):
+        while True:
+            self.wakeup.wait(self.fsync_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"خطأ في كتابة سجل الصفقات: {e}")
+
+    def flush(self) -> int:
+        """كتابة الأحداث المعلقة مع fsync واحد للدفعة"""
+        with self.io_lock:
+            with self.lock:
+                batch, self.pending = self.pending, []
+            if not batch:
+                return 0
+            if self.file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self.file = open(self.path, 'a', encoding='utf-8')
+            self.file.write(''.join(json.dumps(e, ensure_ascii=False, default=str) + '\n' for e in batch))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.stats['flushes'] += 1
+            return len(batch)
+
+    def read_events(self) -> List[Dict[str, Any]]:
+        """أحداث السجل الحالي (السطر الأخير غير المكتمل بعد توقف مفاجئ يُتجاهل)"""
+        events = []
+        if not os.path.exists(self.path):
+            return events
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    logger.warning("تجاهل سطر غير مكتمل في سجل الصفقات")
+        return events
+
+    # ---------- نقاط التثبيت ----------
+
+    def read_checkpoint(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"تعذر قراءة نقطة تثبيت سجل الصفقات: {e}")
+            return None
+
+    def checkpoint(self, force: bool = False) -> str:
+        """
+        نقطة تثبيت: نسخة احتياطية متسقة من المخزن ثم تفريغ السجل
+        قبل حلول موعدها (TRADE_JOURNAL_CHECKPOINT_INTERVAL) تكتفي بكتابة الأحداث المعلقة
+
+        :param force: إنشاء نقطة تثبيت فوراً
+        :return: مسار النسخة الاحتياطية أو "" إذا لم تُنشأ
+        """
+        if not force and time.time() - self.last_checkpoint < self.checkpoint_interval:
+            self.flush()
+            return ""
+        # قفل المخزن: لا تُسجل أحداث جديدة بين النسخة ورقم آخر حدث فيها
+        with self.store.lock:
+            with self.lock:
+                if self.seq is None:
+                    self._init_seq()
+            self.flush()
+            backup_path = self.store.backup(force=True)
+            now = time.time()
+            tmp_path = f"{self.checkpoint_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'seq': self.seq, 'backup': backup_path, 'time': now}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.checkpoint_path)
+            with self.io_lock:
+                if self.file is not None:
+                    self.file.close()
+                self.file = open(self.path, 'w', encoding='utf-8')
+                os.fsync(self.file.fileno())
+            self.last_checkpoint = now
+            self.stats['checkpoints'] += 1
+        logger.info(f"نقطة تثبيت لسجل الصفقات عند الحدث {self.seq}: {backup_path}")
+        return backup_path
+
+    # ---------- الاستعادة ----------
+
+    @staticmethod
+    def _backup_rows(backup_path: str) -> Dict[str, Tuple[str, str, Dict[str, Any]]]:
+        conn = sqlite3.connect(backup_path)
+        try:
+            rows = conn.execute("SELECT trade_key, symbol, status, data FROM trades").fetchall()
+        finally:
+            conn.close()
+        return {key: (symbol, status, json.loads(data)) for key, symbol, status, data in rows}
+
+    def replay(self) -> Dict[str, Tuple[str, str, Dict[str, Any]]]:
+        """
+        الحالة من آخر نقطة تثبيت مع أحداث السجل اللاحقة لها
+
+        :return: مفتاح الصفقة -> (الرمز، الحالة، الصفقة)
+        """
+        checkpoint = self.read_checkpoint() or {}
+        rows: Dict[str, Tuple[str, str, Dict[str, Any]]] = {}
+        backup_path = checkpoint.get('backup')
+        if backup_path and os.path.exists(backup_path):
+            rows = self._backup_rows(backup_path)
+        elif backup_path:
+            logger.error(f"نسخة نقطة التثبيت غير موجودة: {backup_path}")
+        applied = 0
+        for event in self.read_events():
+            if event.get('seq', 0) <= checkpoint.get('seq', 0):
+                continue
+            if event['event'] == 'snapshot':
+                rows = {key: (symbol, status, trade) for key, symbol, status, trade in event['rows']}
+            elif event['event'] in REMOVE_EVENTS:
+                rows.pop(event['key'], None)
+            else:
+                rows[event['key']] = (event['symbol'], event['status'], event['trade'])
+            applied += 1
+        self.stats['replayed'] += applied
+        return rows
+
+    def recover(self) -> int:
+        """
+        استعادة قاعدة الصفقات إذا كانت مفقودة أو تالفة عند بدء التشغيل
+
+        :return: عدد الصفقات المستعادة
+        """
+        with self.store.lock:
+            self.store._connect()
+            if not self.store.needs_recovery:
+                return 0
+            rows = self.replay()
+            self.replaying = True
+            try:
+                restored = self.store.restore_rows(rows)
+            finally:
+                self.replaying = False
+            with self.lock:
+                self.statuses = None
+        if restored:
+            logger.warning(f"تمت استعادة {restored} صفقة من نقطة التثبيت وسجل الأحداث")
+            self.checkpoint(force=True)
+        return restored
+
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات السجل"""
+        with self.lock:
+            return {
+                'seq': self.seq,
+                'pending': len(self.pending),
+                'last_checkpoint': self.last_checkpoint,
+                'stats': dict(self.stats)
+            }
+
+
+# نسخة عامة مشتركة
+trade_journal = TradeJournal()
+atexit.register(trade_journal.flush)
+
+
+def start_journal():
+    """استعادة المخزن عند الحاجة وتسجيل نقاط التثبيت الدورية في محرك التداول"""
+    try:
+        trade_journal.recover()
+    except Exception as e:
+        logger.error(f"خطأ في استعادة الصفقات من السجل: {e}")
+    from app.engine import trading_engine
+    trading_engine.register(CHECKPOINT_TASK, trade_journal.checkpoint, TRADE_JOURNAL_CHECKPOINT_INTERVAL,
+                            error_interval=600, exclusive=True, initial_delay=TRADE_JOURNAL_CHECKPOINT_INTERVAL)
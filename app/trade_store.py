@@ -0,0 +1,610 @@
+"""
+مخزن الصفقات المعاملاتي (SQLite بوضع WAL)
+- كل صفقة صف مستقل مع فهارس على الرمز والحالة ورقم الأمر، فتحديث صفقة واحدة يكتب صفاً واحداً
+  بدلاً من إعادة كتابة ملف active_trades.json بالكامل
+- ترحيل تلقائي لمرة واحدة من ملف JSON القديم
+- طبقة توافق load_all()/save_all() بنفس شكل {'open': [...], 'closed': [...]} المستخدم في الشيفرة القديمة
+  (save_all تكتب الصفوف المتغيرة فقط داخل معاملة واحدة، ولا تحذف صفوفاً أبداً: اللقطة قد تكون قديمة)
+"""
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from app.config import TRADE_STORE_PATH, TRADES_JSON_PATH, TRADE_BACKUP_MIN_INTERVAL
+except (ImportError, AttributeError):
+    TRADE_STORE_PATH = 'trades_store.db'
+    TRADES_JSON_PATH = 'active_trades.json'
+    TRADE_BACKUP_MIN_INTERVAL = 3600
+
+try:
+    from app.config import TRADE_BACKUP_KEEP
+except (ImportError, AttributeError):
+    TRADE_BACKUP_KEEP = 24
+
+OPEN = 'OPEN'
+CLOSED = 'CLOSED'
+# حالة تظهر في تغييرات الصفوف فقط: صفقة مغلقة نُقلت من المخزن إلى الأرشيف (لم تُحذف)
+ARCHIVED = 'ARCHIVED'
+
+# أقصى عدد مفاتيح في استعلام IN واحد (حد متغيرات SQLite القديم 999)
+SYNC_CHUNK = 500
+
+# تغيير صف واحد: (مفتاح الصفقة، الرمز، الحالة، الصفقة) - الحالة والصفقة None عند حذف الصف
+RowChange = Tuple[str, Optional[str], Optional[str], Optional[Dict[str, Any]]]
+
+
+def make_trade_key(trade: Dict[str, Any]) -> str:
+    """
+    المفتاح الفريد للصفقة: (الرمز، الطابع الزمني) وهي نفس طريقة التعرف المستخدمة في trading_system
+    مع الرجوع إلى رقم الأمر إذا لم يوجد طابع زمني
+    """
+    symbol = trade.get('symbol', '')
+    timestamp = trade.get('timestamp')
+    if timestamp not in (None, ''):
+        return f"{symbol}|{timestamp}"
+    order_id = trade.get('orderId') or trade.get('order_id')
+    if order_id:
+        return f"{symbol}|order:{order_id}"
+    return f"{symbol}|{json.dumps(trade, sort_keys=True, default=str)}"
+
+
+class TradeStore:
+    """مخزن صفقات SQLite آمن للاستخدام من عدة خيوط"""
+
+    def __init__(self, db_path: str = TRADE_STORE_PATH, json_path: Optional[str] = TRADES_JSON_PATH):
+        self.db_path = db_path
+        self.json_path = json_path
+        self.lock = threading.RLock()
+        self._conn = None
+        self._listeners: List[Callable[[], None]] = []
+        self._row_listeners: List[Callable[[Optional[List[RowChange]]], None]] = []
+        self._backup_hooks: List[Callable[[str], None]] = []
+        self.last_backup = 0.0
+        # القاعدة أُنشئت من جديد في هذه الجلسة (مفقودة أو تالفة) ولم تُستعد بعد
+        self.needs_recovery = False
+
+    # ---------- الاتصال والترحيل ----------
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # قاعدة مفقودة أو تالفة: تُنشأ من جديد ويمكن استعادتها من سجل الصفقات (trade_journal)
+            if not os.path.exists(self.db_path):
+                self.needs_recovery = True
+            try:
+                conn = self._open()
+            except sqlite3.DatabaseError as e:
+                corrupt_path = f"{self.db_path}.corrupt.{int(time.time())}"
+                logger.error(f"قاعدة الصفقات تالفة ({e})، نقلها إلى {corrupt_path} وإنشاء قاعدة جديدة")
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(self.db_path + suffix):
+                        os.replace(self.db_path + suffix, corrupt_path + suffix)
+                self.needs_recovery = True
+                conn = self._open()
+            self._conn = conn
+            self._migrate_from_json()
+        return self._conn
+
+    def _open(self) -> sqlite3.Connection:
+        """فتح القاعدة وإنشاء الجداول مع فحص سريع للسلامة (sqlite3.DatabaseError إذا كانت تالفة)"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        try:
+            self._prepare(conn)
+            if conn.execute("PRAGMA quick_check").fetchone()[0] != 'ok':
+                raise sqlite3.DatabaseError("quick_check failed")
+        except sqlite3.DatabaseError:
+            conn.close()
+            raise
+        return conn
+
+    @staticmethod
+    def _prepare(conn: sqlite3.Connection):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS trades (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                trade_key TEXT NOT NULL UNIQUE,
+                symbol TEXT NOT NULL,
+                status TEXT NOT NULL,
+                order_id TEXT,
+                timestamp INTEGER,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades(symbol);
+            CREATE INDEX IF NOT EXISTS idx_trades_status ON trades(status);
+            CREATE INDEX IF NOT EXISTS idx_trades_order_id ON trades(order_id);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            """
+        )
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _migrate_from_json(self):
+        """ترحيل لمرة واحدة من ملف active_trades.json (يُعاد تسمية الملف بعد الترحيل)"""
+        if self._get_meta('json_migrated'):
+            return
+        data = {'open': [], 'closed': []}
+        if self.json_path and os.path.exists(self.json_path):
+            try:
+                with open(self.json_path, 'r') as f:
+                    raw = json.load(f)
+                if isinstance(raw, dict):
+                    data = {'open': raw.get('open', []), 'closed': raw.get('closed', [])}
+                elif isinstance(raw, list):
+                    data = {
+                        'open': [t for t in raw if t.get('status') == OPEN],
+                        'closed': [t for t in raw if t.get('status') != OPEN]
+                    }
+            except Exception as e:
+                logger.error(f"تعذر قراءة {self.json_path} للترحيل: {e}")
+                return
+        changes: List[RowChange] = []
+        with self._transaction():
+            self._sync(data, changes)
+            self._set_meta('json_migrated', str(int(time.time())))
+        self._publish_rows(changes)
+        if self.json_path and os.path.exists(self.json_path):
+            migrated_path = f"{self.json_path}.migrated.{int(time.time())}"
+            os.replace(self.json_path, migrated_path)
+            logger.info(f"تم ترحيل {len(data['open'])} صفقة مفتوحة و {len(data['closed'])} صفقة مغلقة "
+                        f"إلى {self.db_path} (الملف القديم: {migrated_path})")
+
+    @contextmanager
+    def _transaction(self):
+        """معاملة ذرية (BEGIN IMMEDIATE ... COMMIT/ROLLBACK)"""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @contextmanager
+    def transaction(self):
+        """معاملة عامة تضم عدة عمليات كتابة (مع إشعار المستمعين بعد الإتمام)"""
+        with self.lock:
+            self._connect()
+            with self._transaction() as conn:
+                yield conn
+            # تعديلات SQL مباشرة غير معروفة الصفوف: المستمعون يعيدون البناء بالكامل
+            self._publish_rows(None)
+        self._notify()
+
+    # ---------- المستمعون ----------
+
+    def add_listener(self, callback: Callable[[], None]):
+        """تسجيل دالة تُستدعى بعد كل تعديل ناجح على الصفقات"""
+        self._listeners.append(callback)
+
+    def add_row_listener(self, callback: Callable[[Optional[List[RowChange]]], None]):
+        """
+        تسجيل دالة تتلقى الصفوف المتغيرة بعد كل معاملة ناجحة (None = تغييرات غير محددة)
+        تُستدعى داخل قفل المخزن فتصل التغييرات بترتيب كتابتها، لذا يجب أن تكون سريعة وبلا إدخال/إخراج
+        """
+        self._row_listeners.append(callback)
+
+    def add_backup_hook(self, callback: Callable[[str], None]):
+        """تسجيل دالة تُستدعى بمسار كل نسخة احتياطية جديدة (لنسخ البيانات المرتبطة معها)"""
+        self._backup_hooks.append(callback)
+
+    def _publish_rows(self, changes: Optional[List[RowChange]]):
+        if changes is not None and not changes:
+            return
+        for callback in list(self._row_listeners):
+            try:
+                callback(changes)
+            except Exception as e:
+                logger.error(f"خطأ في مستمع صفوف مخزن الصفقات: {e}")
+
+    def _notify(self):
+        for callback in list(self._listeners):
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"خطأ في مستمع مخزن الصفقات: {e}")
+
+    # ---------- تحويل الصفوف ----------
+
+    @staticmethod
+    def _row_values(trade: Dict[str, Any], status: str, key: str) -> Tuple:
+        order_id = trade.get('orderId') or trade.get('order_id')
+        timestamp = trade.get('timestamp')
+        try:
+            timestamp = int(timestamp) if timestamp not in (None, '') else None
+        except (TypeError, ValueError):
+            timestamp = None
+        return (key, trade.get('symbol', ''), status,
+                str(order_id) if order_id not in (None, '') else None,
+                timestamp, json.dumps(trade, ensure_ascii=False, default=str))
+
+    def _sync(self, data: Dict[str, List[Dict[str, Any]]], changes: Optional[List[RowChange]] = None) -> int:
+        """
+        مزامنة الجدول مع شكل {'open', 'closed'}: إدراج/تحديث الصفوف المتغيرة فقط (يجب استدعاؤها داخل معاملة)
+        اللقطة قد تكون محملة قبل كتابات خيوط أخرى، لذلك:
+        - الصفوف الغائبة عنها لا تُحذف (صفقة أضافها كاتب آخر بعد تحميلها)
+        - الصفقة المغلقة في المخزن لا يُعاد فتحها (أغلقها كاتب آخر بعد تحميلها)
+
+        :param changes: قائمة تُضاف إليها الصفوف المتغيرة (اختياري)
+        """
+        conn = self._conn
+        desired = {}
+        trades_by_key = {}
+        for status, trades in ((OPEN, data.get('open', []) or []), (CLOSED, data.get('closed', []) or [])):
+            for trade in trades:
+                key = make_trade_key(trade)
+                suffix = 1
+                while key in desired:
+                    suffix += 1
+                    key = f"{make_trade_key(trade)}#{suffix}"
+                desired[key] = self._row_values(trade, status, key)
+                trades_by_key[key] = trade
+
+        # صفوف اللقطة فقط وليس الجدول كاملاً
+        existing = {}
+        keys = list(desired)
+        for i in range(0, len(keys), SYNC_CHUNK):
+            chunk = keys[i:i + SYNC_CHUNK]
+            existing.update((key, (status, payload)) for key, status, payload in conn.execute(
+                f"SELECT trade_key, status, data FROM trades WHERE trade_key IN ({','.join('?' * len(chunk))})",
+                chunk
+            ))
+
+        changed = 0
+        for key, values in desired.items():
+            current = existing.get(key)
+            if current == (values[2], values[5]):
+                continue
+            if current is not None and current[0] == CLOSED and values[2] == OPEN:
+                logger.debug(f"تجاهل إعادة فتح الصفقة المغلقة {key} من لقطة قديمة")
+                continue
+            if current is None:
+                conn.execute(
+                    "INSERT INTO trades (trade_key, symbol, status, order_id, timestamp, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    values
+                )
+            else:
+                conn.execute(
+                    "UPDATE trades SET symbol = ?, status = ?, order_id = ?, timestamp = ?, data = ? WHERE trade_key = ?",
+                    values[1:] + (key,)
+                )
+            changed += 1
+            if changes is not None:
+                changes.append((key, values[1], values[2], trades_by_key[key]))
+        return changed
+
+    # ---------- طبقة التوافق ----------
+
+    def load_all(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        جميع الصفقات بشكل ملف active_trades.json القديم
+
+        :return: {'open': [...], 'closed': [...]}
+        """
+        with self.lock:
+            rows = self._connect().execute("SELECT status, data FROM trades ORDER BY id").fetchall()
+        data = {'open': [], 'closed': []}
+        for status, payload in rows:
+            data['open' if status == OPEN else 'closed'].append(json.loads(payload))
+        return data
+
+    def save_all(self, data: Dict[str, List[Dict[str, Any]]]) -> int:
+        """
+        حفظ شكل {'open', 'closed'} كاملاً (تُكتب الصفوف المتغيرة فقط في معاملة واحدة)
+        لا تحذف الصفوف الغائبة عن البيانات ولا تعيد فتح الصفقات المغلقة (انظر _sync)
+
+        :return: عدد الصفوف المعدلة
+        """
+        changes: List[RowChange] = []
+        with self.lock:
+            self._connect()
+            with self._transaction():
+                changed = self._sync(data, changes)
+            self._publish_rows(changes)
+        if changed:
+            self._notify()
+        return changed
+
+    def load_list(self) -> List[Dict[str, Any]]:
+        """جميع الصفقات كقائمة مسطحة (للوحدات القديمة التي تقرأ الملف كقائمة)"""
+        data = self.load_all()
+        return data['open'] + data['closed']
+
+    def save_list(self, trades: List[Dict[str, Any]]) -> int:
+        """حفظ قائمة مسطحة من الصفقات (تُصنف حسب الحقل status)"""
+        return self.save_all({
+            'open': [t for t in trades if t.get('status') == OPEN],
+            'closed': [t for t in trades if t.get('status') != OPEN]
+        })
+
+    # ---------- عمليات على مستوى الصف ----------
+
+    def get_trades(self, symbol: Optional[str] = None, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """الصفقات حسب الرمز و/أو الحالة (عبر الفهارس)"""
+        query = "SELECT data FROM trades"
+        conditions, params = [], []
+        if symbol:
+            conditions.append("symbol = ?")
+            params.append(symbol)
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id"
+        with self.lock:
+            rows = self._connect().execute(query, params).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def iter_rows(self) -> List[RowChange]:
+        """جميع الصفوف بصيغة (المفتاح، الرمز، الحالة، الصفقة) لإعادة بناء الفهارس في الذاكرة"""
+        with self.lock:
+            rows = self._connect().execute("SELECT trade_key, symbol, status, data FROM trades ORDER BY id").fetchall()
+        return [(key, symbol, status, json.loads(payload)) for key, symbol, status, payload in rows]
+
+    def get_closed_rows(self) -> List[RowChange]:
+        """الصفقات المغلقة بصيغة (المفتاح، الرمز، الحالة، الصفقة)"""
+        with self.lock:
+            rows = self._connect().execute(
+                "SELECT trade_key, symbol, status, data FROM trades WHERE status = ? ORDER BY id", (CLOSED,)
+            ).fetchall()
+        return [(key, symbol, status, json.loads(payload)) for key, symbol, status, payload in rows]
+
+    def remove_archived(self, keys: Iterable[str]) -> int:
+        """
+        حذف صفقات مغلقة نُقلت إلى الأرشيف (يتلقى المستمعون الحالة ARCHIVED بدلاً من الحذف)
+
+        :param keys: مفاتيح الصفقات المؤرشفة
+        :return: عدد الصفوف المحذوفة
+        """
+        changes: List[RowChange] = []
+        with self.lock:
+            conn = self._connect()
+            with self._transaction():
+                for key in keys:
+                    row = conn.execute("SELECT symbol, data FROM trades WHERE trade_key = ? AND status = ?",
+                                       (key, CLOSED)).fetchone()
+                    if row is None:
+                        continue
+                    conn.execute("DELETE FROM trades WHERE trade_key = ?", (key,))
+                    changes.append((key, row[0], ARCHIVED, json.loads(row[1])))
+            self._publish_rows(changes)
+        if changes:
+            self._notify()
+        return len(changes)
+
+    def restore_rows(self, rows: Dict[str, Tuple[str, str, Dict[str, Any]]]) -> int:
+        """
+        استعادة صفوف بعد فقدان القاعدة (الصفوف المكتوبة في هذه الجلسة تبقى كما هي)
+
+        :param rows: مفتاح الصفقة -> (الرمز، الحالة، الصفقة)
+        :return: عدد الصفوف المستعادة
+        """
+        changes: List[RowChange] = []
+        with self.lock:
+            conn = self._connect()
+            with self._transaction():
+                existing = {key for (key,) in conn.execute("SELECT trade_key FROM trades")}
+                for key, (symbol, status, trade) in rows.items():
+                    if key in existing:
+                        continue
+                    values = self._row_values(trade, status, key)
+                    conn.execute(
+                        "INSERT INTO trades (trade_key, symbol, status, order_id, timestamp, data) VALUES (?, ?, ?, ?, ?, ?)",
+                        values
+                    )
+                    changes.append((key, values[1], status, trade))
+            self.needs_recovery = False
+            self._publish_rows(changes)
+        if changes:
+            self._notify()
+        return len(changes)
+
+    def get_open_trades(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        """الصفقات المفتوحة"""
+        return self.get_trades(symbol=symbol, status=OPEN)
+
+    def get_by_order_id(self, order_id: Any) -> Optional[Dict[str, Any]]:
+        """البحث عن صفقة برقم الأمر"""
+        with self.lock:
+            row = self._connect().execute(
+                "SELECT data FROM trades WHERE order_id = ? ORDER BY id DESC LIMIT 1", (str(order_id),)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_trade(self, symbol: str, timestamp: Any, status: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """صفقة واحدة بالرمز والطابع الزمني (مع تقييد الحالة اختيارياً)"""
+        key = make_trade_key({'symbol': symbol, 'timestamp': timestamp})
+        with self.lock:
+            row = self._connect().execute("SELECT status, data FROM trades WHERE trade_key = ?", (key,)).fetchone()
+        if row is None or (status and row[0] != status):
+            return None
+        return json.loads(row[1])
+
+    def count(self, status: Optional[str] = None) -> int:
+        """عدد الصفقات (بحالة محددة أو الكل)"""
+        with self.lock:
+            conn = self._connect()
+            if status:
+                return conn.execute("SELECT COUNT(*) FROM trades WHERE status = ?", (status,)).fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+
+    def add_trade(self, trade: Dict[str, Any], status: str = OPEN) -> str:
+        """
+        إضافة صفقة جديدة (أو استبدال صفقة بنفس المفتاح)
+
+        :return: مفتاح الصفقة
+        """
+        key = make_trade_key(trade)
+        values = self._row_values(trade, status, key)
+        with self.lock:
+            self._connect()
+            with self._transaction() as conn:
+                conn.execute(
+                    """
+                    INSERT INTO trades (trade_key, symbol, status, order_id, timestamp, data) VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(trade_key) DO UPDATE SET symbol = excluded.symbol, status = excluded.status,
+                        order_id = excluded.order_id, timestamp = excluded.timestamp, data = excluded.data
+                    """,
+                    values
+                )
+            self._publish_rows([(key, values[1], status, trade)])
+        self._notify()
+        return key
+
+    def update_trade(self, symbol: str, timestamp: Any, changes: Dict[str, Any],
+                     status: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        تحديث حقول صفقة واحدة ذرياً (قراءة-دمج-كتابة لصف واحد)
+
+        :param symbol: رمز العملة
+        :param timestamp: الطابع الزمني للصفقة
+        :param changes: الحقول المراد تحديثها
+        :param status: الحالة الجديدة للصف (OPEN/CLOSED) أو None لإبقائها
+        :return: الصفقة بعد التحديث أو None إذا لم توجد
+        """
+        key = make_trade_key({'symbol': symbol, 'timestamp': timestamp})
+        with self.lock:
+            self._connect()
+            with self._transaction() as conn:
+                row = conn.execute("SELECT status, data FROM trades WHERE trade_key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                trade = json.loads(row[1])
+                trade.update(changes)
+                values = self._row_values(trade, status or row[0], key)
+                conn.execute(
+                    "UPDATE trades SET symbol = ?, status = ?, order_id = ?, timestamp = ?, data = ? WHERE trade_key = ?",
+                    values[1:] + (key,)
+                )
+            self._publish_rows([(key, values[1], values[2], trade)])
+        self._notify()
+        return trade
+
+    def close_trade(self, symbol: str, timestamp: Any, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        نقل صفقة مفتوحة إلى المغلقة مع تحديث حقولها
+
+        :return: الصفقة بعد الإغلاق أو None إذا لم تكن مفتوحة
+        """
+        key = make_trade_key({'symbol': symbol, 'timestamp': timestamp})
+        with self.lock:
+            self._connect()
+            with self._transaction() as conn:
+                row = conn.execute(
+                    "SELECT data FROM trades WHERE trade_key = ? AND status = ?", (key, OPEN)
+                ).fetchone()
+                if row is None:
+                    return None
+                trade = json.loads(row[0])
+                trade.update(changes)
+                values = self._row_values(trade, CLOSED, key)
+                conn.execute(
+                    "UPDATE trades SET symbol = ?, status = ?, order_id = ?, timestamp = ?, data = ? WHERE trade_key = ?",
+                    values[1:] + (key,)
+                )
+            self._publish_rows([(key, values[1], CLOSED, trade)])
+        self._notify()
+        return trade
+
+    # ---------- النسخ الاحتياطي ----------
+
+    def backup(self, force: bool = False) -> str:
+        """
+        نسخة احتياطية متسقة من قاعدة البيانات (واجهة SQLite backup)
+        لا تُنشأ أكثر من مرة كل TRADE_BACKUP_MIN_INTERVAL ثانية إلا عند الطلب الصريح
+
+        :return: مسار النسخة أو "" إذا تم تخطيها
+        """
+        now = time.time()
+        if not force and now - self.last_backup < TRADE_BACKUP_MIN_INTERVAL:
+            return ""
+        backup_path = f"{self.db_path}.backup.{int(now)}"
+        with self.lock:
+            target = sqlite3.connect(backup_path)
+            try:
+                self._connect().backup(target)
+            finally:
+                target.close()
+        self.last_backup = now
+        logger.info(f"تم إنشاء نسخة احتياطية: {backup_path}")
+        for callback in list(self._backup_hooks):
+            try:
+                callback(backup_path)
+            except Exception as e:
+                logger.error(f"خطأ في نسخ البيانات المرتبطة بالنسخة الاحتياطية: {e}")
+        self._prune_backups()
+        return backup_path
+
+    def _prune_backups(self):
+        """الإبقاء على آخر TRADE_BACKUP_KEEP نسخة احتياطية فقط (مع ملحقاتها)"""
+        directory = os.path.dirname(self.db_path) or '.'
+        prefix = f"{os.path.basename(self.db_path)}.backup."
+        stamps = sorted({name[len(prefix):].split('.')[0] for name in os.listdir(directory)
+                         if name.startswith(prefix)}, key=lambda v: int(v) if v.isdigit() else 0)
+        for stamp in stamps[:-TRADE_BACKUP_KEEP] if TRADE_BACKUP_KEEP > 0 else []:
+            base = os.path.join(directory, f"{prefix}{stamp}")
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if path == base or name.startswith(f"{prefix}{stamp}."):
+                    if os.path.isdir(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        os.remove(path)
+
+    def export_json(self, path: str) -> str:
+        """تصدير جميع الصفقات إلى ملف JSON بنفس الشكل القديم"""
+        data = self.load_all()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    def close(self):
+        """إغلاق الاتصال"""
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# نسخة عامة مشتركة من المخزن
+trade_store = TradeStore()
+
+
+def load_trades() -> Dict[str, List[Dict[str, Any]]]:
+    """طبقة توافق: نفس شكل load_trades القديم {'open': [...], 'closed': [...]}"""
+    return trade_store.load_all()
+
+
+def save_trades(data: Dict[str, List[Dict[str, Any]]]) -> bool:
+    """طبقة توافق: حفظ شكل {'open', 'closed'} (تُكتب الصفوف المتغيرة فقط)"""
+    try:
+        trade_store.save_all(data)
+        return True
+    except Exception as e:
+        logger.error(f"خطأ في حفظ الصفقات: {e}")
+        return False
@@ -3,10 +3,11 @@
 يجمع بين المكونات المختلفة للنظام في واجهة موحدة
 """
 import logging
-import threading
 import time
 from typing import Dict, Any
 
+from app.engine import trading_engine
+
 # إعداد التسجيل
 logging.basicConfig(
     level=logging.INFO, 
@@ -37,78 +38,46 @@ except ImportError:
 # حالة البوت
 BOT_STATUS = {
     'running': False,
-    'thread': None,
     'last_run': 0,
     'cycle_count': 0,
     'stats': {}
 }
 
-def trading_loop():
+# اسم مهمة دورة التداول في المحرك الموحد
+TRADING_CYCLE_TASK = 'trading_bot.cycle'
+
+# الفاصل بين دورات التداول (15 دقيقة) وبعد دورة فاشلة (دقيقة)
+TRADING_CYCLE_INTERVAL = 900
+TRADING_CYCLE_ERROR_INTERVAL = 60
+
+def trading_cycle():
     """
-    حلقة التداول الرئيسية للبوت
-    تعمل في خيط منفصل وتدير عمليات التداول بشكل مستمر
+    دورة تداول واحدة للبوت (مهمة دورية في محرك التداول الموحد)
     """
-    try:
-        logger.info("🚀 بدء تشغيل حلقة التداول")
-        
-        BOT_STATUS['running'] = True
-        BOT_STATUS['cycle_count'] = 0
-        
-        # تنظيف الصفقات الوهمية عند بدء التشغيل
+    # تنظيف الصفقات الوهمية عند بدء التشغيل
+    if BOT_STATUS['cycle_count'] == 0:
         logger.info("🧹 تنظيف الصفقات الوهمية عند بدء التشغيل")
         clean_result = clean_fake_trades()
         logger.info(f"🧹 نتيجة التنظيف: {clean_result}")
-        
-        # سجل لتتبع العملات التي تم تداولها مؤخراً
-        recent_trades = set()
-        
-        # استمرار الحلقة طالما البوت يعمل
-        while BOT_STATUS['running']:
-            try:
-                cycle_start_time = time.time()
-                BOT_STATUS['last_run'] = cycle_start_time
-                BOT_STATUS['cycle_count'] += 1
-                
-                logger.info(f"📊 دورة التداول رقم {BOT_STATUS['cycle_count']}")
-                
-                # 1. تشغيل دورة التداول الكاملة (بيع الصفقات المؤهلة وفتح صفقات جديدة)
-                stats = run_trade_cycle()
-                BOT_STATUS['stats'] = stats
-                
-                # 2. فحص السوق للحصول على فرص جديدة
-                scan_result = scan_market()
-                
-                # حساب الوقت المستغرق في الدورة
-                cycle_duration = time.time() - cycle_start_time
-                logger.info(f"⏱️ استغرقت دورة التداول {cycle_duration:.1f} ثانية")
-                
-                # انتظار 15 دقيقة (900 ثانية) بين الدورات
-                # أو أقل إذا كانت الدورة استغرقت وقتاً طويلاً
-                sleep_time = max(60, 900 - cycle_duration)  # ننتظر على الأقل دقيقة واحدة
-                logger.info(f"💤 انتظار {sleep_time:.0f} ثانية قبل الدورة التالية")
-                
-                # تقسيم وقت الانتظار لإتاحة التوقف السريع
-                wait_intervals = 6  # نتحقق كل 10 ثوانٍ
-                interval_time = sleep_time / wait_intervals
-                
-                for _ in range(wait_intervals):
-                    if not BOT_STATUS['running']:
-                        break
-                    time.sleep(interval_time)
-                
-            except Exception as cycle_error:
-                logger.error(f"❌ خطأ في دورة التداول: {cycle_error}")
-                # ننتظر قليلاً ثم نستمر
-                time.sleep(60)
-        
-        logger.info("🛑 انتهت حلقة التداول")
-    except Exception as e:
-        logger.error(f"❌❌ خطأ كارثي في حلقة التداول: {e}")
-        BOT_STATUS['running'] = False
+    
+    cycle_start_time = time.time()
+    BOT_STATUS['last_run'] = cycle_start_time
+    BOT_STATUS['cycle_count'] += 1
+    
+    logger.info(f"📊 دورة التداول رقم {BOT_STATUS['cycle_count']}")
+    
+    # تشغيل دورة التداول الكاملة (بيع الصفقات المؤهلة وفتح صفقات جديدة)
+    # مسح السوق يتولاه ماسح السوق (market_scanner) كمهمة غير exclusive وليس هذه الدورة
+    stats = run_trade_cycle()
+    BOT_STATUS['stats'] = stats
+    
+    # حساب الوقت المستغرق في الدورة
+    cycle_duration = time.time() - cycle_start_time
+    logger.info(f"⏱️ استغرقت دورة التداول {cycle_duration:.1f} ثانية")
 
 def start_bot() -> bool:
     """
-    بدء تشغيل البوت
+    بدء تشغيل البوت (تسجيل دورة التداول كمهمة دورية في محرك التداول الموحد)
     
     :return: نجاح العملية
     """
@@ -117,10 +86,11 @@ def start_bot() -> bool:
             logger.warning("البوت يعمل بالفعل")
             return False
             
-        # إنشاء خيط جديد لحلقة التداول
-        BOT_STATUS['thread'] = threading.Thread(target=trading_loop)
-        BOT_STATUS['thread'].daemon = True
-        BOT_STATUS['thread'].start()
+        BOT_STATUS['running'] = True
+        BOT_STATUS['cycle_count'] = 0
+        trading_engine.register(TRADING_CYCLE_TASK, trading_cycle, TRADING_CYCLE_INTERVAL,
+                                error_interval=TRADING_CYCLE_ERROR_INTERVAL, exclusive=True,
+                                uses_prices=True)
         
         logger.info("🚀 تم بدء تشغيل البوت بنجاح")
         return True
@@ -140,12 +110,9 @@ def stop_bot() -> bool:
             logger.warning("البوت متوقف بالفعل")
             return False
             
-        # إيقاف الحلقة
+        # إزالة دورة التداول من المحرك (الدورة الجارية إن وجدت تكتمل)
         BOT_STATUS['running'] = False
-        
-        # انتظار انتهاء الخيط (بحد أقصى 5 ثوانٍ)
-        if BOT_STATUS['thread'] and BOT_STATUS['thread'].is_alive():
-            BOT_STATUS['thread'].join(5)
+        trading_engine.unregister(TRADING_CYCLE_TASK)
             
         logger.info("🛑 تم إيقاف البوت بنجاح")
         return True
@@ -163,7 +130,8 @@ def get_bot_status() -> Dict[str, Any]:
         'running': BOT_STATUS['running'],
         'last_run': BOT_STATUS['last_run'],
         'cycle_count': BOT_STATUS['cycle_count'],
-        'stats': BOT_STATUS['stats']
+        'stats': BOT_STATUS['stats'],
+        'engine': trading_engine.get_status()
     }
 
 def execute_manual_trade_cycle() -> Dict[str, Any]:
@@ -17,13 +17,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger('trading_system')
 
-# ملف تخزين الصفقات
+# ملف تخزين الصفقات القديم (يُرحّل تلقائياً إلى مخزن SQLite في app/trade_store.py)
 TRADES_FILE = 'active_trades.json'
 
 # قفل للتعامل مع الملفات
 import threading
 FILE_LOCK = threading.RLock()
 
+# الصفقات قيد الإغلاق حالياً (لمنع البيع المزدوج من مصادر متعددة)
+CLOSING_TRADES = set()
+CLOSING_LOCK = threading.Lock()
+
 # استيراد الإعدادات والوظائف المساعدة
 try:
     from app.config import SYSTEM_SETTINGS
@@ -53,6 +57,12 @@ from app.mexc_api import (
     get_trades_history
 )
 from app.telegram_notify import notify_trade_status
+from app.market_feed import market_feed
+from app.exit_engine import exit_engine, TAKE_PROFIT
+from app.trade_store import trade_store
+from app.trade_journal import trade_journal
+from app.position_index import position_index
+from app.order_tracker import order_tracker, track_buy, track_sell
 
 # قائمة العملات ذات الأولوية للتداول
 PRIORITY_COINS = [
@@ -62,53 +72,26 @@ PRIORITY_COINS = [
 
 def create_backup() -> str:
     """
-    إنشاء نسخة احتياطية من ملف الصفقات
+    إنشاء نسخة احتياطية من مخزن الصفقات
+    (التغييرات محفوظة أولاً بأول في سجل الأحداث؛ النسخة الكاملة عند حلول نقطة التثبيت فقط)
     
-    :return: اسم ملف النسخة الاحتياطية
+    :return: اسم ملف النسخة الاحتياطية أو "" إذا تم تخطيها
     """
     try:
-        if not os.path.exists(TRADES_FILE):
-            logger.warning(f"ملف الصفقات {TRADES_FILE} غير موجود لإنشاء نسخة احتياطية")
-            return ""
-            
-        timestamp = int(time.time())
-        backup_file = f"{TRADES_FILE}.backup.{timestamp}"
-        
-        with FILE_LOCK:
-            os.system(f"cp {TRADES_FILE} {backup_file}")
-            
-        logger.info(f"تم إنشاء نسخة احتياطية: {backup_file}")
-        return backup_file
+        return trade_journal.checkpoint()
     except Exception as e:
         logger.error(f"خطأ في إنشاء نسخة احتياطية: {e}")
         return ""
 
 def load_trades() -> Dict[str, List[Dict[str, Any]]]:
     """
-    تحميل الصفقات من الملف
+    تحميل الصفقات من مخزن الصفقات
     
-    :return: بيانات الصفقات
+    :return: بيانات الصفقات {'open': [...], 'closed': [...]}
     """
     try:
         with FILE_LOCK:
-            if os.path.exists(TRADES_FILE):
-                with open(TRADES_FILE, 'r') as f:
-                    data = json.load(f)
-                
-                # تحويل البيانات إلى التنسيق الصحيح إذا لزم الأمر
-                if isinstance(data, dict) and 'open' in data and 'closed' in data:
-                    return data
-                elif isinstance(data, list):
-                    return {
-                        'open': data,
-                        'closed': []
-                    }
-            
-            # إنشاء ملف جديد إذا لم يكن موجودًا
-            return {
-                'open': [],
-                'closed': []
-            }
+            return trade_store.load_all()
     except Exception as e:
         logger.error(f"خطأ في تحميل الصفقات: {e}")
         return {
@@ -118,20 +101,25 @@ def load_trades() -> Dict[str, List[Dict[str, Any]]]:
 
 def save_trades(data: Dict[str, List[Dict[str, Any]]]) -> bool:
     """
-    حفظ الصفقات في الملف
+    حفظ الصفقات في مخزن الصفقات (تُكتب الصفقات المتغيرة فقط في معاملة واحدة)
     
     :param data: بيانات الصفقات
     :return: نجاح العملية
     """
     try:
         with FILE_LOCK:
-            with open(TRADES_FILE, 'w') as f:
-                json.dump(data, f, indent=2)
+            trade_store.save_all(data)
         return True
     except Exception as e:
         logger.error(f"خطأ في حفظ الصفقات: {e}")
         return False
 
+def _rebuild_exit_index():
+    """تحديث فهرس مستويات الخروج بالصفقات المفتوحة الحالية بعد كل تعديل على المخزن"""
+    exit_engine.rebuild(trade_store.get_open_trades())
+
+trade_store.add_listener(_rebuild_exit_index)
+
 def get_active_symbols() -> Set[str]:
     """
     الحصول على مجموعة العملات المتداولة حالياً
@@ -139,8 +127,7 @@ def get_active_symbols() -> Set[str]:
     :return: مجموعة من العملات المتداولة
     """
     try:
-        data = load_trades()
-        return {trade.get('symbol', '') for trade in data.get('open', [])}
+        return position_index.open_symbols()
     except Exception as e:
         logger.error(f"خطأ في الحصول على العملات المتداولة: {e}")
         return set()
@@ -157,13 +144,11 @@ def is_trade_allowed(symbol: str) -> Tuple[bool, str]:
         return False, "العملة في القائمة السوداء"
         
     # تحقق من عدم تجاوز الحد الأقصى للصفقات
-    active_trades = load_trades().get('open', [])
-    if len(active_trades) >= SYSTEM_SETTINGS['max_trades']:
+    if position_index.open_count() >= SYSTEM_SETTINGS['max_trades']:
         return False, f"وصلنا للحد الأقصى للصفقات: {SYSTEM_SETTINGS['max_trades']}"
         
     # تحقق من عدم وجود صفقة مفتوحة للعملة
-    active_symbols = get_active_symbols()
-    if symbol in active_symbols:
+    if position_index.is_open(symbol):
         return False, "توجد صفقة مفتوحة بالفعل لهذه العملة"
     
     return True, "مسموح بالتداول"
@@ -420,6 +405,11 @@ def clean_fake_trades() -> Dict[str, int]:
             is_fake = False
             fake_reason = ''
             
+            # أوامر الشراء بانتظار تأكيد التنفيذ في الخلفية ليست صفقات وهمية
+            if order_tracker.is_pending(trade.get('orderId', '')) or trade.get('confirmation') == 'PENDING':
+                cleaned_open.append(trade)
+                continue
+            
             # الطريقة 1: التحقق من العلامات الصريحة
             if trade.get('test_trade') == True or trade.get('api_executed') == False or trade.get('api_confirmed') == False:
                 is_fake = True
@@ -474,7 +464,8 @@ def clean_fake_trades() -> Dict[str, int]:
 
 def execute_buy(symbol: str, amount: float) -> Tuple[bool, Dict]:
     """
-    تنفيذ عملية الشراء مع تأكيد قطعي للصفقات الحقيقية فقط
+    تنفيذ عملية الشراء - تُسجّل الصفقة كمعلّقة ويعود فوراً، ويُؤكَّد التنفيذ في الخلفية عبر track_buy
+    (الصفقة لا تدخل محرك الخروج ولا تُباع قبل التأكيد)
     
     :param symbol: رمز العملة
     :param amount: المبلغ بالدولار
@@ -562,63 +553,6 @@ def execute_buy(symbol: str, amount: float) -> Tuple[bool, Dict]:
             
         logger.info(f"✅ تم إرسال أمر الشراء بنجاح: {result}")
         
-        # التحقق من تنفيذ الصفقة فعلياً - إنتظار قصير للتأكد من تحديث تاريخ التداول
-        time.sleep(2)
-        
-        # نتحقق عبر تاريخ التداول أولاً
-        trade_history_verified = False
-        try:
-            logger.info(f"🔍 التحقق من تنفيذ صفقة {symbol} في تاريخ التداول...")
-            
-            # محاولات متعددة للتحقق من تنفيذ الصفقة خلال 10 ثوانٍ
-            for attempt in range(3):
-                recent_trades = get_trades_history(symbol, 20)
-                order_id = result.get('orderId')
-                
-                if recent_trades:
-                    for trade_record in recent_trades:
-                        if str(trade_record.get('orderId')) == str(order_id):
-                            trade_history_verified = True
-                            logger.info(f"✅✅ تأكيد وجود الصفقة في تاريخ التداول: {symbol} (معرف الأمر: {order_id})")
-                            break
-                
-                if trade_history_verified:
-                    break
-                    
-                # إنتظار قصير ثم محاولة مرة أخرى
-                logger.warning(f"⚠️ محاولة {attempt+1}/3: لم يتم العثور على الصفقة في تاريخ التداول بعد. إنتظار...")
-                time.sleep(2)
-            
-            if not trade_history_verified:
-                logger.error(f"❌❌ لم يتم تأكيد الصفقة في تاريخ التداول بعد 3 محاولات: {symbol}")
-                return False, {"error": "لم يتم تأكيد الصفقة في تاريخ التداول"}
-                
-        except Exception as e:
-            logger.error(f"❌ خطأ أثناء التحقق من تاريخ التداول: {e}")
-            return False, {"error": f"خطأ أثناء التحقق من تاريخ التداول: {e}"}
-        
-        # التحقق من تغير الرصيد بعد الشراء
-        try:
-            new_balance = get_account_balance()
-            if new_balance and 'USDT' in new_balance:
-                new_usdt_balance = float(new_balance['USDT'].get('free', 0))
-                balance_diff = initial_usdt_balance - new_usdt_balance
-                logger.info(f"💰 تغير رصيد USDT: {initial_usdt_balance} → {new_usdt_balance} (فرق: {balance_diff})")
-                
-                # التحقق إذا كان هناك تغير فعلي في الرصيد يقارب قيمة الصفقة
-                if balance_diff < amount * 0.8:  # يجب أن يكون التغير على الأقل 80% من قيمة الصفقة
-                    logger.warning(f"⚠️ تغير الرصيد أقل من المتوقع: {balance_diff} < {amount}")
-                    # لكننا نستمر لأن الصفقة تم تأكيدها بالفعل في تاريخ التداول
-            
-            # التحقق من وجود العملة في الرصيد بعد الشراء
-            purchased_coin_symbol = symbol.replace('USDT', '')
-            if new_balance and purchased_coin_symbol in new_balance:
-                purchased_coin_balance = float(new_balance[purchased_coin_symbol].get('free', 0))
-                logger.info(f"💰 رصيد {purchased_coin_symbol} الجديد: {purchased_coin_balance}")
-        except Exception as e:
-            logger.error(f"❌ خطأ في التحقق من تغير الرصيد: {e}")
-            # نستمر لأن الصفقة تم تأكيدها بالفعل في تاريخ التداول
-        
         # تحضير أهداف الربح - تم تعديلها لتكون 0.01% (1 سنت) لزيادة حركة التداول
         take_profit_targets = [
             {'percent': 0.01, 'hit': False},
@@ -626,7 +560,7 @@ def execute_buy(symbol: str, amount: float) -> Tuple[bool, Dict]:
             {'percent': 0.01, 'hit': False}
         ]
         
-        # إنشاء سجل للصفقة
+        # إنشاء سجل للصفقة كصفقة معلّقة حتى يتأكد تنفيذ الأمر
         order_info = {
             'symbol': symbol,
             'quantity': quantity,
@@ -636,27 +570,17 @@ def execute_buy(symbol: str, amount: float) -> Tuple[bool, Dict]:
             'timestamp': int(time.time() * 1000),
             'status': 'OPEN',
             'api_executed': True,
-            'api_confirmed': True,  # نؤكد أنها صفقة حقيقية تم التحقق منها
+            'api_confirmed': False,  # تصبح True عند تأكيد التنفيذ في الخلفية
+            'confirmation': 'PENDING',
             'orderId': result.get('orderId', ''),
             'order_type': 'MARKET'
         }
         
-        # تحديث ملف الصفقات
-        data = load_trades()
-        data['open'].append(order_info)
-        save_trades(data)
-        
-        logger.info(f"✅✅ تم تسجيل صفقة حقيقية مؤكدة: {symbol}")
-        
-        # إرسال إشعار تلجرام
-        notify_trade_status(
-            symbol=symbol, 
-            status="تم الشراء", 
-            price=price, 
-            order_id=result.get('orderId'),
-            api_verified=True
-        )
+        # إضافة الصفقة إلى المخزن (كتابة صف واحد) ثم تأكيد التنفيذ في الخلفية
+        trade_store.add_trade(order_info)
+        track_buy(order_info, notify=notify_trade_status)
         
+        result['pending'] = True
         return True, result
     except Exception as e:
         logger.error(f"❌ خطأ في تنفيذ الشراء لـ {symbol}: {e}")
@@ -664,7 +588,7 @@ def execute_buy(symbol: str, amount: float) -> Tuple[bool, Dict]:
 
 def execute_sell(symbol: str, quantity: float, trade_data: Dict[str, Any]) -> Tuple[bool, Dict]:
     """
-    تنفيذ عملية البيع مع تأكيد قطعي للصفقات الحقيقية فقط
+    تنفيذ عملية البيع - يعود فور قبول المنصة للأمر، ويُؤكَّد التنفيذ في الخلفية عبر track_sell
     
     :param symbol: رمز العملة
     :param quantity: الكمية
@@ -710,70 +634,8 @@ def execute_sell(symbol: str, quantity: float, trade_data: Dict[str, Any]) -> Tu
             
         logger.info(f"✅ تم إرسال أمر البيع بنجاح: {result}")
         
-        # التحقق من تنفيذ الصفقة فعلياً - إنتظار قصير للتأكد من تحديث تاريخ التداول
-        time.sleep(2)
-        
-        # نتحقق عبر تاريخ التداول أولاً
-        trade_history_verified = False
-        try:
-            logger.info(f"🔍 التحقق من تنفيذ صفقة البيع {symbol} في تاريخ التداول...")
-            
-            # محاولات متعددة للتحقق من تنفيذ الصفقة خلال 10 ثوانٍ
-            for attempt in range(3):
-                recent_trades = get_trades_history(symbol, 20)
-                order_id = result.get('orderId')
-                
-                if recent_trades:
-                    for trade_record in recent_trades:
-                        if str(trade_record.get('orderId')) == str(order_id):
-                            trade_history_verified = True
-                            logger.info(f"✅✅ تأكيد وجود صفقة البيع في تاريخ التداول: {symbol} (معرف الأمر: {order_id})")
-                            break
-                
-                if trade_history_verified:
-                    break
-                    
-                # إنتظار قصير ثم محاولة مرة أخرى
-                logger.warning(f"⚠️ محاولة {attempt+1}/3: لم يتم العثور على صفقة البيع في تاريخ التداول بعد. إنتظار...")
-                time.sleep(2)
-            
-            if not trade_history_verified:
-                logger.error(f"❌❌ لم يتم تأكيد صفقة البيع في تاريخ التداول بعد 3 محاولات: {symbol}")
-                return False, {"error": "لم يتم تأكيد صفقة البيع في تاريخ التداول"}
-                
-        except Exception as e:
-            logger.error(f"❌ خطأ أثناء التحقق من تاريخ التداول: {e}")
-            return False, {"error": f"خطأ أثناء التحقق من تاريخ التداول: {e}"}
-        
-        # حساب الربح/الخسارة
-        entry_price = trade_data.get('entry_price', 0)
-        profit_percent = ((price - entry_price) / entry_price) * 100 if entry_price else 0
-        
-        # التحقق من تغير الرصيد بعد البيع
-        try:
-            new_balance = get_account_balance()
-            if new_balance and coin_symbol in new_balance:
-                new_coin_balance = float(new_balance[coin_symbol].get('free', 0))
-                balance_diff = initial_coin_balance - new_coin_balance
-                logger.info(f"💰 تغير رصيد {coin_symbol}: {initial_coin_balance} → {new_coin_balance} (فرق: {balance_diff})")
-                
-                # التحقق إذا كان هناك تغير فعلي في الرصيد يقارب قيمة الصفقة
-                if balance_diff < quantity * 0.8:  # يجب أن يكون التغير على الأقل 80% من قيمة الصفقة
-                    logger.warning(f"⚠️ تغير الرصيد أقل من المتوقع: {balance_diff} < {quantity}")
-                    # لكننا نستمر لأن الصفقة تم تأكيدها بالفعل في تاريخ التداول
-        except Exception as e:
-            logger.error(f"❌ خطأ في التحقق من تغير الرصيد: {e}")
-            # نستمر لأن الصفقة تم تأكيدها بالفعل في تاريخ التداول
-        
-        # إرسال إشعار بنجاح البيع
-        notify_trade_status(
-            symbol=symbol,
-            status=f"تم البيع بربح {profit_percent:.2f}%",
-            price=price,
-            profit_loss=profit_percent,
-            order_id=result.get('orderId'),
-            api_verified=True
-        )
+        # تأكيد التنفيذ وسعر البيع الفعلي يتمان في الخلفية (track_sell) بعد إغلاق الصفقة في المخزن
+        result['pending'] = True
         
         return True, result
     except Exception as e:
@@ -789,6 +651,21 @@ def close_trade(trade: Dict[str, Any], reason: str, api_verified: bool = True) -
     :param api_verified: هل تم التحقق من الصفقة عبر API
     :return: نجاح العملية
     """
+    # منع إغلاق نفس الصفقة مرتين بالتوازي (دورة التداول ومحرك الخروج)
+    key = (trade.get('symbol'), trade.get('timestamp'))
+    with CLOSING_LOCK:
+        if key in CLOSING_TRADES:
+            logger.info(f"الصفقة {key[0]} قيد الإغلاق بالفعل، تجاهل الطلب المكرر")
+            return False
+        CLOSING_TRADES.add(key)
+    try:
+        return _close_trade(trade, reason, api_verified)
+    finally:
+        with CLOSING_LOCK:
+            CLOSING_TRADES.discard(key)
+
+def _close_trade(trade: Dict[str, Any], reason: str, api_verified: bool = True) -> bool:
+    """تنفيذ إغلاق الصفقة (يُستدعى من close_trade بعد حجز الصفقة)"""
     try:
         symbol = trade.get('symbol')
         quantity = trade.get('quantity', 0)
@@ -801,51 +678,43 @@ def close_trade(trade: Dict[str, Any], reason: str, api_verified: bool = True) -
             logger.info(f"تنفيذ بيع {symbol} بكمية {quantity} (سبب: {reason})")
             success, result = execute_sell(symbol, quantity, trade)
             
-        # قراءة ملف الصفقات
-        trades_data = load_trades()
-        
-        # البحث عن الصفقة وتحديثها
-        for i, t in enumerate(trades_data.get('open', [])):
-            if t.get('symbol') == symbol and t.get('timestamp') == trade.get('timestamp'):
-                # إغلاق الصفقة
-                t['status'] = 'CLOSED'
-                t['close_reason'] = reason
-                t['close_timestamp'] = int(time.time() * 1000)
-                t['api_confirmed'] = api_verified  # إضافة علامة التحقق من API
-                
-                # إضافة بيانات البيع إذا نجح
-                if success and result:
-                    t['sell_price'] = result.get('price', 0)
-                    t['sell_time'] = result.get('transactTime', 0)
-                    
-                # نقل الصفقة إلى المغلقة
-                if 'closed' not in trades_data:
-                    trades_data['closed'] = []
-                    
-                trades_data['closed'].append(t)
-                trades_data['open'].pop(i)
-                
-                # حفظ التغييرات
-                save_trades(trades_data)
-                
-                # إرسال إشعار تلجرام للصفقات المؤكدة فقط
-                if api_verified:
-                    sell_price = result.get('price', 0) if success and result else 0
-                    profit_loss = ((sell_price - trade.get('entry_price', 0)) / trade.get('entry_price', 1)) * 100 if sell_price > 0 else 0
-                    
-                    # إرسال إشعار بنجاح البيع
-                    notify_trade_status(
-                        symbol=symbol,
-                        status=f"تم البيع ({reason})",
-                        price=sell_price,
-                        profit_loss=profit_loss,
-                        order_id=result.get('orderId') if success and result else None,
-                        api_verified=True
-                    )
-                else:
-                    logger.warning(f"⚠️ تم إغلاق صفقة غير مؤكدة: {symbol} - لم يتم إرسال إشعار")
+        # نقل الصفقة إلى المغلقة وتحديثها (كتابة صف واحد)
+        changes = {
+            'status': 'CLOSED',
+            'close_reason': reason,
+            'close_timestamp': int(time.time() * 1000),
+            'api_confirmed': api_verified  # إضافة علامة التحقق من API
+        }
+        # إضافة بيانات البيع إذا نجح
+        if success and result:
+            changes['sell_order_id'] = result.get('orderId', '')
+            changes['sell_time'] = result.get('transactTime', 0)
+            if not result.get('pending'):
+                changes['sell_price'] = result.get('price', 0)
+        
+        closed = trade_store.close_trade(symbol, trade.get('timestamp'), changes)
+        if closed is not None:
+            # تأكيد أمر البيع في الخلفية: سعر البيع الفعلي والإشعار عند التنفيذ
+            if success and result and result.get('pending'):
+                track_sell(closed, result.get('orderId'), reason, notify=notify_trade_status)
+            # إرسال إشعار تلجرام للصفقات المؤكدة فقط
+            elif api_verified:
+                sell_price = result.get('price', 0) if success and result else 0
+                profit_loss = ((sell_price - trade.get('entry_price', 0)) / trade.get('entry_price', 1)) * 100 if sell_price > 0 else 0
                 
-                return True
+                # إرسال إشعار بنجاح البيع
+                notify_trade_status(
+                    symbol=symbol,
+                    status=f"تم البيع ({reason})",
+                    price=sell_price,
+                    profit_loss=profit_loss,
+                    order_id=result.get('orderId') if success and result else None,
+                    api_verified=True
+                )
+            else:
+                logger.warning(f"⚠️ تم إغلاق صفقة غير مؤكدة: {symbol} - لم يتم إرسال إشعار")
+            
+            return True
         
         logger.warning(f"لم يتم العثور على الصفقة لإغلاقها: {symbol} - {trade.get('timestamp')}")
         return False
@@ -853,6 +722,56 @@ def close_trade(trade: Dict[str, Any], reason: str, api_verified: bool = True) -
         logger.error(f"خطأ في إغلاق الصفقة: {e}")
         return False
 
+def process_exit_event(trade: Dict[str, Any], kind: str, price: Optional[float]) -> bool:
+    """
+    معالجة حدث خروج من محرك الخروج (نفس قواعد check_and_sell_trades لكن لحظة عبور المستوى)
+    
+    :param trade: الصفقة كما فُهرست في المحرك
+    :param kind: نوع الحدث (take_profit / stop_loss / max_hold_time)
+    :param price: السعر الذي فعّل الحدث
+    :return: True إذا تم إغلاق الصفقة
+    """
+    symbol = trade.get('symbol')
+    timestamp = trade.get('timestamp')
+    
+    # قراءة أحدث نسخة من الصفقة (قد تكون أُغلقت أو تغيرت منذ الفهرسة)
+    current = trade_store.get_trade(symbol, timestamp, status='OPEN')
+    if current is None:
+        return False
+    
+    entry_price = current.get('entry_price', 0)
+    profit_percent = (price - entry_price) / entry_price * 100 if price and entry_price else 0
+    
+    if kind != TAKE_PROFIT:
+        logger.info(f"سيتم بيع {symbol}: {kind}, الربح/الخسارة={profit_percent:.2f}%")
+        return close_trade(current, kind, api_verified=True)
+    
+    # تعليم جميع الأهداف التي بلغها السعر كمحققة
+    tp_targets = current.get('take_profit_targets', [])
+    newly_hit = []
+    for target in tp_targets:
+        if not target.get('hit', False) and profit_percent >= target.get('percent', 0):
+            target['hit'] = True
+            newly_hit.append(target.get('percent', 0))
+    if not newly_hit:
+        return False
+    trade_store.update_trade(symbol, timestamp, {'take_profit_targets': tp_targets})
+    
+    for target_percent in newly_hit:
+        logger.info(f"🎯 تم تحقيق هدف الربح {target_percent}% للعملة {symbol}")
+        notify_trade_status(
+            symbol=symbol,
+            status=f"تم تحقيق هدف {target_percent}%",
+            price=price,
+            profit_loss=profit_percent,
+            api_verified=True
+        )
+    
+    if all(target.get('hit', False) for target in tp_targets):
+        logger.info(f"سيتم بيع {symbol}: all_targets_hit, الربح/الخسارة={profit_percent:.2f}%")
+        return close_trade(current, "all_targets_hit", api_verified=True)
+    return False
+
 def check_and_sell_trades() -> int:
     """
     التحقق من الصفقات وبيعها إذا استوفت شروط البيع
@@ -875,6 +794,10 @@ def check_and_sell_trades() -> int:
             logger.info("لا توجد صفقات مفتوحة للتحقق")
             return 0
         
+        # الاشتراك في الأسعار اللحظية للصفقات المفتوحة (إذا كانت تغذية WebSocket تعمل)
+        if market_feed.running:
+            market_feed.subscribe(trade.get('symbol') for trade in open_trades)
+        
         current_time = int(time.time() * 1000)
         sold_count = 0
         cleaned_count = 0
@@ -906,7 +829,11 @@ def check_and_sell_trades() -> int:
         # تنظيف الصفقات غير المؤكدة
         for trade in list(open_trades):  # نسخة من القائمة لتجنب مشاكل التعديل أثناء التكرار
             symbol = trade.get('symbol')
-            
+
+            # أوامر الشراء بانتظار تأكيد التنفيذ في الخلفية ليست صفقات وهمية
+            if order_tracker.is_pending(trade.get('orderId', '')) or trade.get('confirmation') == 'PENDING':
+                continue
+
             # إذا كانت الصفقة غير مؤكدة، نغلقها ونعلمها كصفقة وهمية
             if not trade.get('api_confirmed', False):
                 logger.warning(f"⚠️ تنظيف صفقة غير مؤكدة: {symbol}")
@@ -969,13 +896,8 @@ def check_and_sell_trades() -> int:
                     tp_targets[i]['hit'] = True
                     target_hit = True
                     
-                    # تحديث الصفقة في الملف
-                    update_data = load_trades()
-                    for t in update_data.get('open', []):
-                        if t.get('symbol') == symbol and t.get('timestamp') == timestamp:
-                            t['take_profit_targets'] = tp_targets
-                            break
-                    save_trades(update_data)
+                    # تحديث الصفقة في المخزن (كتابة صف واحد)
+                    trade_store.update_trade(symbol, timestamp, {'take_profit_targets': tp_targets})
                     
                     logger.info(f"🎯 تم تحقيق هدف الربح {target_percent}% للعملة {symbol}")
                     
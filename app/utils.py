@@ -160,64 +160,9 @@ def calculate_total_profit():
     :return: الربح الإجمالي بالدولار والنسبة المئوية
     """
     try:
-        trades = load_trades()
-        
-        total_profit_dollar = 0
-        total_profit_pct = 0
-        num_profitable_trades = 0
-        num_closed_trades = 0
-        
-        for trade in trades:
-            if trade.get('status') != 'CLOSED':
-                continue
-                
-            # زيادة عدد الصفقات المغلقة
-            num_closed_trades += 1
-            
-            entry_price = float(trade.get('entry_price', 0))
-            close_price = float(trade.get('close_price', 0))
-            quantity = float(trade.get('quantity', 0))
-            
-            # إذا كانت جميع البيانات اللازمة متوفرة
-            if entry_price > 0 and close_price > 0 and quantity > 0:
-                trade_profit_dollar = (close_price - entry_price) * quantity
-                
-                # إضافة الربح إلى الإجمالي
-                total_profit_dollar += trade_profit_dollar
-                
-                # حساب نسبة الربح المئوية
-                profit_pct = ((close_price - entry_price) / entry_price) * 100
-                total_profit_pct += profit_pct
-                
-                # التحقق مما إذا كانت الصفقة مربحة
-                if trade_profit_dollar > 0:
-                    num_profitable_trades += 1
-            
-            # أو استخدام profit_pct المخزن مباشرة إذا كان متوفرًا
-            elif trade.get('profit_pct') is not None:
-                profit_pct = float(trade.get('profit_pct', 0))
-                total_profit_pct += profit_pct
-                
-                # التحقق مما إذا كانت الصفقة مربحة
-                if profit_pct > 0:
-                    num_profitable_trades += 1
-        
-        # حساب متوسط الربح بالنسبة المئوية (إذا كان هناك صفقات مغلقة)
-        avg_profit_pct = total_profit_pct / num_closed_trades if num_closed_trades > 0 else 0
-        
-        # حساب نسبة الصفقات المربحة
-        win_rate = (num_profitable_trades / num_closed_trades * 100) if num_closed_trades > 0 else 0
-        
-        # تنسيق النتائج
-        profit_statistics = {
-            'total_profit_dollar': round(total_profit_dollar, 2),
-            'avg_profit_pct': round(avg_profit_pct, 2),
-            'win_rate': round(win_rate, 2),
-            'num_profitable_trades': num_profitable_trades,
-            'num_closed_trades': num_closed_trades
-        }
-        
-        return profit_statistics
+        # مجاميع جارية من مخزن الصفقات بدلاً من إعادة فحص جميع الصفقات المغلقة
+        from app.trade_analytics import trade_analytics
+        return trade_analytics.total_profit()
     except Exception as e:
         logger.error(f"خطأ في حساب الربح الإجمالي: {e}")
         return {
@@ -1,10 +1,11 @@
 """
 نسخة كاملة من main.py مع إصلاح مشكلة BOT_STATE
 """
-from flask import Flask, render_template, redirect, url_for, request, flash, jsonify
+from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, Response, stream_with_context
 import os
 import logging
 import traceback
+import time
 from datetime import datetime
 
 # إعداد التسجيل
@@ -124,6 +125,13 @@ except Exception as e:
     logger.error(f"❌ خطأ في تهيئة مرشحات Jinja: {e}")
     traceback.print_exc()
 
+# استعادة مخزن الصفقات من سجل الأحداث إذا كان مفقوداً أو تالفاً (قبل تشغيل البوت)
+try:
+    from app.trade_journal import start_journal
+    start_journal()
+except Exception as e:
+    logger.error(f"خطأ في تشغيل سجل الصفقات: {e}")
+
 # تشغيل البوت تلقائياً عند بدء التطبيق
 from app.trading_bot import start_bot, get_bot_status, check_bot_health, BOT_STATUS
 if not BOT_STATUS.get('running', False):
@@ -131,36 +139,49 @@ if not BOT_STATUS.get('running', False):
     start_bot()
 
 # إضافة آلية فحص دوري للتأكد من استمرارية البوت
-import threading
-import time
-
 def bot_watchdog():
     """آلية حارسة للتأكد من استمرارية البوت وإعادة تشغيله تلقائياً في حالة التوقف"""
-    while True:
-        try:
-            # فحص حالة البوت
-            bot_status = get_bot_status()
-            if not bot_status.get('running', False):
-                logger.warning("🔍 اكتشف نظام المراقبة أن البوت متوقف، سيتم محاولة إعادة تشغيله تلقائياً...")
-                check_bot_health()
-        except Exception as e:
-            logger.error(f"خطأ في نظام مراقبة البوت: {e}")
-        
-        # انتظار قبل الفحص التالي (كل 5 دقائق)
-        time.sleep(300)
+    # فحص حالة البوت
+    bot_status = get_bot_status()
+    if not bot_status.get('running', False):
+        logger.warning("🔍 اكتشف نظام المراقبة أن البوت متوقف، سيتم محاولة إعادة تشغيله تلقائياً...")
+        check_bot_health()
 
-# تشغيل حارس البوت في خلفية النظام
-watchdog_thread = threading.Thread(target=bot_watchdog, daemon=True)
-watchdog_thread.start()
+# تشغيل حارس البوت كمهمة في محرك التداول الموحد (كل 5 دقائق)
+from app.engine import trading_engine
+trading_engine.register('main.bot_watchdog', bot_watchdog, 300, initial_delay=300)
 logger.info("🔒 تم تشغيل نظام حماية البوت للتأكد من استمرارية التشغيل")
 
-# متغيرات للتخزين المؤقت
-dashboard_cache = {
-    'last_update': 0,
-    'data': None,
-    'cache_time': 60  # تخزين مؤقت لمدة 60 ثانية لتحسين الأداء
-}
+# تحديث فهرس مرشحات الرموز دورياً في الخلفية (لا تنتظر الأوامر تنزيل exchangeInfo)
+try:
+    from app.symbol_index import symbol_index
+    symbol_index.start_auto_refresh()
+except Exception as e:
+    logger.error(f"خطأ في تشغيل التحديث الدوري لفهرس الرموز: {e}")
+
+# تغذية الأسعار اللحظية عبر WebSocket (البديل: الاستعلام الدوري عبر لقطة الأسعار)
+try:
+    from app.market_feed import start_market_feed
+    from app.config import HIGH_VOLUME_SYMBOLS
+    start_market_feed(HIGH_VOLUME_SYMBOLS)
+except Exception as e:
+    logger.error(f"خطأ في تشغيل تغذية بيانات السوق: {e}")
+
+# أرشفة الصفقات المغلقة القديمة ودمج أجزاء الأرشيف دورياً (المخزن الساخن يبقى صغيراً)
+try:
+    from app.trade_archive import start_archiving
+    start_archiving()
+except Exception as e:
+    logger.error(f"خطأ في تشغيل أرشفة الصفقات: {e}")
+
+# محرك الخروج اللحظي (تنفيذ أهداف الربح ووقف الخسارة فور عبور السعر للمستوى)
+try:
+    from app.exit_engine import start_exit_engine
+    start_exit_engine()
+except Exception as e:
+    logger.error(f"خطأ في تشغيل محرك الخروج: {e}")
 
+# متغيرات للتخزين المؤقت
 # تخزين مؤقت لكل صفحة
 page_caches = {
     'settings': {'last_update': 0, 'data': None, 'cache_time': 120},
@@ -170,44 +191,6 @@ page_caches = {
 
 from functools import wraps
 
-def cache_dashboard_data(func):
-    """
-    مغلف (decorator) للتخزين المؤقت لبيانات لوحة التحكم
-    يقوم بتخزين البيانات مؤقتاً لتقليل الحمل على API
-    """
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        current_time = time.time()
-        force_refresh = kwargs.get('force_refresh', False)
-        
-        # إذا كانت البيانات المخزنة مؤقتاً حديثة بما فيه الكفاية وليس هناك طلب تحديث إجباري
-        if dashboard_cache['data'] and not force_refresh and current_time - dashboard_cache['last_update'] < dashboard_cache['cache_time']:
-            logger.info("استخدام بيانات لوحة التحكم المخزنة مؤقتاً")
-            return dashboard_cache['data']
-        
-        # وإلا، استدعاء الدالة الأصلية والتخزين المؤقت للنتيجة
-        # استخدام نسخة من البيانات القديمة في حالة فشل التحديث
-        old_data = dashboard_cache['data']
-        try:
-            # نزيل force_refresh من kwargs إذا وجد
-            if 'force_refresh' in kwargs:
-                kwargs.pop('force_refresh')
-                
-            result = func(*args, **kwargs)
-            dashboard_cache['data'] = result
-            dashboard_cache['last_update'] = current_time
-            logger.info("تم تحديث بيانات لوحة التحكم وتخزينها مؤقتاً")
-            return result
-        except Exception as e:
-            logger.error(f"خطأ في تحديث البيانات: {e}")
-            # إذا كان هناك بيانات قديمة، نستخدمها بدلاً من إظهار الخطأ
-            if old_data:
-                logger.info("استخدام البيانات المخزنة سابقاً بسبب خطأ في التحديث")
-                return old_data
-            # في حالة عدم وجود بيانات سابقة، نرمي الخطأ
-            raise
-    return wrapper
-
 def cache_page_data(page_name):
     """
     مغلف (decorator) عام للتخزين المؤقت لبيانات أي صفحة
@@ -247,31 +230,53 @@ def cache_page_data(page_name):
         return wrapper
     return decorator
 
-@cache_dashboard_data
+def load_watched_coins():
+    """بيانات العملات المراقبة مع السعر الحالي والتحليل (قسم 'watched' في تغذية لوحة التحكم)"""
+    coins = get_watched_symbols()
+    symbols_data = {}
+    for symbol in coins:
+        symbol_data = {
+            'symbol': symbol,
+            'current_price': get_current_price(symbol),
+            'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        # محاولة الحصول على مزيد من البيانات إذا كانت متاحة
+        try:
+            symbol_data.update(get_symbol_analysis(symbol))
+        except Exception as e:
+            logger.warning(f"لم نتمكن من الحصول على تحليل للعملة {symbol}: {e}")
+        symbols_data[symbol] = symbol_data
+    return {'symbols': coins, 'symbols_data': symbols_data}
+
+# حالة لوحة التحكم المشتركة: كل قسم يُحسب مرة واحدة لجميع الصفحات والتبويبات المفتوحة
+# وتُدفع التغييرات للمتصفحات عبر SSE (/api/dashboard/stream) بدلاً من الاستعلام الدوري
+from app.dashboard_feed import dashboard_feed
+dashboard_feed.register('bot_status', lambda: get_bot_status(), 5)
+dashboard_feed.register('trades', lambda: get_open_trades(), 5, triggers=('trades',))
+dashboard_feed.register('performance', lambda: get_performance_stats(), 10, triggers=('trades',))
+dashboard_feed.register('capital_status', lambda: get_capital_status(), 30, triggers=('trades',))
+dashboard_feed.register('available_capital', lambda: calculate_available_risk_capital(), 30, triggers=('trades',))
+dashboard_feed.register('watched', load_watched_coins, 30)
+DASHBOARD_SECTIONS = ('bot_status', 'trades', 'performance', 'capital_status', 'available_capital')
+
 def get_dashboard_data():
     """
-    الحصول على جميع بيانات لوحة التحكم بطريقة فعالة مع تطبيق التخزين المؤقت
+    بيانات لوحة التحكم من الحالة المشتركة (الأقسام المستحقة فقط تُعاد حسابها)
     """
     try:
-        # جلب البيانات المطلوبة
-        bot_status = get_bot_status()
-        trades = get_open_trades()
-        capital_status = get_capital_status()
-        performance = get_performance_stats()
-        available_capital = calculate_available_risk_capital()
-        
-        # جمع البيانات في قاموس واحد
-        data = {
-            'bot_status': bot_status,
+        state = dashboard_feed.snapshot(DASHBOARD_SECTIONS)
+        trades = state.get('trades') or []
+        return {
+            'bot_status': state.get('bot_status') or {'running': False},
             'trades': trades,
             'trades_count': len(trades),
-            'capital_status': capital_status,
-            'performance': performance,
-            'available_capital': available_capital,
+            'capital_status': state.get('capital_status') or {},
+            'performance': state.get('performance') or {},
+            'available_capital': state.get('available_capital') or 0,
             'base_currency': BASE_CURRENCY,
-            'timestamp': int(time.time())
+            'timestamp': state.get('timestamp', int(time.time())),
+            'version': state.get('version', 0)
         }
-        return data
     except Exception as e:
         logger.error(f"خطأ في جلب بيانات لوحة التحكم: {e}")
         return {
@@ -286,6 +291,27 @@ def get_dashboard_data():
             'timestamp': int(time.time())
         }
 
+@app.route('/api/dashboard/snapshot')
+def api_dashboard_snapshot():
+    """الحالة المشتركة الكاملة للوحة التحكم مع رقم الإصدار"""
+    sections = request.args.get('sections')
+    return jsonify(dashboard_feed.snapshot(sections.split(',') if sections else None))
+
+@app.route('/api/dashboard/stream')
+def api_dashboard_stream():
+    """
+    تغذية لوحة التحكم عبر Server-Sent Events: لقطة كاملة ثم فروق الأقسام المتغيرة
+    (عند إعادة الاتصال ترسل المتصفحات Last-Event-ID فتُرسل الفروق الفائتة فقط)
+    المعامل sections يحدد أقسام الصفحة فلا تُحسب أقسام لا تعرضها أي صفحة مفتوحة
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    sections = request.args.get('sections')
+    return Response(
+        stream_with_context(dashboard_feed.stream(last_event_id, sections.split(',') if sections else None)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/')
 def home():
     """الصفحة الرئيسية / لوحة التحكم"""
@@ -318,10 +344,12 @@ def get_trades_data():
     """
     try:
         trades = get_open_trades()
-        closed_trades = load_json_data('closed_trades.json', default=[])
+        # آخر الصفقات المغلقة من المخزن والأرشيف (تُقرأ أحدث أجزاء الأرشيف فقط)
+        from app.trade_archive import trade_archive
+        closed_trades = trade_archive.history(limit=50)
         
         # تحليل البيانات
-        total_profit = calculate_total_profit(closed_trades)
+        total_profit = calculate_total_profit()
         
         # الحصول على أسعار حالية للصفقات المفتوحة
         for trade in trades:
@@ -339,7 +367,7 @@ def get_trades_data():
                     
         return {
             'open_trades': trades,
-            'closed_trades': closed_trades[:50],  # عرض آخر 50 صفقة مغلقة فقط
+            'closed_trades': closed_trades,  # عرض آخر 50 صفقة مغلقة فقط
             'total_profit': total_profit,
             'base_currency': BASE_CURRENCY,
             'timestamp': int(time.time())
@@ -489,26 +517,10 @@ def scan_market_route():
 def watched_coins():
     """صفحة العملات المراقبة"""
     try:
-        coins = get_watched_symbols()
-        symbols_data = {}
+        watched = dashboard_feed.snapshot(['watched']).get('watched') or load_watched_coins()
+        coins = watched['symbols']
+        symbols_data = watched['symbols_data']
         
-        for symbol in coins:
-            current_price = get_current_price(symbol)
-            symbol_data = {
-                'symbol': symbol,
-                'current_price': current_price,
-                'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
-            # محاولة الحصول على مزيد من البيانات إذا كانت متاحة
-            try:
-                analysis = get_symbol_analysis(symbol)
-                symbol_data.update(analysis)
-            except Exception as e:
-                logger.warning(f"لم نتمكن من الحصول على تحليل للعملة {symbol}: {e}")
-                
-            symbols_data[symbol] = symbol_data
-            
         return render_template(
             'watched_coins.html',
             title="العملات المراقبة",
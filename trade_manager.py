@@ -29,6 +29,8 @@ from app.mexc_api import (
     get_account_balance
 )
 from app.telegram_notify import send_telegram_message, notify_trade_status
+from app.trade_store import trade_store
+from app.order_tracker import track_buy, track_sell
 
 # إعداد التسجيل
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -60,31 +62,27 @@ PREFERRED_COINS = [
 ]
 
 def create_backup():
-    """إنشاء نسخة احتياطية من ملف الصفقات"""
+    """إنشاء نسخة احتياطية من مخزن الصفقات"""
     try:
-        import shutil
-        timestamp = int(time.time())
-        shutil.copy('active_trades.json', f'active_trades.json.backup.{timestamp}')
-        logger.info(f"تم إنشاء نسخة احتياطية: active_trades.json.backup.{timestamp}")
+        backup_name = trade_store.backup(force=True)
+        logger.info(f"تم إنشاء نسخة احتياطية: {backup_name}")
         return True
     except Exception as e:
         logger.error(f"فشل إنشاء نسخة احتياطية: {e}")
         return False
 
 def load_trades():
-    """تحميل الصفقات من الملف"""
+    """تحميل الصفقات من مخزن الصفقات"""
     try:
-        with open('active_trades.json', 'r') as f:
-            return json.load(f)
+        return trade_store.load_all()
     except Exception as e:
-        logger.error(f"خطأ في قراءة ملف الصفقات: {e}")
+        logger.error(f"خطأ في قراءة الصفقات: {e}")
         return {"open": [], "closed": []}
 
 def save_trades(data):
-    """حفظ الصفقات في الملف"""
+    """حفظ الصفقات في مخزن الصفقات (تُكتب الصفقات المتغيرة فقط)"""
     try:
-        with open('active_trades.json', 'w') as f:
-            json.dump(data, f, indent=2)
+        trade_store.save_all(data)
         logger.info(f"تم حفظ {len(data.get('open', []))} صفقة مفتوحة و {len(data.get('closed', []))} صفقة مغلقة")
         return True
     except Exception as e:
@@ -338,8 +336,8 @@ def apply_profit_rules():
         if not target_hit:
             updated_trades.append(trade)
     
-    # حفظ التحديثات
-    trades_data['open'] = updated_trades
+    # حفظ التحديثات (الصفقات المراد إغلاقها تبقى مفتوحة حتى يُرسل أمر بيعها)
+    trades_data['open'] = updated_trades + [t['trade'] for t in trades_to_close]
     save_trades(trades_data)
     
     # إغلاق الصفقات التي وصلت للهدف أو وقف الخسارة
@@ -390,108 +388,26 @@ def apply_profit_rules():
                 
             logger.info(f"✅ تم إرسال أمر البيع بنجاح: {sell_result}")
             
-            # التحقق من تنفيذ الصفقة فعلياً - إنتظار قصير للتأكد من تحديث تاريخ التداول
-            time.sleep(2)
-            
-            # نتحقق عبر تاريخ التداول
-            sell_verified = False
-            try:
-                logger.info(f"🔍 التحقق من تنفيذ عملية بيع {symbol} في تاريخ التداول...")
-                
-                # محاولات متعددة للتحقق من تنفيذ الصفقة
-                for attempt in range(3):
-                    trades_history = get_trades_history(symbol, 20)
-                    if trades_history:
-                        for trade_record in trades_history:
-                            # نبحث عن صفقة بيع حديثة بنفس معرف الأمر
-                            if (str(trade_record.get('orderId')) == str(sell_result.get('orderId')) and 
-                                trade_record.get('side') == 'SELL'):
-                                sell_verified = True
-                                logger.info(f"✅✅ تأكيد تنفيذ عملية البيع في تاريخ التداول: {symbol}")
-                                break
-                    
-                    if sell_verified:
-                        break
-                        
-                    # إنتظار قصير ثم محاولة مرة أخرى
-                    logger.warning(f"⚠️ محاولة {attempt+1}/3: لم يتم العثور على عملية البيع في تاريخ التداول بعد. إنتظار...")
-                    time.sleep(2)
-                
-                if not sell_verified:
-                    # إذا لم نتمكن من التحقق من البيع، نحاول التحقق من تغير الرصيد كوسيلة بديلة
-                    logger.warning(f"⚠️ لم يتم تأكيد عملية البيع في تاريخ التداول. التحقق من تغير الرصيد...")
-                    
-                    try:
-                        # تأكد من أن لدينا معلومات عن رصيد العملة قبل وبعد البيع
-                        _coin_symbol = symbol.replace('USDT', '')
-                        # الحصول على رصيد العملة الحالي
-                        new_balance = get_account_balance()
-                        # استخدام كمية الصفقة كقيمة افتراضية لرصيد العملة
-                        # هذا التغيير يحل مشكلة متغير coin_balance غير المحدد
-                        old_coin_balance = float(quantity)
-                        # نستخدم current_coin_balance المعرف في الأعلى إذا كان موجودًا
-                        if 'current_coin_balance' in locals():
-                            old_coin_balance = current_coin_balance
-                            
-                        # التحقق من انخفاض رصيد العملة
-                        if new_balance and _coin_symbol in new_balance:
-                            new_coin_balance = float(new_balance[_coin_symbol].get('free', 0))
-                            if new_coin_balance < old_coin_balance * 0.5:  # انخفاض الرصيد بشكل كبير يعني نجاح البيع
-                                sell_verified = True
-                                logger.info(f"✅ تم تأكيد البيع من خلال تغير الرصيد: {old_coin_balance} → {new_coin_balance}")
-                                # تم إصلاح جميع أخطاء المتغيرات غير المعرفة
-                    except Exception as e:
-                        logger.error(f"❌ خطأ في التحقق من تغير الرصيد: {e}")
-                    
-                    if not sell_verified:
-                        logger.error(f"❌❌ لم يتم تأكيد عملية البيع بعد عدة محاولات: {symbol}")
-                        # نستمر لأن الأمر تم إرساله وقد يكون التأخير في تحديث API
-            except Exception as e:
-                logger.error(f"❌ خطأ أثناء التحقق من تاريخ التداول للبيع: {e}")
-                # نستمر في التنفيذ لأن الأمر قد يكون نجح رغم فشل التحقق
-            
-            # الحصول على سعر البيع الفعلي
+            # سعر تقديري حتى يصل سعر التنفيذ الفعلي من تأكيد الأمر في الخلفية
             current_price = get_current_price(symbol)
-            if not current_price and sell_result.get('price'):
-                current_price = float(sell_result.get('price'))
-            elif not current_price:
-                # إذا لم نتمكن من الحصول على السعر، نستخدم سعر الصفقة الأصلي + نسبة الربح/الخسارة
+            if not current_price:
                 entry_price = float(trade_obj.get('entry_price', 0))
                 current_price = entry_price * (1 + profit_loss/100)
             
-            # تحديث معلومات الصفقة
-            trade_obj['status'] = 'CLOSED'
-            trade_obj['close_price'] = current_price
-            trade_obj['close_timestamp'] = int(datetime.now().timestamp() * 1000)
-            trade_obj['profit_loss'] = profit_loss
-            trade_obj['close_reason'] = reason
-            trade_obj['sell_verified'] = sell_verified  # إضافة علامة التحقق من البيع
-            trade_obj['sell_order_id'] = sell_result.get('orderId', '')
-            
-            # تحديث ملف الصفقات
-            trades_data = load_trades()  # إعادة تحميل لمنع تضارب التغييرات
-            open_trades = [t for t in trades_data.get('open', []) if t.get('symbol') != symbol]
-            closed_trades = trades_data.get('closed', [])
-            closed_trades.append(trade_obj)
-            
-            trades_data['open'] = open_trades
-            trades_data['closed'] = closed_trades
-            save_trades(trades_data)
+            # نقل الصفقة إلى المغلقة (كتابة صف واحد) ثم تأكيد البيع في الخلفية
+            closed = trade_store.close_trade(symbol, trade_obj.get('timestamp'), {
+                'status': 'CLOSED',
+                'close_price': current_price,
+                'close_timestamp': int(datetime.now().timestamp() * 1000),
+                'profit_loss': profit_loss,
+                'close_reason': reason,
+                'sell_order_id': sell_result.get('orderId', '')
+            })
+            if closed is not None:
+                track_sell(closed, sell_result.get('orderId'), reason, notify=notify_trade_status)
             
             closed_count += 1
-            
-            # إرسال إشعار
-            notify_trade_status(
-                symbol=symbol,
-                status=f"تم البيع ({reason})",
-                price=current_price,
-                profit_loss=profit_loss,
-                order_id=sell_result.get('orderId'),
-                api_verified=sell_verified
-            )
-            
-            verification_status = "✅✅ [تم التأكيد]" if sell_verified else "⚠️ [بانتظار التأكيد]"
-            logger.info(f"✅ تم بيع {symbol} بسعر {current_price} ({profit_loss:.2f}%) {verification_status}")
+            logger.info(f"✅ تم إرسال بيع {symbol} بسعر تقديري {current_price} ({profit_loss:.2f}%) ⏳ [بانتظار التأكيد]")
         except Exception as e:
             logger.error(f"❌ خطأ في بيع {symbol}: {e}")
             # تسجيل تفاصيل الخطأ
@@ -501,7 +417,7 @@ def apply_profit_rules():
     return closed_count
 
 def execute_buy(symbol, amount):
-    """تنفيذ عملية الشراء مع تأكيد قطعي للصفقات الحقيقية فقط"""
+    """تنفيذ عملية الشراء - تُسجّل الصفقة كمعلّقة ويُؤكَّد التنفيذ في الخلفية"""
     try:
         # الحصول على السعر الحالي
         price = get_current_price(symbol)
@@ -545,76 +461,13 @@ def execute_buy(symbol, amount):
             
         logger.info(f"✅ تم إرسال أمر الشراء بنجاح: {result}")
         
-        # التحقق من تنفيذ الصفقة فعلياً - إنتظار قصير للتأكد من تحديث تاريخ التداول
-        time.sleep(2)
-        
-        # نتحقق عبر تاريخ التداول أولاً
-        trade_history_verified = False
-        try:
-            logger.info(f"🔍 التحقق من تنفيذ صفقة {symbol} في تاريخ التداول...")
-            
-            # محاولات متعددة للتحقق من تنفيذ الصفقة خلال 10 ثوانٍ
-            for attempt in range(3):
-                trades_history = get_trades_history(symbol, 20)
-                if trades_history:
-                    for trade_record in trades_history:
-                        if str(trade_record.get('orderId')) == str(result.get('orderId')):
-                            trade_history_verified = True
-                            logger.info(f"✅✅ تأكيد وجود الصفقة في تاريخ التداول: {symbol} (معرف الأمر: {result.get('orderId')})")
-                            break
-                
-                if trade_history_verified:
-                    break
-                    
-                # إنتظار قصير ثم محاولة مرة أخرى
-                logger.warning(f"⚠️ محاولة {attempt+1}/3: لم يتم العثور على الصفقة في تاريخ التداول بعد. إنتظار...")
-                time.sleep(2)
-            
-            if not trade_history_verified:
-                logger.error(f"❌❌ لم يتم تأكيد الصفقة في تاريخ التداول بعد 3 محاولات: {symbol}")
-                return False, {"error": "لم يتم تأكيد الصفقة في تاريخ التداول"}
-                
-        except Exception as e:
-            logger.error(f"❌ خطأ أثناء التحقق من تاريخ التداول: {e}")
-            return False, {"error": f"خطأ أثناء التحقق من تاريخ التداول: {e}"}
-        
-        # وصلنا إلى هنا فقط إذا تم تأكيد الصفقة فعلياً
-        logger.info(f"🎯 تم تأكيد تنفيذ صفقة حقيقية: {symbol}")
-        
-        # التحقق من تغير الرصيد بعد الشراء
-        try:
-            new_balance = get_account_balance()
-            if new_balance and 'USDT' in new_balance:
-                new_usdt_balance = float(new_balance['USDT'].get('free', 0))
-                balance_diff = initial_usdt_balance - new_usdt_balance
-                logger.info(f"💰 تغير رصيد USDT: {initial_usdt_balance} → {new_usdt_balance} (فرق: {balance_diff})")
-                
-                # التحقق إذا كان هناك تغير فعلي في الرصيد يقارب قيمة الصفقة
-                if balance_diff < amount * 0.8:  # يجب أن يكون التغير على الأقل 80% من قيمة الصفقة
-                    logger.warning(f"⚠️ تغير الرصيد أقل من المتوقع: {balance_diff} < {amount}")
-                    # نستمر لأن هناك عوامل أخرى مثل الرسوم قد تؤثر على الدقة
-            
-            # التحقق من وجود العملة في الرصيد بعد الشراء
-            purchased_coin_symbol = symbol.replace('USDT', '')
-            if new_balance and purchased_coin_symbol in new_balance:
-                purchased_coin_balance = float(new_balance[purchased_coin_symbol].get('free', 0))
-                logger.info(f"💰 رصيد {purchased_coin_symbol} الجديد: {purchased_coin_balance}")
-                
-                if purchased_coin_balance < quantity * 0.8:  # يجب أن تكون الكمية على الأقل 80% من المطلوب (بعد خصم الرسوم)
-                    logger.warning(f"⚠️ كمية {purchased_coin_symbol} أقل من المتوقع: {purchased_coin_balance} < {quantity}")
-                    # نستمر لأن الرسوم قد تؤثر على الكمية النهائية
-                
-        except Exception as e:
-            logger.error(f"❌ خطأ في التحقق من تغير الرصيد: {e}")
-            # نستمر رغم الخطأ لأن الصفقة تم تأكيدها بالفعل
-        
         # إضافة أهداف الربح
         take_profit_targets = [
             {'percent': percent, 'hit': False}
             for percent in TRADE_SETTINGS['profit_targets']
         ]
         
-        # إنشاء سجل للصفقة
+        # إنشاء سجل للصفقة كصفقة معلّقة حتى يتأكد تنفيذ الأمر
         order_info = {
             'symbol': symbol,
             'quantity': quantity,
@@ -624,27 +477,19 @@ def execute_buy(symbol, amount):
             'timestamp': int(datetime.now().timestamp() * 1000),
             'status': 'OPEN',
             'api_executed': True,
-            'api_confirmed': True,  # تم التأكد من وجود الصفقة بالفعل
+            'api_confirmed': False,  # تصبح True عند تأكيد التنفيذ في الخلفية
+            'confirmation': 'PENDING',
             'orderId': result.get('orderId', ''),
             'order_type': 'MARKET',
-            'verified_by': 'trade_history'  # تسجيل طريقة التحقق
+            'verified_by': 'order_status'  # تسجيل طريقة التحقق
         }
         
-        # تحديث ملف الصفقات
-        trades_data = load_trades()
-        trades_data['open'].append(order_info)
-        save_trades(trades_data)
-        
-        logger.info(f"✅✅✅ تم تنفيذ الشراء وتأكيده: {symbol}")
+        # إضافة الصفقة إلى المخزن ثم تأكيد التنفيذ في الخلفية
+        trade_store.add_trade(order_info)
+        track_buy(order_info, notify=notify_trade_status)
         
-        # إرسال إشعار
-        notify_trade_status(
-            symbol=symbol, 
-            status="تم الشراء وتأكيده", 
-            price=price, 
-            order_id=result.get('orderId'),
-            api_verified=True
-        )
+        result['pending'] = True
+        logger.info(f"⏳ تم إرسال الشراء وبانتظار التأكيد: {symbol}")
             
         return True, result
         